@@ -0,0 +1,239 @@
+"""Asyncio facade for embedding lookups in async services.
+
+Providers are synchronous and CPU-bound: ``initialize()`` downloads and parses
+snapshots and batch lookups hold the CPU for the whole batch. ``AsyncLookup``
+runs both on a dedicated executor thread, so the event loop keeps serving other
+tasks, and reads async streams of IPs in chunks with bounded read-ahead::
+
+    async with AsyncLookup.from_config(config) as session:
+        batch = await session.lookup(["8.8.8.8", "1.1.1.1"])
+        async for batch in session.stream(kafka_ips()):
+            ...
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import TracebackType
+from typing import AsyncIterable, AsyncIterator, Deque, Iterable, List, Optional, Type, Union
+
+from .columnar import ColumnarBatch
+from .lookup import chunked, lookup_chunk, merge_batches, provider_from_config
+from .models import LookupConfig
+from .providers import BaseProvider
+
+IPSource = Union[AsyncIterable[str], Iterable[str]]
+
+
+async def achunked(
+    items: IPSource, size: int, max_delay: Optional[float] = None
+) -> AsyncIterator[List[str]]:
+    """Split a sync or async iterable into lists of at most ``size`` items.
+
+    Each chunk of a sync iterable is read on the loop's default executor, so a
+    source that blocks (such as a file) does not stall the event loop.
+
+    Args:
+        items: The items to split.
+        size: Maximum number of items per chunk.
+        max_delay: Seconds after which a partial chunk is emitted when the source
+            is idle (default: wait until the chunk is full or the source ends).
+            Only applies to async iterables.
+
+    Yields:
+        Consecutive chunks of items.
+    """
+    loop = asyncio.get_running_loop()
+    if not isinstance(items, AsyncIterable):
+        chunks = chunked(items, size)
+        while True:
+            block = await loop.run_in_executor(None, next, chunks, None)
+            if block is None:
+                return
+            yield block
+
+    iterator = items.__aiter__()
+    chunk: List[str] = []
+    deadline = 0.0
+    # The pending ``__anext__`` survives idle timeouts; cancelling it could break the source.
+    next_item: Optional["asyncio.Future[str]"] = None
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.ensure_future(iterator.__anext__())
+            timeout = deadline - loop.time() if chunk and max_delay is not None else None
+            done, _ = await asyncio.wait({next_item}, timeout=timeout)
+            if not done:
+                yield chunk
+                chunk = []
+                continue
+            future, next_item = next_item, None
+            try:
+                item = future.result()
+            except StopAsyncIteration:
+                break
+            if not chunk and max_delay is not None:
+                deadline = loop.time() + max_delay
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if next_item is not None:
+            next_item.cancel()
+
+
+class AsyncLookup:
+    """Look up IPs with one provider without blocking the event loop.
+
+    Providers are not thread-safe, so every call runs on a single executor thread
+    owned by the session; concurrent callers are served one chunk at a time.
+    """
+
+    def __init__(
+        self,
+        provider: BaseProvider,
+        chunk_size: int = 100_000,
+        enrich: bool = False,
+        max_pending: int = 2,
+    ) -> None:
+        """Initialize the session.
+
+        Args:
+            provider: The provider to look up with (initialized on first use).
+            chunk_size: Number of IPs handed to the provider per executor call.
+            enrich: Also resolve matched prefixes and origin sets.
+            max_pending: Chunks read ahead of the consumer of ``stream``; reading
+                from the source pauses while this many are queued or running.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.provider = provider
+        self.chunk_size = chunk_size
+        self.enrich = enrich
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-ip-to-asn")
+        self._ready: Optional["asyncio.Future[None]"] = None
+
+    @classmethod
+    def from_config(cls, config: LookupConfig, max_pending: int = 2) -> "AsyncLookup":
+        """Create a session for the provider, snapshot and options of a lookup configuration.
+
+        Args:
+            config: Configuration for the lookup operation.
+            max_pending: Chunks read ahead of the consumer of ``stream``.
+
+        Returns:
+            The session.
+        """
+        return cls(provider_from_config(config), config.chunk_size, config.enrich, max_pending)
+
+    async def ainitialize(self) -> None:
+        """Initialize the provider once; concurrent callers wait for the same load.
+
+        Raises:
+            LookupError: If no snapshot exists for the date.
+        """
+        ready = self._ready
+        if ready is None or (ready.done() and (ready.cancelled() or ready.exception() is not None)):
+            # A failed load is retried by the next caller.
+            ready = self._ready = asyncio.ensure_future(self.provider.ainitialize(self._executor))
+        await asyncio.shield(ready)
+
+    def _submit(self, ips: List[str]) -> "asyncio.Future[ColumnarBatch]":
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, lookup_chunk, self.provider, ips, self.provider.snapshot_date, self.enrich
+        )
+
+    async def lookup(self, ips: List[str]) -> ColumnarBatch:
+        """Look up a list of IPs.
+
+        Args:
+            ips: IP addresses to lookup.
+
+        Returns:
+            The results of all IPs, in input order.
+        """
+        await self.ainitialize()
+        batches = [await self._submit(chunk) for chunk in chunked(ips, self.chunk_size)]
+        return merge_batches(batches, self.provider.snapshot_date)
+
+    async def stream(self, ips: IPSource, max_delay: Optional[float] = None) -> AsyncIterator[ColumnarBatch]:
+        """Look up a sync or async stream of IPs chunk by chunk.
+
+        At most ``max_pending`` chunks are read ahead of the consumer, so a slow
+        consumer slows down reading from the source instead of buffering it.
+
+        Args:
+            ips: IP addresses to lookup, e.g. an async generator over a message queue.
+            max_delay: Seconds after which a partial chunk is looked up when the
+                source is idle (default: wait for a full chunk).
+
+        Yields:
+            One ColumnarBatch per chunk, in input order.
+        """
+        await self.ainitialize()
+        chunks = achunked(ips, self.chunk_size, max_delay)
+        pending: Deque["asyncio.Future[ColumnarBatch]"] = deque()
+        next_chunk: Optional["asyncio.Future[List[str]]"] = None
+        exhausted = False
+        try:
+            while not exhausted or pending:
+                if not exhausted and next_chunk is None and len(pending) < self.max_pending:
+                    next_chunk = asyncio.ensure_future(chunks.__anext__())
+                # Wake up for whichever comes first: the next input chunk or the oldest result.
+                waiting = [f for f in (next_chunk, pending[0] if pending else None) if f is not None]
+                await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                if next_chunk is not None and next_chunk.done():
+                    try:
+                        pending.append(self._submit(next_chunk.result()))
+                    except StopAsyncIteration:
+                        exhausted = True
+                    next_chunk = None
+                while pending and pending[0].done():
+                    yield pending.popleft().result()
+        finally:
+            if next_chunk is not None:
+                next_chunk.cancel()
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """Release the executor thread once running lookups finish."""
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "AsyncLookup":
+        await self.ainitialize()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+async def lookup_ips_async(
+    ips: IPSource, config: LookupConfig, max_pending: int = 2, max_delay: Optional[float] = None
+) -> AsyncIterator[ColumnarBatch]:
+    """Perform IP to ASN lookups on a sync or async stream without blocking the event loop.
+
+    The async counterpart of ``lookup_ips_streaming``: use ``async for`` over it.
+
+    Args:
+        ips: IP addresses to lookup.
+        config: Configuration for the lookup operation.
+        max_pending: Chunks read ahead of the consumer.
+        max_delay: Seconds after which a partial chunk is looked up when the source is idle.
+
+    Yields:
+        One ColumnarBatch per chunk of ``config.chunk_size`` IPs.
+    """
+    async with AsyncLookup.from_config(config, max_pending) as session:
+        async for batch in session.stream(ips, max_delay):
+            yield batch
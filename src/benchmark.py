@@ -0,0 +1,704 @@
+"""Offline benchmark suite for providers, serializers and end-to-end runs.
+
+Run with ``python -m src.benchmark``. Every case generates a synthetic pfx2as
+snapshot pair (IPv4 and IPv6) and serves it from a loopback HTTP mirror of the
+CAIDA routing datasets (``$MAP_IP_TO_ASN_ROUTING_URL``), so discovery, download,
+parsing and lookups all run without network access. Each case runs in a fresh
+process so that its peak RSS is its own, and results are written as JSON that
+``--compare`` checks against an earlier run. The import time of the entry
+points, and which heavy optional modules they load, is measured as well.
+"""
+import argparse
+import contextlib
+import gzip
+import http.server
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ipparse import format_ipv4
+from .metrics import peak_rss_mb
+from .models import OutputFormat, Provider
+
+SNAPSHOT_DATE = datetime(2023, 1, 1)
+RESULTS_VERSION = 1
+_ROOT = Path(__file__).resolve().parent.parent
+
+# Metrics compared by ``compare_results``, and whether higher values are better.
+COMPARED_METRICS = {
+    "lookups_per_sec": True,
+    "discovery_s": False,
+    "load_cold_s": False,
+    "load_warm_s": False,
+    "lookup_s": False,
+    "end_to_end_s": False,
+    "peak_rss_mb": False,
+}
+# Timing differences below this are noise, whatever their relative size.
+MIN_SECONDS_DELTA = 0.01
+# Modules whose import time is measured, and the heavy modules they should only
+# load once a code path that needs them is chosen.
+IMPORT_TARGETS = ("src.cli", "src.lookup", "src.serializers", "src.providers")
+HEAVY_MODULES = ("pyarrow", "pandas", "requests", "bs4", "asyncio", "multiprocessing", "http.client")
+OUTPUT_FORMATS = tuple(output_format.value for output_format in OutputFormat)
+
+
+def synthetic_pfx2as(n_prefixes: int, family: int = 4, seed: int = 0, moas_fraction: float = 0.01) -> List[str]:
+    """Generate pfx2as lines with a realistic prefix length mix.
+
+    Args:
+        n_prefixes: Number of prefixes to generate (duplicates are dropped).
+        family: 4 or 6.
+        seed: Random seed.
+        moas_fraction: Fraction of prefixes with two origins (``a_b``).
+
+    Returns:
+        Tab-separated ``network, length, origins`` lines.
+    """
+    rng = np.random.default_rng(seed)
+    if family == 4:
+        # Roughly the length distribution of a full IPv4 table: mostly /24s.
+        lengths = rng.choice([8, 12, 16, 19, 20, 22, 23, 24], n_prefixes,
+                             p=[0.001, 0.004, 0.03, 0.04, 0.06, 0.12, 0.1, 0.645])
+        shift = (32 - lengths).astype(np.uint64)
+        networks = (rng.integers(1 << 24, 224 << 24, n_prefixes, dtype=np.uint64) >> shift << shift)
+        texts = format_ipv4(networks.astype(np.uint32))
+    else:
+        lengths = rng.choice([29, 32, 36, 40, 44, 48], n_prefixes, p=[0.02, 0.2, 0.08, 0.1, 0.1, 0.5])
+        texts = []
+        for length, high in zip(lengths.tolist(), rng.integers(0, 1 << 61, n_prefixes, dtype=np.uint64).tolist()):
+            # Global unicast 2000::/3; only the top 64 bits are ever set.
+            top = ((0b001 << 61) | high) >> (64 - length) << (64 - length)
+            texts.append(socket.inet_ntop(socket.AF_INET6, top.to_bytes(8, "big") + bytes(8)))
+    asns = rng.integers(1, 400_000, n_prefixes).tolist()
+    second = rng.integers(1, 400_000, n_prefixes).tolist()
+    moas = (rng.random(n_prefixes) < moas_fraction).tolist()
+    seen = set()
+    lines = []
+    for text, length, asn, other, multi in zip(texts, lengths.tolist(), asns, second, moas):
+        if (text, length) in seen:
+            continue
+        seen.add((text, length))
+        lines.append(f"{text}\t{length}\t{asn}_{other}" if multi else f"{text}\t{length}\t{asn}")
+    return lines
+
+
+def _random_hosts(rng: np.random.Generator, lines: Sequence[str], n: int, family: int) -> List[str]:
+    """Pick ``n`` random addresses inside random prefixes of a snapshot."""
+    picks = rng.integers(0, len(lines), n)
+    if family == 4:
+        parsed = [lines[i].split("\t") for i in picks.tolist()]
+        nets = np.array([int.from_bytes(socket.inet_aton(p[0]), "big") for p in parsed], dtype=np.uint64)
+        sizes = np.array([1 << (32 - int(p[1])) for p in parsed], dtype=np.uint64)
+        offsets = (rng.random(n) * sizes).astype(np.uint64)
+        return format_ipv4((nets + offsets).astype(np.uint32))
+    hosts = []
+    for i, low in zip(picks.tolist(), rng.integers(0, 1 << 63, n, dtype=np.uint64).tolist()):
+        network, length = lines[i].split("\t")[:2]
+        net = int.from_bytes(socket.inet_pton(socket.AF_INET6, network), "big")
+        host = net | (low & ((1 << (128 - int(length))) - 1))
+        hosts.append(socket.inet_ntop(socket.AF_INET6, host.to_bytes(16, "big")))
+    return hosts
+
+
+def synthetic_ips(
+    lines4: Sequence[str],
+    lines6: Sequence[str],
+    n: int,
+    duplication: float = 0.0,
+    ipv6_fraction: float = 0.0,
+    miss_fraction: float = 0.05,
+    seed: int = 0,
+) -> List[str]:
+    """Generate an IP set with a given size, repetition and family mix.
+
+    Args:
+        lines4: IPv4 pfx2as lines that found addresses are drawn from.
+        lines6: IPv6 pfx2as lines that found addresses are drawn from.
+        n: Number of addresses.
+        duplication: Fraction of addresses that repeat an earlier one.
+        ipv6_fraction: Fraction of distinct addresses that are IPv6.
+        miss_fraction: Fraction of distinct IPv4 addresses outside every prefix
+            (drawn from 240.0.0.0/4).
+        seed: Random seed.
+
+    Returns:
+        The addresses, in random order.
+    """
+    rng = np.random.default_rng(seed)
+    n_unique = max(1, int(round(n * (1 - duplication)))) if n else 0
+    n6 = int(round(n_unique * ipv6_fraction)) if lines6 else 0
+    n_miss = int(round((n_unique - n6) * miss_fraction))
+    n4 = n_unique - n6 - n_miss
+    misses = format_ipv4(rng.integers(240 << 24, 1 << 32, n_miss, dtype=np.uint64).astype(np.uint32))
+    pool = _random_hosts(rng, lines4, n4, 4) + misses + _random_hosts(rng, lines6, n6, 6)
+    repeats = rng.integers(0, len(pool), n - len(pool)) if pool else np.zeros(0, dtype=np.int64)
+    ips = pool + [pool[i] for i in repeats.tolist()]
+    order = rng.permutation(len(ips))
+    return [ips[i] for i in order.tolist()]
+
+
+def write_mirror(root: Path, lines4: Sequence[str], lines6: Sequence[str], date: datetime = SNAPSHOT_DATE) -> None:
+    """Lay out a snapshot pair like the CAIDA routing datasets, with directory listings.
+
+    Args:
+        root: Directory to serve.
+        lines4: Lines of the ``routeviews-prefix2as`` snapshot.
+        lines6: Lines of the ``routeviews6-prefix2as`` snapshot.
+        date: Snapshot date.
+    """
+    for dataset, prefix, lines in (
+        ("routeviews-prefix2as", "routeviews-rv2", lines4), ("routeviews6-prefix2as", "routeviews-rv6", lines6)
+    ):
+        month_dir = root / dataset / f"{date:%Y}" / f"{date:%m}"
+        month_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{prefix}-{date:%Y%m%d}-1200.pfx2as.gz"
+        with gzip.open(month_dir / name, "wt", compresslevel=1) as f:
+            f.write("\n".join(lines) + "\n")
+        (month_dir / "index.html").write_text(f'<html><body><a href="{name}">{name}</a></body></html>')
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def serve_mirror(root: Path) -> Iterator[str]:
+    """Serve a mirror directory on a loopback port.
+
+    Args:
+        root: Directory laid out by ``write_mirror``.
+
+    Yields:
+        The base URL to set as ``$MAP_IP_TO_ASN_ROUTING_URL``.
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _read_snapshot(root: Path, dataset: str) -> List[str]:
+    """Read back the lines of the snapshot a mirror holds for a dataset."""
+    with gzip.open(next((root / dataset).rglob("*.gz")), "rt") as f:
+        return f.read().splitlines()
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark case; meant to run in a fresh process.
+
+    The case dict holds the provider, the IP set parameters, the output formats,
+    the mirror directory and the environment (``$MAP_IP_TO_ASN_ROUTING_URL``).
+
+    Returns:
+        Stage latencies, throughput and peak RSS of the case.
+    """
+    from .columnar import ColumnarBatch
+    from .lookup import get_provider, lookup_unique
+    from .providers import SnapshotStore
+    from .providers.discovery import (
+        ROUTEVIEWS6_DATASET,
+        ROUTEVIEWS_DATASET,
+        find_routeviews_snapshot_url,
+    )
+    from .serializers import open_stream_writer
+
+    os.environ.update(case["env"])
+    mirror = Path(case["mirror"])
+    lines4, lines6 = (_read_snapshot(mirror, dataset) for dataset in ("routeviews-prefix2as", "routeviews6-prefix2as"))
+    ips = synthetic_ips(lines4, lines6, case["ips"], case["duplication"], case["ipv6_fraction"], seed=case["seed"])
+    provider_type = Provider(case["provider"])
+    with_ipv6 = case["ipv6_fraction"] > 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(Path(tmp) / "store")
+        stages: Dict[str, Any] = {}
+
+        def discover() -> None:
+            find_routeviews_snapshot_url(SNAPSHOT_DATE, store, ROUTEVIEWS_DATASET)
+            if with_ipv6:
+                find_routeviews_snapshot_url(SNAPSHOT_DATE, store, ROUTEVIEWS6_DATASET)
+
+        def load() -> Any:
+            provider = get_provider(provider_type, SNAPSHOT_DATE, store)
+            provider.initialize()
+            if with_ipv6:
+                _ = provider.index6  # type: ignore[attr-defined]
+            return provider
+
+        _, stages["discovery_s"] = _timed(discover)
+        _, stages["load_cold_s"] = _timed(load)
+        provider, stages["load_warm_s"] = _timed(load)
+        asns, stages["lookup_s"] = _timed(lambda: lookup_unique(provider, ips))
+        batch = ColumnarBatch.from_ips(ips, asns, provider.provider_name, provider.snapshot_date)
+
+        def write(rows: ColumnarBatch, output_format: str, path: Path) -> None:
+            with open_stream_writer(OutputFormat(output_format), str(path)) as writer:
+                writer.write(rows)
+
+        serialize: Dict[str, Dict[str, float]] = {}
+        for output_format in case["formats"]:
+            path = Path(tmp) / f"out.{output_format}"
+            # Warm up first, so one-time imports (pyarrow) are not billed to the rows.
+            first = ColumnarBatch.from_ips(ips[:1], asns[:1], provider.provider_name, provider.snapshot_date)
+            write(first, output_format, path)
+            _, seconds = _timed(partial(write, batch, output_format, path))
+            serialize[output_format] = {
+                "seconds": seconds,
+                "rows_per_sec": len(ips) / seconds if seconds else 0.0,
+                "bytes": path.stat().st_size,
+            }
+
+        end_to_end = None
+        if case.get("end_to_end"):
+            input_path = Path(tmp) / "ips.txt"
+            input_path.write_text("\n".join(ips) + "\n")
+            end_to_end = _run_cli(
+                ["--file", str(input_path), "--provider", provider_type.value, "--format", "jsonl",
+                 "--output", str(Path(tmp) / "cli.jsonl")],
+                store.root, case["env"]
+            )
+
+    return {
+        "provider": provider_type.value,
+        "dataset": {
+            "ips": case["ips"],
+            "unique_ips": len(set(ips)),
+            "duplication": case["duplication"],
+            "ipv6_fraction": case["ipv6_fraction"],
+        },
+        "stages": stages,
+        "lookups_per_sec": len(ips) / stages["lookup_s"] if stages["lookup_s"] else 0.0,
+        "successful": int(np.count_nonzero(asns)),
+        "serialize": serialize,
+        "end_to_end_s": end_to_end,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _run_cli(args: List[str], cache_dir: Path, env: Dict[str, str]) -> float:
+    """Run the CLI in a new interpreter and return its wall time in seconds.
+
+    Raises:
+        RuntimeError: If the CLI fails.
+    """
+    command = [sys.executable, "-m", "src.cli", "--date", SNAPSHOT_DATE.strftime("%Y-%m-%d"),
+               "--cache-dir", str(cache_dir), *args]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=_ROOT, env={**os.environ, **env}, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed: {completed.stderr.strip()}")
+    return seconds
+
+
+def measure_startup(
+    provider: Provider, formats: Sequence[str], env: Dict[str, str], repeat: int = 3
+) -> Dict[str, Dict[str, float]]:
+    """Measure the wall time of single-IP CLI runs.
+
+    The first run against an empty snapshot cache (discovery, download and
+    index compilation) is reported as ``cold_s``; the best of ``repeat`` later
+    runs, which memory-map the cached index, as ``warm_s``.
+
+    Args:
+        provider: Provider to start.
+        formats: Output formats to measure.
+        env: Environment pointing discovery at the mirror.
+        repeat: Number of warm runs per format.
+
+    Returns:
+        ``{format: {"cold_s": ..., "warm_s": ...}}``.
+    """
+    startup: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for output_format in formats:
+            cache_dir = Path(tmp) / output_format
+            args = ["--ip", "192.0.2.1", "--provider", provider.value, "--format", output_format,
+                    "--output", str(Path(tmp) / f"out.{output_format}")]
+            cold = _run_cli(args, cache_dir, env)
+            warm = min(_run_cli(args, cache_dir, env) for _ in range(repeat))
+            startup[output_format] = {"cold_s": cold, "warm_s": warm}
+    return startup
+
+
+def _import_seconds(importtime_log: str, module: str) -> float:
+    """Cumulative import time of a module in ``-X importtime`` output, in seconds."""
+    for line in importtime_log.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise ValueError(f"{module} not found in import time log")
+
+
+def measure_imports(modules: Sequence[str] = IMPORT_TARGETS, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """Measure the import time of modules, each in fresh interpreters.
+
+    Args:
+        modules: Modules to import.
+        repeat: Interpreters per module; the best time is reported.
+
+    Returns:
+        ``{module: {"import_s": ..., "heavy_modules": [...]}}``, listing the
+        ``HEAVY_MODULES`` that importing the module loaded.
+
+    Raises:
+        RuntimeError: If a module fails to import.
+    """
+    imports: Dict[str, Dict[str, Any]] = {}
+    for module in modules:
+        # Only the import statement is logged by -X importtime, and nothing else
+        # may be imported first, or it would not be billed to the module.
+        code = (f"import {module}; import json, sys; "
+                f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+        seconds = []
+        for _ in range(repeat):
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code], cwd=_ROOT, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(f"Importing {module} failed: {completed.stderr.strip()[-500:]}")
+            seconds.append(_import_seconds(completed.stderr, module))
+        imports[module] = {"import_s": min(seconds), "heavy_modules": json.loads(completed.stdout)}
+    return imports
+
+
+def measure_delta_update(
+    n_prefixes: int, churn: float = 0.005, seed: int = 0, repeat: int = 3
+) -> Dict[str, Any]:
+    """Compare building a range index with applying a snapshot delta to the previous one.
+
+    The next snapshot drops half of ``churn`` of the prefixes, re-originates a
+    quarter and adds a quarter as new prefixes.
+
+    Args:
+        n_prefixes: Number of IPv4 prefixes in the synthetic snapshot.
+        churn: Fraction of the prefixes that change.
+        seed: Random seed.
+        repeat: Runs of each; the best time is reported.
+
+    Returns:
+        ``{"prefixes", "changes", "build_s", "apply_delta_s"}``.
+    """
+    from .providers.prefix_table import PrefixTable, RangeIndex
+    from .providers.snapshot_diff import apply_delta_to_index, diff_tables
+
+    rng = np.random.default_rng(seed)
+    lines = synthetic_pfx2as(n_prefixes, 4, seed)
+    changes = max(1, int(len(lines) * churn))
+    picked = rng.permutation(len(lines))
+    dropped = set(picked[:changes // 2].tolist())
+    moved = set(picked[changes // 2:changes * 3 // 4].tolist())
+    next_lines = [
+        line.rsplit("\t", 1)[0] + "\t64512" if i in moved else line
+        for i, line in enumerate(lines) if i not in dropped
+    ]
+    next_lines += synthetic_pfx2as(max(1, changes // 4), 4, seed + 1)
+    old, new = PrefixTable.from_lines(lines), PrefixTable.from_lines(next_lines)
+    delta = diff_tables(old, new)
+    base = RangeIndex.build(old)
+    return {
+        "prefixes": len(new),
+        "changes": len(delta),
+        "build_s": min(_timed(partial(RangeIndex.build, new))[1] for _ in range(repeat)),
+        "apply_delta_s": min(_timed(partial(apply_delta_to_index, base, delta))[1] for _ in range(repeat)),
+    }
+
+
+def _provider_available(provider: Provider) -> Optional[str]:
+    """Return why a provider cannot be benchmarked here, or None if it can."""
+    if provider == Provider.PYIPMETA:
+        import importlib.util
+        if importlib.util.find_spec("_pyipmeta") is None:
+            return "pyipmeta is not installed"
+    return None
+
+
+def _median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine repeated runs of a case, taking the median of every number."""
+    def combine(values: List[Any]) -> Any:
+        first = values[0]
+        if isinstance(first, dict):
+            return {key: combine([v[key] for v in values]) for key in first}
+        if isinstance(first, float) and all(isinstance(v, float) for v in values):
+            return statistics.median(values)
+        return first
+    result: Dict[str, Any] = combine(runs)
+    result["runs"] = len(runs)
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_benchmark(
+    sizes: Sequence[int] = (10_000, 100_000),
+    duplications: Sequence[float] = (0.0, 0.9),
+    ipv6_fractions: Sequence[float] = (0.0, 0.2),
+    providers: Sequence[Provider] = (Provider.PREFIX2AS, Provider.PYIPMETA),
+    formats: Sequence[str] = OUTPUT_FORMATS,
+    n_prefixes: int = 200_000,
+    repeat: int = 1,
+    startup: bool = True,
+    end_to_end: bool = True,
+    imports: bool = True,
+    delta: bool = True,
+    seed: int = 0,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Run every combination of provider and IP set parameters.
+
+    Args:
+        sizes: Numbers of IPs per set.
+        duplications: Fractions of repeated IPs.
+        ipv6_fractions: Fractions of IPv6 addresses.
+        providers: Providers to benchmark; unavailable ones are reported as skipped.
+        formats: Output formats to serialize to.
+        n_prefixes: Number of IPv4 prefixes in the synthetic snapshot (a tenth as many IPv6).
+        repeat: Runs per case; the median of each metric is reported.
+        startup: Also measure CLI startup per provider and format.
+        end_to_end: Also time a full CLI run per case.
+        imports: Also measure the import time of ``IMPORT_TARGETS``.
+        delta: Also compare building the snapshot's range index with applying a delta.
+        seed: Random seed for snapshots and IP sets.
+        log: Optional progress callback.
+
+    Returns:
+        The machine-readable results document.
+    """
+    log = log or (lambda message: None)
+    document: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {
+                "sizes": list(sizes), "duplications": list(duplications), "ipv6_fractions": list(ipv6_fractions),
+                "formats": list(formats), "n_prefixes": n_prefixes, "repeat": repeat, "seed": seed,
+            },
+        },
+        "results": [],
+        "startup": {},
+        "imports": {},
+        "delta": {},
+        "skipped": {},
+    }
+    if imports:
+        log("Measuring import times")
+        document["imports"] = measure_imports()
+    if delta:
+        log("Measuring snapshot delta updates")
+        document["delta"] = measure_delta_update(n_prefixes, seed=seed)
+    if not sizes and not startup:
+        return document
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = Path(tmp) / "mirror"
+        write_mirror(
+            mirror, synthetic_pfx2as(n_prefixes, 4, seed), synthetic_pfx2as(max(1, n_prefixes // 10), 6, seed)
+        )
+        with serve_mirror(mirror) as url:
+            env = {"MAP_IP_TO_ASN_ROUTING_URL": url}
+            for provider in providers:
+                reason = _provider_available(provider)
+                if reason:
+                    log(f"Skipping {provider.value}: {reason}")
+                    document["skipped"][provider.value] = reason
+                    continue
+                if startup:
+                    log(f"Measuring {provider.value} startup")
+                    document["startup"][provider.value] = measure_startup(provider, formats, env)
+                for size in sizes:
+                    for duplication in duplications:
+                        for ipv6_fraction in ipv6_fractions:
+                            case = {
+                                "provider": provider.value, "ips": size, "duplication": duplication,
+                                "ipv6_fraction": ipv6_fraction, "formats": list(formats), "seed": seed,
+                                "mirror": str(mirror), "env": env, "end_to_end": end_to_end,
+                            }
+                            log(f"{provider.value}: {size} IPs, {duplication:.0%} repeated, "
+                                f"{ipv6_fraction:.0%} IPv6")
+                            runs = []
+                            for _ in range(repeat):
+                                # A fresh process per run, so peak RSS and caches are the run's own.
+                                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                                    runs.append(pool.submit(run_case, case).result())
+                            document["results"].append(_median_result(runs))
+    return document
+
+
+def _case_key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    dataset = result["dataset"]
+    return result["provider"], dataset["ips"], dataset["duplication"], dataset["ipv6_fraction"]
+
+
+def _metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    values = {**result["stages"], "lookups_per_sec": result["lookups_per_sec"]}
+    if result.get("end_to_end_s") is not None:
+        values["end_to_end_s"] = result["end_to_end_s"]
+    if result.get("peak_rss_mb") is not None:
+        values["peak_rss_mb"] = result["peak_rss_mb"]
+    for output_format, stats in result.get("serialize", {}).items():
+        values[f"serialize_{output_format}_s"] = stats["seconds"]
+    return values
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[str]:
+    """List the metrics of matching cases that got worse by more than ``threshold``.
+
+    Timings that moved by less than ``MIN_SECONDS_DELTA`` are not reported.
+    Entry points that load a heavy module they did not load before are.
+
+    Args:
+        baseline: Results document of the reference run.
+        current: Results document to check.
+        threshold: Allowed relative slowdown (0.1 = 10%).
+
+    Returns:
+        One human-readable line per regression.
+    """
+    regressions = []
+    for module, stats in current.get("imports", {}).items():
+        before = baseline.get("imports", {}).get(module)
+        if before is None:
+            continue
+        added = sorted(set(stats["heavy_modules"]) - set(before["heavy_modules"]))
+        if added:
+            regressions.append(f"import {module}: now loads {', '.join(added)}")
+        old, value = before["import_s"], stats["import_s"]
+        if old and abs(value - old) >= MIN_SECONDS_DELTA and (value - old) / old > threshold:
+            regressions.append(f"import {module}: import_s {old:.4g} -> {value:.4g} ({(value - old) / old:+.0%} worse)")
+
+    before_delta, after_delta = baseline.get("delta", {}), current.get("delta", {})
+    if before_delta.get("prefixes") and before_delta.get("prefixes") == after_delta.get("prefixes"):
+        old, value = before_delta["apply_delta_s"], after_delta["apply_delta_s"]
+        if abs(value - old) >= MIN_SECONDS_DELTA and (value - old) / old > threshold:
+            regressions.append(f"delta: apply_delta_s {old:.4g} -> {value:.4g} ({(value - old) / old:+.0%} worse)")
+
+    previous = {_case_key(r): _metrics(r) for r in baseline["results"]}
+    for result in current["results"]:
+        before = previous.get(_case_key(result))
+        if before is None:
+            continue
+        provider, ips, duplication, ipv6_fraction = _case_key(result)
+        label = f"{provider} {ips} IPs dup={duplication} v6={ipv6_fraction}"
+        for name, value in _metrics(result).items():
+            old = before.get(name)
+            if not old or value is None:
+                continue
+            if name.endswith("_s") and abs(value - old) < MIN_SECONDS_DELTA:
+                continue
+            higher_is_better = COMPARED_METRICS.get(name, False)
+            change = (old - value) / old if higher_is_better else (value - old) / old
+            if change > threshold:
+                regressions.append(f"{label}: {name} {old:.4g} -> {value:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def _floats(text: str) -> List[float]:
+    return [float(v) for v in text.split(",") if v]
+
+
+def _ints(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point of ``python -m src.benchmark``."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.benchmark",
+        description="Benchmark providers and serializers on synthetic data, without network access",
+    )
+    parser.add_argument("--sizes", type=_ints, default=[10_000, 100_000], help="IPs per set (default: 10000,100000)")
+    parser.add_argument("--duplication", type=_floats, default=[0.0, 0.9],
+                        help="Fractions of repeated IPs (default: 0,0.9)")
+    parser.add_argument("--ipv6", type=_floats, default=[0.0, 0.2], help="Fractions of IPv6 IPs (default: 0,0.2)")
+    parser.add_argument("--providers", default="prefix2as,pyipmeta",
+                        help="Providers to benchmark (default: prefix2as,pyipmeta)")
+    parser.add_argument("--formats", default=",".join(OUTPUT_FORMATS),
+                        help="Output formats to serialize to (default: all)")
+    parser.add_argument("--prefixes", type=int, default=200_000,
+                        help="IPv4 prefixes in the synthetic snapshot (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, reporting the median (default: 1)")
+    parser.add_argument("--no-startup", dest="startup", action="store_false", help="Skip CLI startup timings")
+    parser.add_argument("--no-end-to-end", dest="end_to_end", action="store_false",
+                        help="Skip the full CLI run of each case")
+    parser.add_argument("--no-imports", dest="imports", action="store_false", help="Skip import timings")
+    parser.add_argument("--no-delta", dest="delta", action="store_false",
+                        help="Skip the snapshot delta update timings")
+    parser.add_argument("--imports-only", action="store_true",
+                        help="Only measure import times, without any lookup case or CLI run")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression (default: 0.1)")
+    args = parser.parse_args(argv)
+    if args.imports_only:
+        args.sizes, args.startup, args.imports, args.delta = [], False, True, False
+
+    document = run_benchmark(
+        sizes=args.sizes,
+        duplications=args.duplication,
+        ipv6_fractions=args.ipv6,
+        providers=[Provider(p) for p in args.providers.split(",") if p],
+        formats=[OutputFormat(f).value for f in args.formats.split(",") if f],
+        n_prefixes=args.prefixes,
+        repeat=args.repeat,
+        startup=args.startup,
+        end_to_end=args.end_to_end,
+        imports=args.imports,
+        delta=args.delta,
+        seed=args.seed,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    text = json.dumps(document, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare_results(json.loads(Path(args.compare).read_text()), document, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Resumable, checkpointed batch jobs.
+
+A checkpointed job splits its input into numbered chunks of ``chunk_size``
+lines and writes the results of every chunk to its own part
+file (``part-000042.parquet``) in the job directory. A part is written to a
+temporary file and renamed into place, so it is either complete or absent, and
+is then recorded in the job's manifest. A restarted job skips the chunks its
+manifest lists; the snapshot is not even loaded if none are left. A job
+resumed without an explicit snapshot date keeps the date it was started with.
+
+Jobs can be sharded: shard ``i`` of ``n`` only processes the chunks whose
+number is ``i`` modulo ``n`` and keeps its own manifest, so several machines
+can work on one input in a shared directory. Every run also skips the chunks
+recorded by the other manifests of the directory, so a job can be finished with
+a different number of shards. The part files of all shards together form the
+output; manifest names start with an underscore, so Parquet readers take the
+directory as one dataset.
+"""
+import json
+import os
+import tempfile
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .ipparse import ErrorStream, parse_ip_buffer
+from .lookup import initialize_provider, lookup_chunk, provider_from_config, record_cache_stats
+from .models import LookupConfig
+from .providers import BaseProvider
+from .providers.snapshot_store import atomic_write_bytes
+from .readers import input_size, iter_input_lines
+from .serializers import open_stream_writer
+
+MANIFEST_VERSION = 1
+MANIFEST_GLOB = "_manifest*.json"
+
+
+def part_name(chunk: int, extension: str) -> str:
+    """File name of the part holding the results of a chunk."""
+    return f"part-{chunk:06d}.{extension}"
+
+
+def iter_line_chunks(
+    file_path: str,
+    chunk_lines: int,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+) -> Iterator[Tuple[int, int, List[bytes]]]:
+    """Split an input into numbered chunks of lines without parsing them.
+
+    Args:
+        file_path: Path, directory or glob of the input files.
+        chunk_lines: Number of lines per chunk.
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+
+    Yields:
+        Tuples of (chunk number, line number of its first line, raw lines).
+
+    Raises:
+        FileNotFoundError: If no file matches.
+    """
+    source = iter_input_lines(file_path, column, read_workers)
+    chunk = 0
+    while True:
+        lines = list(islice(source, chunk_lines))
+        if not lines:
+            return
+        yield chunk, chunk * chunk_lines + 1, lines
+        chunk += 1
+
+
+class CheckpointJob:
+    """The manifest and committed parts of one shard of a checkpointed job.
+
+    The manifest records the options the job was started with, which a resumed
+    run must repeat, and every chunk known to be committed, by this shard or
+    by others, with its row counts. Chunks whose part file has gone missing are
+    processed again.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        params: Dict[str, Any],
+        extension: str,
+        shard_index: int = 0,
+        shard_count: int = 1,
+    ) -> None:
+        """Open or start the job.
+
+        Args:
+            directory: Job directory; created if missing.
+            params: Options that identify the job (input, chunk size, format, ...).
+            extension: Extension of the part files.
+            shard_index: Shard processed by this run, from 0.
+            shard_count: Number of shards the chunks are spread over.
+
+        Raises:
+            ValueError: If the directory holds a job started with other options.
+        """
+        self.directory = Path(directory)
+        self.params = params
+        self.extension = extension
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        name = "_manifest.json" if shard_count == 1 else f"_manifest-{shard_index}-of-{shard_count}.json"
+        self.manifest_path = self.directory / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.chunks: Dict[int, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        for path in sorted(self.directory.glob(MANIFEST_GLOB)):
+            with open(path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"{path} was written by an incompatible version")
+            for key, value in self.params.items():
+                if manifest["params"].get(key) != value:
+                    raise ValueError(
+                        f"{self.directory} holds a job started with {key}={manifest['params'].get(key)!r}, "
+                        f"not {value!r}; repeat its options to resume it"
+                    )
+            self.chunks.update(
+                (int(chunk), entry) for chunk, entry in manifest["chunks"].items()
+                if (self.directory / entry["file"]).exists()
+            )
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "params": self.params,
+            "shard": [self.shard_index, self.shard_count],
+            "chunks": {str(chunk): entry for chunk, entry in sorted(self.chunks.items())},
+        }
+        atomic_write_bytes(self.manifest_path, json.dumps(manifest, indent=1).encode())
+
+    def owns(self, chunk: int) -> bool:
+        """Return whether a chunk belongs to this shard."""
+        return chunk % self.shard_count == self.shard_index
+
+    def is_done(self, chunk: int) -> bool:
+        """Return whether a chunk's part has been committed."""
+        return chunk in self.chunks
+
+    @property
+    def rows(self) -> int:
+        """Number of result rows in the committed parts."""
+        return sum(entry["rows"] for entry in self.chunks.values())
+
+    @property
+    def successful(self) -> int:
+        """Number of found addresses in the committed parts."""
+        return sum(entry["successful"] for entry in self.chunks.values())
+
+    def commit(self, chunk: int, tmp_path: Path, rows: int, successful: int) -> Path:
+        """Move a fully written part into place and record it in the manifest.
+
+        Args:
+            chunk: Number of the chunk.
+            tmp_path: Temporary file holding the part, in the job directory.
+            rows: Number of rows in the part.
+            successful: Number of found addresses in the part.
+
+        Returns:
+            Path of the committed part.
+        """
+        name = part_name(chunk, self.extension)
+        path = self.directory / name
+        os.replace(tmp_path, path)
+        self.chunks[chunk] = {"file": name, "rows": rows, "successful": successful}
+        self._write_manifest()
+        return path
+
+
+def recorded_snapshot_date(directory: Path) -> Optional[datetime]:
+    """Return the snapshot date of the job started in a directory, if any.
+
+    Args:
+        directory: Job directory.
+
+    Returns:
+        The snapshot date recorded by its manifests, or None for a new job.
+    """
+    for path in sorted(directory.glob(MANIFEST_GLOB)):
+        with open(path, "r") as f:
+            date = json.load(f)["params"].get("snapshot_date")
+        if date:
+            return datetime.strptime(date, "%Y-%m-%d")
+    return None
+
+
+def job_params(config: LookupConfig) -> Dict[str, Any]:
+    """Return the options that identify a checkpointed job.
+
+    The input is identified by its name and the total size of its files rather
+    than its path, so the same job can be resumed, or sharded, on machines that
+    keep it elsewhere.
+    """
+    assert config.input_file
+    return {
+        "input": Path(config.input_file).name,
+        "input_bytes": input_size(config.input_file),
+        "input_column": config.input_column,
+        "chunk_size": config.chunk_size,
+        "output_format": config.output_format.value,
+        "provider": config.provider.value,
+        "snapshot_date": config.snapshot_date.strftime("%Y-%m-%d"),
+        "enrich": config.enrich,
+    }
+
+
+class JobProgress:
+    """Counts of one run of a checkpointed job.
+
+    Attributes:
+        committed: Chunks looked up and committed by this run.
+        skipped: Chunks of this shard that were already committed.
+        rows: Result rows written by this run.
+        successful: Found addresses among them.
+    """
+
+    def __init__(self) -> None:
+        self.committed = 0
+        self.skipped = 0
+        self.rows = 0
+        self.successful = 0
+
+
+def run_checkpointed_job(
+    config: LookupConfig,
+    errors: Optional[ErrorStream] = None,
+) -> Tuple[CheckpointJob, JobProgress]:
+    """Look up the input file chunk by chunk, committing one part file per chunk.
+
+    Chunks of other shards and chunks already committed are skipped without
+    being parsed; the provider is only initialized once a chunk needs it. When
+    the configuration leaves the snapshot date unset, a resumed job looks up
+    the date it was started with rather than today's.
+
+    Args:
+        config: Configuration naming the input file, ``checkpoint_dir`` and shard.
+        errors: Where invalid lines of the processed chunks are reported.
+
+    Returns:
+        Tuple of (the job, the counts of this run).
+    """
+    assert config.checkpoint_dir
+    if "snapshot_date" not in config.model_fields_set:
+        started = recorded_snapshot_date(Path(config.checkpoint_dir))
+        if started is not None:
+            config = config.model_copy(update={"snapshot_date": started})
+    assert config.input_file and config.checkpoint_dir
+    job = CheckpointJob(
+        Path(config.checkpoint_dir), job_params(config), config.output_format.value,
+        config.shard_index, config.shard_count,
+    )
+    progress = JobProgress()
+    provider: Optional[BaseProvider] = None
+    try:
+        chunks = iter_line_chunks(
+            config.input_file, config.chunk_size, config.input_column, config.read_workers,
+        )
+        for chunk, first_line, lines in chunks:
+            if not job.owns(chunk):
+                continue
+            if job.is_done(chunk):
+                progress.skipped += 1
+                continue
+            if provider is None:
+                provider = provider_from_config(config)
+                initialize_provider(provider)
+            parsed = parse_ip_buffer(b"".join(lines), first_line)
+            if errors is not None:
+                errors.report(parsed.errors)
+            ips = parsed.addresses(keep_invalid=errors is None)
+            batch = lookup_chunk(provider, ips, config.snapshot_date, config.enrich)
+
+            fd, tmp_name = tempfile.mkstemp(dir=job.directory, prefix=".tmp-", suffix=f".{job.extension}")
+            os.close(fd)
+            try:
+                with metrics.span("serialize"), \
+                        open_stream_writer(config.output_format, tmp_name, config.parquet) as writer:
+                    writer.write(batch)
+                job.commit(chunk, Path(tmp_name), writer.total, writer.successful)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+            progress.committed += 1
+            progress.rows += writer.total
+            progress.successful += writer.successful
+    finally:
+        if provider is not None:
+            record_cache_stats(provider)
+    return job, progress
@@ -1,12 +1,45 @@
 """Command-line interface for IP to ASN mapping."""
 import argparse
+import json
 import sys
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
-from .lookup import lookup_ips, read_ips_from_file
-from .models import LookupConfig, OutputFormat, Provider
-from .serializers import CSVSerializer, JSONSerializer, ParquetSerializer
+from . import metrics
+from .checkpoint import run_checkpointed_job
+from .columnar import ColumnarBatch
+from .ipparse import ErrorStream
+from .lookup import (
+    iter_ips_from_file,
+    lookup_asn_prefixes,
+    lookup_ips,
+    lookup_ips_streaming,
+    lookup_ranges_streaming,
+    merge_batches,
+    normalize_ips,
+    read_ips_from_file,
+)
+from .models import (
+    LookupConfig,
+    OutputFormat,
+    ParquetCompression,
+    ParquetOptions,
+    Provider,
+    ServerConfig,
+)
+from .ranges import ParsedRanges, iter_parsed_ranges, parse_ranges
+from .reverse import parse_asns
+from .serializers import (
+    CSVSerializer,
+    JSONSerializer,
+    open_stream_writer,
+)
+
+# The daemon, its client, the process pool, multi-date lookups, index compilation
+# and Parquet output pull in asyncio, multiprocessing, http.client or pyarrow, so
+# they are imported by the code paths that use them to keep startup fast.
 
 
 def parse_date(date_str: str) -> datetime:
@@ -24,7 +57,79 @@ def parse_date(date_str: str) -> datetime:
     try:
         return datetime.strptime(date_str, "%Y-%m-%d")
     except ValueError:
-        raise argparse.ArgumentTypeError(f"Invalid date format: {date_str}. Use YYYY-MM-DD")
+        raise argparse.ArgumentTypeError(f"Invalid date format: {date_str}. Use YYYY-MM-DD") from None
+
+
+def parse_dates(dates_str: str) -> List[datetime]:
+    """Parse a comma-separated list of YYYY-MM-DD dates.
+    
+    Args:
+        dates_str: Dates separated by commas.
+        
+    Returns:
+        Parsed datetime objects.
+        
+    Raises:
+        argparse.ArgumentTypeError: If any date is invalid.
+    """
+    return [parse_date(d.strip()) for d in dates_str.split(",") if d.strip()]
+
+
+def parse_date_range(range_str: str) -> Tuple[datetime, datetime]:
+    """Parse a START:END date range in YYYY-MM-DD format.
+    
+    Args:
+        range_str: Range string to parse.
+        
+    Returns:
+        Tuple of (start, end) datetimes.
+        
+    Raises:
+        argparse.ArgumentTypeError: If the range format is invalid.
+    """
+    start, sep, end = range_str.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Invalid date range: {range_str}. Use YYYY-MM-DD:YYYY-MM-DD")
+    return parse_date(start), parse_date(end)
+
+
+def parse_asn_list(asns_str: str) -> List[int]:
+    """Parse a comma-separated list of ASNs (``AS64500``, ``64500`` or asdot ``1.10``).
+    
+    Args:
+        asns_str: ASNs separated by commas.
+        
+    Returns:
+        The distinct ASNs, in the order given.
+        
+    Raises:
+        argparse.ArgumentTypeError: If any ASN is invalid.
+    """
+    try:
+        asns = parse_asns([asns_str])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+    if not asns:
+        raise argparse.ArgumentTypeError("At least one ASN is required")
+    return asns
+
+
+def parse_shard(shard_str: str) -> Tuple[int, int]:
+    """Parse an I/N shard specification (shard I of N, counted from 0).
+    
+    Args:
+        shard_str: Shard string to parse.
+        
+    Returns:
+        Tuple of (shard index, shard count).
+        
+    Raises:
+        argparse.ArgumentTypeError: If the specification is invalid.
+    """
+    index, sep, count = shard_str.partition("/")
+    if not (sep and index.isdigit() and count.isdigit() and int(index) < int(count)):
+        raise argparse.ArgumentTypeError(f"Invalid shard: {shard_str}. Use I/N with 0 <= I < N")
+    return int(index), int(count)
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -47,6 +152,45 @@ Examples:
   
   # Use a specific date for the RouteViews snapshot
   %(prog)s --file ips.txt --date 2023-01-01 --format parquet
+  
+  # Precompile the snapshot for a date into a memory-mappable index
+  %(prog)s --compile-index --date 2023-01-01 --output rv-20230101.idx
+  %(prog)s --compile-index --ipv6 --date 2023-01-01 --output rv6-20230101.idx
+  %(prog)s --file ips.txt --provider prefix2as --index rv-20230101.idx --index6 rv6-20230101.idx
+  
+  # Include the matched prefix and all origin ASNs of multi-origin prefixes
+  %(prog)s --file ips.txt --provider prefix2as --enrich --format csv
+  
+  # Which prefixes and origin ASNs own each /24 or range, with address counts
+  %(prog)s --file subnets.txt --ranges --provider prefix2as --format csv
+  %(prog)s --ip 203.0.113.0-203.0.113.99 --ranges --provider prefix2as
+  
+  # Every prefix originated by some ASNs, with their total address space
+  %(prog)s --asn AS15169,AS36040 --provider prefix2as --format csv
+  %(prog)s --asn 15169 --ipv6 --provider prefix2as
+  
+  # Stream a very large file in bounded memory
+  %(prog)s --file huge.txt --stream --format jsonl --output results.jsonl
+  
+  # ASN of the same IPs on many dates, as a long (ip, snapshot_date, asn) table
+  %(prog)s --file ips.txt --date-range 2023-01-01:2023-01-31 --format csv
+  %(prog)s --file ips.txt --dates 2022-01-01,2023-01-01 --provider prefix2as
+  
+  # Keep snapshots loaded in a daemon and send lookups to it
+  %(prog)s --serve --provider prefix2as --listen unix:/tmp/map-ip-to-asn.sock
+  %(prog)s --file ips.txt --server unix:/tmp/map-ip-to-asn.sock
+  
+  # A resumable job: one Parquet part per chunk, rerun the same command to resume
+  %(prog)s --file huge.txt --checkpoint-dir job/ --format parquet --date 2023-01-01
+  # ... or split it over two machines sharing job/
+  %(prog)s --file huge.txt --checkpoint-dir job/ --shard 0/2 --format parquet --date 2023-01-01
+  %(prog)s --file huge.txt --checkpoint-dir job/ --shard 1/2 --format parquet --date 2023-01-01
+  
+  # Spread lookups over 16 processes
+  %(prog)s --file huge.txt --stream --workers 16 --format csv --output results.csv
+  
+  # Report where the time went (discovery, download, load, lookup, serialize)
+  %(prog)s --file ips.txt --provider prefix2as --stats stats.json
         """
     )
     
@@ -60,7 +204,26 @@ Examples:
     input_group.add_argument(
         "--file",
         dest="input_file",
-        help="Path to file containing IP addresses (one per line)"
+        help="File of IP addresses (one per line), a directory or a quoted glob of files; gzip, bzip2 "
+             "and zstd files are decompressed, and .csv, .tsv and .parquet files are read by column"
+    )
+    input_group.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run a resident lookup daemon on --listen instead of performing lookups"
+    )
+    input_group.add_argument(
+        "--compile-index",
+        dest="compile_index",
+        action="store_true",
+        help="Compile the snapshot for --date into a binary index (into the cache, or --output) and exit"
+    )
+    input_group.add_argument(
+        "--asn",
+        dest="asns",
+        type=parse_asn_list,
+        help="Comma-separated ASNs (AS64500, 64500 or asdot) to list the originated prefixes and "
+             "address space of, instead of looking up IPs (prefix2as provider)"
     )
     
     # Output options
@@ -77,66 +240,561 @@ Examples:
         dest="output_file",
         help="Path to output file (default: stdout)"
     )
+    parser.add_argument(
+        "--errors",
+        dest="errors_file",
+        help="File to report invalid input lines to, which are left out of the results (default: stderr)"
+    )
+    parser.add_argument(
+        "--enrich",
+        action="store_true",
+        help="Also output the matched prefix, its length and every origin ASN (MOAS) of each IP"
+    )
+    parser.add_argument(
+        "--ranges",
+        action="store_true",
+        help="Read CIDR prefixes (a.b.c.d/n) and ranges (first-last) as well as IPs, and output the "
+             "prefixes and origin ASNs covering each with address counts (prefix2as provider)"
+    )
     
-    # Provider options (hidden since only one provider is available)
+    # Input reading options
+    parser.add_argument(
+        "--column",
+        dest="input_column",
+        help="Column of CSV, TSV and Parquet input files holding the IPs (default: the first); "
+             "with --column, files without a known suffix are read as CSV"
+    )
+    parser.add_argument(
+        "--read-workers",
+        dest="read_workers",
+        type=int,
+        default=1,
+        help="Number of --file inputs read and decompressed ahead concurrently (default: 1)"
+    )
+    
+    # Provider options
     parser.add_argument(
         "--provider",
         type=str,
         choices=[p.value for p in Provider],
         default=Provider.PYIPMETA.value,
-        help=argparse.SUPPRESS  # Hide this option since only pyipmeta is available
+        help="Lookup provider: pyipmeta (libipmeta) or prefix2as (pure Python/NumPy) (default: pyipmeta)"
     )
     
     # Date option
     parser.add_argument(
         "--date",
         type=parse_date,
-        default=datetime.now(),
-        help="RouteViews snapshot date in YYYY-MM-DD format (default: today)"
+        help="RouteViews snapshot date in YYYY-MM-DD format (default: today, or the date a "
+             "resumed --checkpoint-dir job was started with)"
+    )
+    
+    parser.add_argument(
+        "--index",
+        dest="index_path",
+        help="Precompiled snapshot index to memory-map instead of discovering a snapshot (prefix2as provider)"
+    )
+    parser.add_argument(
+        "--index6",
+        dest="index6_path",
+        help="Precompiled IPv6 snapshot index to memory-map (prefix2as provider; with --index, "
+             "IPv6 addresses are only found when this is given)"
+    )
+    parser.add_argument(
+        "--ipv6",
+        action="store_true",
+        help="With --compile-index or --asn, use the IPv6 (routeviews6) snapshot instead"
+    )
+    
+    # Streaming options
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read, look up and write in chunks so memory stays bounded for huge inputs"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        type=int,
+        default=100_000,
+        help="Number of IPs per chunk in --stream and --workers modes (default: 100000)"
+    )
+    
+    # Checkpoint options
+    parser.add_argument(
+        "--checkpoint-dir",
+        dest="checkpoint_dir",
+        help="Run as a resumable job: write one part file per --chunk-size input lines to this "
+             "directory and record them in a manifest; rerunning skips the committed parts"
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        help="With --checkpoint-dir, only process shard I of N of the chunks (I/N, from 0)"
+    )
+    
+    # Parquet options
+    parser.add_argument(
+        "--row-group-size",
+        dest="row_group_size",
+        type=int,
+        help="Rows per Parquet row group (default: one row group per chunk)"
+    )
+    parser.add_argument(
+        "--compression",
+        choices=[c.value for c in ParquetCompression],
+        default=ParquetCompression.SNAPPY.value,
+        help="Parquet compression codec (default: snappy)"
+    )
+    
+    # Daemon options
+    parser.add_argument(
+        "--listen",
+        default="127.0.0.1:8765",
+        help="Address for --serve: host:port or unix:/path (default: 127.0.0.1:8765)"
+    )
+    parser.add_argument(
+        "--max-snapshots",
+        dest="max_snapshots",
+        type=int,
+        default=4,
+        help="Number of snapshot dates --serve keeps loaded at once (default: 4)"
+    )
+    parser.add_argument(
+        "--server",
+        help="Send lookups to a running --serve daemon at this address instead of loading snapshots"
+    )
+    
+    # Parallelism options
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for lookups (default: 1)"
+    )
+    parser.add_argument(
+        "--unordered",
+        dest="ordered",
+        action="store_false",
+        help="With --workers, write chunks as they complete instead of in input order"
+    )
+    
+    # Multi-date options
+    dates_group = parser.add_mutually_exclusive_group()
+    dates_group.add_argument(
+        "--dates",
+        type=parse_dates,
+        help="Comma-separated snapshot dates (YYYY-MM-DD,...) to look every IP up on"
+    )
+    dates_group.add_argument(
+        "--date-range",
+        dest="date_range",
+        type=parse_date_range,
+        help="Inclusive snapshot date range START:END (YYYY-MM-DD:YYYY-MM-DD) to look every IP up on"
+    )
+    parser.add_argument(
+        "--date-step",
+        dest="date_step",
+        type=int,
+        default=1,
+        help="Days between dates in --date-range (default: 1)"
+    )
+    
+    # Snapshot cache options
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        help="Directory for the local snapshot cache (default: $MAP_IP_TO_ASN_CACHE_DIR or ~/.cache/map-ip-to-asn)"
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        dest="cache_size_mb",
+        type=int,
+        default=2048,
+        help="Maximum size of the local snapshot cache in MB (default: 2048)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="Always download snapshots instead of using the local cache"
+    )
+    parser.add_argument(
+        "--lookup-cache-size",
+        dest="lookup_cache_entries",
+        type=int,
+        default=100_000,
+        help="Addresses kept in each provider's in-memory lookup cache, 0 to disable (default: 100000)"
+    )
+    parser.add_argument(
+        "--prefix-cache-size",
+        dest="prefix_cache_entries",
+        type=int,
+        default=0,
+        help="Address blocks kept in each provider's prefix-level lookup cache (default: 0, disabled)"
+    )
+    
+    # Instrumentation options
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Write a JSON report of per-stage wall time, counters, cache hit rates and peak memory "
+             "to FILE (default: stderr)"
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="With --serve, expose Prometheus-style metrics at GET /metrics"
     )
     
     return parser
 
 
+def write_stats(path: str) -> None:
+    """Write the instrumentation report of this run as JSON.
+    
+    Args:
+        path: File to write the report to, or ``-`` for stderr.
+    """
+    report = json.dumps(metrics.get_recorder().report(), indent=2, sort_keys=True)
+    if path == "-":
+        print(report, file=sys.stderr)
+    else:
+        with open(path, "w") as f:
+            f.write(report + "\n")
+
+
+@contextmanager
+def open_error_stream(config: LookupConfig) -> Iterator[ErrorStream]:
+    """Open the stream invalid input lines are reported to.
+    
+    Args:
+        config: Configuration naming the errors file (stderr if unset).
+        
+    Yields:
+        The error reporter; a summary is printed to stderr on exit.
+    """
+    f = open(config.errors_file, "w") if config.errors_file else sys.stderr  # noqa: SIM115 - closed below
+    errors = ErrorStream(f)
+    try:
+        yield errors
+    finally:
+        if f is not sys.stderr:
+            f.close()
+        if errors.count:
+            print(f"Skipped {errors.count} invalid input line(s)", file=sys.stderr)
+
+
+def iter_result_chunks(ips: Iterable[str], config: LookupConfig) -> Iterator[ColumnarBatch]:
+    """Look up IPs chunk by chunk using the daemon, a process pool or this process.
+    
+    Args:
+        ips: Iterable of IP addresses to lookup.
+        config: Configuration for the lookup operation.
+        
+    Yields:
+        One ColumnarBatch per chunk.
+    """
+    if config.server:
+        from .client import LookupClient
+        client = LookupClient(config.server)
+        try:
+            yield from client.lookup_streaming(ips, config.snapshot_date, config.chunk_size)
+        finally:
+            client.close()
+    elif config.workers > 1:
+        from .parallel import lookup_ips_parallel
+        yield from lookup_ips_parallel(ips, config)
+    else:
+        yield from lookup_ips_streaming(ips, config)
+
+
+def run_streaming(config: LookupConfig) -> None:
+    """Look up and write results chunk by chunk with bounded memory.
+    
+    Args:
+        config: Configuration for the lookup operation.
+    """
+    print(f"Streaming lookups in chunks of {config.chunk_size} using {config.provider.value} provider...",
+          file=sys.stderr)
+    with open_error_stream(config) as errors:
+        if config.single_ip:
+            ips = iter(normalize_ips([config.single_ip], errors))
+        else:
+            assert config.input_file
+            ips = iter_ips_from_file(config.input_file, errors, config.input_column, config.read_workers)
+        with open_stream_writer(config.output_format, config.output_file, config.parquet) as writer:
+            for chunk in iter_result_chunks(ips, config):
+                with metrics.span("serialize"):
+                    writer.write(chunk)
+    
+    print(f"\nProcessed {writer.total} IPs: {writer.successful} found, "
+          f"{writer.total - writer.successful} not found", file=sys.stderr)
+
+
+def iter_range_blocks(config: LookupConfig, errors: ErrorStream) -> Iterator[ParsedRanges]:
+    """Parse the range input chunk by chunk, reporting invalid lines.
+    
+    Args:
+        config: Configuration naming the input.
+        errors: Where invalid lines are reported.
+        
+    Yields:
+        The parsed queries of each chunk of ``config.chunk_size`` lines.
+    """
+    if config.single_ip:
+        blocks: Iterable[ParsedRanges] = [parse_ranges([config.single_ip])]
+    else:
+        assert config.input_file
+        blocks = iter_parsed_ranges(
+            config.input_file, config.chunk_size, config.input_column, config.read_workers,
+        )
+    for parsed in blocks:
+        errors.report(parsed.errors)
+        yield parsed
+
+
+def run_ranges(config: LookupConfig) -> None:
+    """Resolve prefixes and ranges to the prefixes covering them, chunk by chunk.
+    
+    Args:
+        config: Configuration for the lookup operation.
+    """
+    print(f"Resolving prefixes and ranges using {config.provider.value} provider...", file=sys.stderr)
+    with open_error_stream(config) as errors, \
+            open_stream_writer(config.output_format, config.output_file, config.parquet) as writer:
+        for chunk in lookup_ranges_streaming(iter_range_blocks(config, errors), config):
+            with metrics.span("serialize"):
+                writer.write(chunk)
+    
+    print(f"\nWrote {writer.total} prefix row(s): {writer.successful} routed, "
+          f"{writer.total - writer.successful} unrouted", file=sys.stderr)
+
+
+def run_asns(config: LookupConfig) -> None:
+    """List the prefixes originated by the requested ASNs and summarize their address space.
+    
+    Args:
+        config: Configuration whose ``asns`` lists the requested ASNs.
+    """
+    assert config.asns
+    family = 6 if config.ipv6 else 4
+    print(f"Listing the IPv{family} prefixes of {len(config.asns)} ASN(s) using "
+          f"{config.provider.value} provider...", file=sys.stderr)
+    batch = lookup_asn_prefixes(config.asns, config, family)
+    with open_stream_writer(config.output_format, config.output_file, config.parquet) as writer, \
+            metrics.span("serialize"):
+        writer.write(batch)
+    
+    prefixes = batch.prefixes
+    print(file=sys.stderr)
+    for asn, count in prefixes.prefix_counts().items():
+        print(f"AS{asn}: {count} prefix(es), {prefixes.space[asn]} address(es)", file=sys.stderr)
+    print(f"Total: {len(prefixes)} prefix row(s), {prefixes.total_space} address(es)", file=sys.stderr)
+
+
+def run_checkpointed(config: LookupConfig) -> None:
+    """Run a resumable job that commits one part file per chunk.
+    
+    Args:
+        config: Configuration naming the input file and ``checkpoint_dir``.
+    """
+    shard = f" (shard {config.shard_index}/{config.shard_count})" if config.shard_count > 1 else ""
+    print(f"Running checkpointed job in {config.checkpoint_dir}{shard} using "
+          f"{config.provider.value} provider...", file=sys.stderr)
+    with open_error_stream(config) as errors:
+        job, progress = run_checkpointed_job(config, errors)
+    
+    print(f"\nCommitted {progress.committed} chunk(s) with {progress.rows} IPs "
+          f"({progress.successful} found); skipped {progress.skipped} chunk(s) already done. "
+          f"{len(job.chunks)} chunk(s) with {job.rows} IPs are complete in {job.manifest_path}", file=sys.stderr)
+
+
+def run_timeseries(config: LookupConfig) -> None:
+    """Look up every IP on each requested snapshot date and write a long table.
+    
+    Args:
+        config: Configuration whose ``snapshot_dates`` lists the requested dates.
+    """
+    from .timeseries import lookup_ips_over_dates
+    
+    with open_error_stream(config) as errors, metrics.span("read_input"):
+        if config.single_ip:
+            ips = normalize_ips([config.single_ip], errors)
+        else:
+            assert config.input_file
+            ips = read_ips_from_file(config.input_file, errors, config.input_column, config.read_workers)
+    
+    assert config.snapshot_dates
+    print(f"Looking up {len(ips)} IP address(es) on {len(config.snapshot_dates)} date(s) "
+          f"using {config.provider.value} provider...", file=sys.stderr)
+    with open_stream_writer(config.output_format, config.output_file, config.parquet) as writer:
+        for snapshot in lookup_ips_over_dates(ips, config):
+            with metrics.span("serialize"):
+                writer.write(snapshot)
+    
+    print(f"\nProcessed {writer.total} lookups: {writer.successful} found, "
+          f"{writer.total - writer.successful} not found", file=sys.stderr)
+
+
+def run_server(args: argparse.Namespace) -> None:
+    """Run the resident lookup daemon.
+    
+    Args:
+        args: Parsed command-line arguments.
+    """
+    config = ServerConfig(
+        provider=Provider(args.provider),
+        address=args.listen,
+        max_providers=args.max_snapshots,
+        index_path=args.index_path,
+        index6_path=args.index6_path,
+        use_cache=args.use_cache,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_size_mb * 1024 * 1024,
+        lookup_cache_entries=args.lookup_cache_entries,
+        prefix_cache_entries=args.prefix_cache_entries,
+        metrics=args.metrics
+    )
+    from .server import serve
+    serve(config)
+
+
+def run_compile_index(args: argparse.Namespace) -> None:
+    """Compile the snapshot for the requested date into a binary index.
+    
+    Args:
+        args: Parsed command-line arguments.
+    """
+    from .providers import SnapshotStore
+    from .providers.prefix2as import compile_snapshot_index
+    
+    store = None
+    if args.use_cache:
+        store = SnapshotStore(
+            Path(args.cache_dir) if args.cache_dir else None,
+            max_bytes=args.cache_size_mb * 1024 * 1024
+        )
+    dest = Path(args.output_file) if args.output_file else None
+    path, actual_date = compile_snapshot_index(args.date or datetime.now(), store, dest, family=6 if args.ipv6 else 4)
+    print(f"Compiled snapshot {actual_date.strftime('%Y-%m-%d')} into {path}", file=sys.stderr)
+
+
 def main() -> None:
     """Main entry point for the CLI."""
     parser = create_parser()
     args = parser.parse_args()
+    if args.stats:
+        metrics.enable()
     
     try:
+        if args.compile_index:
+            run_compile_index(args)
+            return
+        if args.serve:
+            run_server(args)
+            return
+        
+        snapshot_dates = args.dates
+        if args.date_range:
+            from .timeseries import expand_date_range
+            start, end = args.date_range
+            snapshot_dates = expand_date_range(start, end, step_days=args.date_step)
+        
+        # Leave the date unset unless given, so a resumed job keeps its own
+        date_option: Dict[str, Any] = {"snapshot_date": args.date} if args.date else {}
+        
         # Create configuration
         config = LookupConfig(
             provider=Provider(args.provider),
-            snapshot_date=args.date,
+            **date_option,
             output_format=OutputFormat(args.output_format),
             input_file=args.input_file,
+            input_column=args.input_column,
+            read_workers=args.read_workers,
             single_ip=args.single_ip,
-            output_file=args.output_file
+            output_file=args.output_file,
+            errors_file=args.errors_file,
+            snapshot_dates=snapshot_dates,
+            index_path=args.index_path,
+            index6_path=args.index6_path,
+            use_cache=args.use_cache,
+            cache_dir=args.cache_dir,
+            cache_max_bytes=args.cache_size_mb * 1024 * 1024,
+            lookup_cache_entries=args.lookup_cache_entries,
+            prefix_cache_entries=args.prefix_cache_entries,
+            stream=args.stream,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            ordered=args.ordered,
+            server=args.server,
+            enrich=args.enrich,
+            ranges=args.ranges,
+            asns=args.asns,
+            ipv6=args.ipv6,
+            checkpoint_dir=args.checkpoint_dir,
+            shard_index=args.shard[0],
+            shard_count=args.shard[1],
+            parquet=ParquetOptions(
+                row_group_size=args.row_group_size,
+                compression=ParquetCompression(args.compression)
+            )
         )
         
+        if config.snapshot_dates:
+            run_timeseries(config)
+            return
+        if config.ranges:
+            run_ranges(config)
+            return
+        if config.asns:
+            run_asns(config)
+            return
+        if config.checkpoint_dir:
+            run_checkpointed(config)
+            return
+        if config.stream:
+            run_streaming(config)
+            return
+        
         # Get IPs to process
-        if config.single_ip:
-            ips = [config.single_ip]
-        else:
-            ips = read_ips_from_file(config.input_file)
+        with open_error_stream(config) as errors, metrics.span("read_input"):
+            if config.single_ip:
+                ips = normalize_ips([config.single_ip], errors)
+            else:
+                assert config.input_file
+                ips = read_ips_from_file(config.input_file, errors, config.input_column, config.read_workers)
         
         # Perform lookups
         print(f"Looking up {len(ips)} IP address(es) using {config.provider.value} provider...", 
               file=sys.stderr)
-        results = lookup_ips(ips, config)
+        if config.server or config.workers > 1:
+            results = merge_batches(iter_result_chunks(ips, config), config.snapshot_date)
+        else:
+            results = lookup_ips(ips, config)
         
         # Serialize output
-        if config.output_format == OutputFormat.JSON:
-            output = JSONSerializer.serialize(results, config.output_file)
-        elif config.output_format == OutputFormat.CSV:
-            output = CSVSerializer.serialize(results, config.output_file)
-        elif config.output_format == OutputFormat.PARQUET:
-            ParquetSerializer.serialize(results, config.output_file)
-            output = None  # Parquet is binary, don't print to stdout
-        
-        # Print to stdout if no output file specified
-        if not config.output_file and output:
-            print(output)
+        with metrics.span("serialize"):
+            if config.output_format == OutputFormat.JSON:
+                output = JSONSerializer.serialize(results, config.output_file)
+            elif config.output_format == OutputFormat.JSONL:
+                # Written line by line straight to the output, not built as one string
+                with open_stream_writer(OutputFormat.JSONL, config.output_file) as writer:
+                    writer.write(results)
+                output = None
+            elif config.output_format == OutputFormat.CSV:
+                output = CSVSerializer.serialize(results, config.output_file)
+            elif config.output_format == OutputFormat.PARQUET:
+                from .serializers.parquet_serializer import ParquetSerializer
+                ParquetSerializer.serialize(results, config.output_file, config.parquet)
+                output = None  # Parquet is binary, don't print to stdout
+            
+            # Print to stdout if no output file specified
+            if not config.output_file and output:
+                print(output)
         
         # Print summary
         print(f"\nProcessed {results.total} IPs: {results.successful} found, "
@@ -145,6 +803,9 @@ def main() -> None:
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if args.stats:
+            write_stats(args.stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""Thin client for the resident lookup daemon."""
+import http.client
+import json
+import socket
+from datetime import datetime
+from typing import Iterable, Iterator, List
+
+from . import metrics
+from .columnar import ColumnarBatch
+from .lookup import chunked
+from .server import parse_address
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket."""
+
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._path)
+        self.sock = sock
+
+
+class LookupClient:
+    """Send lookups to a running ``map-ip-to-asn --serve`` daemon."""
+
+    def __init__(self, address: str, timeout: float = 300.0) -> None:
+        """Initialize the client.
+
+        Args:
+            address: Daemon address, ``host:port``, ``http://host:port`` or ``unix:/path``.
+            timeout: Socket timeout in seconds.
+        """
+        kind, host, port = parse_address(address)
+        if kind == "unix":
+            self._conn: http.client.HTTPConnection = _UnixHTTPConnection(host, timeout)
+        else:
+            self._conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def lookup(self, ips: List[str], date: datetime) -> ColumnarBatch:
+        """Look up a batch of IPs.
+
+        Args:
+            ips: IP addresses to lookup.
+            date: Requested snapshot date.
+
+        Returns:
+            The batch result computed by the daemon.
+
+        Raises:
+            RuntimeError: If the daemon reports an error.
+        """
+        body = json.dumps({"ips": ips, "date": date.strftime("%Y-%m-%d")})
+        metrics.incr("lookups", len(ips))
+        with metrics.span("lookup"):
+            self._conn.request("POST", "/lookup", body=body, headers={"Content-Type": "application/json"})
+            response = self._conn.getresponse()
+            data = response.read()
+        if response.status != 200:
+            self._conn.close()
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError):
+                message = data.decode(errors="replace")
+            raise RuntimeError(f"Lookup server error ({response.status}): {message}")
+        return ColumnarBatch.from_dict(json.loads(data))
+
+    def lookup_streaming(self, ips: Iterable[str], date: datetime, chunk_size: int) -> Iterator[ColumnarBatch]:
+        """Look up IPs chunk by chunk over one connection.
+
+        Args:
+            ips: Iterable of IP addresses to lookup.
+            date: Requested snapshot date.
+            chunk_size: Number of IPs sent per request.
+
+        Yields:
+            One ColumnarBatch per chunk.
+        """
+        for chunk in chunked(ips, chunk_size):
+            yield self.lookup(chunk, date)
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._conn.close()
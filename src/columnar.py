@@ -0,0 +1,467 @@
+"""Columnar lookup results.
+
+A ``ColumnarBatch`` holds the results of one lookup batch as arrays instead of
+one ``ASNResult`` model per row: the address family of every row, IPv4
+addresses as packed ``uint32`` values, IPv6 addresses as (high, low) ``uint64``
+pairs, ASNs as ``uint32``, and a single timestamp, provider and snapshot date (with the
+requested date it answered, for multi-date lookups) shared by every row. ``ASNResult`` objects are only built when ``results`` is accessed.
+Enriched lookups also carry ``LookupDetails`` (matched prefix length and origin
+sets), which are written as optional columns.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from itertools import groupby, repeat
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .ipparse import FAMILY_INVALID, FAMILY_IPV4, FAMILY_IPV6, format_ipv4, format_ipv6, parse_ips
+from .models import ASNResult, BatchResult
+from .providers.origins import NO_PREFIX, LookupDetails
+
+
+def pack_ips(ips: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[int, str]]:
+    """Pack IP strings into per-family address columns.
+
+    Args:
+        ips: IP address strings.
+
+    Returns:
+        Tuple of (uint8 address family of every row, ``uint32`` IPv4 address
+        column, ``(n, 2)`` ``uint64`` IPv6 address column, original text of the
+        rows that are not IP addresses keyed by row). Rows of the other family
+        are 0 in each address column.
+    """
+    parsed = parse_ips(ips)
+    rows = parsed.line - 1
+    family = np.full(len(ips), FAMILY_INVALID, dtype=np.uint8)
+    family[rows] = parsed.family
+    addrs = np.zeros(len(ips), dtype=np.uint32)
+    addrs[rows[parsed.v4_rows]] = parsed.v4
+    addrs6 = np.zeros((len(ips), 2), dtype=np.uint64)
+    addrs6[rows[parsed.v6_rows]] = parsed.v6
+    return family, addrs, addrs6, {i: ips[i] for i in np.flatnonzero(family == FAMILY_INVALID).tolist()}
+
+
+def _network_bits(addrs: np.ndarray, length: np.ndarray, bits: int) -> np.ndarray:
+    """Mask ``uint64`` address words holding address bits ``[bits - 64, bits)`` to their prefix lengths."""
+    host_bits = np.clip(bits - length.astype(np.int64), 0, 64)
+    # A shift by the full word width is undefined, so whole host words are masked separately.
+    mask = np.where(
+        host_bits == 64, np.uint64(0), np.uint64(0xFFFFFFFFFFFFFFFF) << np.minimum(host_bits, 63).astype(np.uint64)
+    )
+    return addrs & mask  # type: ignore[no-any-return]
+
+
+class ColumnarBatch:
+    """Results of a batch of lookups, stored column-wise.
+
+    Exposes the same ``results``/``total``/``successful``/``lookup_date``
+    attributes as ``BatchResult``, so it can be used wherever one is read.
+    Only rows that are not IP addresses keep their text.
+    """
+
+    def __init__(
+        self,
+        addrs: np.ndarray,
+        asns: Union[np.ndarray, Sequence[int]],
+        provider: str,
+        lookup_date: datetime,
+        timestamp: Optional[datetime] = None,
+        snapshot_date: Optional[datetime] = None,
+        text: Optional[Dict[int, str]] = None,
+        ips: Optional[List[str]] = None,
+        details: Optional[LookupDetails] = None,
+        requested_date: Optional[datetime] = None,
+        family: Optional[np.ndarray] = None,
+        addrs6: Optional[np.ndarray] = None,
+    ) -> None:
+        """Initialize the batch.
+
+        Args:
+            addrs: Packed IPv4 address of every row (0 for other rows).
+            asns: ASN of every row (0 if not found).
+            provider: Name of the provider that answered.
+            lookup_date: RouteViews snapshot date used.
+            timestamp: Lookup timestamp shared by all rows (default: now).
+            snapshot_date: Snapshot every row was resolved against (multi-date
+                lookups only).
+            text: Original text of the rows that are not IP addresses, keyed by row.
+            ips: IP strings of the rows, if the caller already holds them; otherwise
+                they are formatted from the address columns when needed.
+            details: Matched prefix lengths and origin sets (enriched lookups only).
+            requested_date: Requested date ``snapshot_date`` answered (multi-date
+                lookups only).
+            family: uint8 address family of every row (default: IPv4 for every
+                row without ``text``).
+            addrs6: ``(n, 2)`` ``uint64`` (high, low) IPv6 address of every row (0
+                for other rows; default: no IPv6 rows).
+        """
+        self.addrs = np.asarray(addrs, dtype=np.uint32)
+        self.asns = np.asarray(asns, dtype=np.uint32)
+        if len(self.addrs) != len(self.asns):
+            raise ValueError(f"Got {len(self.addrs)} addresses but {len(self.asns)} ASNs")
+        self.text = text or {}
+        if family is None:
+            family = np.full(len(self.addrs), FAMILY_IPV4, dtype=np.uint8)
+            family[list(self.text)] = FAMILY_INVALID
+        self.family = np.asarray(family, dtype=np.uint8)
+        if addrs6 is None:
+            addrs6 = np.zeros((len(self.addrs), 2), dtype=np.uint64)
+        self.addrs6 = np.asarray(addrs6, dtype=np.uint64).reshape(-1, 2)
+        if details is not None and len(details) != len(self.asns):
+            raise ValueError(f"Got {len(self.asns)} ASNs but {len(details)} enriched rows")
+        self.provider = provider
+        self.lookup_date = lookup_date
+        self.timestamp = timestamp or datetime.now(timezone.utc)
+        self.snapshot_date = snapshot_date
+        self.requested_date = requested_date
+        self._ips = ips
+        self.details = details
+        self._results: Optional[List[ASNResult]] = None
+
+    @classmethod
+    def from_ips(
+        cls,
+        ips: Sequence[str],
+        asns: Union[np.ndarray, Sequence[int]],
+        provider: str,
+        lookup_date: datetime,
+        snapshot_date: Optional[datetime] = None,
+        details: Optional[LookupDetails] = None,
+        requested_date: Optional[datetime] = None,
+    ) -> "ColumnarBatch":
+        """Build a batch from IP strings and their looked-up ASNs.
+
+        Args:
+            ips: The IP addresses that were looked up.
+            asns: The ASN for each IP address (0 if not found).
+            provider: Name of the provider that answered.
+            lookup_date: RouteViews snapshot date used.
+            snapshot_date: Snapshot the rows were resolved against (multi-date lookups only).
+            details: Matched prefix lengths and origin sets (enriched lookups only).
+            requested_date: Requested date the snapshot answered (multi-date lookups only).
+
+        Returns:
+            The batch.
+        """
+        family, addrs, addrs6, text = pack_ips(ips)
+        return cls(
+            addrs, asns, provider, lookup_date, snapshot_date=snapshot_date, text=text,
+            ips=ips if isinstance(ips, list) else None, details=details, requested_date=requested_date,
+            family=family, addrs6=addrs6
+        )
+
+    @classmethod
+    def from_results(cls, results: Sequence[ASNResult], lookup_date: datetime) -> "ColumnarBatch":
+        """Build a batch from result rows that share timestamp, provider and snapshot dates.
+
+        Rows of enriched lookups keep their prefix lengths and origin sets.
+
+        Args:
+            results: The rows.
+            lookup_date: RouteViews snapshot date used.
+
+        Returns:
+            The batch.
+        """
+        first = results[0] if results else None
+        details = None
+        if any(r.origins is not None for r in results):
+            details = LookupDetails.from_origin_lists([r.origins or [] for r in results])
+            details.asns = np.array([r.asn for r in results], dtype=np.uint32)
+            details.prefix_length = np.array(
+                [NO_PREFIX if r.prefix_length is None else r.prefix_length for r in results], dtype=np.uint8
+            )
+        batch = cls.from_ips(
+            [r.ip for r in results],
+            [r.asn for r in results],
+            first.provider if first else "",
+            lookup_date,
+            snapshot_date=first.snapshot_date if first else None,
+            details=details,
+            requested_date=first.requested_date if first else None,
+        )
+        if first is not None:
+            batch.timestamp = first.timestamp
+        return batch
+
+    @classmethod
+    def concat(cls, batches: Iterable["ColumnarBatch"], lookup_date: datetime) -> "ColumnarBatch":
+        """Concatenate batches of the same lookup run.
+
+        The provider, timestamp and snapshot dates of the first batch are kept.
+        Enriched details are kept when every batch has them.
+
+        Args:
+            batches: The batches, in output order.
+            lookup_date: RouteViews snapshot date used.
+
+        Returns:
+            The concatenated batch.
+        """
+        batches = list(batches)
+        if not batches:
+            return cls(np.empty(0, dtype=np.uint32), [], "", lookup_date)
+        text: Dict[int, str] = {}
+        offset = 0
+        for batch in batches:
+            text.update((offset + row, ip) for row, ip in batch.text.items())
+            offset += len(batch)
+        first = batches[0]
+        details = None
+        if all(b.details is not None for b in batches):
+            details = LookupDetails.concat(b.details for b in batches if b.details is not None)
+        return cls(
+            np.concatenate([b.addrs for b in batches]),
+            np.concatenate([b.asns for b in batches]),
+            first.provider,
+            lookup_date,
+            timestamp=first.timestamp,
+            snapshot_date=first.snapshot_date,
+            text=text,
+            details=details,
+            requested_date=first.requested_date,
+            family=np.concatenate([b.family for b in batches]),
+            addrs6=np.concatenate([b.addrs6 for b in batches]),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnarBatch":
+        """Build a batch from the JSON layout produced by ``to_dict``.
+
+        Args:
+            data: Decoded JSON document.
+
+        Returns:
+            The batch.
+        """
+        rows = data["results"]
+        first = rows[0] if rows else {}
+        batch = cls.from_ips(
+            [row["ip"] for row in rows],
+            [row["asn"] for row in rows],
+            first.get("provider", ""),
+            datetime.fromisoformat(data["lookup_date"]),
+            snapshot_date=datetime.fromisoformat(first["snapshot_date"]) if first.get("snapshot_date") else None,
+            requested_date=datetime.fromisoformat(first["requested_date"]) if first.get("requested_date") else None,
+        )
+        if "timestamp" in first:
+            batch.timestamp = datetime.fromisoformat(first["timestamp"])
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    @property
+    def total(self) -> int:
+        """Total number of lookups."""
+        return len(self.asns)
+
+    @property
+    def successful(self) -> int:
+        """Number of successful lookups (ASN != 0)."""
+        return int(np.count_nonzero(self.asns))
+
+    @property
+    def ips(self) -> List[str]:
+        """IP address strings, formatted from the address columns on first access."""
+        if self._ips is None:
+            ips = format_ipv4(self.addrs)
+            v6_rows = np.flatnonzero(self.family == FAMILY_IPV6)
+            for row, ip in zip(v6_rows.tolist(), format_ipv6(self.addrs6[v6_rows])):
+                ips[row] = ip
+            for row, ip in self.text.items():
+                ips[row] = ip
+            self._ips = ips
+        return self._ips
+
+    def prefixes(self) -> List[Optional[str]]:
+        """Network address of the matched prefix of every row (None where unknown).
+
+        Networks are not stored: each is the row's address masked to its prefix length.
+
+        Raises:
+            ValueError: If the batch has no enriched details.
+        """
+        if self.details is None:
+            raise ValueError("Batch has no enriched details")
+        length = self.details.prefix_length
+        known = (length != NO_PREFIX) & (self.family != FAMILY_INVALID)
+        host_bits = np.where(known, 32 - np.minimum(length, 32).astype(np.int64), 32).astype(np.uint64)
+        mask = (np.uint64(0xFFFFFFFF) << host_bits) & np.uint64(0xFFFFFFFF)
+        networks: List[Optional[str]] = list(format_ipv4((self.addrs & mask).astype(np.uint32)))
+        v6_rows = np.flatnonzero(known & (self.family == FAMILY_IPV6))
+        v6_length = length[v6_rows]
+        v6 = np.stack([
+            _network_bits(self.addrs6[v6_rows, 0], v6_length, 64),
+            _network_bits(self.addrs6[v6_rows, 1], v6_length, 128),
+        ], axis=1)
+        for row, network in zip(v6_rows.tolist(), format_ipv6(v6)):
+            networks[row] = network
+        for row in np.flatnonzero(~known).tolist():
+            networks[row] = None
+        return networks
+
+    def detail_columns(self) -> Tuple[List[Optional[str]], List[Optional[int]], List[List[int]]]:
+        """Return the (prefix, prefix length, origins) columns of an enriched batch.
+
+        Raises:
+            ValueError: If the batch has no enriched details.
+        """
+        prefixes = self.prefixes()
+        assert self.details is not None
+        lengths: List[Optional[int]] = [
+            None if prefix is None else length
+            for prefix, length in zip(prefixes, self.details.prefix_length.tolist())
+        ]
+        return prefixes, lengths, self.details.origins()
+
+    @property
+    def results(self) -> List[ASNResult]:
+        """Result rows as ``ASNResult`` models, built on first access."""
+        if self._results is None:
+            rows = zip(self.ips, self.asns.tolist())
+            if self.details is None:
+                self._results = [
+                    ASNResult(
+                        ip=ip, asn=asn, timestamp=self.timestamp, provider=self.provider,
+                        snapshot_date=self.snapshot_date, requested_date=self.requested_date
+                    )
+                    for ip, asn in rows
+                ]
+            else:
+                self._results = [
+                    ASNResult(
+                        ip=ip, asn=asn, timestamp=self.timestamp, provider=self.provider,
+                        snapshot_date=self.snapshot_date, requested_date=self.requested_date,
+                        prefix=prefix, prefix_length=length, origins=origins
+                    )
+                    for (ip, asn), prefix, length, origins in zip(rows, *self.detail_columns())
+                ]
+        return self._results
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield JSON-ready rows, omitting the snapshot and requested dates when unset.
+
+        Enriched batches add ``prefix``, ``prefix_length`` and ``origins`` to every row.
+        """
+        shared: Dict[str, Any] = {"timestamp": self.timestamp.isoformat(), "provider": self.provider}
+        if self.snapshot_date is not None:
+            shared["snapshot_date"] = self.snapshot_date.isoformat()
+        if self.requested_date is not None:
+            shared["requested_date"] = self.requested_date.isoformat()
+        if self.details is None:
+            for ip, asn in zip(self.ips, self.asns.tolist()):
+                yield {"ip": ip, "asn": asn, **shared}
+            return
+        for ip, asn, prefix, length, origins in zip(self.ips, self.asns.tolist(), *self.detail_columns()):
+            yield {"ip": ip, "asn": asn, **shared, "prefix": prefix, "prefix_length": length, "origins": origins}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON-ready document, in the same layout as ``BatchResult``."""
+        return {
+            "results": list(self.records()),
+            "total": self.total,
+            "successful": self.successful,
+            "lookup_date": self.lookup_date.isoformat(),
+        }
+
+    def to_batch_result(self) -> BatchResult:
+        """Convert to a row-based ``BatchResult``."""
+        return BatchResult(
+            results=self.results, total=self.total, successful=self.successful, lookup_date=self.lookup_date
+        )
+
+
+class TableBatch(ABC):
+    """Results of queries that do not answer with one row per looked-up address.
+
+    Range lookups and ASN queries report a varying number of rows per query.
+    Subclasses list their fields in ``FIELDNAMES`` and return every column but
+    ``timestamp`` and ``provider`` (shared by all rows) from ``columns()`` as
+    JSON-ready values, so that the serializers can write any of them.
+    """
+
+    FIELDNAMES: Tuple[str, ...] = ()
+
+    def __init__(self, provider: str, lookup_date: datetime, timestamp: Optional[datetime] = None) -> None:
+        """Initialize the shared fields.
+
+        Args:
+            provider: Name of the provider that answered.
+            lookup_date: RouteViews snapshot date used.
+            timestamp: Lookup timestamp shared by all rows (default: now).
+        """
+        self.provider = provider
+        self.lookup_date = lookup_date
+        self.timestamp = timestamp or datetime.now(timezone.utc)
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    @property
+    @abstractmethod
+    def asns(self) -> np.ndarray:
+        """uint32 ASN of every row (0 for rows that matched nothing)."""
+        pass
+
+    @property
+    def total(self) -> int:
+        """Number of rows."""
+        return len(self)
+
+    @property
+    def successful(self) -> int:
+        """Number of rows with an ASN."""
+        return int(np.count_nonzero(self.asns))
+
+    @abstractmethod
+    def columns(self) -> Dict[str, List[Any]]:
+        """Return the JSON-ready columns of the batch, keyed by field name."""
+        pass
+
+    def shared(self) -> Dict[str, Any]:
+        """Return the JSON-ready values shared by every row."""
+        return {"timestamp": self.timestamp.isoformat(), "provider": self.provider}
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield JSON-ready rows with the fields in ``FIELDNAMES`` order."""
+        columns = self.columns()
+        shared = self.shared()
+        names = self.FIELDNAMES
+        values = [columns[name] if name in columns else repeat(shared[name]) for name in names]
+        for row in zip(*values):
+            yield dict(zip(names, row))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON-ready document, in the layout of ``ColumnarBatch.to_dict``."""
+        return {
+            "results": list(self.records()),
+            "total": self.total,
+            "successful": self.successful,
+            "lookup_date": self.lookup_date.isoformat(),
+        }
+
+
+LookupResult = Union[BatchResult, ColumnarBatch]
+
+
+def iter_columns(result: LookupResult) -> Iterator[ColumnarBatch]:
+    """Return a result as columnar batches.
+
+    A ``ColumnarBatch`` is returned as is. The rows of a ``BatchResult`` are
+    grouped into runs sharing timestamp, provider and snapshot date.
+
+    Args:
+        result: A columnar or row-based result.
+
+    Yields:
+        Columnar batches covering all rows, in order.
+    """
+    if isinstance(result, ColumnarBatch):
+        yield result
+        return
+    key = lambda r: (r.timestamp, r.provider, r.snapshot_date, r.requested_date)  # noqa: E731
+    for _, rows in groupby(result.results, key=key):
+        yield ColumnarBatch.from_results(list(rows), result.lookup_date)
@@ -0,0 +1,419 @@
+"""Bulk parsing and normalization of IP address input.
+
+``parse_ip_buffer`` turns a buffer of newline-separated text into packed
+integer columns without creating a Python object per line: dotted-quad IPv4
+lines are decoded with NumPy over the raw bytes, and only the remaining lines
+(IPv6, or anything that is not a plain dotted quad) go through
+``socket.inet_pton`` one by one. Addresses come out normalized, so spellings
+such as ``010.0.0.1`` and ``10.0.0.1`` map to the same address, and invalid
+lines are collected as ``InvalidLine`` records instead of raising.
+"""
+import functools
+import socket
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+# Longest dotted quad, "255.255.255.255".
+MAX_IPV4_CHARS = 15
+BLOCK_BYTES = 1 << 22
+
+FAMILY_INVALID = 0
+FAMILY_IPV4 = 4
+FAMILY_IPV6 = 6
+
+# Internal family of blank lines, which are not rows.
+_BLANK = 255
+_DOT = ord(".")
+_ZERO = ord("0")
+_IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+class InvalidLine(NamedTuple):
+    """An input line that is not an IP address."""
+    line: int
+    text: str
+
+    def __str__(self) -> str:
+        return f"line {self.line}: invalid IP address: {self.text!r}"
+
+
+def _octet_cells(separator: bytes) -> np.ndarray:
+    """Text of every octet value followed by ``separator``, NUL-padded into a uint32 cell."""
+    cells = np.zeros((256, 4), dtype=np.uint8)
+    for value in range(256):
+        text = str(value).encode("ascii") + separator
+        cells[value, :len(text)] = list(text)
+    return cells.view(np.uint32).reshape(256)
+
+
+_DOTTED_OCTETS = _octet_cells(b".")
+_FINAL_OCTETS = _octet_cells(b"\n")
+
+
+def format_ipv4(addrs: np.ndarray) -> List[str]:
+    """Format packed IPv4 addresses as dotted-quad strings.
+
+    The text of all addresses is assembled in one byte buffer from per-octet
+    cells and split once, instead of formatting each address separately.
+    """
+    octets = np.asarray(addrs, dtype=np.uint32).astype(">u4").view(np.uint8).reshape(-1, 4)
+    cells = np.empty((len(octets), 4), dtype=np.uint32)
+    cells[:, :3] = _DOTTED_OCTETS[octets[:, :3]]
+    cells[:, 3] = _FINAL_OCTETS[octets[:, 3]]
+    chars = cells.view(np.uint8)
+    return chars[chars != 0].tobytes().decode("ascii").split("\n")[:-1]  # type: ignore[no-any-return]
+
+
+def format_ipv6(addrs: np.ndarray) -> List[str]:
+    """Format IPv6 addresses packed as (high, low) ``uint64`` pairs in canonical form."""
+    packed = np.asarray(addrs, dtype=np.uint64).reshape(-1, 2).astype(">u8").tobytes()
+    inet_ntop = socket.inet_ntop
+    af_inet6 = socket.AF_INET6
+    return [inet_ntop(af_inet6, packed[i:i + 16]) for i in range(0, len(packed), 16)]
+
+
+class ParsedIPs:
+    """Packed addresses parsed from a block of input lines.
+
+    Blank lines are skipped; every other line is a row. ``family`` gives the
+    address family of each row (``FAMILY_INVALID`` for lines that are not
+    addresses), and the addresses of each family are stored in their own column
+    alongside the rows they came from. IPv4-mapped IPv6 addresses are stored as IPv4.
+    """
+
+    def __init__(
+        self,
+        line: np.ndarray,
+        family: np.ndarray,
+        v4_rows: np.ndarray,
+        v4: np.ndarray,
+        v6_rows: np.ndarray,
+        v6: np.ndarray,
+        errors: List[InvalidLine],
+    ) -> None:
+        """Initialize from parsed columns.
+
+        Args:
+            line: int64 input line number (1-based) of every row.
+            family: uint8 address family of every row.
+            v4_rows: int64 rows holding IPv4 addresses, ascending.
+            v4: uint32 address of each of ``v4_rows``.
+            v6_rows: int64 rows holding IPv6 addresses, ascending.
+            v6: ``(n, 2)`` uint64 (high, low) address of each of ``v6_rows``.
+            errors: The invalid rows, in input order.
+        """
+        self.line = line
+        self.family = family
+        self.v4_rows = v4_rows
+        self.v4 = v4
+        self.v6_rows = v6_rows
+        self.v6 = v6
+        self.errors = errors
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    @property
+    def invalid(self) -> np.ndarray:
+        """Boolean mask of the rows that are not IP addresses."""
+        return self.family == FAMILY_INVALID  # type: ignore[no-any-return]
+
+    def addresses(self, keep_invalid: bool = False) -> List[str]:
+        """Return the rows as normalized address strings, in input order.
+
+        Args:
+            keep_invalid: Keep invalid rows as their original (stripped) text
+                instead of dropping them.
+
+        Returns:
+            IPv4 rows in dotted-quad form and IPv6 rows in canonical form.
+        """
+        v4 = format_ipv4(self.v4)
+        if len(v4) == len(self):
+            return v4
+        out = np.empty(len(self), dtype=object)
+        out[self.v4_rows] = v4
+        out[self.v6_rows] = format_ipv6(self.v6)
+        invalid = self.invalid
+        if keep_invalid:
+            out[invalid] = [error.text for error in self.errors]
+            return out.tolist()  # type: ignore[no-any-return]
+        return out[~invalid].tolist()  # type: ignore[no-any-return]
+
+
+def _dotted_quad(text: str) -> Optional[int]:
+    """Decode one dotted-quad IPv4 address, leading zeros read as decimal."""
+    parts = text.split(".")
+    if len(parts) != 4:
+        return None
+    addr = 0
+    for part in parts:
+        if not (1 <= len(part) <= 3 and part.isascii() and part.isdigit()):
+            return None
+        value = int(part)
+        if value > 255:
+            return None
+        addr = (addr << 8) | value
+    return addr
+
+
+def _parse_dotted_quads(
+    data: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode the lines of a buffer that are bare dotted-quad IPv4 addresses.
+
+    Works on the flat buffer: per-line character counts come from binary searches
+    over the positions of dots and other non-digits, and each octet is read from
+    the (at most three) digits before the dot or line end closing it, so the cost
+    is a few passes over the bytes whatever the number of lines.
+
+    Args:
+        data: The buffer as uint8.
+        starts: First byte of each line.
+        ends: Byte after the last character of each line.
+
+    Returns:
+        Tuple of (boolean mask of the lines that are dotted quads, their uint32
+        addresses, 0 for other lines).
+    """
+    digits = data - np.uint8(_ZERO)
+    is_dot = data == _DOT
+    dots = np.flatnonzero(is_dot)
+    others = np.flatnonzero((digits > 9) & ~is_dot)
+    first_dot = np.searchsorted(dots, starts)
+    length = ends - starts
+    candidate = (
+        (length >= 7) & (length <= MAX_IPV4_CHARS)
+        & (np.searchsorted(others, ends) == np.searchsorted(others, starts))
+        & (np.searchsorted(dots, ends) - first_dot == 3)
+    )
+    addrs = np.zeros(len(starts), dtype=np.uint32)
+    lines = np.flatnonzero(candidate)
+    if not len(lines):
+        return candidate, addrs
+
+    # Octet boundaries of every candidate line: its start, its three dots, its end.
+    bounds = np.empty((len(lines), 5), dtype=np.int64)
+    bounds[:, 0] = starts[lines] - 1
+    bounds[:, 1:4] = dots[first_dot[lines, None] + np.arange(3)]
+    bounds[:, 4] = ends[lines]
+    octet_ends = bounds[:, 1:]
+    size = octet_ends - bounds[:, :-1] - 1
+    ok = np.all((size >= 1) & (size <= 3), axis=1)
+
+    value = np.zeros(size.shape, dtype=np.uint16)
+    for place, scale in enumerate((1, 10, 100)):
+        digit = np.take(digits, octet_ends - 1 - place, mode="clip").astype(np.uint16)
+        value += (size > place) * digit * np.uint16(scale)
+    ok &= np.all(value <= 255, axis=1)
+    value = value.astype(np.uint32)
+    packed = (value[:, 0] << 24) | (value[:, 1] << 16) | (value[:, 2] << 8) | value[:, 3]
+    candidate[lines[~ok]] = False
+    addrs[lines[ok]] = packed[ok]
+    return candidate, addrs
+
+
+def _parse_plain_ipv6(
+    buffer: bytes,
+    data: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    family: np.ndarray,
+    v4_line: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse the lines that are bare IPv6 addresses in one pass over the block.
+
+    Lines still marked invalid that contain a colon are handed to ``inet_pton``
+    without stripping; the whole batch is converted with a single ``map`` and
+    only falls back to one call per line when some of them are not addresses,
+    which are left for the slow path. IPv4-mapped addresses are stored as IPv4.
+
+    Args:
+        buffer: The block being parsed.
+        data: ``buffer`` as uint8.
+        starts: Offset of every line.
+        ends: End offset of every line.
+        family: Family per line; IPv4-mapped lines are set to ``FAMILY_IPV4`` here.
+        v4_line: uint32 IPv4 address per line, filled in for IPv4-mapped lines.
+
+    Returns:
+        Tuple of (int64 lines holding IPv6 addresses, their ``(n, 2)`` uint64 addresses).
+    """
+    empty = (np.zeros(0, dtype=np.int64), np.zeros((0, 2), dtype=np.uint64))
+    colons = np.concatenate(([0], np.cumsum(data == ord(":"))))
+    lines = np.flatnonzero((family == FAMILY_INVALID) & (colons[ends] > colons[starts]))
+    if not len(lines) or (data >= 0x80).any():
+        return empty
+
+    text = buffer.decode("ascii")
+    texts = [text[start:end] for start, end in zip(starts[lines].tolist(), ends[lines].tolist())]
+    to_packed = functools.partial(socket.inet_pton, socket.AF_INET6)
+    try:
+        packed = list(map(to_packed, texts))
+    except (OSError, ValueError):
+        parsed: List[Optional[bytes]] = []
+        for addr in texts:
+            try:
+                parsed.append(to_packed(addr))
+            except (OSError, ValueError):
+                parsed.append(None)
+        ok = np.array([p is not None for p in parsed], dtype=bool)
+        lines = lines[ok]
+        packed = [p for p in parsed if p is not None]
+    if not len(lines):
+        return empty
+
+    v6 = np.frombuffer(b"".join(packed), dtype=">u8").astype(np.uint64).reshape(-1, 2)
+    mapped = (v6[:, 0] == 0) & ((v6[:, 1] >> np.uint64(32)) == np.uint64(0xFFFF))
+    if mapped.any():
+        family[lines[mapped]] = FAMILY_IPV4
+        v4_line[lines[mapped]] = (v6[mapped, 1] & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        v6, lines = v6[~mapped], lines[~mapped]
+    return lines, v6
+
+
+def parse_ip_buffer(buffer: bytes, first_line: int = 1) -> ParsedIPs:
+    """Parse newline-separated IP addresses from a byte buffer.
+
+    Surrounding whitespace is stripped and blank lines are skipped.
+
+    Args:
+        buffer: ASCII text, one address per line.
+        first_line: Line number of the first line in ``buffer``.
+
+    Returns:
+        The parsed rows.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord("\n"))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(data)]))
+    if len(data) and data[-1] == ord("\n"):
+        starts, ends = starts[:-1], ends[:-1]
+    # Drop the carriage return of CRLF line endings.
+    if len(data):
+        ends = ends - ((ends > starts) & (data[np.maximum(ends - 1, 0)] == ord("\r")))
+
+    is_v4, v4_line = _parse_dotted_quads(data, starts, ends)
+    family = np.where(is_v4, FAMILY_IPV4, FAMILY_INVALID).astype(np.uint8)
+    family[ends == starts] = _BLANK
+    v6_lines: List[int] = []
+    v6_packed: List[bytes] = []
+    errors: List[InvalidLine] = []
+    fast_lines, fast_v6 = _parse_plain_ipv6(buffer, data, starts, ends, family, v4_line)
+    family[fast_lines] = FAMILY_IPV6
+    inet_pton = socket.inet_pton
+    af_inet6 = socket.AF_INET6
+    for line in np.flatnonzero(family == FAMILY_INVALID).tolist():
+        text = buffer[starts[line]:ends[line]].decode("utf-8", errors="replace").strip()
+        if not text:
+            family[line] = _BLANK
+            continue
+        addr = _dotted_quad(text)
+        if addr is None:
+            try:
+                packed = inet_pton(af_inet6, text)
+            except (OSError, ValueError):
+                errors.append(InvalidLine(first_line + line, text))
+                continue
+            if not packed.startswith(_IPV4_MAPPED_PREFIX):
+                family[line] = FAMILY_IPV6
+                v6_lines.append(line)
+                v6_packed.append(packed)
+                continue
+            addr = int.from_bytes(packed[12:], "big")
+        family[line] = FAMILY_IPV4
+        v4_line[line] = addr
+
+    slow_v6 = np.frombuffer(b"".join(v6_packed), dtype=">u8").astype(np.uint64).reshape(-1, 2)
+    v6_line = np.concatenate((fast_lines, np.array(v6_lines, dtype=np.int64)))
+    v6 = np.concatenate((fast_v6, slow_v6))
+    if len(v6_lines) and len(fast_lines):
+        order = np.argsort(v6_line, kind="stable")
+        v6_line, v6 = v6_line[order], v6[order]
+
+    nonblank = family != _BLANK
+    row_of_line = np.cumsum(nonblank) - 1
+    v4_lines = np.flatnonzero(family == FAMILY_IPV4)
+    return ParsedIPs(
+        np.flatnonzero(nonblank) + first_line,
+        family[nonblank],
+        row_of_line[v4_lines],
+        v4_line[v4_lines],
+        row_of_line[v6_line],
+        v6,
+        errors,
+    )
+
+
+def parse_ips(ips: Sequence[str]) -> ParsedIPs:
+    """Parse a sequence of IP strings (one row per non-blank string).
+
+    Args:
+        ips: IP address strings.
+
+    Returns:
+        The parsed rows; ``line`` numbers are 1-based positions in ``ips``.
+    """
+    text = "\n".join(ips)
+    if text.count("\n") != len(ips) - 1:
+        # Keep one line per entry; entries spanning lines are not addresses anyway.
+        text = "\n".join(ip.replace("\n", " ") for ip in ips)
+    return parse_ip_buffer(text.encode("utf-8", errors="replace") + b"\n" if ips else b"")
+
+
+def iter_parsed_file(file_path: str, block_bytes: int = BLOCK_BYTES) -> Iterator[ParsedIPs]:
+    """Parse a file of IP addresses block by block.
+
+    Args:
+        file_path: Path to the file (one address per line).
+        block_bytes: Approximate number of bytes parsed at a time.
+
+    Yields:
+        The parsed rows of each block, with line numbers relative to the whole file.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+    """
+    try:
+        f = open(Path(file_path), "rb")  # noqa: SIM115 - closed by the with block below
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input file not found: {file_path}") from None
+    with f:
+        line = 1
+        tail = b""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            if not cut:
+                tail = block
+                continue
+            tail = block[cut:]
+            yield parse_ip_buffer(block[:cut], line)
+            line += block.count(b"\n", 0, cut)
+        if tail:
+            yield parse_ip_buffer(tail, line)
+
+
+class ErrorStream:
+    """Reports invalid input lines to a text stream and counts them."""
+
+    def __init__(self, stream: TextIO) -> None:
+        """Initialize the reporter.
+
+        Args:
+            stream: Where invalid lines are written, one per line.
+        """
+        self.stream = stream
+        self.count = 0
+
+    def report(self, errors: Sequence[InvalidLine]) -> None:
+        """Write invalid lines to the stream."""
+        for error in errors:
+            self.stream.write(f"{error}\n")
+        self.count += len(errors)
@@ -1,17 +1,67 @@
 """Core IP to ASN lookup functionality."""
 from datetime import datetime
-from typing import List, Optional
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from .models import ASNResult, BatchResult, LookupConfig, Provider
-from .providers import BaseProvider, PyIPMetaProvider
+import numpy as np
 
+from . import metrics
+from .columnar import ColumnarBatch
+from .ipparse import ErrorStream, parse_ips
+from .models import LookupConfig, Provider, ServerConfig
+from .providers import BaseProvider, SnapshotStore
+from .providers.cache import LookupCache, make_cache
+from .providers.origins import LookupDetails
+from .ranges import ParsedRanges, RangeBatch, parse_ranges
+from .readers import iter_parsed_input
+from .reverse import PrefixBatch
 
-def get_provider(provider_type: Provider, snapshot_date: datetime) -> BaseProvider:
+
+def get_snapshot_store(config: Union[LookupConfig, ServerConfig]) -> Optional[SnapshotStore]:
+    """Build the local snapshot store described by a configuration.
+    
+    Args:
+        config: Lookup or server configuration.
+        
+    Returns:
+        The snapshot store, or None if caching is disabled.
+    """
+    if not config.use_cache:
+        return None
+    root = Path(config.cache_dir) if config.cache_dir else None
+    return SnapshotStore(root, max_bytes=config.cache_max_bytes)
+
+
+def get_lookup_cache(config: Union[LookupConfig, ServerConfig]) -> LookupCache:
+    """Build a provider lookup cache sized as described by a configuration.
+    
+    Args:
+        config: Lookup or server configuration.
+        
+    Returns:
+        A new, empty lookup cache.
+    """
+    return make_cache(config.lookup_cache_entries, config.prefix_cache_entries)
+
+
+def get_provider(
+    provider_type: Provider,
+    snapshot_date: datetime,
+    store: Optional[SnapshotStore] = None,
+    index_path: Optional[str] = None,
+    cache: Optional[LookupCache] = None,
+    index6_path: Optional[str] = None
+) -> BaseProvider:
     """Get the appropriate provider instance.
     
     Args:
         provider_type: The type of provider to use.
         snapshot_date: The date for which to fetch the RouteViews snapshot.
+        store: Optional local snapshot store shared by providers.
+        index_path: Optional precompiled snapshot index (prefix2as provider only).
+        cache: Optional lookup cache for the provider (default: a bounded address LRU).
+        index6_path: Optional precompiled IPv6 snapshot index (prefix2as provider only).
         
     Returns:
         An initialized provider instance.
@@ -19,13 +69,165 @@ def get_provider(provider_type: Provider, snapshot_date: datetime) -> BaseProvid
     Raises:
         ValueError: If the provider type is not supported.
     """
+    # Only the chosen provider's module is imported.
     if provider_type == Provider.PYIPMETA:
-        return PyIPMetaProvider(snapshot_date)
+        from .providers.pyipmeta import PyIPMetaProvider
+        return PyIPMetaProvider(snapshot_date, store, cache)
+    elif provider_type == Provider.PREFIX2AS:
+        from .providers.prefix2as import Prefix2ASProvider
+        return Prefix2ASProvider(
+            snapshot_date, store, Path(index_path) if index_path else None, cache,
+            Path(index6_path) if index6_path else None
+        )
     else:
         raise ValueError(f"Unsupported provider: {provider_type}")
 
 
-def lookup_ips(ips: List[str], config: LookupConfig) -> BatchResult:
+def provider_from_config(config: LookupConfig) -> BaseProvider:
+    """Create the (uninitialized) provider described by a configuration.
+    
+    Args:
+        config: Configuration for the lookup operation.
+        
+    Returns:
+        The provider instance.
+    """
+    return get_provider(
+        config.provider, config.snapshot_date, get_snapshot_store(config), config.index_path,
+        get_lookup_cache(config), config.index6_path
+    )
+
+
+def dedupe_ips(ips: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """Deduplicate IP strings, keeping first-seen order.
+    
+    Args:
+        ips: IP addresses, possibly repeated.
+        
+    Returns:
+        Tuple of (unique IPs, position of every input IP among them).
+    """
+    positions: Dict[str, int] = {}
+    inverse = np.fromiter(
+        (positions.setdefault(ip, len(positions)) for ip in ips), dtype=np.int64, count=len(ips)
+    )
+    return list(positions), inverse
+
+
+def lookup_unique(provider: BaseProvider, ips: Sequence[str]) -> np.ndarray:
+    """Look up a batch of IPs, resolving each distinct address only once.
+    
+    Providers flagged ``dedupes_batches`` (prefix2as) already reduce a batch to
+    its sorted unique integer addresses, which is cheaper than hashing the
+    strings, so they receive the batch as is. For the others, repetitive
+    inputs are reduced to their unique strings before lookup and the answers
+    are scattered back.
+    
+    Args:
+        provider: An initialized provider.
+        ips: The IP addresses to lookup.
+        
+    Returns:
+        uint32 ASN per input IP, 0 where not found.
+    """
+    if provider.dedupes_batches:
+        return np.asarray(provider.lookup_batch(ips), dtype=np.uint32)
+    unique_ips, inverse = dedupe_ips(ips)
+    if len(unique_ips) == len(ips):
+        return np.asarray(provider.lookup_batch(ips), dtype=np.uint32)
+    return np.asarray(provider.lookup_batch(unique_ips), dtype=np.uint32)[inverse]  # type: ignore[no-any-return]
+
+
+def lookup_details_unique(provider: BaseProvider, ips: Sequence[str]) -> LookupDetails:
+    """Look up a batch of IPs with their matched prefixes and origin sets.
+    
+    Distinct addresses are resolved once, as in ``lookup_unique``.
+    
+    Args:
+        provider: An initialized provider.
+        ips: The IP addresses to lookup.
+        
+    Returns:
+        The enriched result of every input IP.
+    """
+    if provider.dedupes_batches:
+        return provider.lookup_details(ips)
+    unique_ips, inverse = dedupe_ips(ips)
+    if len(unique_ips) == len(ips):
+        return provider.lookup_details(ips)
+    return provider.lookup_details(unique_ips).take(inverse)
+
+
+def build_batch(
+    ips: List[str],
+    asns: Union[np.ndarray, List[int]],
+    provider_name: str,
+    lookup_date: datetime,
+    details: Optional[LookupDetails] = None
+) -> ColumnarBatch:
+    """Assemble a columnar batch from IPs and their looked-up ASNs.
+    
+    Args:
+        ips: The IP addresses that were looked up.
+        asns: The ASN for each IP address (0 if not found).
+        provider_name: Name of the provider that answered.
+        lookup_date: RouteViews snapshot date used.
+        details: Matched prefixes and origin sets (enriched lookups only).
+        
+    Returns:
+        The batch result.
+    """
+    return ColumnarBatch.from_ips(ips, asns, provider_name, lookup_date, details=details)
+
+
+def lookup_chunk(provider: BaseProvider, ips: List[str], lookup_date: datetime, enrich: bool = False) -> ColumnarBatch:
+    """Look up one batch of IPs with an initialized provider.
+    
+    Args:
+        provider: An initialized provider.
+        ips: The IP addresses to lookup.
+        lookup_date: RouteViews snapshot date reported with the results.
+        enrich: Also resolve matched prefixes and origin sets.
+        
+    Returns:
+        The batch result.
+    """
+    metrics.incr("lookups", len(ips))
+    with metrics.span("lookup"):
+        if enrich:
+            details = lookup_details_unique(provider, ips)
+            return build_batch(ips, details.asns, provider.provider_name, lookup_date, details)
+        return build_batch(ips, lookup_unique(provider, ips), provider.provider_name, lookup_date)
+
+
+def initialize_provider(provider: BaseProvider) -> None:
+    """Initialize a provider, timing it as the ``initialize`` stage."""
+    with metrics.span("initialize"):
+        provider.initialize()
+
+
+def record_cache_stats(provider: BaseProvider) -> None:
+    """Add a provider's lookup cache counters to the run's metrics."""
+    stats = provider.cache.stats
+    metrics.incr("lookup_cache_hits", stats.hits)
+    metrics.incr("lookup_cache_misses", stats.misses)
+    metrics.incr("lookup_cache_evictions", stats.evictions)
+
+
+def merge_batches(batches: Iterable[ColumnarBatch], lookup_date: datetime) -> ColumnarBatch:
+    """Concatenate chunked results into a single batch.
+    
+    Args:
+        batches: The chunks to merge, in output order.
+        lookup_date: RouteViews snapshot date used.
+        
+    Returns:
+        The merged batch result.
+    """
+    return ColumnarBatch.concat(batches, lookup_date)
+
+
+def lookup_ips(ips: List[str], config: LookupConfig) -> ColumnarBatch:
     """Perform IP to ASN lookups for a list of IPs.
     
     Args:
@@ -33,49 +235,212 @@ def lookup_ips(ips: List[str], config: LookupConfig) -> BatchResult:
         config: Configuration for the lookup operation.
         
     Returns:
-        BatchResult containing all lookup results.
+        ColumnarBatch containing all lookup results.
     """
-    provider = get_provider(config.provider, config.snapshot_date)
-    provider.initialize()
+    provider = provider_from_config(config)
+    initialize_provider(provider)
     
-    results = []
-    for ip in ips:
-        asn = provider.lookup(ip)
-        result = ASNResult(
-            ip=ip,
-            asn=asn,
-            provider=provider.provider_name
-        )
-        results.append(result)
+    results = lookup_chunk(provider, ips, config.snapshot_date, config.enrich)
+    record_cache_stats(provider)
+    return results
+
+
+def lookup_ranges_chunk(provider: BaseProvider, parsed: ParsedRanges, lookup_date: datetime) -> RangeBatch:
+    """Resolve one batch of addresses, prefixes and ranges with an initialized provider.
     
-    return BatchResult(
-        results=results,
-        total=len(results),
-        successful=sum(1 for r in results if r.asn != 0),
-        lookup_date=config.snapshot_date
-    )
+    Args:
+        provider: An initialized provider that implements ``lookup_ranges``.
+        parsed: The parsed queries.
+        lookup_date: RouteViews snapshot date reported with the results.
+        
+    Returns:
+        One row per (query, prefix) pair with address counts.
+    """
+    metrics.incr("lookups", len(parsed))
+    with metrics.span("lookup"):
+        return RangeBatch(parsed.text, provider.lookup_ranges(parsed), provider.provider_name, lookup_date)
 
 
-def read_ips_from_file(file_path: str) -> List[str]:
-    """Read IP addresses from a file (one per line).
+def lookup_ranges(ranges: Sequence[str], config: LookupConfig, errors: Optional[ErrorStream] = None) -> RangeBatch:
+    """Resolve addresses, CIDR prefixes and address ranges to the prefixes covering them.
+    
+    Ranges are intersected with the prefix table instead of being expanded into
+    single addresses, so a /8 costs no more than a /32.
     
     Args:
-        file_path: Path to the file containing IP addresses.
+        ranges: Entries such as ``10.1.2.0/24``, ``10.1.2.5-10.1.2.99`` or ``8.8.8.8``.
+        config: Configuration for the lookup operation.
+        errors: Where invalid entries are reported; they are dropped either way.
         
     Returns:
-        List of IP addresses.
+        RangeBatch with one row per (query, prefix) pair.
+    """
+    parsed = parse_ranges(ranges)
+    if errors is not None:
+        errors.report(parsed.errors)
+    provider = provider_from_config(config)
+    initialize_provider(provider)
+    return lookup_ranges_chunk(provider, parsed, config.snapshot_date)
+
+
+def lookup_ranges_streaming(blocks: Iterable[ParsedRanges], config: LookupConfig) -> Iterator[RangeBatch]:
+    """Resolve blocks of parsed ranges (e.g. from ``iter_parsed_ranges``) one at a time.
+    
+    Args:
+        blocks: The parsed queries, block by block.
+        config: Configuration for the lookup operation.
         
-    Raises:
-        FileNotFoundError: If the file doesn't exist.
-        ValueError: If the file is empty.
+    Yields:
+        One RangeBatch per block; a single empty one if there are no blocks, so
+        that writers still emit the range layout.
+    """
+    provider = provider_from_config(config)
+    initialize_provider(provider)
+    
+    empty = True
+    for parsed in blocks:
+        empty = False
+        yield lookup_ranges_chunk(provider, parsed, config.snapshot_date)
+    if empty:
+        yield lookup_ranges_chunk(provider, parse_ranges([]), config.snapshot_date)
+
+
+def lookup_asn_prefixes(asns: Sequence[int], config: LookupConfig, family: int = 4) -> PrefixBatch:
+    """Find the prefixes and address space originated by ASNs on the configured snapshot.
+    
+    The snapshot is discovered, cached and loaded as for address lookups; its
+    prefix table is inverted into a reverse index on the first query.
+    
+    Args:
+        asns: Distinct ASNs to look up.
+        config: Configuration for the lookup operation.
+        family: 4 for IPv4 prefixes, 6 for IPv6 ones (only that snapshot is loaded).
+        
+    Returns:
+        PrefixBatch with one row per (ASN, prefix) pair.
+    """
+    provider = provider_from_config(config)
+    if family == 4:
+        initialize_provider(provider)
+    metrics.incr("lookups", len(asns))
+    with metrics.span("lookup"):
+        return PrefixBatch(provider.lookup_asns(asns, family), provider.provider_name, config.snapshot_date)
+
+
+def chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split an iterable into lists of at most ``size`` items.
+    
+    Args:
+        items: The items to split.
+        size: Maximum number of items per chunk.
+        
+    Yields:
+        Consecutive chunks of items.
     """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def lookup_ips_streaming(ips: Iterable[str], config: LookupConfig) -> Iterator[ColumnarBatch]:
+    """Perform IP to ASN lookups in chunks of ``config.chunk_size`` IPs.
+    
+    The provider is initialized once; only one chunk of input and results is held
+    in memory at a time.
+    
+    Args:
+        ips: Iterable of IP addresses to lookup (e.g. from ``iter_ips_from_file``).
+        config: Configuration for the lookup operation.
+        
+    Yields:
+        One ColumnarBatch per chunk, with ``total``/``successful`` for that chunk.
+    """
+    provider = provider_from_config(config)
+    initialize_provider(provider)
+    
     try:
-        with open(file_path, 'r') as f:
-            ips = [line.strip() for line in f if line.strip()]
+        for chunk in chunked(ips, config.chunk_size):
+            yield lookup_chunk(provider, chunk, config.snapshot_date, config.enrich)
+    finally:
+        record_cache_stats(provider)
+
+
+def normalize_ips(ips: Sequence[str], errors: Optional[ErrorStream] = None) -> List[str]:
+    """Parse IP strings into their normalized form.
+    
+    Args:
+        ips: IP address strings (blank entries are skipped).
+        errors: Where invalid entries are reported and dropped; when None they are
+            kept as their stripped text (and resolve to ASN 0).
         
-        if not ips:
-            raise ValueError(f"No IP addresses found in {file_path}")
+    Returns:
+        IPv4 addresses in dotted-quad form and IPv6 addresses in canonical form.
+    """
+    parsed = parse_ips(ips)
+    if errors is not None:
+        errors.report(parsed.errors)
+    return parsed.addresses(keep_invalid=errors is None)
+
+
+def iter_ips_from_file(
+    file_path: str,
+    errors: Optional[ErrorStream] = None,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+) -> Iterator[str]:
+    """Lazily read IP addresses from an input (one per line), skipping blank lines.
+    
+    The input is parsed in blocks by the bulk parser, so addresses come out
+    normalized (``010.0.0.1`` reads as ``10.0.0.1``). It can be compressed, a
+    directory or glob of files, or a column of CSV and Parquet files (see
+    ``readers``).
+    
+    Args:
+        file_path: Path, directory or glob of the files containing IP addresses.
+        errors: Where invalid lines are reported and dropped; when None they are
+            passed through as their stripped text (and resolve to ASN 0).
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+        
+    Yields:
+        IP addresses.
         
-        return ips
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Input file not found: {file_path}")
\ No newline at end of file
+    Raises:
+        FileNotFoundError: If no file matches.
+    """
+    for parsed in iter_parsed_input(file_path, column, read_workers):
+        if errors is not None:
+            errors.report(parsed.errors)
+        yield from parsed.addresses(keep_invalid=errors is None)
+
+
+def read_ips_from_file(
+    file_path: str,
+    errors: Optional[ErrorStream] = None,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+) -> List[str]:
+    """Read IP addresses from an input (one per line).
+    
+    Args:
+        file_path: Path, directory or glob of the files containing IP addresses.
+        errors: Where invalid lines are reported and dropped (see ``iter_ips_from_file``).
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+        
+    Returns:
+        List of IP addresses.
+        
+    Raises:
+        FileNotFoundError: If no file matches.
+        ValueError: If the input is empty.
+    """
+    ips = list(iter_ips_from_file(file_path, errors, column, read_workers))
+    
+    if not ips:
+        raise ValueError(f"No IP addresses found in {file_path}")
+    
+    return ips
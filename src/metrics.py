@@ -0,0 +1,218 @@
+"""Run instrumentation: timed spans, counters and gauges.
+
+Instrumentation is off by default. The module-level ``span``, ``timed`` and
+``incr`` helpers then go to a recorder that does nothing, so instrumented code
+pays a function call per stage or chunk and nothing per address. ``enable()``
+swaps in a recording one whose report backs ``--stats`` and the daemon's
+``/metrics`` endpoint.
+
+Spans are named after pipeline stages (``discovery``, ``download``,
+``load_index``, ``initialize``, ``read_input``, ``lookup``, ``serialize``) and
+may nest: a lazily loaded index is timed inside the ``lookup`` that needed it.
+Worker processes of ``--workers`` runs keep their own recorders, which are not
+collected; the parent only counts the lookups they answered.
+"""
+import functools
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+PROMETHEUS_PREFIX = "map_ip_to_asn"
+_UNSAFE_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class SpanStats:
+    """Accumulated wall time of one named span."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "seconds": self.seconds, "max_seconds": self.max_seconds}
+
+
+class Recorder:
+    """Collects spans, counters and gauges; safe to use from several threads."""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.spans: Dict[str, SpanStats] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def span(self, name: str) -> ContextManager[None]:
+        """Time the enclosed block under a span name."""
+        return self._span(name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Add one timed occurrence to a span."""
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.add(seconds)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Add to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def report(self) -> Dict[str, Any]:
+        """Return everything recorded so far as a JSON-serializable dict.
+
+        Besides the raw counters and spans, the report derives the wall time of
+        the run, its peak memory, cache hit rates and the lookup rate (over the
+        ``lookup`` span, or over the whole run when lookups happened elsewhere).
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            spans = {name: stats.as_dict() for name, stats in self.spans.items()}
+        wall = time.perf_counter() - self.started
+        lookups = counters.get("lookups", 0)
+        lookup_seconds = spans["lookup"]["seconds"] if "lookup" in spans else wall
+        rates = {"lookups_per_second": lookups / lookup_seconds if lookup_seconds > 0 else 0.0}
+        for cache in ("lookup_cache", "snapshot_store", "discovery_catalog"):
+            hits, misses = counters.get(f"{cache}_hits", 0), counters.get(f"{cache}_misses", 0)
+            if hits or misses:
+                rates[f"{cache}_hit_rate"] = hits / (hits + misses)
+        return {
+            "wall_seconds": wall,
+            "peak_rss_mb": peak_rss_mb(),
+            "spans": spans,
+            "counters": counters,
+            "gauges": gauges,
+            "rates": rates,
+        }
+
+    def prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """Render the recorded metrics in the Prometheus text exposition format.
+
+        Spans become summaries (``<name>_seconds_sum``/``_count``), counters get a
+        ``_total`` suffix and gauges are exported as is.
+
+        Args:
+            prefix: Prefix of every metric name.
+
+        Returns:
+            The exposition text, ending with a newline.
+        """
+        report = self.report()
+        lines: List[str] = []
+
+        def add(name: str, kind: str, samples: Dict[str, float]) -> None:
+            name = f"{prefix}_{_UNSAFE_NAME.sub('_', name)}"
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, value in samples.items():
+                lines.append(f"{name}{suffix} {value:g}")
+
+        for name, stats in sorted(report["spans"].items()):
+            add(f"{name}_seconds", "summary", {"_sum": stats["seconds"], "_count": stats["count"]})
+        for name, value in sorted(report["counters"].items()):
+            add(f"{name}_total" if not name.endswith("_total") else name, "counter", {"": value})
+        gauges = dict(report["gauges"])
+        gauges["uptime_seconds"] = report["wall_seconds"]
+        if report["peak_rss_mb"] is not None:
+            gauges["peak_rss_bytes"] = report["peak_rss_mb"] * 1024 * 1024
+        for name, value in sorted(gauges.items()):
+            add(name, "gauge", {"": value})
+        return "\n".join(lines) + "\n"
+
+
+class NullRecorder(Recorder):
+    """Recorder used while instrumentation is off; every call is a no-op."""
+
+    enabled = False
+
+    def span(self, name: str) -> ContextManager[None]:
+        return nullcontext()
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def incr(self, name: str, value: float = 1) -> None:
+        pass
+
+    def set_gauge(self, name: str, value: float) -> None:
+        pass
+
+
+_recorder: Recorder = NullRecorder()
+
+
+def get_recorder() -> Recorder:
+    """Return the active recorder (a ``NullRecorder`` while instrumentation is off)."""
+    return _recorder
+
+
+def enable() -> Recorder:
+    """Start recording into a fresh recorder and return it."""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable() -> None:
+    """Stop recording; instrumented code goes back to the no-op recorder."""
+    global _recorder
+    _recorder = NullRecorder()
+
+
+def span(name: str) -> ContextManager[None]:
+    """Time the enclosed block under a span name, if instrumentation is on."""
+    return _recorder.span(name)
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Add to a counter, if instrumentation is on."""
+    _recorder.incr(name, value)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator timing every call of a function under a span name."""
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _recorder.span(name):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorate
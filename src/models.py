@@ -9,13 +9,25 @@ from pydantic import BaseModel, Field, field_validator, model_validator, IPvAnyA
 class OutputFormat(str, Enum):
     """Supported output formats."""
     JSON = "json"
+    JSONL = "jsonl"
     CSV = "csv"
     PARQUET = "parquet"
 
 
+class ParquetCompression(str, Enum):
+    """Supported Parquet compression codecs."""
+    NONE = "none"
+    SNAPPY = "snappy"
+    GZIP = "gzip"
+    BROTLI = "brotli"
+    ZSTD = "zstd"
+    LZ4 = "lz4"
+
+
 class Provider(str, Enum):
     """Available lookup providers."""
     PYIPMETA = "pyipmeta"
+    PREFIX2AS = "prefix2as"
 
 
 class IPAddress(BaseModel):
@@ -35,6 +47,11 @@ class ASNResult(BaseModel):
     asn: int = Field(..., description="The Autonomous System Number (0 if not found)")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Lookup timestamp")
     provider: str = Field(..., description="Provider used for lookup")
+    snapshot_date: Optional[datetime] = Field(None, description="Snapshot the ASN was resolved against (multi-date lookups only)")
+    requested_date: Optional[datetime] = Field(None, description="Requested date the snapshot answered (multi-date lookups only)")
+    prefix: Optional[str] = Field(None, description="Network address of the matched prefix (enriched lookups only)")
+    prefix_length: Optional[int] = Field(None, description="Length of the matched prefix (enriched lookups only)")
+    origins: Optional[List[int]] = Field(None, description="Every origin ASN of the matched prefix (enriched lookups only)")
     
     class Config:
         """Pydantic configuration."""
@@ -57,14 +74,44 @@ class BatchResult(BaseModel):
         return v
 
 
+class ParquetOptions(BaseModel):
+    """Settings for Parquet output."""
+    row_group_size: Optional[int] = Field(None, gt=0, description="Rows per row group (default: one row group per chunk)")
+    compression: ParquetCompression = Field(default=ParquetCompression.SNAPPY, description="Compression codec")
+
+
 class LookupConfig(BaseModel):
     """Configuration for IP lookup operations."""
     provider: Provider = Field(default=Provider.PYIPMETA, description="Lookup provider to use")
     snapshot_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="RouteViews snapshot date")
     output_format: OutputFormat = Field(default=OutputFormat.JSON, description="Output format")
-    input_file: Optional[str] = Field(None, description="Path to input file with IPs")
+    input_file: Optional[str] = Field(None, description="Path, directory or glob of input files with IPs")
+    input_column: Optional[str] = Field(None, description="Column of CSV and Parquet input files holding the IPs")
+    read_workers: int = Field(default=1, ge=1, description="Number of input files read and decompressed concurrently")
     single_ip: Optional[str] = Field(None, description="Single IP address to lookup")
     output_file: Optional[str] = Field(None, description="Path to output file")
+    errors_file: Optional[str] = Field(None, description="File invalid input lines are reported to (default: stderr)")
+    snapshot_dates: Optional[List[datetime]] = Field(None, description="Snapshot dates for multi-date lookups")
+    use_cache: bool = Field(default=True, description="Keep downloaded snapshots in a local store")
+    cache_dir: Optional[str] = Field(None, description="Snapshot store directory (default: user cache dir)")
+    cache_max_bytes: int = Field(default=2 * 1024 ** 3, gt=0, description="Size cap for the snapshot store")
+    lookup_cache_entries: int = Field(default=100_000, ge=0, description="Addresses kept in each provider's lookup cache (0 disables it)")
+    prefix_cache_entries: int = Field(default=0, ge=0, description="Address blocks kept in each provider's prefix cache (0 disables it)")
+    index_path: Optional[str] = Field(None, description="Precompiled snapshot index to load (prefix2as provider)")
+    index6_path: Optional[str] = Field(None, description="Precompiled IPv6 snapshot index to load (prefix2as provider)")
+    stream: bool = Field(default=False, description="Process input in bounded-memory chunks")
+    chunk_size: int = Field(default=100_000, gt=0, description="Number of IPs per chunk in streaming mode")
+    workers: int = Field(default=1, ge=1, description="Number of worker processes for lookups")
+    ordered: bool = Field(default=True, description="Keep output in input order when using workers")
+    server: Optional[str] = Field(None, description="Address of a running lookup daemon to send lookups to")
+    enrich: bool = Field(default=False, description="Also report the matched prefix and every origin ASN")
+    ranges: bool = Field(default=False, description="Read CIDR prefixes and address ranges and report the prefixes covering them")
+    asns: Optional[List[int]] = Field(None, description="ASNs to list the originated prefixes and address space of")
+    ipv6: bool = Field(default=False, description="List the IPv6 prefixes of the ASNs instead of the IPv4 ones")
+    checkpoint_dir: Optional[str] = Field(None, description="Directory of a resumable job's part files and manifest")
+    shard_index: int = Field(default=0, ge=0, description="Shard of a checkpointed job's chunks processed by this run")
+    shard_count: int = Field(default=1, ge=1, description="Number of shards a checkpointed job's chunks are spread over")
+    parquet: ParquetOptions = Field(default_factory=ParquetOptions, description="Parquet output settings")
     
     @field_validator('snapshot_date')
     @classmethod
@@ -80,11 +127,72 @@ class LookupConfig(BaseModel):
             raise ValueError("Snapshot date cannot be in the future")
         return v
     
+    @field_validator('snapshot_dates')
+    @classmethod
+    def validate_dates(cls, v: Optional[List[datetime]]) -> Optional[List[datetime]]:
+        """Ensure multi-date lookups have at least one date, none in the future."""
+        if v is None:
+            return v
+        if not v:
+            raise ValueError("At least one snapshot date is required")
+        for date in v:
+            cls.validate_date(date)
+        return v
+    
     @model_validator(mode='after')
     def validate_input_options(self) -> 'LookupConfig':
         """Ensure either input_file or single_ip is provided, not both."""
         if self.single_ip and self.input_file:
             raise ValueError("Cannot specify both input_file and single_ip")
-        if not self.single_ip and not self.input_file:
+        if self.asns is not None and (self.single_ip or self.input_file):
+            raise ValueError("ASN queries do not read IPs")
+        if not self.single_ip and not self.input_file and not self.asns:
             raise ValueError("Must specify either input_file or single_ip")
-        return self
\ No newline at end of file
+        if (self.input_column or self.read_workers > 1) and not self.input_file:
+            raise ValueError("Input columns and read workers apply to input files")
+        if (self.index_path or self.index6_path) and self.provider != Provider.PREFIX2AS:
+            raise ValueError("A precompiled index can only be used with the prefix2as provider")
+        if self.snapshot_dates and (self.index_path or self.index6_path):
+            raise ValueError("A precompiled index cannot be combined with multiple snapshot dates")
+        if self.snapshot_dates and (self.server or self.workers > 1):
+            raise ValueError("Multi-date lookups run locally in a single process")
+        if self.enrich and self.server:
+            raise ValueError("Enriched lookups are not supported by the lookup daemon")
+        if self.ranges and self.provider != Provider.PREFIX2AS:
+            raise ValueError("Prefix and range lookups need the prefix2as provider")
+        if self.ranges and (self.snapshot_dates or self.server or self.workers > 1):
+            raise ValueError("Prefix and range lookups run locally on a single snapshot date")
+        if self.asns and self.provider != Provider.PREFIX2AS:
+            raise ValueError("ASN queries need the prefix2as provider")
+        if self.asns and (self.snapshot_dates or self.server or self.workers > 1 or self.ranges or self.enrich):
+            raise ValueError("ASN queries run locally on a single snapshot date")
+        if self.shard_index >= self.shard_count:
+            raise ValueError("Shard index must be below the shard count")
+        if self.shard_count > 1 and not self.checkpoint_dir:
+            raise ValueError("Shards need a checkpoint directory")
+        if self.checkpoint_dir:
+            if not self.input_file:
+                raise ValueError("Checkpointed jobs need an input file")
+            if self.output_file:
+                raise ValueError("Checkpointed jobs write part files to the checkpoint directory, not an output file")
+            if self.snapshot_dates or self.server or self.workers > 1 or self.ranges or self.asns:
+                raise ValueError("Checkpointed jobs look up IPs locally on a single snapshot date; "
+                                 "use shards to spread them over processes")
+        return self
+
+
+class ServerConfig(BaseModel):
+    """Configuration for the resident lookup daemon."""
+    provider: Provider = Field(default=Provider.PYIPMETA, description="Lookup provider to use")
+    address: str = Field(default="127.0.0.1:8765", description="host:port or unix:/path to listen on")
+    max_providers: int = Field(default=4, ge=1, description="Number of snapshots kept loaded at once")
+    batch_window_ms: float = Field(default=2.0, ge=0, description="Time to wait for more requests to batch together")
+    max_batch_size: int = Field(default=100_000, gt=0, description="Maximum number of IPs per provider call")
+    index_path: Optional[str] = Field(None, description="Precompiled snapshot index to load (prefix2as provider)")
+    index6_path: Optional[str] = Field(None, description="Precompiled IPv6 snapshot index to load (prefix2as provider)")
+    use_cache: bool = Field(default=True, description="Keep downloaded snapshots in a local store")
+    cache_dir: Optional[str] = Field(None, description="Snapshot store directory (default: user cache dir)")
+    cache_max_bytes: int = Field(default=2 * 1024 ** 3, gt=0, description="Size cap for the snapshot store")
+    lookup_cache_entries: int = Field(default=100_000, ge=0, description="Addresses kept in each provider's lookup cache (0 disables it)")
+    prefix_cache_entries: int = Field(default=0, ge=0, description="Address blocks kept in each provider's prefix cache (0 disables it)")
+    metrics: bool = Field(default=False, description="Record metrics and expose them at GET /metrics")
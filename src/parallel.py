@@ -0,0 +1,101 @@
+"""Multi-process batch lookups."""
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Deque, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from . import metrics
+from .columnar import ColumnarBatch
+from .lookup import build_batch, chunked, lookup_details_unique, lookup_unique, provider_from_config
+from .models import LookupConfig
+from .providers import BaseProvider
+from .providers.origins import LookupDetails
+
+# Provider owned by the current worker process, set up once by the pool initializer.
+_worker_provider: Optional[BaseProvider] = None
+_worker_enrich = False
+
+# What a worker sends back per chunk: an ASN column, or the enriched details.
+ChunkAnswer = Union[np.ndarray, LookupDetails]
+
+
+def _init_worker(config: LookupConfig) -> None:
+    """Pool initializer: create and initialize this worker's provider once."""
+    global _worker_provider, _worker_enrich
+    _worker_provider = provider_from_config(config)
+    _worker_provider.initialize()
+    _worker_enrich = config.enrich
+
+
+def _lookup_in_worker(ips: List[str]) -> ChunkAnswer:
+    """Look up one chunk with the worker's provider, returning compact columns."""
+    assert _worker_provider is not None, "worker provider not initialized"
+    if _worker_enrich:
+        return lookup_details_unique(_worker_provider, ips)
+    return lookup_unique(_worker_provider, ips)
+
+
+def lookup_ips_parallel(ips: Iterable[str], config: LookupConfig) -> Iterator[ColumnarBatch]:
+    """Perform IP to ASN lookups on a pool of ``config.workers`` processes.
+    
+    Input is split into chunks of ``config.chunk_size`` IPs. At most two chunks
+    per worker are in flight, so memory stays bounded for arbitrarily large
+    inputs. Chunks are yielded in input order unless ``config.ordered`` is False,
+    in which case each chunk is yielded as soon as it completes.
+    
+    Args:
+        ips: Iterable of IP addresses to lookup.
+        config: Configuration for the lookup operation.
+        
+    Yields:
+        One ColumnarBatch per chunk.
+    """
+    provider = provider_from_config(config)
+    # Download/compile once here so workers initialize from a warm snapshot store.
+    with metrics.span("prepare"):
+        provider.prepare()
+    if not config.use_cache:
+        print("Warning: without the snapshot cache every worker downloads the snapshot",
+              file=sys.stderr)
+    
+    max_in_flight = 2 * config.workers
+    chunks = chunked(ips, config.chunk_size)
+    
+    def result(chunk: List[str], future: "Future[ChunkAnswer]") -> ColumnarBatch:
+        answer = future.result()
+        metrics.incr("lookups", len(chunk))
+        if isinstance(answer, LookupDetails):
+            return build_batch(chunk, answer.asns, provider.provider_name, config.snapshot_date, answer)
+        return build_batch(chunk, answer, provider.provider_name, config.snapshot_date)
+    
+    with ProcessPoolExecutor(
+        max_workers=config.workers, initializer=_init_worker, initargs=(config,)
+    ) as executor:
+        if config.ordered:
+            queue: Deque[Tuple[List[str], "Future[ChunkAnswer]"]] = deque()
+            for chunk in chunks:
+                queue.append((chunk, executor.submit(_lookup_in_worker, chunk)))
+                if len(queue) >= max_in_flight:
+                    yield result(*queue.popleft())
+            while queue:
+                yield result(*queue.popleft())
+        else:
+            pending: Set["Future[ChunkAnswer]"] = set()
+            inputs = {}
+            exhausted = False
+            while not exhausted or pending:
+                while not exhausted and len(pending) < max_in_flight:
+                    block = next(chunks, None)
+                    if block is None:
+                        exhausted = True
+                        break
+                    future = executor.submit(_lookup_in_worker, block)
+                    inputs[future] = block
+                    pending.add(future)
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield result(inputs.pop(future), future)
@@ -1,5 +1,24 @@
-"""IP to ASN lookup providers."""
+"""IP to ASN lookup providers.
+
+Provider implementations are imported on first access, so that choosing one
+provider does not load the modules of the other.
+"""
+import importlib
+from typing import Any
+
 from .base import BaseProvider
-from .pyipmeta import PyIPMetaProvider
+from .snapshot_store import SnapshotStore
+
+_LAZY_PROVIDERS = {
+    "Prefix2ASProvider": "prefix2as",
+    "PyIPMetaProvider": "pyipmeta",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_PROVIDERS:
+        return getattr(importlib.import_module(f".{_LAZY_PROVIDERS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = ["BaseProvider", "PyIPMetaProvider"]
\ No newline at end of file
+__all__ = ["BaseProvider", "Prefix2ASProvider", "PyIPMetaProvider", "SnapshotStore"]
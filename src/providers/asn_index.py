@@ -0,0 +1,143 @@
+"""Reverse index from origin ASN to the prefixes it announces."""
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from .prefix_table import PrefixTable, expand_runs
+from .prefix_table6 import PrefixTable6
+
+
+class ASNIndex:
+    """Prefix table rows grouped by origin ASN, in compressed sparse row layout.
+
+    ``asns`` holds every origin ASN of the table once, sorted; the table rows it
+    originates are ``rows[offsets[i]:offsets[i + 1]]``, in table (address) order.
+    A multi-origin prefix is listed under each of its origins, so finding the
+    prefixes of an ASN is a single ``np.searchsorted`` and a slice.
+    """
+
+    def __init__(
+        self,
+        table: Union[PrefixTable, PrefixTable6],
+        asns: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+    ) -> None:
+        """Initialize the index from precomputed arrays.
+
+        Args:
+            table: The prefix table the rows refer to.
+            asns: Sorted, unique uint32 origin ASNs.
+            offsets: int64 start of every ASN's rows in ``rows``, plus the end.
+            rows: uint32 table rows, grouped by ASN.
+        """
+        self.table = table
+        self.asns = asns
+        self.offsets = offsets
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    @property
+    def family(self) -> int:
+        """Address family of the indexed table."""
+        return 6 if isinstance(self.table, PrefixTable6) else 4
+
+    @classmethod
+    def build(cls, table: Union[PrefixTable, PrefixTable6]) -> "ASNIndex":
+        """Invert the origin sets of a prefix table.
+
+        Args:
+            table: The prefix table to index.
+
+        Returns:
+            The reverse index of the table.
+        """
+        owner = np.repeat(np.arange(len(table), dtype=np.uint32), np.diff(table.origin_offsets))
+        pool = np.asarray(table.origin_pool, dtype=np.uint32)
+        order = np.lexsort((owner, pool))
+        pool, owner = pool[order], owner[order]
+        # An AS set can list the same ASN twice; keep one entry per (ASN, row).
+        keep = np.ones(len(pool), dtype=bool)
+        keep[1:] = (pool[1:] != pool[:-1]) | (owner[1:] != owner[:-1])
+        pool, owner = pool[keep], owner[keep]
+        asns, starts = np.unique(pool, return_index=True)
+        offsets = np.append(starts, len(owner)).astype(np.int64)
+        return cls(table, asns, offsets, owner)
+
+    def rows_of(self, asn: int) -> np.ndarray:
+        """Return the table rows originated by one ASN (empty if it originates none)."""
+        i = int(np.searchsorted(self.asns, asn))
+        if i == len(self.asns) or self.asns[i] != asn:
+            return self.rows[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def lookup(self, asns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the table rows of a batch of ASNs.
+
+        Args:
+            asns: uint32 ASNs to look up.
+
+        Returns:
+            Tuple of (int64 position in ``asns``, uint32 table row) per match,
+            ordered by position and then by address.
+        """
+        asns = np.asarray(asns, dtype=np.uint32)
+        pos = np.searchsorted(self.asns, asns)
+        found = pos < len(self.asns)
+        found[found] = self.asns[pos[found]] == asns[found]
+        lo = np.where(found, self.offsets[np.minimum(pos, len(self.asns))], 0)
+        hi = np.where(found, self.offsets[np.minimum(pos + 1, len(self.asns))], 0)
+        query, at = expand_runs(lo, hi)
+        return query, self.rows[at]
+
+    def address_space(self, rows: np.ndarray) -> int:
+        """Count the addresses covered by a set of table rows, nested prefixes counted once.
+
+        Args:
+            rows: Table rows in ascending order, as returned by ``rows_of``.
+
+        Returns:
+            Size of the union of the rows' prefixes.
+        """
+        return self.address_spaces(np.zeros(len(rows), dtype=np.int64), rows, 1)[0]
+
+    def address_spaces(self, group: np.ndarray, rows: np.ndarray, groups: int) -> List[int]:
+        """Count the addresses covered by several sets of table rows at once.
+
+        Rows are sorted by (network, length), so a prefix nested in an earlier
+        one of its group starts no later than the furthest end seen so far in
+        the group; only the others add to the count.
+
+        Args:
+            group: Non-decreasing int64 group of every row, as returned by ``lookup``.
+            rows: Table rows, in ascending order within each group.
+            groups: Number of groups.
+
+        Returns:
+            Size of the union of every group's prefixes.
+        """
+        if self.family == 4:
+            start, end = self.table.ranges(rows)
+            # Lift each group above the addresses of the previous ones, so one
+            # running maximum serves all groups.
+            lift = np.asarray(group, dtype=np.uint64) << np.uint64(33)
+            reach = np.maximum.accumulate(end + lift)
+            outer = np.ones(len(rows), dtype=bool)
+            outer[1:] = start[1:] + lift[1:] > reach[:-1]
+            sizes = (end[outer] - start[outer] + np.uint64(1)).astype(np.int64)
+            totals = np.zeros(groups, dtype=np.int64)
+            np.add.at(totals, group[outer], sizes)
+            return totals.tolist()  # type: ignore[no-any-return]
+        (start_hi, start_lo), (end_hi, end_lo) = self.table.ranges(rows)
+        spaces = [0] * groups
+        furthest, last = -1, -1
+        for g, s_hi, s_lo, e_hi, e_lo in zip(
+            group.tolist(), start_hi.tolist(), start_lo.tolist(), end_hi.tolist(), end_lo.tolist()
+        ):
+            low, high = (s_hi << 64) | s_lo, (e_hi << 64) | e_lo
+            if g != last or low > furthest:
+                spaces[g] += high - low + 1
+                furthest, last = high, g
+        return spaces
@@ -1,26 +1,68 @@
 """Abstract base class for IP to ASN lookup providers."""
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from .cache import LookupCache, Span, address_key, make_cache
+from .origins import LookupDetails
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    
+    from ..ranges import ParsedRanges, RangeDetails
+    from ..reverse import ASNPrefixes
 
 
 class BaseProvider(ABC):
     """Abstract base class for IP to ASN lookup providers."""
     
-    def __init__(self, snapshot_date: datetime) -> None:
+    # True for providers whose ``lookup_batch`` already resolves each distinct
+    # address once, so callers need not deduplicate its input first.
+    dedupes_batches: bool = False
+    
+    def __init__(self, snapshot_date: datetime, cache: Optional[LookupCache] = None) -> None:
         """Initialize the provider with a snapshot date.
         
         Args:
             snapshot_date: The date for which to fetch the RouteViews snapshot.
+            cache: Cache for single-address lookups (default: a bounded address LRU).
         """
         self.snapshot_date = snapshot_date
-        self._cache: Dict[str, int] = {}
+        self.cache = cache if cache is not None else make_cache()
     
     @abstractmethod
     def initialize(self) -> None:
         """Initialize the provider with necessary resources."""
         pass
     
+    async def ainitialize(self, executor: Optional["Executor"] = None) -> None:
+        """Initialize the provider without blocking the running event loop.
+        
+        ``initialize()`` downloads and parses snapshots, so it runs on an executor
+        thread while the loop keeps serving other tasks.
+        
+        Args:
+            executor: Executor to run ``initialize()`` on (default: the loop's).
+            
+        Raises:
+            LookupError: If no snapshot exists for the date.
+        """
+        import asyncio
+        
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, self.initialize)
+        except SystemExit as e:
+            # Providers exit when no snapshot exists; that must not stop the host service.
+            raise LookupError(str(e)) from e
+    
+    def prepare(self) -> None:  # noqa: B027
+        """Fetch everything ``initialize()`` needs into local caches without loading it.
+        
+        Called once in a parent process before worker processes initialize their own
+        provider, so that they do not all download the same snapshot.
+        """
+        pass
+    
     @abstractmethod
     def _lookup_uncached(self, ip: str) -> int:
         """Perform the actual IP to ASN lookup without caching.
@@ -33,6 +75,21 @@ class BaseProvider(ABC):
         """
         pass
     
+    def _lookup_uncached_span(self, ip: str) -> Tuple[int, Optional[Span]]:
+        """Perform an uncached lookup, also returning the range the answer holds for.
+        
+        Providers that know the address range around a match override this so
+        that a prefix-level cache can answer every address in it.
+        
+        Args:
+            ip: The IP address to lookup.
+            
+        Returns:
+            Tuple of (ASN or 0 if not found, inclusive (first, last) range of address keys with
+            the same answer or None if unknown).
+        """
+        return self._lookup_uncached(ip), None
+    
     def lookup(self, ip: str) -> int:
         """Lookup the ASN for an IP address with caching.
         
@@ -42,13 +99,83 @@ class BaseProvider(ABC):
         Returns:
             The ASN for the IP address, or 0 if not found.
         """
-        if ip not in self._cache:
-            self._cache[ip] = self._lookup_uncached(ip)
-        return self._cache[ip]
+        key = address_key(ip)
+        if key is None:
+            return self._lookup_uncached(ip)
+        asn = self.cache.get(key)
+        if asn is None:
+            asn, span = self._lookup_uncached_span(ip)
+            self.cache.put(key, asn, span)
+        return asn
+    
+    def lookup_batch(self, ips: Sequence[str]) -> List[int]:
+        """Lookup the ASNs for a batch of IP addresses.
+        
+        Providers that can answer many addresses at once should override this.
+        
+        Args:
+            ips: The IP addresses to lookup.
+            
+        Returns:
+            The ASN for each IP address, or 0 if not found.
+        """
+        return [self.lookup(ip) for ip in ips]
+    
+    def lookup_details(self, ips: Sequence[str]) -> LookupDetails:
+        """Lookup a batch of IP addresses with their matched prefix and full origin set.
+        
+        Providers that know more than one ASN per address should override this;
+        the default reports the ASN of ``lookup_batch`` as the only origin and
+        no prefix.
+        
+        Args:
+            ips: The IP addresses to lookup.
+            
+        Returns:
+            The enriched results, one row per IP address.
+        """
+        return LookupDetails.from_asns(self.lookup_batch(ips))
+    
+    def lookup_ranges(self, parsed: "ParsedRanges") -> "RangeDetails":
+        """Resolve address intervals to the prefixes answering for their addresses.
+        
+        Needs the prefix table itself, so only providers that hold one implement it.
+        
+        Args:
+            parsed: Addresses, CIDR prefixes and ranges from ``parse_ranges``.
+            
+        Returns:
+            One row per (query, prefix) pair with address counts.
+            
+        Raises:
+            NotImplementedError: If the provider cannot intersect ranges with prefixes.
+        """
+        raise NotImplementedError(
+            f"The {self.provider_name} provider cannot resolve prefixes and ranges; use prefix2as"
+        )
+    
+    def lookup_asns(self, asns: Sequence[int], family: int = 4) -> "ASNPrefixes":
+        """Find the prefixes originated by ASNs, with their address space.
+        
+        Needs the prefix table itself, so only providers that hold one implement it.
+        
+        Args:
+            asns: Distinct ASNs to look up.
+            family: 4 for IPv4 prefixes, 6 for IPv6 ones.
+            
+        Returns:
+            One row per (ASN, prefix) pair, by ASN.
+            
+        Raises:
+            NotImplementedError: If the provider cannot list the prefixes of an ASN.
+        """
+        raise NotImplementedError(
+            f"The {self.provider_name} provider cannot list the prefixes of an ASN; use prefix2as"
+        )
     
     def clear_cache(self) -> None:
         """Clear the lookup cache."""
-        self._cache.clear()
+        self.cache.clear()
     
     @property
     def provider_name(self) -> str:
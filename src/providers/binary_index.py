@@ -0,0 +1,226 @@
+"""Compact binary snapshot index that can be memory-mapped read-only.
+
+Layout (all integers little-endian)::
+
+    header   64 bytes: magic, format version, address family (4 or 6),
+             snapshot date (YYYYMMDD), number of prefixes, number of ranges
+             and number of origin ASNs
+    prefixes network <u4[P], length u1[P], asn <u4[P]
+    origins  offsets <u4[P + 1], pool <u4[O] (every origin of every prefix)
+    ranges   start <u4[R], end <u4[R], prefix row <u4[R], asn <u4[R]
+
+IPv6 indexes store every address column as two ``<u8`` sections, high word
+first (``network_hi``, ``network_lo``, ``starts_hi``, ...).
+
+Every section starts on an 8-byte boundary so that it can be viewed in place
+with ``np.frombuffer``.
+"""
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from .. import metrics
+from .prefix_table import PrefixTable, RangeIndex
+from .prefix_table6 import PrefixTable6, RangeIndex6
+from .snapshot_store import SnapshotStore
+
+AnyRangeIndex = Union[RangeIndex, RangeIndex6]
+
+INDEX_MAGIC = b"IP2ASIDX"
+INDEX_VERSION = 3
+INDEX_SUFFIX = f"v{INDEX_VERSION}.idx"
+_HEADER = struct.Struct("<8sHHIQQQ")
+_HEADER_SIZE = 64
+_ALIGN = 8
+
+
+_TABLE_SECTIONS = {
+    4: [("network", "<u4"), ("length", "u1"), ("asn", "<u4")],
+    6: [("network_hi", "<u8"), ("network_lo", "<u8"), ("length", "u1"), ("asn", "<u4")],
+}
+_RANGE_SECTIONS = {
+    4: [("starts", "<u4"), ("ends", "<u4"), ("prefix", "<u4"), ("range_asn", "<u4")],
+    6: [
+        ("starts_hi", "<u8"), ("starts_lo", "<u8"), ("ends_hi", "<u8"), ("ends_lo", "<u8"),
+        ("prefix", "<u4"), ("range_asn", "<u4"),
+    ],
+}
+
+
+def _sections(family: int, n_prefixes: int, n_ranges: int, n_origins: int) -> List[Tuple[str, str, int]]:
+    """Return (name, dtype, count) of every section in file order."""
+    return (
+        [(name, dtype, n_prefixes) for name, dtype in _TABLE_SECTIONS[family]]
+        + [("origin_offsets", "<u4", n_prefixes + 1), ("origin_pool", "<u4", n_origins)]
+        + [(name, dtype, n_ranges) for name, dtype in _RANGE_SECTIONS[family]]
+    )
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGN
+
+
+def write_index(index: AnyRangeIndex, snapshot_date: datetime, path: Path) -> None:
+    """Write a range index to a binary index file atomically.
+
+    Args:
+        index: The IPv4 or IPv6 range index to write.
+        snapshot_date: Date of the snapshot the index was built from.
+        path: Destination path.
+    """
+    table = index.table
+    family = index.family
+    arrays = {name: getattr(table, name) for name, _ in _TABLE_SECTIONS[family]}
+    arrays["origin_offsets"] = table.origin_offsets
+    arrays["origin_pool"] = table.origin_pool
+    arrays.update({name: getattr(index, name) for name, _ in _RANGE_SECTIONS[family]})
+    header = _HEADER.pack(
+        INDEX_MAGIC,
+        INDEX_VERSION,
+        family,
+        int(snapshot_date.strftime("%Y%m%d")),
+        len(table),
+        len(index),
+        len(table.origin_pool),
+    )
+
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(_HEADER_SIZE, b"\0"))
+            offset = _HEADER_SIZE
+            for name, dtype, count in _sections(family, len(table), len(index), len(table.origin_pool)):
+                data = np.ascontiguousarray(arrays[name], dtype=dtype).tobytes()
+                assert len(data) == count * np.dtype(dtype).itemsize
+                f.write(data)
+                offset += len(data)
+                pad = _padding(offset)
+                f.write(b"\0" * pad)
+                offset += pad
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_index(path: Path) -> Tuple[AnyRangeIndex, datetime]:
+    """Memory-map a binary index file read-only.
+
+    The returned arrays are zero-copy views of the mapping, so processes that load
+    the same file share its pages through the OS page cache.
+
+    Args:
+        path: Path to the index file.
+
+    Returns:
+        Tuple of (range index, snapshot date); the index is a ``RangeIndex6`` for
+        IPv6 snapshots.
+
+    Raises:
+        ValueError: If the file is not a compatible index.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER_SIZE:
+            raise ValueError(f"{path} is not a snapshot index")
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version = struct.unpack_from("<8sH", buf, 0)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"{path} is not a snapshot index")
+    if version != INDEX_VERSION:
+        raise ValueError(f"{path} has index version {version}, expected {INDEX_VERSION}")
+    _, _, family, date_int, n_prefixes, n_ranges, n_origins = _HEADER.unpack_from(buf, 0)
+    if family not in _TABLE_SECTIONS:
+        raise ValueError(f"{path} has unknown address family {family}")
+
+    arrays: Dict[str, np.ndarray] = {}
+    offset = _HEADER_SIZE
+    for name, dtype, count in _sections(family, n_prefixes, n_ranges, n_origins):
+        nbytes = count * np.dtype(dtype).itemsize
+        if offset + nbytes > size:
+            raise ValueError(f"{path} is truncated")
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        offset += nbytes + _padding(offset + nbytes)
+
+    index: AnyRangeIndex
+    if family == 6:
+        table6 = PrefixTable6.from_sorted(
+            arrays["network_hi"], arrays["network_lo"], arrays["length"], arrays["asn"],
+            arrays["origin_offsets"], arrays["origin_pool"]
+        )
+        index = RangeIndex6(
+            table6, arrays["starts_hi"], arrays["starts_lo"], arrays["ends_hi"], arrays["ends_lo"],
+            arrays["prefix"], arrays["range_asn"]
+        )
+    else:
+        table = PrefixTable.from_sorted(
+            arrays["network"], arrays["length"], arrays["asn"], arrays["origin_offsets"], arrays["origin_pool"]
+        )
+        index = RangeIndex(table, arrays["starts"], arrays["ends"], arrays["prefix"], arrays["range_asn"])
+    return index, datetime.strptime(str(date_int), "%Y%m%d")
+
+
+def build_index(source: Path, family: int = 4) -> AnyRangeIndex:
+    """Parse a pfx2as snapshot into a range index.
+
+    Args:
+        source: Path to the (possibly gzip-compressed) pfx2as file.
+        family: 4 for a pfx2as snapshot, 6 for a pfx2as6 one.
+
+    Returns:
+        The range index.
+    """
+    if family == 6:
+        return RangeIndex6.build(PrefixTable6.from_file(source))
+    return RangeIndex.build(PrefixTable.from_file(source))
+
+
+def compile_snapshot(source: Path, snapshot_date: datetime, dest: Path, family: int = 4) -> AnyRangeIndex:
+    """Parse a pfx2as snapshot and write its binary index.
+
+    Args:
+        source: Path to the (possibly gzip-compressed) pfx2as file.
+        snapshot_date: Date of the snapshot.
+        dest: Path of the index file to write.
+        family: 4 for a pfx2as snapshot, 6 for a pfx2as6 one.
+
+    Returns:
+        The in-memory range index that was written.
+    """
+    index = build_index(source, family)
+    write_index(index, snapshot_date, dest)
+    return index
+
+
+def cached_index(store: SnapshotStore, url: str, snapshot_date: datetime, family: int = 4) -> Path:
+    """Return the compiled index for a snapshot, compiling it into the store if needed.
+
+    Args:
+        store: Snapshot store holding snapshots and their indexes.
+        url: Source URL of the snapshot.
+        snapshot_date: Date of the snapshot.
+        family: 4 for a pfx2as snapshot, 6 for a pfx2as6 one.
+
+    Returns:
+        Path of the index file inside the store.
+    """
+    digest = store.digest(url)
+    if digest is not None:
+        path = store.derived_path(digest, INDEX_SUFFIX)
+        if path.exists():
+            store.touch(path)
+            return path
+    source = store.fetch(url)
+    path = store.derived_path(source.name, INDEX_SUFFIX)
+    with metrics.span("compile_index"):
+        compile_snapshot(source, snapshot_date, path, family)
+    store.evict(keep=path)
+    return path
@@ -0,0 +1,277 @@
+"""Bounded lookup caches for providers.
+
+Caches are keyed by integer address (see ``address_key``) so that one entry
+costs a few dozen bytes regardless of how the address was spelled. Every cache
+is bounded and evicts least recently used entries, so memory stays predictable
+in long-running processes.
+"""
+import socket
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# IPv6 keys are offset past the IPv4 range so both families share one key space.
+IPV6_KEY_OFFSET = 1 << 32
+IPV4_BITS = 32
+IPV6_BITS = 128
+
+DEFAULT_CACHE_ENTRIES = 100_000
+
+Span = Tuple[int, int]
+
+
+def address_key(ip: str) -> Optional[int]:
+    """Return the integer cache key of an IP address, or None if it is not one.
+
+    Args:
+        ip: IPv4 or IPv6 address string.
+
+    Returns:
+        The IPv4 address as an integer, the IPv6 address offset by
+        ``IPV6_KEY_OFFSET``, or None for invalid input.
+    """
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, TypeError):
+        pass
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big") + IPV6_KEY_OFFSET
+    except (OSError, TypeError):
+        return None
+
+
+class CacheStats:
+    """Hit, miss and eviction counters of a cache."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the counters as a dictionary."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "hit_rate": self.hit_rate}
+
+
+class LookupCache(ABC):
+    """Interface of provider lookup caches."""
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: int) -> Optional[int]:
+        """Return the cached ASN of an address key, or None on a miss."""
+
+    @abstractmethod
+    def put(self, key: int, asn: int, span: Optional[Span] = None) -> None:
+        """Cache the ASN of an address key.
+
+        Args:
+            key: Address key from ``address_key``.
+            asn: The looked-up ASN (0 if not found).
+            span: Optional inclusive (first, last) range of address keys, containing
+                the address, over which the same ASN is returned.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of cached entries."""
+
+
+class NullCache(LookupCache):
+    """Cache that stores nothing; every lookup is a miss."""
+
+    def get(self, key: int) -> Optional[int]:
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: int, asn: int, span: Optional[Span] = None) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class LRUCache(LookupCache):
+    """Size-bounded least-recently-used cache keyed by address."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached addresses.
+        """
+        super().__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, int]" = OrderedDict()
+
+    def get(self, key: int) -> Optional[int]:
+        asn = self._entries.get(key)
+        if asn is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return asn
+
+    def put(self, key: int, asn: int, span: Optional[Span] = None) -> None:
+        self._entries[key] = asn
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _key_family(key: int) -> Tuple[int, int]:
+    """Return the (key offset, address bits) of the family an address key belongs to."""
+    return (0, IPV4_BITS) if key < IPV6_KEY_OFFSET else (IPV6_KEY_OFFSET, IPV6_BITS)
+
+
+def _largest_block(addr: int, first: int, last: int, bits: int = IPV4_BITS) -> Tuple[int, int]:
+    """Return the shortest (length, network) CIDR block containing ``addr`` within [first, last]."""
+    for length in range(bits + 1):
+        size = 1 << (bits - length)
+        network = addr & ~(size - 1)
+        if network >= first and network + size - 1 <= last:
+            return length, network
+    return bits, addr  # pragma: no cover - a host block always fits
+
+
+class PrefixCache(LookupCache):
+    """Size-bounded LRU cache of IPv4 and IPv6 address blocks.
+
+    Each entry is the largest CIDR block around a looked-up address over which
+    the provider returns the same ASN, so every later address in that block
+    hits without having been seen before. Addresses without a span are not cached.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached blocks.
+        """
+        super().__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        # Blocks are keyed by (address bits, prefix length, network key).
+        self._blocks: "OrderedDict[Tuple[int, int, int], int]" = OrderedDict()
+        # Number of cached blocks per (address bits, prefix length); only these are probed.
+        self._lengths: Dict[Tuple[int, int], int] = {}
+
+    def get(self, key: int) -> Optional[int]:
+        offset, bits = _key_family(key)
+        addr = key - offset
+        for family_bits, length in self._lengths:
+            if family_bits != bits:
+                continue
+            block = (bits, length, addr & ~((1 << (bits - length)) - 1))
+            asn = self._blocks.get(block)
+            if asn is not None:
+                self._blocks.move_to_end(block)
+                self.stats.hits += 1
+                return asn
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: int, asn: int, span: Optional[Span] = None) -> None:
+        if span is None:
+            return
+        offset, bits = _key_family(key)
+        length, network = _largest_block(key - offset, span[0] - offset, span[1] - offset, bits)
+        block = (bits, length, network)
+        if block not in self._blocks:
+            self._lengths[(bits, length)] = self._lengths.get((bits, length), 0) + 1
+        self._blocks[block] = asn
+        self._blocks.move_to_end(block)
+        if len(self._blocks) > self.max_entries:
+            (bits, length, _), _ = self._blocks.popitem(last=False)
+            self._lengths[(bits, length)] -= 1
+            if not self._lengths[(bits, length)]:
+                del self._lengths[(bits, length)]
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._blocks.clear()
+        self._lengths.clear()
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+
+class TieredCache(LookupCache):
+    """Consult several caches in order and fill all of them on a miss."""
+
+    def __init__(self, tiers: Sequence[LookupCache]) -> None:
+        """Initialize the cache.
+
+        Args:
+            tiers: Caches to consult, fastest first.
+        """
+        super().__init__()
+        self.tiers: List[LookupCache] = list(tiers)
+
+    def get(self, key: int) -> Optional[int]:
+        for tier in self.tiers:
+            asn = tier.get(key)
+            if asn is not None:
+                self.stats.hits += 1
+                return asn
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: int, asn: int, span: Optional[Span] = None) -> None:
+        for tier in self.tiers:
+            put_before = tier.stats.evictions
+            tier.put(key, asn, span)
+            self.stats.evictions += tier.stats.evictions - put_before
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def __len__(self) -> int:
+        return sum(len(tier) for tier in self.tiers)
+
+
+def make_cache(max_entries: int = DEFAULT_CACHE_ENTRIES, prefix_entries: int = 0) -> LookupCache:
+    """Build the cache for the given sizes.
+
+    Args:
+        max_entries: Maximum number of cached addresses (0 disables the address cache).
+        prefix_entries: Maximum number of cached prefix blocks (0 disables the prefix cache).
+
+    Returns:
+        The cache.
+    """
+    tiers: List[LookupCache] = []
+    if max_entries:
+        tiers.append(LRUCache(max_entries))
+    if prefix_entries:
+        tiers.append(PrefixCache(prefix_entries))
+    if not tiers:
+        return NullCache()
+    return tiers[0] if len(tiers) == 1 else TieredCache(tiers)
@@ -0,0 +1,267 @@
+"""Discovery of RouteViews prefix2as snapshots in CAIDA's data repository."""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .. import metrics
+from .snapshot_store import SnapshotStore, atomic_write_bytes
+
+if TYPE_CHECKING:
+    import requests
+
+CAIDA_ROUTING_URL = "http://data.caida.org/datasets/routing"
+# Points discovery at a mirror of the routing datasets instead (e.g. for offline benchmarks).
+ROUTING_URL_ENV = "MAP_IP_TO_ASN_ROUTING_URL"
+ROUTEVIEWS_DATASET = "routeviews-prefix2as"
+ROUTEVIEWS6_DATASET = "routeviews6-prefix2as"
+# Dataset holding the prefixes of each address family.
+FAMILY_DATASETS = {4: ROUTEVIEWS_DATASET, 6: ROUTEVIEWS6_DATASET}
+SEARCH_MONTHS = 6
+# Listings of the current month change daily; past months are essentially frozen.
+CURRENT_MONTH_TTL_SECONDS = 60 * 60
+PAST_MONTH_TTL_SECONDS = 30 * 24 * 60 * 60
+
+_SNAPSHOT_LINK = re.compile(r'href="([^"/?]*?(\d{8})[^"/?]*)"')
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+Listing = List[Tuple[str, datetime]]
+
+
+def get_session() -> "requests.Session":
+    """Return the process-wide HTTP session, so connections are reused.
+
+    requests is imported here rather than at module level: runs answered from
+    the snapshot store never make a request and skip its import cost.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+        return _session
+
+
+def routing_url() -> str:
+    """Return the base URL of the routing datasets, ``$MAP_IP_TO_ASN_ROUTING_URL`` if set."""
+    return (os.environ.get(ROUTING_URL_ENV) or CAIDA_ROUTING_URL).rstrip("/")
+
+
+def month_url(year: int, month: int, dataset: str = ROUTEVIEWS_DATASET) -> str:
+    """Return the directory URL holding a month of snapshots."""
+    return f"{routing_url()}/{dataset}/{year}/{month:02d}/"
+
+
+def parse_listing(base_url: str, html: str) -> Listing:
+    """Extract snapshot files from a directory listing.
+
+    Args:
+        base_url: URL of the listed directory.
+        html: The listing page.
+
+    Returns:
+        (snapshot URL, snapshot date) pairs in listing order.
+    """
+    snapshots = []
+    seen = set()
+    for match in _SNAPSHOT_LINK.finditer(html):
+        file_name, date_str = match.groups()
+        if file_name in seen:
+            continue
+        try:
+            snapshot_date = datetime.strptime(date_str, "%Y%m%d")
+        except ValueError:
+            continue
+        seen.add(file_name)
+        snapshots.append((f"{base_url}{file_name}", snapshot_date))
+    return snapshots
+
+
+class SnapshotCatalog:
+    """Known snapshot listings per month, persisted next to the snapshot store.
+
+    Each month's listing is fetched at most once per TTL, shared by all lookups
+    in the process and, when backed by a file, by later runs as well.
+    """
+
+    def __init__(self, path: Optional[Path] = None, dataset: str = ROUTEVIEWS_DATASET) -> None:
+        """Initialize the catalog.
+
+        Args:
+            path: JSON file to persist the catalog in (in-memory only if None).
+            dataset: CAIDA dataset the catalog lists.
+        """
+        self.path = path
+        self.dataset = dataset
+        self._months: Dict[str, Dict[str, Any]] = {}
+        self._changed = False
+        self._lock = threading.Lock()
+        if path is not None:
+            try:
+                with open(path, "r") as f:
+                    self._months = json.load(f).get(dataset, {})
+            except (FileNotFoundError, ValueError):
+                pass
+
+    @staticmethod
+    def _ttl(year: int, month: int) -> int:
+        now = datetime.now()
+        if (year, month) >= (now.year, now.month):
+            return CURRENT_MONTH_TTL_SECONDS
+        # The first days of a month may still add the previous month's last snapshots.
+        if (now.year * 12 + now.month) - (year * 12 + month) == 1 and now.day <= 3:
+            return CURRENT_MONTH_TTL_SECONDS
+        return PAST_MONTH_TTL_SECONDS
+
+    def cached(self, year: int, month: int) -> Optional[Listing]:
+        """Return a month's listing if it is known and fresh."""
+        entry = self._months.get(f"{year}/{month:02d}")
+        if not entry or time.time() - float(entry["fetched_at"]) > self._ttl(year, month):
+            return None
+        return [(url, datetime.strptime(d, "%Y-%m-%d")) for url, d in entry["snapshots"]]
+
+    def fetch(self, year: int, month: int) -> Listing:
+        """Return a month's listing, downloading it if not cached.
+
+        Unreachable or missing months yield an empty listing, which is not cached.
+        """
+        cached = self.cached(year, month)
+        if cached is not None:
+            metrics.incr("discovery_catalog_hits")
+            return cached
+        metrics.incr("discovery_catalog_misses")
+        import requests
+
+        base_url = month_url(year, month, self.dataset)
+        try:
+            response = get_session().get(base_url, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException:
+            return []
+        snapshots = parse_listing(base_url, response.text)
+        with self._lock:
+            self._months[f"{year}/{month:02d}"] = {
+                "fetched_at": time.time(),
+                "snapshots": [(url, d.strftime("%Y-%m-%d")) for url, d in snapshots],
+            }
+            self._changed = True
+        return snapshots
+
+    def save(self, store: Optional[SnapshotStore] = None) -> None:
+        """Persist the catalog, merging with listings other processes saved.
+
+        Does nothing unless a listing was downloaded since the catalog was loaded
+        or last saved.
+        """
+        if self.path is None or not self._changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        def merge() -> None:
+            assert self.path is not None
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            months = data.setdefault(self.dataset, {})
+            for key, entry in self._months.items():
+                if key not in months or float(months[key]["fetched_at"]) < float(entry["fetched_at"]):
+                    months[key] = entry
+            atomic_write_bytes(self.path, json.dumps(data).encode())
+
+        if store is not None:
+            with store.locked():
+                merge()
+        else:
+            merge()
+        self._changed = False
+
+
+_memory_catalogs: Dict[str, SnapshotCatalog] = {}
+
+
+def get_catalog(store: Optional[SnapshotStore], dataset: str = ROUTEVIEWS_DATASET) -> SnapshotCatalog:
+    """Return the catalog for a store (or the in-memory one without a store)."""
+    if store is not None:
+        return SnapshotCatalog(store.root / "discovery.json", dataset)
+    if dataset not in _memory_catalogs:
+        _memory_catalogs[dataset] = SnapshotCatalog(None, dataset)
+    return _memory_catalogs[dataset]
+
+
+def _previous_months(date: datetime, count: int) -> List[Tuple[int, int]]:
+    """Return ``count`` (year, month) pairs starting at ``date``'s month, going back."""
+    index = date.year * 12 + date.month - 1
+    return [((index - i) // 12, (index - i) % 12 + 1) for i in range(count)]
+
+
+@metrics.timed("discovery")
+def find_routeviews_snapshot_url(
+    date: datetime,
+    store: Optional[SnapshotStore] = None,
+    dataset: str = ROUTEVIEWS_DATASET
+) -> Tuple[str, datetime]:
+    """Retrieves the URL for a RouteViews prefix-to-AS snapshot from CAIDA's data repository.
+
+    If the exact date is not found, the closest earlier snapshot of the same month is
+    used; earlier months (up to 6 months back) are fetched concurrently only when the
+    requested month has no snapshot on or before the date. Month listings are cached
+    in a catalog with a TTL, and dates the store has already resolved are answered
+    locally without any HTTP request.
+
+    Args:
+        date: The date of the RouteViews prefix-to-AS snapshot to be downloaded.
+        store: Optional local snapshot store to consult first and record the result in.
+        dataset: ``ROUTEVIEWS_DATASET`` for IPv4 prefixes or ``ROUTEVIEWS6_DATASET``
+            for IPv6 prefixes.
+
+    Returns:
+        Tuple of (URL to the RouteViews snapshot, actual date found).
+
+    Raises:
+        SystemExit: If no snapshot can be found within 6 months.
+    """
+    # The IPv4 dataset keeps the store's original, unprefixed date keys.
+    store_dataset = None if dataset == ROUTEVIEWS_DATASET else dataset
+    if store is not None:
+        cached = store.resolve(date, store_dataset)
+        if cached is not None:
+            return cached
+
+    catalog = get_catalog(store, dataset)
+    day = datetime(date.year, date.month, date.day)
+
+    def closest(listing: Listing) -> Optional[Tuple[str, datetime]]:
+        candidates = [(url, d) for url, d in listing if d <= day]
+        return max(candidates, key=lambda c: c[1]) if candidates else None
+
+    months = _previous_months(date, SEARCH_MONTHS)
+    best = closest(catalog.fetch(*months[0]))
+    if best is None or best[1] != day:
+        print(f"Exact date {date.strftime('%Y-%m-%d')} not found in {dataset}, searching backwards for closest available snapshot...", file=sys.stderr)
+    if best is None:
+        with ThreadPoolExecutor(max_workers=len(months) - 1) as executor:
+            listings = list(executor.map(lambda ym: catalog.fetch(*ym), months[1:]))
+        for listing in listings:
+            best = closest(listing)
+            if best is not None:
+                break
+    catalog.save(store)
+
+    if best is None:
+        raise SystemExit(f"No RouteViews snapshot found within 6 months of {date.strftime('%Y-%m-%d')}")
+
+    url, snapshot_date = best
+    if snapshot_date != day:
+        print(f"Using closest available {dataset} snapshot from {snapshot_date.strftime('%Y-%m-%d')} ({(day - snapshot_date).days} days difference)", file=sys.stderr)
+    if store is not None:
+        store.remember(date, url, snapshot_date, store_dataset)
+    return url, snapshot_date
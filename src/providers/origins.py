@@ -0,0 +1,214 @@
+"""Origin sets of prefixes and the enriched results of lookups.
+
+A prefix can be announced by several origin ASNs (MOAS, written ``a_b`` in
+pfx2as files) or by an AS set (``a,b``). Origin sets are stored as a ragged
+column: an ``offsets`` array with one entry per row plus one, and a shared
+``pool`` of ASNs, so row ``i`` owns ``pool[offsets[i]:offsets[i + 1]]``.
+"""
+import re
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .prefix_table import PrefixTable
+    from .prefix_table6 import PrefixTable6
+
+# Prefix length of rows that matched no prefix.
+NO_PREFIX = 255
+
+_ORIGIN_SPLIT = re.compile(r"[_,]")
+
+Ragged = Tuple[np.ndarray, np.ndarray]
+
+
+def split_origins(text: str) -> List[int]:
+    """Parse a pfx2as origin field (``a``, ``a_b`` or ``a,b``) into its ASNs.
+
+    Raises:
+        ValueError: If a component is not an integer.
+    """
+    return [int(asn) for asn in _ORIGIN_SPLIT.split(text)]
+
+
+def ragged_from_lists(lists: Sequence[Sequence[int]]) -> Ragged:
+    """Build a ragged ``(offsets, pool)`` column from per-row lists."""
+    counts = np.fromiter((len(items) for items in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    pool = np.fromiter((asn for items in lists for asn in items), dtype=np.uint32, count=int(offsets[-1]))
+    return offsets, pool
+
+
+def single_origins(asn: np.ndarray) -> Ragged:
+    """Ragged column with one origin per row."""
+    return np.arange(len(asn) + 1, dtype=np.int64), np.asarray(asn, dtype=np.uint32)
+
+
+def take_ragged(offsets: np.ndarray, pool: np.ndarray, rows: np.ndarray) -> Ragged:
+    """Select rows of a ragged column.
+
+    Args:
+        offsets: Row offsets into ``pool`` (one more than the number of rows).
+        pool: Values of all rows.
+        rows: int64 rows to select, in output order; -1 selects an empty row.
+
+    Returns:
+        The ragged ``(offsets, pool)`` column of the selected rows.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    valid = rows >= 0
+    safe = np.where(valid, rows, 0)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts = offsets[safe]
+    counts = np.where(valid, offsets[np.minimum(safe + 1, len(offsets) - 1)] - starts, 0)
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    total = int(new_offsets[-1])
+    # Position of every output value in ``pool``: its row's start plus its rank in the row.
+    source = np.repeat(starts - new_offsets[:-1], counts) + np.arange(total, dtype=np.int64)
+    return new_offsets, np.asarray(pool, dtype=np.uint32)[source]
+
+
+def concat_ragged(parts: Iterable[Ragged]) -> Ragged:
+    """Concatenate ragged columns."""
+    parts = list(parts)
+    if not parts:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+    offsets = [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for part_offsets, _ in parts:
+        part_offsets = np.asarray(part_offsets, dtype=np.int64)
+        offsets.append(part_offsets[1:] - part_offsets[0] + base)
+        base += int(part_offsets[-1] - part_offsets[0])
+    pool = np.concatenate([np.asarray(p, dtype=np.uint32)[int(o[0]):int(o[-1])] for o, p in parts])
+    return np.concatenate(offsets), pool
+
+
+def ragged_rows_differ(a: Ragged, a_rows: np.ndarray, b: Ragged, b_rows: np.ndarray) -> np.ndarray:
+    """Compare rows of two ragged columns pairwise.
+
+    Args:
+        a: First ragged column.
+        a_rows: Rows of ``a`` to compare.
+        b: Second ragged column.
+        b_rows: Rows of ``b`` to compare them with.
+
+    Returns:
+        Boolean mask of the pairs whose values differ (in value or order).
+    """
+    a_offsets, a_pool = take_ragged(*a, a_rows)
+    b_offsets, b_pool = take_ragged(*b, b_rows)
+    a_counts, b_counts = np.diff(a_offsets), np.diff(b_offsets)
+    differ = a_counts != b_counts
+    same = np.flatnonzero(~differ)
+    a_offsets, a_pool = take_ragged(a_offsets, a_pool, same)
+    b_offsets, b_pool = take_ragged(b_offsets, b_pool, same)
+    row_of_value = np.repeat(same, np.diff(a_offsets))
+    differ[row_of_value[a_pool != b_pool]] = True
+    return differ  # type: ignore[no-any-return]
+
+
+class LookupDetails:
+    """Enriched results of a batch of lookups, stored column-wise.
+
+    Holds, per looked-up address, the ASN, the length of the matched prefix
+    (``NO_PREFIX`` when none matched or the provider does not report it) and the
+    full origin set of the prefix as a ragged column. The matched network itself
+    is the address masked to ``prefix_length`` bits and is not stored.
+    """
+
+    def __init__(
+        self, asns: np.ndarray, prefix_length: np.ndarray, origin_offsets: np.ndarray, origin_pool: np.ndarray
+    ) -> None:
+        """Initialize from columns.
+
+        Args:
+            asns: uint32 ASN per row (the last origin, 0 if not found).
+            prefix_length: uint8 matched prefix length per row, ``NO_PREFIX`` if unknown.
+            origin_offsets: int64 offsets into ``origin_pool``, one more than the rows.
+            origin_pool: uint32 origin ASNs of all rows.
+        """
+        self.asns = np.asarray(asns, dtype=np.uint32)
+        self.prefix_length = np.asarray(prefix_length, dtype=np.uint8)
+        self.origin_offsets = np.asarray(origin_offsets, dtype=np.int64)
+        self.origin_pool = np.asarray(origin_pool, dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    @classmethod
+    def from_asns(cls, asns: Union[Sequence[int], np.ndarray]) -> "LookupDetails":
+        """Details of providers that only report one ASN per address.
+
+        Found addresses get that ASN as their origin set and no prefix.
+        """
+        values = np.asarray(asns, dtype=np.uint32)
+        found = values != 0
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(found, out=offsets[1:])
+        return cls(values, np.full(len(values), NO_PREFIX, dtype=np.uint8), offsets, values[found])
+
+    @classmethod
+    def from_origin_lists(cls, origins: Sequence[Sequence[int]]) -> "LookupDetails":
+        """Details from the full origin list of every address, without prefixes."""
+        offsets, pool = ragged_from_lists(origins)
+        asns = np.array([items[-1] if items else 0 for items in origins], dtype=np.uint32)
+        return cls(asns, np.full(len(origins), NO_PREFIX, dtype=np.uint8), offsets, pool)
+
+    @classmethod
+    def from_table(cls, table: Union["PrefixTable", "PrefixTable6"], rows: np.ndarray) -> "LookupDetails":
+        """Details of matched rows of a prefix table.
+
+        Args:
+            table: A ``PrefixTable`` or ``PrefixTable6``.
+            rows: int64 matched table row per address, -1 where none matched.
+
+        Returns:
+            The details, in the order of ``rows``.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(table):
+            return cls.from_asns(np.zeros(len(rows), dtype=np.uint32))
+        found = rows >= 0
+        safe = np.where(found, rows, 0)
+        offsets, pool = take_ragged(table.origin_offsets, table.origin_pool, rows)
+        return cls(
+            np.where(found, table.asn[safe], 0),
+            np.where(found, table.length[safe], NO_PREFIX),
+            offsets,
+            pool,
+        )
+
+    @classmethod
+    def concat(cls, parts: Iterable["LookupDetails"]) -> "LookupDetails":
+        """Concatenate details of consecutive batches."""
+        parts = list(parts)
+        offsets, pool = concat_ragged((p.origin_offsets, p.origin_pool) for p in parts)
+        return cls(
+            np.concatenate([p.asns for p in parts]) if parts else np.zeros(0, dtype=np.uint32),
+            np.concatenate([p.prefix_length for p in parts]) if parts else np.zeros(0, dtype=np.uint8),
+            offsets,
+            pool,
+        )
+
+    def take(self, rows: np.ndarray) -> "LookupDetails":
+        """Select rows, in the given order; -1 selects an empty (not found) row."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(self):
+            return LookupDetails.from_asns(np.zeros(len(rows), dtype=np.uint32))
+        found = rows >= 0
+        safe = np.where(found, rows, 0)
+        offsets, pool = take_ragged(self.origin_offsets, self.origin_pool, rows)
+        return LookupDetails(
+            np.where(found, self.asns[safe], 0),
+            np.where(found, self.prefix_length[safe], NO_PREFIX),
+            offsets,
+            pool,
+        )
+
+    def origins(self) -> List[List[int]]:
+        """Origin set of every row as Python lists."""
+        pool = self.origin_pool.tolist()
+        bounds = self.origin_offsets.tolist()
+        return [pool[start:end] for start, end in zip(bounds, bounds[1:])]
@@ -0,0 +1,363 @@
+"""Pure-Python/NumPy provider for IP to ASN lookups."""
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import metrics
+from ..ipparse import ParsedIPs, parse_ips
+from ..ranges import ParsedRanges, RangeDetails
+from ..reverse import ASNPrefixes
+from .asn_index import ASNIndex
+from .base import BaseProvider
+from .binary_index import AnyRangeIndex, build_index, cached_index, compile_snapshot, load_index
+from .cache import IPV6_KEY_OFFSET, LookupCache, Span, address_key
+from .discovery import FAMILY_DATASETS, find_routeviews_snapshot_url
+from .origins import LookupDetails
+from .prefix_table import PrefixTable, RangeIndex
+from .prefix_table6 import PrefixTable6, RangeIndex6
+from .snapshot_store import SnapshotStore
+
+
+def compile_snapshot_index(
+    snapshot_date: datetime,
+    store: Optional[SnapshotStore] = None,
+    dest: Optional[Path] = None,
+    family: int = 4
+) -> Tuple[Path, datetime]:
+    """Compile the RouteViews snapshot for a date into a binary index.
+
+    Args:
+        snapshot_date: The requested snapshot date.
+        store: Snapshot store to read the snapshot from and, without ``dest``,
+            to keep the compiled index in.
+        dest: Optional path to write the index to instead of the store.
+        family: 4 for the IPv4 snapshot, 6 for the IPv6 one.
+
+    Returns:
+        Tuple of (index path, actual snapshot date).
+
+    Raises:
+        ValueError: If neither a store nor a destination is given.
+    """
+    if store is None and dest is None:
+        raise ValueError("An output path is required when the snapshot cache is disabled")
+
+    url, actual_date = find_routeviews_snapshot_url(snapshot_date, store, FAMILY_DATASETS[family])
+    if dest is None:
+        assert store is not None
+        return cached_index(store, url, actual_date, family), actual_date
+
+    if store is not None:
+        compile_snapshot(store.fetch(url), actual_date, dest, family)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            compile_snapshot(SnapshotStore(Path(tmp_dir)).fetch(url), actual_date, dest, family)
+    return dest, actual_date
+
+
+@metrics.timed("load_index")
+def load_snapshot_index(
+    snapshot_date: datetime,
+    store: Optional[SnapshotStore] = None,
+    family: int = 4
+) -> Tuple[AnyRangeIndex, datetime]:
+    """Discover the RouteViews snapshot for a date and load its range index.
+
+    With a store, the snapshot is compiled once into a binary index that later
+    runs memory-map directly; without one it is downloaded and parsed in memory.
+
+    Args:
+        snapshot_date: The requested snapshot date.
+        store: Optional local snapshot store to read snapshots and indexes from.
+        family: 4 for the IPv4 snapshot, 6 for the IPv6 one.
+
+    Returns:
+        Tuple of (range index, actual snapshot date).
+    """
+    url, actual_date = find_routeviews_snapshot_url(snapshot_date, store, FAMILY_DATASETS[family])
+    if store is None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            return build_index(SnapshotStore(Path(tmp_dir)).fetch(url), family), actual_date
+
+    index_path = cached_index(store, url, actual_date, family)
+    try:
+        index, _ = load_index(index_path)
+    except ValueError as e:
+        print(f"Rebuilding cached index: {e}", file=sys.stderr)
+        index_path.unlink(missing_ok=True)
+        index, _ = load_index(cached_index(store, url, actual_date, family))
+    return index, actual_date
+
+
+class Prefix2ASProvider(BaseProvider):
+    """Provider that loads the RouteViews pfx2as files into NumPy range arrays.
+
+    Lookups for whole batches are answered with a single ``np.searchsorted`` and
+    do not need the native libipmeta stack. With a snapshot store, each snapshot
+    is compiled once into a binary index that later runs memory-map directly.
+    IPv6 addresses are answered from the routeviews6 snapshot, which is only
+    loaded once a batch contains one.
+    """
+
+    dedupes_batches = True
+
+    def __init__(
+        self,
+        snapshot_date: datetime,
+        store: Optional[SnapshotStore] = None,
+        index_path: Optional[Path] = None,
+        cache: Optional[LookupCache] = None,
+        index6_path: Optional[Path] = None
+    ) -> None:
+        """Initialize the prefix2as provider.
+
+        Args:
+            snapshot_date: The date for which to fetch the RouteViews snapshot.
+            store: Optional local snapshot store to read snapshots and indexes from.
+            index_path: Optional precompiled IPv4 index to load instead of discovering
+                a snapshot; its header date replaces ``snapshot_date``.
+            cache: Cache for single-address lookups (default: a bounded address LRU).
+            index6_path: Optional precompiled IPv6 index. When only ``index_path``
+                is given, no IPv6 snapshot is discovered and IPv6 addresses are not found.
+        """
+        super().__init__(snapshot_date, cache)
+        self.store = store
+        self.index_path = index_path
+        self.index6_path = index6_path
+        self.requested_date = snapshot_date
+        self.snapshot_date6: Optional[datetime] = None
+        self._index: Optional[RangeIndex] = None
+        self._index6: Optional[RangeIndex6] = None
+        self._asn_indexes: Dict[int, ASNIndex] = {}
+
+    def prepare(self) -> None:
+        """Download and compile the IPv4 snapshot index into the snapshot store."""
+        if self.index_path is None and self.store is not None:
+            url, actual_date = find_routeviews_snapshot_url(self.snapshot_date, self.store)
+            cached_index(self.store, url, actual_date)
+
+    def initialize(self) -> None:
+        """Load the index for the RouteViews snapshot, compiling it if needed."""
+        if self._index is not None:
+            return
+
+        if self.index_path is not None:
+            index, self.snapshot_date = load_index(self.index_path)
+            if not isinstance(index, RangeIndex):
+                raise ValueError(f"{self.index_path} is an IPv6 index; pass it as the IPv6 index instead")
+            self._index = index
+            return
+
+        index, self.snapshot_date = load_snapshot_index(self.requested_date, self.store)
+        assert isinstance(index, RangeIndex)
+        self._index = index
+
+    def load_table(self, table: PrefixTable) -> None:
+        """Index an already parsed prefix table.
+
+        Args:
+            table: The prefix table to serve lookups from.
+        """
+        self._index = RangeIndex.build(table)
+        self._asn_indexes.pop(4, None)
+
+    @property
+    def index(self) -> RangeIndex:
+        """The loaded range index, initializing the provider if needed."""
+        if self._index is None:
+            self.initialize()
+        assert self._index is not None
+        return self._index
+
+    @property
+    def index6(self) -> RangeIndex6:
+        """The IPv6 range index, loaded on first use."""
+        if self._index6 is None:
+            if self.index6_path is not None:
+                index, self.snapshot_date6 = load_index(self.index6_path)
+                if not isinstance(index, RangeIndex6):
+                    raise ValueError(f"{self.index6_path} is not an IPv6 index")
+            elif self.index_path is not None:
+                index = RangeIndex6.build(PrefixTable6.from_lines([]))
+            else:
+                index, self.snapshot_date6 = load_snapshot_index(self.requested_date, self.store, family=6)
+                assert isinstance(index, RangeIndex6)
+            self._index6 = index
+        return self._index6
+
+    def load_table6(self, table: PrefixTable6) -> None:
+        """Index an already parsed IPv6 prefix table.
+
+        Args:
+            table: The IPv6 prefix table to serve lookups from.
+        """
+        self._index6 = RangeIndex6.build(table)
+        self._asn_indexes.pop(6, None)
+
+    def lookup_addrs(self, addrs: np.ndarray) -> np.ndarray:
+        """Lookup the ASNs for integer IPv4 addresses.
+
+        The addresses are deduplicated and sorted, resolved in one forward pass
+        over the index and scattered back to input order.
+
+        Args:
+            addrs: uint32 addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where not found.
+        """
+        return self.index.lookup_unique(addrs)
+
+    def lookup_addrs6(self, addrs: np.ndarray) -> np.ndarray:
+        """Lookup the ASNs for IPv6 addresses held as (high, low) ``uint64`` pairs.
+
+        Args:
+            addrs: ``(n, 2)`` uint64 addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where not found.
+        """
+        return self.index6.lookup_unique(addrs)
+
+    def lookup_parsed(self, parsed: ParsedIPs) -> np.ndarray:
+        """Lookup the ASNs of parsed addresses, routing each family to its index.
+
+        Args:
+            parsed: Output of the bulk parser.
+
+        Returns:
+            uint32 ASN per row of ``parsed``, 0 for invalid rows and where not found.
+        """
+        asns = np.zeros(len(parsed), dtype=np.uint32)
+        if len(parsed.v4_rows):
+            asns[parsed.v4_rows] = self.lookup_addrs(parsed.v4)
+        if len(parsed.v6_rows):
+            asns[parsed.v6_rows] = self.lookup_addrs6(parsed.v6)
+        return asns
+
+    def lookup_batch(self, ips: Sequence[str]) -> List[int]:
+        """Lookup the ASNs for a batch of IPv4 and IPv6 addresses in one vectorized pass.
+
+        Args:
+            ips: The IP addresses to lookup.
+
+        Returns:
+            The ASN for each IP address, or 0 if not found.
+        """
+        parsed = parse_ips(ips)
+        asns = np.zeros(len(ips), dtype=np.uint32)
+        asns[parsed.line - 1] = self.lookup_parsed(parsed)
+        return asns.tolist()  # type: ignore[no-any-return]
+
+    def lookup_details(self, ips: Sequence[str]) -> LookupDetails:
+        """Lookup a batch of IP addresses with their matched prefix and full origin set.
+
+        Both families are resolved to rows of their prefix table in the same
+        vectorized pass as ``lookup_batch``; the origin sets are gathered from the
+        table's shared ASN pool.
+
+        Args:
+            ips: The IP addresses to lookup.
+
+        Returns:
+            The enriched results, one row per IP address.
+        """
+        parsed = parse_ips(ips)
+        lines = parsed.line - 1
+        parts: List[LookupDetails] = []
+        positions: List[np.ndarray] = []
+        if len(parsed.v4_rows):
+            parts.append(LookupDetails.from_table(self.index.table, self.index.lookup_rows_unique(parsed.v4)))
+            positions.append(lines[parsed.v4_rows])
+        if len(parsed.v6_rows):
+            parts.append(LookupDetails.from_table(self.index6.table, self.index6.lookup_rows_unique(parsed.v6)))
+            positions.append(lines[parsed.v6_rows])
+        # Rows of the concatenated parts in input order; -1 for blank and invalid input.
+        order = np.full(len(ips), -1, dtype=np.int64)
+        if positions:
+            order[np.concatenate(positions)] = np.arange(sum(len(p) for p in positions))
+        return LookupDetails.concat(parts).take(order)
+
+    def lookup_ranges(self, parsed: ParsedRanges) -> RangeDetails:
+        """Resolve address intervals by intersecting them with the range indexes.
+
+        Each family is resolved in one vectorized pass over its index; the IPv6
+        index is only loaded if the input holds IPv6 intervals.
+
+        Args:
+            parsed: Addresses, CIDR prefixes and ranges from ``parse_ranges``.
+
+        Returns:
+            One row per (query, prefix) pair with address counts, by query.
+        """
+        parts: List[RangeDetails] = []
+        for family in (4, 6):
+            rows = parsed.rows(family)
+            if len(rows):
+                index = self.index if family == 4 else self.index6
+                parts.append(RangeDetails.from_index(index, rows, parsed.first[rows], parsed.last[rows]))
+        return RangeDetails.merge(parts)
+
+    def asn_index(self, family: int = 4) -> ASNIndex:
+        """The reverse index of one family's prefix table, built on first use.
+
+        Args:
+            family: 4 for the IPv4 table, 6 for the IPv6 one.
+
+        Returns:
+            The ASN to prefix index of the loaded snapshot.
+        """
+        if family not in self._asn_indexes:
+            index = self.index if family == 4 else self.index6
+            with metrics.span("build_asn_index"):
+                self._asn_indexes[family] = ASNIndex.build(index.table)
+        return self._asn_indexes[family]
+
+    def lookup_asns(self, asns: Sequence[int], family: int = 4) -> ASNPrefixes:
+        """Find the prefixes originated by ASNs, with their address space.
+
+        The first query of a family inverts its prefix table into an
+        ``ASNIndex``; every ASN is then found with one binary search.
+
+        Args:
+            asns: Distinct ASNs to look up.
+            family: 4 for IPv4 prefixes, 6 for IPv6 ones.
+
+        Returns:
+            One row per (ASN, prefix) pair, by ASN.
+        """
+        return ASNPrefixes.from_index(self.asn_index(family), list(asns))
+
+    def _lookup_uncached(self, ip: str) -> int:
+        """Perform the actual IP to ASN lookup against the range index.
+
+        Args:
+            ip: The IP address to lookup.
+
+        Returns:
+            The ASN for the IP address, or 0 if not found.
+        """
+        return self.lookup_batch([ip])[0]
+
+    def _lookup_uncached_span(self, ip: str) -> Tuple[int, Optional[Span]]:
+        """Look up an address together with the index range (or gap) containing it.
+
+        Args:
+            ip: The IP address to lookup.
+
+        Returns:
+            Tuple of (ASN or 0 if not found, inclusive range of address keys with
+            the same answer).
+        """
+        key = address_key(ip)
+        if key is None:
+            return 0, None
+        if key < IPV6_KEY_OFFSET:
+            asn, first, last = self.index.span(key)
+            return asn, (first, last)
+        asn, first, last = self.index6.span(key - IPV6_KEY_OFFSET)
+        return asn, (first + IPV6_KEY_OFFSET, last + IPV6_KEY_OFFSET)
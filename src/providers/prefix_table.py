@@ -0,0 +1,379 @@
+"""In-memory prefix table and range index built from RouteViews pfx2as files."""
+import gzip
+import socket
+from pathlib import Path
+from typing import IO, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .origins import ragged_from_lists, single_origins, split_origins, take_ragged
+
+
+def _open_text(path: Path) -> IO[str]:
+    """Open a possibly gzip-compressed text file."""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def ipv4_to_ints(ips: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert dotted-quad IPv4 strings to integers.
+
+    Args:
+        ips: IPv4 address strings.
+
+    Returns:
+        Tuple of (uint32 addresses, boolean mask of entries that parsed). Entries
+        that are not valid IPv4 addresses are set to 0 and flagged False.
+    """
+    packed: List[bytes] = []
+    valid = np.ones(len(ips), dtype=bool)
+    inet_pton = socket.inet_pton
+    af_inet = socket.AF_INET
+    for i, ip in enumerate(ips):
+        try:
+            packed.append(inet_pton(af_inet, ip))
+        except (OSError, TypeError):
+            packed.append(b"\x00\x00\x00\x00")
+            valid[i] = False
+    addrs = np.frombuffer(b"".join(packed), dtype=">u4").astype(np.uint32)
+    return addrs, valid
+
+
+def expand_runs(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Expand a ``[lo, hi)`` run of positions per query into flat (query, position) pairs."""
+    counts = np.maximum(np.asarray(hi, dtype=np.int64) - lo, 0)
+    query = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    skip = np.cumsum(counts) - counts - lo
+    return query, np.arange(int(counts.sum()), dtype=np.int64) - np.repeat(skip, counts)
+
+
+class PrefixTable:
+    """Columnar table of announced prefixes and their origin ASN.
+
+    Rows are sorted by (network, length) and unique on that key. ``asn`` holds the
+    last origin listed for the prefix, matching what ``PyIPMetaProvider`` returns;
+    the full origin set of every row is kept in the ragged ``origin_offsets`` /
+    ``origin_pool`` columns.
+    """
+
+    def __init__(
+        self,
+        network: np.ndarray,
+        length: np.ndarray,
+        asn: np.ndarray,
+        origin_offsets: Optional[np.ndarray] = None,
+        origin_pool: Optional[np.ndarray] = None,
+    ) -> None:
+        """Initialize the table from column arrays (sorted and deduplicated here).
+
+        Args:
+            network: uint32 network addresses.
+            length: uint8 prefix lengths.
+            asn: uint32 origin ASNs.
+            origin_offsets: Offsets of every row's origin set into ``origin_pool``
+                (default: ``asn`` is the only origin of each row).
+            origin_pool: uint32 origin ASNs of all rows.
+        """
+        network = np.asarray(network, dtype=np.uint32)
+        length = np.asarray(length, dtype=np.uint8)
+        asn = np.asarray(asn, dtype=np.uint32)
+        key = (network.astype(np.uint64) << np.uint64(8)) | length
+        # Keep the last occurrence of duplicated prefixes, as a later line wins.
+        rev_key = key[::-1]
+        _, rev_first = np.unique(rev_key, return_index=True)
+        order = len(key) - 1 - rev_first
+        self.network = network[order]
+        self.length = length[order]
+        self.asn = asn[order]
+        if origin_offsets is None or origin_pool is None:
+            origin_offsets, origin_pool = single_origins(asn)
+        self.origin_offsets, self.origin_pool = take_ragged(origin_offsets, origin_pool, order)
+
+    def __len__(self) -> int:
+        return len(self.network)
+
+    @classmethod
+    def from_sorted(
+        cls,
+        network: np.ndarray,
+        length: np.ndarray,
+        asn: np.ndarray,
+        origin_offsets: Optional[np.ndarray] = None,
+        origin_pool: Optional[np.ndarray] = None,
+    ) -> "PrefixTable":
+        """Wrap columns that are already sorted and unique without copying them.
+
+        Args:
+            network: uint32 network addresses.
+            length: uint8 prefix lengths.
+            asn: uint32 origin ASNs.
+            origin_offsets: Offsets of every row's origin set into ``origin_pool``
+                (default: ``asn`` is the only origin of each row).
+            origin_pool: uint32 origin ASNs of all rows.
+
+        Returns:
+            The table, sharing memory with the given arrays.
+        """
+        table = cls.__new__(cls)
+        table.network = network
+        table.length = length
+        table.asn = asn
+        if origin_offsets is None or origin_pool is None:
+            origin_offsets, origin_pool = single_origins(asn)
+        table.origin_offsets = origin_offsets
+        table.origin_pool = origin_pool
+        return table
+
+    @property
+    def keys(self) -> np.ndarray:
+        """Sortable uint64 key per row: network in the high bits, length in the low byte."""
+        return (self.network.astype(np.uint64) << np.uint64(8)) | self.length  # type: ignore[no-any-return]
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "PrefixTable":
+        """Parse pfx2as lines of the form ``<network>\\t<length>\\t<asn>``.
+
+        Multi-origin (``a_b``) and AS-set (``a,b``) origins keep their last ASN in
+        ``asn`` and all of them in the origin set. Malformed lines and non-IPv4
+        prefixes are skipped.
+
+        Args:
+            lines: Lines of a pfx2as file.
+
+        Returns:
+            The parsed table.
+        """
+        packed: List[bytes] = []
+        lengths: List[int] = []
+        origins: List[List[int]] = []
+        inet_pton = socket.inet_pton
+        af_inet = socket.AF_INET
+        for line in lines:
+            parts = line.split()
+            if len(parts) != 3:
+                continue
+            try:
+                net = inet_pton(af_inet, parts[0])
+                length = int(parts[1])
+                origin = split_origins(parts[2])
+            except (OSError, ValueError):
+                continue
+            if not 0 <= length <= 32:
+                continue
+            packed.append(net)
+            lengths.append(length)
+            origins.append(origin)
+        network = np.frombuffer(b"".join(packed), dtype=">u4").astype(np.uint32)
+        asns = np.array([origin[-1] for origin in origins], dtype=np.uint32)
+        return cls(network, np.array(lengths, dtype=np.uint8), asns, *ragged_from_lists(origins))
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PrefixTable":
+        """Parse a (possibly gzip-compressed) pfx2as file.
+
+        Args:
+            path: Path to the pfx2as file.
+
+        Returns:
+            The parsed table.
+        """
+        with _open_text(Path(path)) as f:
+            return cls.from_lines(f)
+
+    def ranges(self, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the inclusive [start, end] address range of every row (or of ``rows``) as uint64."""
+        network, length = (self.network, self.length) if rows is None else (self.network[rows], self.length[rows])
+        start = network.astype(np.uint64)
+        size = np.left_shift(np.uint64(1), (32 - length.astype(np.int64)).astype(np.uint64))
+        return start, start + size - np.uint64(1)
+
+
+class RangeIndex:
+    """Non-overlapping, sorted address ranges mapped to their most specific prefix.
+
+    Nested prefixes are flattened so that a single ``np.searchsorted`` over
+    ``starts`` performs a longest-prefix match for a whole batch of addresses.
+    """
+
+    family = 4
+
+    def __init__(
+        self,
+        table: PrefixTable,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        prefix: np.ndarray,
+        range_asn: Optional[np.ndarray] = None,
+    ) -> None:
+        """Initialize the index from precomputed arrays.
+
+        Args:
+            table: The prefix table the ranges refer to.
+            starts: uint32 first address of each range, sorted ascending.
+            ends: uint32 last address of each range.
+            prefix: uint32 row in ``table`` owning each range.
+            range_asn: uint32 origin ASN of each range (derived from ``table`` if omitted).
+        """
+        self.table = table
+        self.starts = starts
+        self.ends = ends
+        self.prefix = prefix
+        if range_asn is None:
+            range_asn = table.asn[prefix] if len(prefix) else np.zeros(0, dtype=np.uint32)
+        self.range_asn = range_asn
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def build(cls, table: PrefixTable) -> "RangeIndex":
+        """Flatten a prefix table into non-overlapping ranges.
+
+        Args:
+            table: The prefix table to index.
+
+        Returns:
+            The range index.
+        """
+        if len(table) == 0:
+            empty = np.zeros(0, dtype=np.uint32)
+            return cls(table, empty, empty, empty)
+
+        starts, ends = table.ranges()
+        bounds = np.unique(np.concatenate([starts, ends + np.uint64(1)]))
+        seg_starts = bounds[:-1]
+        seg_ends = bounds[1:] - np.uint64(1)
+
+        # Assign each elementary segment to its covering prefix, shortest first so
+        # that more specific prefixes overwrite less specific ones.
+        owner = np.full(len(seg_starts), -1, dtype=np.int64)
+        for length in np.unique(table.length):
+            rows = np.flatnonzero(table.length == length)
+            pos = np.searchsorted(starts[rows], seg_starts, side="right") - 1
+            clipped = np.maximum(pos, 0)
+            covered = (pos >= 0) & (seg_starts <= ends[rows][clipped])
+            owner[covered] = rows[clipped[covered]]
+
+        keep = owner >= 0
+        seg_starts, seg_ends, owner = seg_starts[keep], seg_ends[keep], owner[keep]
+
+        # Merge adjacent segments owned by the same prefix.
+        new_run = np.ones(len(owner), dtype=bool)
+        new_run[1:] = (owner[1:] != owner[:-1]) | (seg_starts[1:] != seg_ends[:-1] + np.uint64(1))
+        run_starts = np.flatnonzero(new_run)
+        run_ends = np.append(run_starts[1:], len(owner)) - 1
+        return cls(
+            table,
+            seg_starts[run_starts].astype(np.uint32),
+            seg_ends[run_ends].astype(np.uint32),
+            owner[run_starts].astype(np.uint32),
+        )
+
+    def locate(self, addrs: np.ndarray) -> np.ndarray:
+        """Find the range containing each address.
+
+        Args:
+            addrs: uint32 addresses.
+
+        Returns:
+            int64 range position per address, or -1 where no prefix matches.
+        """
+        pos = np.searchsorted(self.starts, addrs, side="right") - 1
+        if len(self.starts) == 0:
+            return np.full(len(addrs), -1, dtype=np.int64)
+        clipped = np.maximum(pos, 0)
+        hit = (pos >= 0) & (addrs <= self.ends[clipped])
+        return np.where(hit, pos, -1)
+
+    def lookup_unique(self, addrs: np.ndarray) -> np.ndarray:
+        """Longest-prefix-match origin ASN for each address, resolved via sorted unique values.
+
+        Duplicates are resolved once, and the sorted unique addresses are located
+        in a single forward pass over the ranges: each binary search starts where
+        the previous one ended, which is far more cache friendly than searching
+        in input order. Answers are scattered back to the input order.
+
+        Args:
+            addrs: uint32 addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where no prefix matches.
+        """
+        unique, inverse = np.unique(np.asarray(addrs, dtype=np.uint32), return_inverse=True)
+        return self.lookup(unique)[inverse.reshape(-1)]
+
+    def lookup_rows_unique(self, addrs: np.ndarray) -> np.ndarray:
+        """Row of the longest matching prefix in ``table`` for each address.
+
+        Resolved via sorted unique addresses, like ``lookup_unique``.
+
+        Args:
+            addrs: uint32 addresses.
+
+        Returns:
+            int64 table row per address, -1 where no prefix matches.
+        """
+        unique, inverse = np.unique(np.asarray(addrs, dtype=np.uint32), return_inverse=True)
+        pos = self.locate(unique)
+        if len(self.prefix) == 0:
+            return np.full(len(inverse.reshape(-1)), -1, dtype=np.int64)
+        rows = np.where(pos >= 0, self.prefix[np.maximum(pos, 0)].astype(np.int64), -1)
+        return rows[inverse.reshape(-1)]
+
+    def intersect(self, first: np.ndarray, last: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find the ranges overlapping each inclusive address interval.
+
+        Ranges are sorted and do not overlap, so their ends are sorted too and two
+        binary searches bound the run of ranges overlapping an interval: its cost
+        does not depend on the number of addresses in it.
+
+        Args:
+            first: uint32 first address of each interval.
+            last: uint32 last address of each interval (not below ``first``).
+
+        Returns:
+            Tuple of (int64 interval, int64 range position, uint64 number of the
+            interval's addresses inside the range) per overlap, by interval and address.
+        """
+        first = np.asarray(first, dtype=np.uint32)
+        last = np.asarray(last, dtype=np.uint32)
+        query, pos = expand_runs(
+            np.searchsorted(self.ends, first, side="left"), np.searchsorted(self.starts, last, side="right")
+        )
+        overlap_end = np.minimum(self.ends[pos], last[query]).astype(np.uint64)
+        overlap_start = np.maximum(self.starts[pos], first[query]).astype(np.uint64)
+        return query, pos, overlap_end - overlap_start + np.uint64(1)
+
+    def span(self, addr: int) -> Tuple[int, int, int]:
+        """Find the origin ASN of one address and the address range it holds for.
+
+        Args:
+            addr: IPv4 address as an integer.
+
+        Returns:
+            Tuple of (ASN or 0, first address, last address) of the range containing
+            ``addr``, or of the gap between ranges when no prefix matches.
+        """
+        pos = int(np.searchsorted(self.starts, addr, side="right")) - 1
+        if pos >= 0 and addr <= int(self.ends[pos]):
+            return int(self.range_asn[pos]), int(self.starts[pos]), int(self.ends[pos])
+        first = int(self.ends[pos]) + 1 if pos >= 0 else 0
+        last = int(self.starts[pos + 1]) - 1 if pos + 1 < len(self.starts) else 0xFFFFFFFF
+        return 0, first, last
+
+    def lookup(self, addrs: np.ndarray) -> np.ndarray:
+        """Longest-prefix-match origin ASN for each address.
+
+        Args:
+            addrs: uint32 addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where no prefix matches.
+        """
+        pos = self.locate(np.asarray(addrs, dtype=np.uint32))
+        if len(self.range_asn) == 0:
+            return np.zeros(len(pos), dtype=np.uint32)
+        return np.where(pos >= 0, self.range_asn[np.maximum(pos, 0)], 0).astype(np.uint32)
@@ -0,0 +1,487 @@
+"""IPv6 prefix table and range index built from RouteViews pfx2as6 files.
+
+IPv6 addresses do not fit a NumPy integer, so every 128-bit value is held as a
+pair of ``uint64`` columns (high and low 64 bits). Comparisons and searches work
+on the pair: a ``np.searchsorted`` over the high words narrows each address to
+the run of ranges sharing its high word, and only those runs (which exist only
+for prefixes longer than /64) are bisected on the low words.
+"""
+import socket
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .origins import ragged_from_lists, single_origins, split_origins, take_ragged
+from .prefix_table import _open_text, expand_runs
+
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+Pair = Tuple[np.ndarray, np.ndarray]
+
+
+def pair_le(a_hi: np.ndarray, a_lo: np.ndarray, b_hi: np.ndarray, b_lo: np.ndarray) -> np.ndarray:
+    """Element-wise ``a <= b`` for 128-bit values held as pairs."""
+    return (a_hi < b_hi) | ((a_hi == b_hi) & (a_lo <= b_lo))  # type: ignore[no-any-return]
+
+
+def pair_add_one(hi: np.ndarray, lo: np.ndarray) -> Pair:
+    """Element-wise ``value + 1`` for 128-bit values held as pairs (wrapping at 2**128)."""
+    lo = lo + np.uint64(1)
+    return hi + (lo == 0).astype(np.uint64), lo
+
+
+def pair_sub_one(hi: np.ndarray, lo: np.ndarray) -> Pair:
+    """Element-wise ``value - 1`` for 128-bit values held as pairs (wrapping at 0)."""
+    return hi - (lo == 0).astype(np.uint64), lo - np.uint64(1)
+
+
+def pair_sub(a_hi: np.ndarray, a_lo: np.ndarray, b_hi: np.ndarray, b_lo: np.ndarray) -> Pair:
+    """Element-wise ``a - b`` for 128-bit values held as pairs (``a >= b``)."""
+    return a_hi - b_hi - (a_lo < b_lo).astype(np.uint64), a_lo - b_lo
+
+
+def unique_pairs(hi: np.ndarray, lo: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort and deduplicate 128-bit values held as pairs.
+
+    Returns:
+        Tuple of (unique high words, unique low words, position of every input
+        value among the unique ones).
+    """
+    order = np.lexsort((lo, hi))
+    hi, lo = hi[order], lo[order]
+    first = np.ones(len(hi), dtype=bool)
+    first[1:] = (hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return hi[first], lo[first], inverse
+
+
+def searchsorted_pairs(
+    sorted_hi: np.ndarray, sorted_lo: np.ndarray, hi: np.ndarray, lo: np.ndarray
+) -> np.ndarray:
+    """Count the sorted values that are ``<=`` each query (``side="right"`` search).
+
+    Args:
+        sorted_hi: High words of the sorted values.
+        sorted_lo: Low words of the sorted values.
+        hi: High words of the queries.
+        lo: Low words of the queries.
+
+    Returns:
+        int64 insertion position of each query.
+    """
+    left = np.searchsorted(sorted_hi, hi, side="left")
+    right = np.searchsorted(sorted_hi, hi, side="right")
+    # Values sharing a query's high word are bisected on their low word.
+    tied = np.flatnonzero(right > left)
+    if len(tied):
+        start, stop, query_lo = left[tied], right[tied], lo[tied]
+        while True:
+            open_ = start < stop
+            if not open_.any():
+                break
+            mid = (start + stop) // 2
+            below = open_ & (sorted_lo[np.minimum(mid, len(sorted_lo) - 1)] <= query_lo)
+            start = np.where(below, mid + 1, start)
+            stop = np.where(open_ & ~below, mid, stop)
+        left[tied] = start
+    return left
+
+
+class PrefixTable6:
+    """Columnar table of announced IPv6 prefixes and their origin ASN.
+
+    Rows are sorted by (network, length) and unique on that key. ``asn`` holds the
+    last origin listed for the prefix and ``origin_offsets``/``origin_pool`` the
+    full origin set, as for ``PrefixTable``.
+    """
+
+    def __init__(
+        self,
+        network_hi: np.ndarray,
+        network_lo: np.ndarray,
+        length: np.ndarray,
+        asn: np.ndarray,
+        origin_offsets: Optional[np.ndarray] = None,
+        origin_pool: Optional[np.ndarray] = None,
+    ) -> None:
+        """Initialize the table from column arrays (sorted and deduplicated here).
+
+        Args:
+            network_hi: uint64 high words of the network addresses.
+            network_lo: uint64 low words of the network addresses.
+            length: uint8 prefix lengths.
+            asn: uint32 origin ASNs.
+            origin_offsets: Offsets of every row's origin set into ``origin_pool``
+                (default: ``asn`` is the only origin of each row).
+            origin_pool: uint32 origin ASNs of all rows.
+        """
+        network_hi = np.asarray(network_hi, dtype=np.uint64)
+        network_lo = np.asarray(network_lo, dtype=np.uint64)
+        length = np.asarray(length, dtype=np.uint8)
+        asn = np.asarray(asn, dtype=np.uint32)
+        # Keep the last occurrence of duplicated prefixes, as a later line wins.
+        rev = slice(None, None, -1)
+        order = np.lexsort((length[rev], network_lo[rev], network_hi[rev]))
+        key_hi, key_lo, key_len = network_hi[rev][order], network_lo[rev][order], length[rev][order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (key_hi[1:] != key_hi[:-1]) | (key_lo[1:] != key_lo[:-1]) | (key_len[1:] != key_len[:-1])
+        rows = len(length) - 1 - order[first]
+        self.network_hi = network_hi[rows]
+        self.network_lo = network_lo[rows]
+        self.length = length[rows]
+        self.asn = asn[rows]
+        if origin_offsets is None or origin_pool is None:
+            origin_offsets, origin_pool = single_origins(asn)
+        self.origin_offsets, self.origin_pool = take_ragged(origin_offsets, origin_pool, rows)
+
+    def __len__(self) -> int:
+        return len(self.length)
+
+    @classmethod
+    def from_sorted(
+        cls,
+        network_hi: np.ndarray,
+        network_lo: np.ndarray,
+        length: np.ndarray,
+        asn: np.ndarray,
+        origin_offsets: Optional[np.ndarray] = None,
+        origin_pool: Optional[np.ndarray] = None,
+    ) -> "PrefixTable6":
+        """Wrap columns that are already sorted and unique without copying them."""
+        table = cls.__new__(cls)
+        table.network_hi = network_hi
+        table.network_lo = network_lo
+        table.length = length
+        table.asn = asn
+        if origin_offsets is None or origin_pool is None:
+            origin_offsets, origin_pool = single_origins(asn)
+        table.origin_offsets = origin_offsets
+        table.origin_pool = origin_pool
+        return table
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "PrefixTable6":
+        """Parse pfx2as6 lines of the form ``<network>\\t<length>\\t<asn>``.
+
+        Multi-origin (``a_b``) and AS-set (``a,b``) origins keep their last ASN in
+        ``asn`` and all of them in the origin set. Malformed lines and non-IPv6
+        prefixes are skipped.
+
+        Args:
+            lines: Lines of a pfx2as6 file.
+
+        Returns:
+            The parsed table.
+        """
+        packed: List[bytes] = []
+        lengths: List[int] = []
+        origins: List[List[int]] = []
+        inet_pton = socket.inet_pton
+        af_inet6 = socket.AF_INET6
+        for line in lines:
+            parts = line.split()
+            if len(parts) != 3:
+                continue
+            try:
+                net = inet_pton(af_inet6, parts[0])
+                length = int(parts[1])
+                origin = split_origins(parts[2])
+            except (OSError, ValueError):
+                continue
+            if not 0 <= length <= 128:
+                continue
+            packed.append(net)
+            lengths.append(length)
+            origins.append(origin)
+        network = np.frombuffer(b"".join(packed), dtype=">u8").astype(np.uint64).reshape(-1, 2)
+        asns = np.array([origin[-1] for origin in origins], dtype=np.uint32)
+        return cls(network[:, 0], network[:, 1], np.array(lengths, dtype=np.uint8), asns, *ragged_from_lists(origins))
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PrefixTable6":
+        """Parse a (possibly gzip-compressed) pfx2as6 file."""
+        with _open_text(Path(path)) as f:
+            return cls.from_lines(f)
+
+    def ranges(self, rows: Optional[np.ndarray] = None) -> Tuple[Pair, Pair]:
+        """Return the inclusive (start, end) address pair of every row (or of ``rows``)."""
+        network_hi, network_lo, length = self.network_hi, self.network_lo, self.length.astype(np.int64)
+        if rows is not None:
+            network_hi, network_lo, length = network_hi[rows], network_lo[rows], length[rows]
+        # Host bits of each half: 64 - length for the high word, 128 - length for the low word.
+        hi_bits = np.clip(64 - length, 0, 64).astype(np.uint64)
+        lo_bits = np.clip(128 - length, 0, 64).astype(np.uint64)
+        hi_mask = np.where(hi_bits == 64, ALL_ONES, (np.uint64(1) << np.minimum(hi_bits, 63)) - np.uint64(1))
+        lo_mask = np.where(lo_bits == 64, ALL_ONES, (np.uint64(1) << np.minimum(lo_bits, 63)) - np.uint64(1))
+        start = (network_hi & ~hi_mask, network_lo & ~lo_mask)
+        return start, (start[0] | hi_mask, start[1] | lo_mask)
+
+
+class RangeIndex6:
+    """Non-overlapping, sorted IPv6 address ranges mapped to their most specific prefix.
+
+    The IPv6 counterpart of ``RangeIndex``, with every address column split into
+    high and low ``uint64`` words.
+    """
+
+    family = 6
+
+    def __init__(
+        self,
+        table: PrefixTable6,
+        starts_hi: np.ndarray,
+        starts_lo: np.ndarray,
+        ends_hi: np.ndarray,
+        ends_lo: np.ndarray,
+        prefix: np.ndarray,
+        range_asn: np.ndarray,
+    ) -> None:
+        """Initialize the index from precomputed arrays.
+
+        Args:
+            table: The prefix table the ranges refer to.
+            starts_hi: uint64 high words of the first address of each range, sorted.
+            starts_lo: uint64 low words of the first address of each range.
+            ends_hi: uint64 high words of the last address of each range.
+            ends_lo: uint64 low words of the last address of each range.
+            prefix: uint32 row in ``table`` owning each range.
+            range_asn: uint32 origin ASN of each range.
+        """
+        self.table = table
+        self.starts_hi = starts_hi
+        self.starts_lo = starts_lo
+        self.ends_hi = ends_hi
+        self.ends_lo = ends_lo
+        self.prefix = prefix
+        self.range_asn = range_asn
+
+    def __len__(self) -> int:
+        return len(self.starts_hi)
+
+    @classmethod
+    def build(cls, table: PrefixTable6) -> "RangeIndex6":
+        """Flatten a prefix table into non-overlapping ranges.
+
+        Args:
+            table: The prefix table to index.
+
+        Returns:
+            The range index.
+        """
+        empty64 = np.zeros(0, dtype=np.uint64)
+        empty32 = np.zeros(0, dtype=np.uint32)
+        if len(table) == 0:
+            return cls(table, empty64, empty64, empty64, empty64, empty32, empty32)
+
+        (start_hi, start_lo), (end_hi, end_lo) = table.ranges()
+        after_hi, after_lo = pair_add_one(end_hi, end_lo)
+        # A range ending at the last address has no bound after it.
+        wraps = (end_hi == ALL_ONES) & (end_lo == ALL_ONES)
+        bounds_hi, bounds_lo, _ = unique_pairs(
+            np.concatenate([start_hi, after_hi[~wraps]]), np.concatenate([start_lo, after_lo[~wraps]])
+        )
+        seg_starts = (bounds_hi[:-1], bounds_lo[:-1])
+        seg_ends = pair_sub_one(bounds_hi[1:], bounds_lo[1:])
+        if wraps.any():
+            seg_starts = (bounds_hi, bounds_lo)
+            seg_ends = (np.append(seg_ends[0], ALL_ONES), np.append(seg_ends[1], ALL_ONES))
+
+        # Shortest prefixes first, so that more specific ones overwrite them.
+        owner = np.full(len(seg_starts[0]), -1, dtype=np.int64)
+        for length in np.unique(table.length):
+            rows = np.flatnonzero(table.length == length)
+            pos = searchsorted_pairs(start_hi[rows], start_lo[rows], *seg_starts) - 1
+            clipped = np.maximum(pos, 0)
+            covered = (pos >= 0) & pair_le(*seg_starts, end_hi[rows][clipped], end_lo[rows][clipped])
+            owner[covered] = rows[clipped[covered]]
+
+        keep = owner >= 0
+        owner = owner[keep]
+        seg_starts = (seg_starts[0][keep], seg_starts[1][keep])
+        seg_ends = (seg_ends[0][keep], seg_ends[1][keep])
+
+        # Merge adjacent segments owned by the same prefix.
+        next_hi, next_lo = pair_add_one(seg_ends[0][:-1], seg_ends[1][:-1])
+        new_run = np.ones(len(owner), dtype=bool)
+        new_run[1:] = (owner[1:] != owner[:-1]) | (seg_starts[0][1:] != next_hi) | (seg_starts[1][1:] != next_lo)
+        run_starts = np.flatnonzero(new_run)
+        run_ends = np.append(run_starts[1:], len(owner)) - 1
+        prefix = owner[run_starts].astype(np.uint32)
+        return cls(
+            table,
+            seg_starts[0][run_starts],
+            seg_starts[1][run_starts],
+            seg_ends[0][run_ends],
+            seg_ends[1][run_ends],
+            prefix,
+            table.asn[prefix],
+        )
+
+    def locate(self, addrs: np.ndarray) -> np.ndarray:
+        """Find the range containing each address.
+
+        Args:
+            addrs: ``(n, 2)`` uint64 (high, low) addresses.
+
+        Returns:
+            int64 range position per address, or -1 where no prefix matches.
+        """
+        addrs = np.asarray(addrs, dtype=np.uint64).reshape(-1, 2)
+        if len(self) == 0:
+            return np.full(len(addrs), -1, dtype=np.int64)
+        hi, lo = addrs[:, 0], addrs[:, 1]
+        pos = searchsorted_pairs(self.starts_hi, self.starts_lo, hi, lo) - 1
+        clipped = np.maximum(pos, 0)
+        hit = (pos >= 0) & pair_le(hi, lo, self.ends_hi[clipped], self.ends_lo[clipped])
+        return np.where(hit, pos, -1)
+
+    def lookup(self, addrs: np.ndarray) -> np.ndarray:
+        """Longest-prefix-match origin ASN for each address.
+
+        Args:
+            addrs: ``(n, 2)`` uint64 (high, low) addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where no prefix matches.
+        """
+        pos = self.locate(addrs)
+        if len(self.range_asn) == 0:
+            return np.zeros(len(pos), dtype=np.uint32)
+        return np.where(pos >= 0, self.range_asn[np.maximum(pos, 0)], 0).astype(np.uint32)
+
+    def _locate_high(self, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Locate addresses from their high word alone where the low word cannot matter.
+
+        That is the case unless a range boundary falls inside the /64 of the
+        address, i.e. only around prefixes longer than /64.
+
+        Args:
+            hi: uint64 high words, sorted.
+
+        Returns:
+            Tuple of (int64 range position per high word or -1, boolean mask of the
+            high words whose answer holds for every low word).
+        """
+        left = np.searchsorted(self.starts_hi, hi, side="left")
+        right = np.searchsorted(self.starts_hi, hi, side="right")
+        pos = right - 1
+        clipped = np.maximum(pos, 0)
+        starts_here = right - left
+        end_hi = self.ends_hi[clipped]
+        exact = (starts_here == 0) | ((starts_here == 1) & (self.starts_lo[clipped] == 0))
+        exact &= (end_hi != hi) | (self.ends_lo[clipped] == ALL_ONES)
+        hit = (pos >= 0) & (end_hi >= hi)
+        return np.where(hit, pos, -1), exact
+
+    def locate_unique(self, addrs: np.ndarray) -> np.ndarray:
+        """Find the range containing each address, resolved via sorted unique high words.
+
+        Addresses are deduplicated and sorted on their high word, which decides
+        the answer on its own unless a prefix longer than /64 starts or ends in
+        the same /64; only those addresses are searched on both words.
+
+        Args:
+            addrs: ``(n, 2)`` uint64 (high, low) addresses.
+
+        Returns:
+            int64 range position per address, or -1 where no prefix matches.
+        """
+        addrs = np.asarray(addrs, dtype=np.uint64).reshape(-1, 2)
+        if len(self) == 0:
+            return np.full(len(addrs), -1, dtype=np.int64)
+        unique_hi, inverse = np.unique(addrs[:, 0], return_inverse=True)
+        inverse = inverse.reshape(-1)
+        pos_hi, exact = self._locate_high(unique_hi)
+        pos = pos_hi[inverse]
+        rows = np.flatnonzero(~exact[inverse])
+        if len(rows):
+            pos[rows] = self.locate(addrs[rows])
+        return pos
+
+    def lookup_unique(self, addrs: np.ndarray) -> np.ndarray:
+        """Longest-prefix-match origin ASN for each address (see ``locate_unique``).
+
+        Args:
+            addrs: ``(n, 2)`` uint64 (high, low) addresses.
+
+        Returns:
+            uint32 ASN per address, 0 where no prefix matches.
+        """
+        pos = self.locate_unique(addrs)
+        if len(self.range_asn) == 0:
+            return np.zeros(len(pos), dtype=np.uint32)
+        return np.where(pos >= 0, self.range_asn[np.maximum(pos, 0)], 0).astype(np.uint32)
+
+    def lookup_rows_unique(self, addrs: np.ndarray) -> np.ndarray:
+        """Row of the longest matching prefix in ``table`` for each address.
+
+        Args:
+            addrs: ``(n, 2)`` uint64 (high, low) addresses.
+
+        Returns:
+            int64 table row per address, -1 where no prefix matches.
+        """
+        pos = self.locate_unique(addrs)
+        if len(self.prefix) == 0:
+            return np.full(len(pos), -1, dtype=np.int64)
+        return np.where(pos >= 0, self.prefix[np.maximum(pos, 0)].astype(np.int64), -1)
+
+    def intersect(self, first: np.ndarray, last: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find the ranges overlapping each inclusive address interval (see ``RangeIndex.intersect``).
+
+        Args:
+            first: ``(n, 2)`` uint64 (high, low) first address of each interval.
+            last: ``(n, 2)`` uint64 (high, low) last address of each interval.
+
+        Returns:
+            Tuple of (int64 interval, int64 range position, number of the interval's
+            addresses inside the range) per overlap. Counts are Python ints in an
+            object array, since an IPv6 interval can hold up to 2**128 addresses.
+        """
+        first = np.asarray(first, dtype=np.uint64).reshape(-1, 2)
+        last = np.asarray(last, dtype=np.uint64).reshape(-1, 2)
+        # Ranges ending before an interval are those ending at or before its first address minus one.
+        at_zero = (first[:, 0] == 0) & (first[:, 1] == 0)
+        lo = np.where(
+            at_zero, 0, searchsorted_pairs(self.ends_hi, self.ends_lo, *pair_sub_one(first[:, 0], first[:, 1]))
+        )
+        hi = searchsorted_pairs(self.starts_hi, self.starts_lo, last[:, 0], last[:, 1])
+        query, pos = expand_runs(lo, hi)
+        start_hi, start_lo = self.starts_hi[pos], self.starts_lo[pos]
+        end_hi, end_lo = self.ends_hi[pos], self.ends_lo[pos]
+        first_hi, first_lo = first[query, 0], first[query, 1]
+        last_hi, last_lo = last[query, 0], last[query, 1]
+        clip_start = pair_le(start_hi, start_lo, first_hi, first_lo)
+        clip_end = pair_le(last_hi, last_lo, end_hi, end_lo)
+        span_hi, span_lo = pair_sub(
+            np.where(clip_end, last_hi, end_hi), np.where(clip_end, last_lo, end_lo),
+            np.where(clip_start, first_hi, start_hi), np.where(clip_start, first_lo, start_lo),
+        )
+        counts = np.empty(len(pos), dtype=object)
+        counts[:] = [(hi << 64 | lo) + 1 for hi, lo in zip(span_hi.tolist(), span_lo.tolist())]
+        return query, pos, counts
+
+    def span(self, addr: int) -> Tuple[int, int, int]:
+        """Find the origin ASN of one address and the address range it holds for.
+
+        Args:
+            addr: IPv6 address as an integer.
+
+        Returns:
+            Tuple of (ASN or 0, first address, last address) of the range containing
+            ``addr``, or of the gap between ranges when no prefix matches.
+        """
+        hi = np.array([addr >> 64], dtype=np.uint64)
+        lo = np.array([addr & 0xFFFFFFFFFFFFFFFF], dtype=np.uint64)
+        pos = int(searchsorted_pairs(self.starts_hi, self.starts_lo, hi, lo)[0]) - 1
+
+        def value(words_hi: np.ndarray, words_lo: np.ndarray, i: int) -> int:
+            return (int(words_hi[i]) << 64) | int(words_lo[i])
+
+        if pos >= 0 and addr <= value(self.ends_hi, self.ends_lo, pos):
+            return int(self.range_asn[pos]), value(self.starts_hi, self.starts_lo, pos), value(self.ends_hi, self.ends_lo, pos)
+        first = value(self.ends_hi, self.ends_lo, pos) + 1 if pos >= 0 else 0
+        last = value(self.starts_hi, self.starts_lo, pos + 1) - 1 if pos + 1 < len(self) else (1 << 128) - 1
+        return 0, first, last
@@ -1,121 +1,57 @@
 """PyIPMeta provider for IP to ASN lookups."""
-import sys
+import socket
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional, Sequence, Tuple
 
-import requests
-from bs4 import BeautifulSoup
+import numpy as np
 
 from .base import BaseProvider
+from .cache import IPV6_KEY_OFFSET, LookupCache, Span, address_key
+from .discovery import find_routeviews_snapshot_url
+from .origins import NO_PREFIX, LookupDetails
+from .prefix2as import load_snapshot_index
+from .prefix_table6 import RangeIndex6
+from .snapshot_store import SnapshotStore
 
-
-def find_routeviews_snapshot_url(date: datetime) -> tuple[str, datetime]:
-    """Retrieves the URL for a RouteViews prefix-to-AS snapshot from CAIDA's data repository.
-    
-    If the exact date is not found, searches for the closest available snapshot within the same month,
-    then tries previous months up to 6 months back.
-    
-    Args:
-        date: The date of the RouteViews prefix-to-AS snapshot to be downloaded.
-    
-    Returns:
-        Tuple of (URL to the RouteViews snapshot, actual date found).
-        
-    Raises:
-        SystemExit: If no snapshot can be found within 6 months.
-    """
-    from datetime import timedelta
-    import re
-    
-    def get_snapshots_for_month(year: int, month: int) -> list[tuple[str, datetime]]:
-        """Get all available snapshots for a given month."""
-        base_url = f"http://data.caida.org/datasets/routing/routeviews-prefix2as/{year}/{month:02d}/"
-        
-        try:
-            response = requests.get(base_url)
-            response.raise_for_status()
-        except requests.RequestException:
-            return []
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.find_all('a')
-        snapshots = []
-        
-        for link in links:
-            # Look for files with date pattern YYYYMMDD
-            match = re.search(r'(\d{8})', link.text)
-            if match:
-                date_str = match.group(1)
-                try:
-                    snapshot_date = datetime.strptime(date_str, '%Y%m%d')
-                    snapshots.append((f"{base_url}{link.text}", snapshot_date))
-                except ValueError:
-                    continue
-        
-        return snapshots
-    
-    # Try to find exact date first
-    base_url = f"http://data.caida.org/datasets/routing/routeviews-prefix2as/{date.year}/{date.month:02d}/"
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.find_all('a')
-        
-        for link in links:
-            if date.strftime('%Y%m%d') in link.text:
-                file_name = link.text
-                return f"{base_url}{file_name}", date
-    except requests.RequestException:
-        pass
-    
-    print(f"Exact date {date.strftime('%Y-%m-%d')} not found, searching backwards for closest available snapshot...", file=sys.stderr)
-    
-    # Search for closest date within 6 months, going backwards only
-    best_snapshot = None
-    best_date_diff = None
-    closest_date = None
-    
-    current_date = date
-    for _ in range(6):  # Search up to 6 months back
-        snapshots = get_snapshots_for_month(current_date.year, current_date.month)
-        
-        for snapshot_url, snapshot_date in snapshots:
-            # Only consider dates that are on or before the requested date (backwards only)
-            if snapshot_date <= date:
-                date_diff = (date - snapshot_date).days
-                
-                if best_snapshot is None or date_diff < best_date_diff:
-                    best_snapshot = snapshot_url
-                    best_date_diff = date_diff
-                    closest_date = snapshot_date
-        
-        # Move to previous month safely
-        if current_date.month == 1:
-            current_date = current_date.replace(year=current_date.year - 1, month=12, day=1)
-        else:
-            # Use day=1 to avoid "day out of range" errors when moving between months
-            current_date = current_date.replace(month=current_date.month - 1, day=1)
-    
-    if best_snapshot:
-        print(f"Using closest available snapshot from {closest_date.strftime('%Y-%m-%d')} ({best_date_diff} days difference)", file=sys.stderr)
-        return best_snapshot, closest_date
-    
-    raise SystemExit(f"No RouteViews snapshot found within 6 months of {date.strftime('%Y-%m-%d')}")
+# IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) carry this value above their low 32 bits.
+_IPV4_MAPPED = 0xFFFF
 
 
 class PyIPMetaProvider(BaseProvider):
-    """PyIPMeta-based provider for IP to ASN lookups."""
+    """PyIPMeta-based provider for IP to ASN lookups.
+    
+    libipmeta only loads the IPv4 pfx2as dataset, so IPv6 addresses are answered
+    from the routeviews6 snapshot through the NumPy range index, loaded on first use.
+    """
     
-    def __init__(self, snapshot_date: datetime) -> None:
+    def __init__(
+        self,
+        snapshot_date: datetime,
+        store: Optional[SnapshotStore] = None,
+        cache: Optional[LookupCache] = None
+    ) -> None:
         """Initialize the PyIPMeta provider.
         
         Args:
             snapshot_date: The date for which to fetch the RouteViews snapshot.
+            store: Optional local snapshot store; when set, snapshots are read from disk
+                instead of being streamed from CAIDA on every run.
+            cache: Cache for single-address lookups (default: a bounded address LRU).
+                Prefix caches get no spans from libipmeta and only cache addresses.
         """
-        super().__init__(snapshot_date)
-        self._ip_meta = None
+        super().__init__(snapshot_date, cache)
+        self.store = store
+        self.requested_date = snapshot_date
+        self.snapshot_date6: Optional[datetime] = None
+        self._ip_meta: Any = None
         self._initialized = False
+        self._index6: Optional[RangeIndex6] = None
+    
+    def prepare(self) -> None:
+        """Download the RouteViews snapshot into the snapshot store."""
+        if self.store is not None:
+            url_routeviews_snapshot, _ = find_routeviews_snapshot_url(self.snapshot_date, self.store)
+            self.store.fetch(url_routeviews_snapshot)
     
     def initialize(self) -> None:
         """Initialize PyIPMeta with the RouteViews snapshot."""
@@ -128,20 +64,93 @@ class PyIPMetaProvider(BaseProvider):
             raise SystemExit(
                 "PyIPMeta is not installed. Please install it from: "
                 "https://github.com/CAIDA/pyipmeta"
-            )
+            ) from None
         
         self._ip_meta = _pyipmeta.IpMeta()
         provider = self._ip_meta.get_provider_by_name("pfx2as")
-        url_routeviews_snapshot, actual_date = find_routeviews_snapshot_url(self.snapshot_date)
+        url_routeviews_snapshot, actual_date = find_routeviews_snapshot_url(self.snapshot_date, self.store)
         
         if url_routeviews_snapshot:
-            self._ip_meta.enable_provider(provider, f"-f {url_routeviews_snapshot}")
+            snapshot_location = url_routeviews_snapshot
+            if self.store is not None:
+                snapshot_location = str(self.store.fetch(url_routeviews_snapshot))
+            self._ip_meta.enable_provider(provider, f"-f {snapshot_location}")
             # Update our snapshot date to the actual date found
             self.snapshot_date = actual_date
             self._initialized = True
         else:
             raise SystemExit(f"No snapshot found for date: {self.snapshot_date}")
     
+    @property
+    def index6(self) -> RangeIndex6:
+        """The IPv6 range index, loaded on first use."""
+        if self._index6 is None:
+            index, self.snapshot_date6 = load_snapshot_index(self.requested_date, self.store, family=6)
+            assert isinstance(index, RangeIndex6)
+            self._index6 = index
+        return self._index6
+    
+    def _lookup_uncached_span(self, ip: str) -> Tuple[int, Optional[Span]]:
+        """Look up an address, with the range the answer holds for when it is IPv6.
+        
+        Args:
+            ip: The IP address to lookup.
+            
+        Returns:
+            Tuple of (ASN or 0 if not found, inclusive range of address keys with
+            the same answer, or None for IPv4 addresses answered by libipmeta).
+        """
+        key = address_key(ip)
+        if key is None or key < IPV6_KEY_OFFSET or (key - IPV6_KEY_OFFSET) >> 32 == _IPV4_MAPPED:
+            return self._lookup_uncached(ip), None
+        asn, first, last = self.index6.span(key - IPV6_KEY_OFFSET)
+        return asn, (first + IPV6_KEY_OFFSET, last + IPV6_KEY_OFFSET)
+    
+    def _lookup_record(self, ip: str) -> Tuple[List[int], int]:
+        """Look up the full origin set and matched prefix length of one address.
+        
+        Args:
+            ip: The IP address to lookup.
+            
+        Returns:
+            Tuple of (origin ASNs, empty if not found; prefix length, or ``NO_PREFIX``
+            when unknown).
+        """
+        key = address_key(ip)
+        if key is not None and key >= IPV6_KEY_OFFSET:
+            addr = key - IPV6_KEY_OFFSET
+            if addr >> 32 != _IPV4_MAPPED:
+                pair = np.array([[addr >> 64, addr & 0xFFFFFFFFFFFFFFFF]], dtype=np.uint64)
+                details = LookupDetails.from_table(self.index6.table, self.index6.lookup_rows_unique(pair))
+                return details.origins()[0], int(details.prefix_length[0])
+            ip = socket.inet_ntoa((addr & 0xFFFFFFFF).to_bytes(4, "big"))
+        
+        if not self._initialized:
+            self.initialize()
+        
+        lookup_result = self._ip_meta.lookup(ip)
+        if lookup_result:
+            (result,) = lookup_result
+            return list(result.get('asns') or []), NO_PREFIX
+        return [], NO_PREFIX
+    
+    def lookup_details(self, ips: Sequence[str]) -> LookupDetails:
+        """Lookup a batch of IP addresses with their full origin set.
+        
+        libipmeta reports every origin of a multi-origin prefix but not the
+        prefix itself, so prefixes are only known for IPv6 addresses.
+        
+        Args:
+            ips: The IP addresses to lookup.
+            
+        Returns:
+            The enriched results, one row per IP address.
+        """
+        records = [self._lookup_record(ip) for ip in ips]
+        details = LookupDetails.from_origin_lists([origins for origins, _ in records])
+        details.prefix_length = np.array([length for _, length in records], dtype=np.uint8)
+        return details
+    
     def _lookup_uncached(self, ip: str) -> int:
         """Perform the actual IP to ASN lookup using PyIPMeta.
         
@@ -151,6 +160,13 @@ class PyIPMetaProvider(BaseProvider):
         Returns:
             The ASN for the IP address, or 0 if not found.
         """
+        key = address_key(ip)
+        if key is not None and key >= IPV6_KEY_OFFSET:
+            addr = key - IPV6_KEY_OFFSET
+            if addr >> 32 != _IPV4_MAPPED:
+                return self.index6.span(addr)[0]
+            ip = socket.inet_ntoa((addr & 0xFFFFFFFF).to_bytes(4, "big"))
+        
         if not self._initialized:
             self.initialize()
             
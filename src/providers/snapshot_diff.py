@@ -0,0 +1,315 @@
+"""Prefix-level diffs between snapshots and incremental index updates.
+
+Consecutive RouteViews snapshots share almost all of their prefixes. A
+``SnapshotDelta`` records only the prefixes that were removed, added or changed
+origin set, so a rolling window of daily indexes can be kept as one base index
+plus small deltas, and each next index is produced without re-parsing its
+pfx2as file.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .binary_index import load_index, write_index
+from .origins import concat_ragged, ragged_rows_differ, take_ragged
+from .prefix_table import PrefixTable, RangeIndex, expand_runs
+
+_DELTA_VERSION = 2
+# Size of the address blocks ``apply_delta_to_index`` flattens again.
+BLOCK_BITS = 20
+
+
+def _split_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split ``PrefixTable.keys`` values back into (network, length) columns."""
+    return (keys >> np.uint64(8)).astype(np.uint32), (keys & np.uint64(0xFF)).astype(np.uint8)
+
+
+class SnapshotDelta:
+    """Prefixes removed, added and re-originated between two snapshots."""
+
+    def __init__(
+        self,
+        removed: np.ndarray,
+        upserted: PrefixTable,
+        base_date: Optional[datetime] = None,
+        target_date: Optional[datetime] = None,
+    ) -> None:
+        """Initialize the delta.
+
+        Args:
+            removed: Sorted ``PrefixTable.keys`` of prefixes that disappeared.
+            upserted: Prefixes that were added or whose origin set changed, with
+                their new origins.
+            base_date: Date of the snapshot the delta applies to.
+            target_date: Date of the snapshot the delta produces.
+        """
+        self.removed = np.asarray(removed, dtype=np.uint64)
+        self.upserted = upserted
+        self.base_date = base_date
+        self.target_date = target_date
+
+    def __len__(self) -> int:
+        return len(self.removed) + len(self.upserted)
+
+    def save(self, path: Path) -> None:
+        """Write the delta to a compressed ``.npz`` file.
+
+        Args:
+            path: Destination path.
+        """
+        dates = [d.strftime("%Y-%m-%d") if d else "" for d in (self.base_date, self.target_date)]
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=np.array([_DELTA_VERSION]),
+                dates=np.array(dates),
+                removed=self.removed,
+                network=self.upserted.network,
+                length=self.upserted.length,
+                asn=self.upserted.asn,
+                origin_offsets=self.upserted.origin_offsets,
+                origin_pool=self.upserted.origin_pool,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "SnapshotDelta":
+        """Read a delta written by ``save``.
+
+        Args:
+            path: Path of the delta file.
+
+        Returns:
+            The delta.
+
+        Raises:
+            ValueError: If the file has an unsupported version.
+        """
+        with np.load(path) as data:
+            version = int(data["version"][0])
+            if version != _DELTA_VERSION:
+                raise ValueError(f"{path} has delta version {version}, expected {_DELTA_VERSION}")
+            base, target = (datetime.strptime(d, "%Y-%m-%d") if d else None for d in data["dates"].tolist())
+            upserted = PrefixTable.from_sorted(
+                data["network"], data["length"], data["asn"], data["origin_offsets"], data["origin_pool"]
+            )
+            return cls(data["removed"], upserted, base, target)
+
+
+def diff_tables(
+    old: PrefixTable,
+    new: PrefixTable,
+    base_date: Optional[datetime] = None,
+    target_date: Optional[datetime] = None,
+) -> SnapshotDelta:
+    """Compute the prefix-level difference between two snapshots.
+
+    Args:
+        old: Prefix table of the earlier snapshot.
+        new: Prefix table of the later snapshot.
+        base_date: Date of the earlier snapshot.
+        target_date: Date of the later snapshot.
+
+    Returns:
+        The delta that turns ``old`` into ``new``.
+    """
+    old_keys, new_keys = old.keys, new.keys
+    in_old = np.isin(new_keys, old_keys, assume_unique=True)
+    removed = old_keys[~np.isin(old_keys, new_keys, assume_unique=True)]
+
+    # Both key arrays are sorted, so matching rows can be found by binary search.
+    old_rows = np.searchsorted(old_keys, new_keys[in_old])
+    changed = np.zeros(len(new_keys), dtype=bool)
+    changed[in_old] = ragged_rows_differ(
+        (old.origin_offsets, old.origin_pool), old_rows,
+        (new.origin_offsets, new.origin_pool), np.flatnonzero(in_old),
+    )
+    upsert = ~in_old | changed
+    upserted = PrefixTable.from_sorted(
+        new.network[upsert], new.length[upsert], new.asn[upsert],
+        *take_ragged(new.origin_offsets, new.origin_pool, np.flatnonzero(upsert))
+    )
+    return SnapshotDelta(removed, upserted, base_date, target_date)
+
+
+def _merge_delta(table: PrefixTable, delta: SnapshotDelta) -> Tuple[PrefixTable, np.ndarray]:
+    """Apply a delta to a prefix table, tracking where the kept rows went.
+
+    The rows of ``table`` and ``delta.upserted`` are both sorted, so the merged
+    position of every row is found by binary search instead of sorting again.
+
+    Returns:
+        Tuple of (the target prefix table, int64 row in it of every row of
+        ``table``, -1 for removed and replaced rows).
+    """
+    keys, upserted = table.keys, delta.upserted.keys
+    drop = np.concatenate([delta.removed, upserted])
+    pos = np.minimum(np.searchsorted(keys, drop), max(len(keys) - 1, 0))
+    keep = np.ones(len(keys), dtype=bool)
+    if len(keys):
+        keep[pos[keys[pos] == drop]] = False
+    kept = np.flatnonzero(keep)
+
+    # Each row lands after the rows of the other side with smaller keys.
+    kept_to = np.arange(len(kept)) + np.searchsorted(upserted, keys[kept])
+    upserted_to = np.arange(len(upserted)) + np.searchsorted(keys[kept], upserted)
+    source = np.empty(len(kept) + len(upserted), dtype=np.int64)
+    source[kept_to] = kept
+    source[upserted_to] = len(keys) + np.arange(len(upserted))
+
+    network = np.concatenate([table.network, delta.upserted.network])[source]
+    length = np.concatenate([table.length, delta.upserted.length])[source]
+    asn = np.concatenate([table.asn, delta.upserted.asn])[source]
+    origins = concat_ragged([
+        (table.origin_offsets, table.origin_pool),
+        (delta.upserted.origin_offsets, delta.upserted.origin_pool),
+    ])
+    new_rows = np.full(len(keys), -1, dtype=np.int64)
+    new_rows[kept] = kept_to
+    return PrefixTable.from_sorted(network, length, asn, *take_ragged(*origins, source)), new_rows
+
+
+def apply_delta(table: PrefixTable, delta: SnapshotDelta) -> PrefixTable:
+    """Apply a delta to a prefix table.
+
+    Args:
+        table: Prefix table of the delta's base snapshot.
+        delta: The delta to apply.
+
+    Returns:
+        The prefix table of the delta's target snapshot.
+    """
+    return _merge_delta(table, delta)[0]
+
+
+def _changed_blocks(delta: SnapshotDelta) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the ``/BLOCK_BITS`` address blocks overlapping a prefix of a delta.
+
+    Returns:
+        Tuple of uint32 (first, last) addresses of sorted, disjoint runs of
+        adjacent changed blocks.
+    """
+    removed = PrefixTable.from_sorted(*_split_keys(delta.removed), np.zeros(len(delta.removed), dtype=np.uint32))
+    first, last = (np.concatenate(pair).astype(np.int64) for pair in zip(removed.ranges(), delta.upserted.ranges()))
+    mask = (1 << (32 - BLOCK_BITS)) - 1
+    order = np.argsort(first, kind="stable")
+    first, last = first[order] & ~mask, last[order] | mask
+    # A run starts where no earlier prefix's blocks reach the previous address.
+    new_run = np.ones(len(first), dtype=bool)
+    new_run[1:] = first[1:] > np.maximum.accumulate(last)[:-1] + 1
+    run_starts = np.flatnonzero(new_run)
+    return first[run_starts].astype(np.uint32), np.maximum.reduceat(last, run_starts).astype(np.uint32)
+
+
+def _clip(index: RangeIndex, first: np.ndarray, last: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cut the ranges of an index to sorted, disjoint address intervals.
+
+    Returns:
+        Tuple of uint32 (starts, ends, table rows) of the pieces, sorted.
+    """
+    query, pos, _ = index.intersect(first, last)
+    return (
+        np.maximum(index.starts[pos], first[query]),
+        np.minimum(index.ends[pos], last[query]),
+        index.prefix[pos],
+    )
+
+
+def apply_delta_to_index(index: RangeIndex, delta: SnapshotDelta) -> RangeIndex:
+    """Produce the range index of the delta's target snapshot.
+
+    The address space is cut into ``/BLOCK_BITS`` blocks, and only the blocks
+    overlapping a removed or upserted prefix are flattened again, from the
+    prefixes of the new table overlapping them. Every other address keeps the
+    prefix that owned it, renumbered to its row in the new table.
+
+    Args:
+        index: Range index of the delta's base snapshot (in memory or memory-mapped).
+        delta: The delta to apply.
+
+    Returns:
+        The new in-memory range index, equal to ``RangeIndex.build`` of the target table.
+    """
+    table, new_rows = _merge_delta(index.table, delta)
+    if not len(delta):
+        return RangeIndex(table, index.starts, index.ends, new_rows[index.prefix].astype(np.uint32), index.range_asn)
+    if not len(table):
+        return RangeIndex.build(table)
+    first, last = _changed_blocks(delta)
+
+    # Prefixes of at least BLOCK_BITS lie inside one block and are found by
+    # their network; shorter ones are few, and each is matched against the
+    # first run of blocks ending at or after its start.
+    selected = np.zeros(len(table), dtype=bool)
+    _, inside = expand_runs(
+        np.searchsorted(table.network, first, side="left"), np.searchsorted(table.network, last, side="right")
+    )
+    selected[inside] = True
+    short = np.flatnonzero(table.length < BLOCK_BITS)
+    short_first, short_last = table.ranges(short)
+    run = np.searchsorted(last, short_first, side="left")
+    later = run < len(last)
+    selected[short[later][first[run[later]] <= short_last[later]]] = True
+    rows = np.flatnonzero(selected)
+    sub = RangeIndex.build(PrefixTable.from_sorted(
+        table.network[rows], table.length[rows], table.asn[rows],
+        *take_ragged(table.origin_offsets, table.origin_pool, rows)
+    ))
+    sub_starts, sub_ends, sub_rows = _clip(sub, first, last)
+    sub_rows = rows[sub_rows]
+
+    # Old ranges reaching into a changed block keep their parts outside of it.
+    lo = np.searchsorted(index.ends, first, side="left")
+    hi = np.searchsorted(index.starts, last, side="right")
+    _, touched = expand_runs(lo, hi)
+    untouched = np.ones(len(index), dtype=bool)
+    untouched[touched] = False
+    touched = np.unique(touched)
+    gap_first = np.concatenate([[0], last.astype(np.int64) + 1])
+    gap_last = np.concatenate([first.astype(np.int64) - 1, [0xFFFFFFFF]])
+    keep_gap = gap_first <= gap_last
+    outside = RangeIndex(index.table, index.starts[touched], index.ends[touched], index.prefix[touched])
+    old_starts, old_ends, old_rows = _clip(
+        outside, gap_first[keep_gap].astype(np.uint32), gap_last[keep_gap].astype(np.uint32)
+    )
+
+    # Splice the new and cut pieces in among the untouched ranges, in address order.
+    starts = np.concatenate([index.starts[untouched], old_starts, sub_starts])
+    ends = np.concatenate([index.ends[untouched], old_ends, sub_ends])
+    owner = np.concatenate([new_rows[index.prefix[untouched]], new_rows[old_rows], sub_rows])
+    order = np.argsort(starts, kind="stable")
+    starts, ends, owner = starts[order], ends[order], owner[order]
+
+    # Merge pieces of one prefix that were cut at block boundaries.
+    new_run = np.ones(len(owner), dtype=bool)
+    new_run[1:] = (owner[1:] != owner[:-1]) | (starts[1:].astype(np.int64) != ends[:-1].astype(np.int64) + 1)
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], len(owner)) - 1
+    return RangeIndex(table, starts[run_starts], ends[run_ends], owner[run_starts].astype(np.uint32))
+
+
+def apply_delta_to_file(base_path: Path, delta: SnapshotDelta, dest: Path) -> RangeIndex:
+    """Apply a delta to an on-disk binary index and write the next index.
+
+    Args:
+        base_path: Binary index of the delta's base snapshot.
+        delta: The delta to apply.
+        dest: Path of the binary index to write.
+
+    Returns:
+        The new range index.
+
+    Raises:
+        ValueError: If the base index is not an IPv4 index of the delta's base snapshot.
+    """
+    index, base_date = load_index(base_path)
+    if not isinstance(index, RangeIndex):
+        raise ValueError(f"{base_path} is not an IPv4 index")
+    if delta.base_date is not None and delta.base_date != base_date:
+        raise ValueError(
+            f"Delta applies to {delta.base_date:%Y-%m-%d}, but {base_path} is {base_date:%Y-%m-%d}"
+        )
+    new_index = apply_delta_to_index(index, delta)
+    write_index(new_index, delta.target_date or base_date, dest)
+    return new_index
@@ -0,0 +1,324 @@
+"""Local content-addressed store for RouteViews prefix2as snapshots."""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .. import metrics
+
+CACHE_DIR_ENV = "MAP_IP_TO_ASN_CACHE_DIR"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Date resolutions that fell back to an older snapshot are only trusted for this
+# long, since the exact snapshot may be published later the same day.
+FALLBACK_TTL_SECONDS = 24 * 60 * 60
+_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    """Return the default snapshot store directory.
+
+    Uses ``$MAP_IP_TO_ASN_CACHE_DIR`` when set, otherwise ``$XDG_CACHE_HOME`` or
+    ``~/.cache``.
+
+    Returns:
+        Path to the store directory.
+    """
+    env_dir = os.environ.get(CACHE_DIR_ENV)
+    if env_dir:
+        return Path(env_dir).expanduser()
+    xdg_cache = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg_cache).expanduser() if xdg_cache else Path.home() / ".cache"
+    return base / "map-ip-to-asn"
+
+
+def sha256_file(path: Path) -> str:
+    """Compute the SHA-256 hex digest of a file.
+
+    Args:
+        path: Path of the file to hash.
+
+    Returns:
+        The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write a file atomically by renaming a temporary file over it.
+
+    Args:
+        path: Destination path; its directory must exist.
+        data: File contents.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class SnapshotStore:
+    """Content-addressed on-disk cache of downloaded snapshot files.
+
+    Files are stored under ``objects/<sha256>`` and a small JSON catalog maps
+    source URLs to digests and requested dates to resolved snapshots. Least
+    recently used objects are evicted once the store grows beyond ``max_bytes``;
+    use is tracked in the access time, so the modification time and size recorded
+    when an object is stored tell whether it has changed since.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Initialize the store.
+
+        Args:
+            root: Directory holding the store (default: ``default_cache_dir()``).
+            max_bytes: Size cap for stored objects, in bytes.
+        """
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self._catalog_path = self.root / "catalog.json"
+        self._lock_path = self.root / ".lock"
+
+    def _ensure_dirs(self) -> None:
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Serialize read-modify-write updates of store files across processes.
+
+        Only effective where ``fcntl`` exists.
+        """
+        self._ensure_dirs()
+        try:
+            import fcntl
+        except ImportError:  # pragma: no cover - non-POSIX platforms
+            yield
+            return
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_catalog(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._catalog_path, "r") as f:
+                catalog = json.load(f)
+        except (FileNotFoundError, ValueError):
+            catalog = {}
+        catalog.setdefault("urls", {})
+        catalog.setdefault("dates", {})
+        return catalog  # type: ignore[no-any-return]
+
+    def _write_catalog(self, catalog: Dict[str, Dict[str, Any]]) -> None:
+        atomic_write_bytes(self._catalog_path, json.dumps(catalog, indent=1).encode())
+
+    def object_path(self, digest: str) -> Path:
+        """Return the path where an object with the given digest is stored."""
+        return self.objects_dir / digest
+
+    def derived_path(self, digest: str, kind: str) -> Path:
+        """Return the path of an artifact derived from a stored object.
+
+        Derived artifacts (such as compiled indexes) live next to the objects and
+        are subject to the same size cap and LRU eviction.
+
+        Args:
+            digest: Digest of the source object.
+            kind: Artifact kind, used as the file suffix.
+
+        Returns:
+            Path of the artifact (which may not exist yet).
+        """
+        self._ensure_dirs()
+        return self.objects_dir / f"{digest}.{kind}"
+
+    def digest(self, url: str) -> Optional[str]:
+        """Return the digest recorded for a URL, whether or not its object is still stored."""
+        entry = self._read_catalog()["urls"].get(url)
+        return entry["sha256"] if entry else None
+
+    def touch(self, path: Path) -> None:
+        """Mark a stored file as recently used, keeping its modification time."""
+        os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+
+    @staticmethod
+    def _file_entry(digest: str, path: Path) -> Dict[str, Any]:
+        stat = path.stat()
+        return {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @staticmethod
+    def _date_key(date: datetime, dataset: Optional[str]) -> str:
+        """Catalog key of a requested date; IPv4 dates keep their unprefixed keys."""
+        key = date.strftime("%Y-%m-%d")
+        return f"{dataset}/{key}" if dataset else key
+
+    def resolve(self, date: datetime, dataset: Optional[str] = None) -> Optional[Tuple[str, datetime]]:
+        """Return a previously resolved snapshot for a requested date.
+
+        Args:
+            date: The requested snapshot date.
+            dataset: Dataset the date was resolved in (default: the IPv4 prefix2as dataset).
+
+        Returns:
+            Tuple of (snapshot URL, actual snapshot date), or None if the date has
+            not been resolved before or nothing derived from its snapshot is stored.
+        """
+        catalog = self._read_catalog()
+        entry = catalog["dates"].get(self._date_key(date, dataset))
+        if not entry:
+            return None
+        if not entry.get("exact") and time.time() - entry.get("resolved_at", 0) > FALLBACK_TTL_SECONDS:
+            return None
+        url = entry["url"]
+        digest = self.digest(url)
+        # The raw snapshot may have been evicted while an index derived from it is kept.
+        if digest is None or not any(self.objects_dir.glob(f"{digest}*")):
+            return None
+        return url, datetime.strptime(entry["date"], "%Y-%m-%d")
+
+    def remember(self, requested: datetime, url: str, actual: datetime, dataset: Optional[str] = None) -> None:
+        """Record which snapshot a requested date resolved to.
+
+        Args:
+            requested: The date that was requested.
+            url: URL of the snapshot it resolved to.
+            actual: Date of that snapshot.
+            dataset: Dataset the date was resolved in (default: the IPv4 prefix2as dataset).
+        """
+        with self.locked():
+            catalog = self._read_catalog()
+            catalog["dates"][self._date_key(requested, dataset)] = {
+                "url": url,
+                "date": actual.strftime("%Y-%m-%d"),
+                "exact": requested.date() == actual.date(),
+                "resolved_at": time.time(),
+            }
+            self._write_catalog(catalog)
+
+    def get(self, url: str, verify: bool = True) -> Optional[Path]:
+        """Return the local path of a stored snapshot, marking it recently used.
+
+        Args:
+            url: Source URL of the snapshot.
+            verify: Whether to check the file contents against its digest. The
+                file is only hashed again if its size or modification time
+                differs from the ones recorded when it was stored.
+
+        Returns:
+            Path to the local copy, or None if it is not stored or is corrupt.
+        """
+        entry = self._read_catalog()["urls"].get(url)
+        if not entry:
+            return None
+        path = self.object_path(entry["sha256"])
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if verify and (stat.st_size, stat.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+            if sha256_file(path) != entry["sha256"]:
+                print(f"Discarding corrupt cached snapshot {path}", file=sys.stderr)
+                path.unlink(missing_ok=True)
+                return None
+            with self.locked():
+                catalog = self._read_catalog()
+                catalog["urls"][url] = self._file_entry(entry["sha256"], path)
+                self._write_catalog(catalog)
+        self.touch(path)
+        return path
+
+    def fetch(self, url: str) -> Path:
+        """Return a local copy of a snapshot, downloading it on a cache miss.
+
+        Args:
+            url: Source URL of the snapshot.
+
+        Returns:
+            Path to the local copy.
+
+        Raises:
+            requests.RequestException: If the download fails.
+        """
+        path = self.get(url)
+        if path is not None:
+            metrics.incr("snapshot_store_hits")
+            return path
+
+        metrics.incr("snapshot_store_misses")
+        import requests
+
+        self._ensure_dirs()
+        digest = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f, metrics.span("download"), \
+                    requests.get(url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    metrics.incr("snapshot_bytes_downloaded", len(chunk))
+            return self.add_file(url, Path(tmp_name), digest.hexdigest())
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+
+    def add_file(self, url: str, source: Path, digest: Optional[str] = None) -> Path:
+        """Move a file into the store and register it under a URL.
+
+        Args:
+            url: Source URL the file was obtained from.
+            source: Path of the file; it is moved, not copied.
+            digest: Precomputed SHA-256 of the file, if known.
+
+        Returns:
+            Path of the stored object.
+        """
+        self._ensure_dirs()
+        digest = digest or sha256_file(source)
+        path = self.object_path(digest)
+        os.replace(source, path)
+        with self.locked():
+            catalog = self._read_catalog()
+            catalog["urls"][url] = self._file_entry(digest, path)
+            self._write_catalog(catalog)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Remove least recently used objects until the store fits its size cap.
+
+        Args:
+            keep: An object that must survive eviction (usually the one just added).
+        """
+        if not self.objects_dir.exists():
+            return
+        entries = []
+        for path in self.objects_dir.iterdir():
+            if path.name.startswith("."):
+                continue
+            stat = path.stat()
+            entries.append((stat.st_atime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,477 @@
+"""Subnet and range-level lookups.
+
+Range input lines hold a single address, a CIDR prefix (``10.1.2.0/24``) or an
+inclusive range (``10.1.2.5-10.1.2.99``). Each becomes an interval of addresses
+that is intersected with the ranges of a ``RangeIndex``, whose sorted bounds
+give the overlapping ranges with two binary searches: addresses are never
+enumerated, so a /8 costs about as much as a /32.
+
+The result has one row per (query, prefix) pair, where the prefix is the
+longest match of at least one address of the query, with the number of the
+query's addresses it answers for and whether it covers the whole query. The
+addresses no prefix matches are reported as one unrouted row (ASN 0, no prefix).
+"""
+from datetime import datetime
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from .columnar import TableBatch
+from .ipparse import (
+    FAMILY_INVALID,
+    FAMILY_IPV4,
+    FAMILY_IPV6,
+    InvalidLine,
+    format_ipv4,
+    format_ipv6,
+    parse_ips,
+)
+from .providers.origins import LookupDetails
+from .readers import iter_input_lines
+
+if TYPE_CHECKING:
+    from .providers.prefix_table import RangeIndex
+    from .providers.prefix_table6 import RangeIndex6
+
+# Lines parsed at a time by ``iter_parsed_ranges``.
+CHUNK_LINES = 100_000
+
+_ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+_SINGLE, _PREFIX, _RANGE = 0, 1, 2
+
+
+class InvalidRange(InvalidLine):
+    """An input line that is not an address, prefix or range."""
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return f"line {self.line}: invalid address, prefix or range: {self.text!r}"
+
+
+def _parse_points(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse one address per entry, as for single-address input.
+
+    Returns:
+        Tuple of (uint8 family per entry, ``FAMILY_INVALID`` where it is not an
+        address, and ``(n, 2)`` uint64 (high, low) addresses, IPv4 in the low word).
+    """
+    parsed = parse_ips(texts)
+    rows = parsed.line - 1
+    family = np.full(len(texts), FAMILY_INVALID, dtype=np.uint8)
+    family[rows] = parsed.family
+    addrs = np.zeros((len(texts), 2), dtype=np.uint64)
+    addrs[rows[parsed.v4_rows], 1] = parsed.v4
+    addrs[rows[parsed.v6_rows]] = parsed.v6
+    return family, addrs
+
+
+def _host_masks(host_bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """High and low words of the mask of the ``host_bits`` lowest bits of 128-bit values."""
+    lo_bits = np.clip(host_bits, 0, 64).astype(np.uint64)
+    hi_bits = np.clip(host_bits - 64, 0, 64).astype(np.uint64)
+
+    def mask(bits: np.ndarray) -> np.ndarray:
+        return np.where(bits == 64, _ALL_ONES, (np.uint64(1) << np.minimum(bits, 63)) - np.uint64(1))  # type: ignore[no-any-return]
+
+    return mask(hi_bits), mask(lo_bits)
+
+
+def _format(family: np.ndarray, addrs: np.ndarray) -> List[str]:
+    """Format (high, low) address pairs of either family."""
+    out = np.empty(len(family), dtype=object)
+    v4 = family == FAMILY_IPV4
+    out[v4] = format_ipv4(addrs[v4, 1].astype(np.uint32))
+    out[~v4] = format_ipv6(addrs[~v4])
+    return out.tolist()  # type: ignore[no-any-return]
+
+
+class ParsedRanges:
+    """Address intervals parsed from range input, one row per valid line.
+
+    Both families share the ``first``/``last`` columns as (high, low) ``uint64``
+    pairs, IPv4 intervals in the low word. ``text`` is the normalized query of
+    every row: prefixes with their host bits cleared, addresses in canonical form.
+    """
+
+    def __init__(
+        self,
+        line: np.ndarray,
+        text: List[str],
+        family: np.ndarray,
+        first: np.ndarray,
+        last: np.ndarray,
+        errors: List[InvalidLine],
+    ) -> None:
+        """Initialize from parsed columns.
+
+        Args:
+            line: int64 input line number (1-based) of every row.
+            text: Normalized query of every row.
+            family: uint8 address family of every row.
+            first: ``(n, 2)`` uint64 first address of every row.
+            last: ``(n, 2)`` uint64 last address of every row.
+            errors: The invalid lines, in input order.
+        """
+        self.line = line
+        self.text = text
+        self.family = family
+        self.first = first
+        self.last = last
+        self.errors = errors
+
+    def __len__(self) -> int:
+        return len(self.family)
+
+    def rows(self, family: int) -> np.ndarray:
+        """int64 rows holding intervals of one address family."""
+        return np.flatnonzero(self.family == family)
+
+
+def parse_ranges(lines: Sequence[str], first_line: int = 1) -> ParsedRanges:
+    """Parse addresses, CIDR prefixes and address ranges, one per line.
+
+    Surrounding whitespace is stripped and blank lines are skipped. The address
+    parts go through the bulk address parser, so IPv4-mapped IPv6 addresses are
+    read as IPv4 (prefixes of them must then be at least /96).
+
+    Args:
+        lines: Input lines.
+        first_line: Line number of the first entry of ``lines``.
+
+    Returns:
+        The parsed rows; invalid lines are collected as ``InvalidRange`` errors.
+    """
+    numbers: List[int] = []
+    texts: List[str] = []
+    heads: List[str] = []
+    tails: List[str] = []
+    kinds: List[int] = []
+    lengths: List[int] = []
+    for number, line in enumerate(lines, first_line):
+        entry = line.strip()
+        if not entry:
+            continue
+        numbers.append(number)
+        texts.append(entry)
+        head, sep, tail = entry.partition("/")
+        entry_length = 0
+        if sep:
+            entry_kind = _PREFIX
+            tail = tail.strip()
+            if tail.isascii() and tail.isdigit() and len(tail) <= 3:
+                entry_length = int(tail)
+            else:
+                head = ""
+            tail = ""
+        else:
+            head, sep, tail = entry.partition("-")
+            entry_kind = _RANGE if sep else _SINGLE
+            if sep and not tail.strip():
+                head = ""
+        heads.append(head.strip())
+        tails.append(tail.strip())
+        kinds.append(entry_kind)
+        lengths.append(entry_length)
+
+    family, first = _parse_points(heads)
+    tail_family, last = _parse_points(tails)
+    kind = np.array(kinds, dtype=np.int64)
+    length = np.array(lengths, dtype=np.int64)
+    ok = family != FAMILY_INVALID
+
+    # Prefixes: IPv4-mapped networks are written in IPv6 bits; the rest must fit the family.
+    is_prefix = kind == _PREFIX
+    written_v6 = np.array([":" in head for head in heads], dtype=bool)
+    mapped = is_prefix & (family == FAMILY_IPV4) & written_v6
+    ok &= ~mapped | (length >= 96)
+    length = np.where(mapped, length - 96, length)
+    bits = np.where(family == FAMILY_IPV4, 32, 128)
+    ok &= ~is_prefix | (length <= bits)
+    hi_mask, lo_mask = _host_masks(np.where(is_prefix & ok, bits - length, 0))
+    first[:, 0] &= ~hi_mask
+    first[:, 1] &= ~lo_mask
+
+    # Ranges: both ends of the same family, in order.
+    is_range = kind == _RANGE
+    ok &= ~is_range | (
+        (tail_family == family)
+        & ((first[:, 0] < last[:, 0]) | ((first[:, 0] == last[:, 0]) & (first[:, 1] <= last[:, 1])))
+    )
+    last = np.where(is_range[:, None], last, first)
+    last[:, 0] |= hi_mask
+    last[:, 1] |= lo_mask
+
+    errors: List[InvalidLine] = [
+        InvalidRange(numbers[i], texts[i]) for i in np.flatnonzero(~ok).tolist()
+    ]
+    keep = np.flatnonzero(ok)
+    family, first, last = family[keep], first[keep], last[keep]
+    kind, length = kind[keep], length[keep]
+    starts = _format(family, first)
+    is_range = kind == _RANGE
+    ends = _format(family[is_range], last[is_range])
+    prefix_lengths = length.tolist()
+    ends_iter = iter(ends)
+    text: List[str] = []
+    for i, row_kind in enumerate(kind.tolist()):
+        if row_kind == _PREFIX:
+            text.append(f"{starts[i]}/{prefix_lengths[i]}")
+        elif row_kind == _RANGE:
+            text.append(f"{starts[i]}-{next(ends_iter)}")
+        else:
+            text.append(starts[i])
+    line_numbers = np.array(numbers, dtype=np.int64)[keep]
+    return ParsedRanges(line_numbers, text, family, first, last, errors)
+
+
+def iter_parsed_ranges(
+    file_path: str,
+    chunk_lines: int = CHUNK_LINES,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+) -> Iterator[ParsedRanges]:
+    """Parse an input of addresses, prefixes and ranges chunk by chunk.
+
+    Args:
+        file_path: Path, directory or glob of the files (one entry per line).
+        chunk_lines: Number of lines parsed at a time.
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+
+    Yields:
+        The parsed rows of each chunk, with line numbers running across all files.
+
+    Raises:
+        FileNotFoundError: If no file matches.
+    """
+    lines = iter_input_lines(file_path, column, read_workers)
+    line = 1
+    while True:
+        chunk = [text.decode("utf-8", errors="replace") for text in islice(lines, chunk_lines)]
+        if not chunk:
+            return
+        yield parse_ranges(chunk, line)
+        line += len(chunk)
+
+
+class RangeDetails:
+    """Prefixes answering for the addresses of a batch of range queries.
+
+    One row per (query, prefix) pair, ordered by query and then by the first
+    address the prefix answers for, followed by the query's unrouted row if some
+    of its addresses match no prefix. Address counts are Python ints, as an IPv6
+    query can hold up to 2**128 addresses.
+    """
+
+    def __init__(
+        self,
+        query: np.ndarray,
+        details: LookupDetails,
+        prefixes: List[Optional[str]],
+        addresses: np.ndarray,
+        covers: np.ndarray,
+    ) -> None:
+        """Initialize from columns.
+
+        Args:
+            query: int64 query (row of the ``ParsedRanges``) of every row.
+            details: ASN, prefix length and origin set of every row.
+            prefixes: Network address of every row's prefix, None for unrouted rows.
+            addresses: Object array with the number of the query's addresses of every row.
+            covers: Boolean mask of the rows whose prefix contains the whole query.
+        """
+        self.query = np.asarray(query, dtype=np.int64)
+        self.details = details
+        self.prefixes = prefixes
+        self.addresses = addresses
+        self.covers = np.asarray(covers, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.query)
+
+    @classmethod
+    def empty(cls) -> "RangeDetails":
+        """Details of no rows."""
+        return cls(
+            np.zeros(0, dtype=np.int64), LookupDetails.from_asns([]), [], np.zeros(0, dtype=object),
+            np.zeros(0, dtype=bool)
+        )
+
+    @classmethod
+    def from_index(
+        cls,
+        index: Union["RangeIndex", "RangeIndex6"],
+        queries: np.ndarray,
+        first: np.ndarray,
+        last: np.ndarray,
+    ) -> "RangeDetails":
+        """Resolve intervals of one address family against its range index.
+
+        Overlapping index ranges are summed per owning prefix, so a prefix split
+        by more specific ones still gets one row.
+
+        Args:
+            index: A ``RangeIndex`` or ``RangeIndex6``.
+            queries: int64 query number reported for each interval.
+            first: ``(n, 2)`` uint64 first address of each interval.
+            last: ``(n, 2)`` uint64 last address of each interval.
+
+        Returns:
+            The details of the intervals, by query.
+        """
+        if index.family == 4:
+            query, pos, counts = index.intersect(
+                first[:, 1].astype(np.uint32), last[:, 1].astype(np.uint32)
+            )
+            sizes = (last[:, 1] - first[:, 1] + np.uint64(1)).astype(object)
+            counts = counts.astype(object)
+        else:
+            query, pos, counts = index.intersect(first, last)
+            sizes = np.empty(len(first), dtype=object)
+            sizes[:] = [
+                ((last_hi - first_hi) << 64) + last_lo - first_lo + 1
+                for (first_hi, first_lo), (last_hi, last_lo) in zip(first.tolist(), last.tolist())
+            ]
+        table_rows = index.prefix[pos].astype(np.int64)
+
+        # One group per (query, prefix); overlaps are already sorted by query and address.
+        order = np.lexsort((table_rows, query))
+        query, pos, table_rows, counts = query[order], pos[order], table_rows[order], counts[order]
+        new_group = np.ones(len(query), dtype=bool)
+        new_group[1:] = (query[1:] != query[:-1]) | (table_rows[1:] != table_rows[:-1])
+        starts = np.flatnonzero(new_group)
+        group_counts = np.add.reduceat(counts, starts) if len(starts) else counts[:0]
+        group_query, group_rows = query[starts], table_rows[starts]
+        by_address = np.lexsort((pos[starts], group_query))
+        group_query, group_rows = group_query[by_address], group_rows[by_address]
+        group_counts = group_counts[by_address]
+
+        covered = np.zeros(len(first), dtype=object)
+        np.add.at(covered, group_query, group_counts)
+        unrouted = sizes - covered
+        gaps = np.flatnonzero(unrouted != 0)
+        out_query = np.concatenate([group_query, gaps])
+        out_rows = np.concatenate([group_rows, np.full(len(gaps), -1, dtype=np.int64)])
+        out_counts = np.concatenate([group_counts, unrouted[gaps]])
+        order = np.argsort(out_query, kind="stable")
+        out_query, out_rows, out_counts = out_query[order], out_rows[order], out_counts[order]
+
+        found = out_rows >= 0
+        safe = np.where(found, out_rows, 0)
+        table = index.table
+        if len(table):
+            start, end = table.ranges(safe)
+            if isinstance(start, np.ndarray):
+                # IPv4 ranges come as single words; pad them to (high, low) pairs.
+                high = np.zeros(len(safe), dtype=np.uint64)
+                start_pairs = np.stack((high, start), axis=1)
+                end_pairs = np.stack((high, end), axis=1)
+            else:
+                start_pairs = np.stack(start, axis=1)
+                end_pairs = np.stack(end, axis=1)  # type: ignore[arg-type]
+        else:
+            start_pairs = end_pairs = np.zeros((len(safe), 2), dtype=np.uint64)
+        family = np.full(len(safe), FAMILY_IPV4 if index.family == 4 else FAMILY_IPV6, dtype=np.uint8)
+        networks: List[Optional[str]] = list(_format(family, start_pairs))
+        for row in np.flatnonzero(~found).tolist():
+            networks[row] = None
+        q_first, q_last = first[out_query], last[out_query]
+        starts_before = (start_pairs[:, 0] < q_first[:, 0]) | (
+            (start_pairs[:, 0] == q_first[:, 0]) & (start_pairs[:, 1] <= q_first[:, 1])
+        )
+        ends_after = (end_pairs[:, 0] > q_last[:, 0]) | (
+            (end_pairs[:, 0] == q_last[:, 0]) & (end_pairs[:, 1] >= q_last[:, 1])
+        )
+        return cls(
+            np.asarray(queries, dtype=np.int64)[out_query],
+            LookupDetails.from_table(table, out_rows),
+            networks,
+            out_counts,
+            found & starts_before & ends_after,
+        )
+
+    @classmethod
+    def merge(cls, parts: Iterable["RangeDetails"]) -> "RangeDetails":
+        """Combine the details of disjoint sets of queries, ordered by query."""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        query = np.concatenate([part.query for part in parts])
+        order = np.argsort(query, kind="stable")
+        prefixes = [prefix for part in parts for prefix in part.prefixes]
+        return cls(
+            query[order],
+            LookupDetails.concat(part.details for part in parts).take(order),
+            [prefixes[i] for i in order.tolist()],
+            np.concatenate([part.addresses for part in parts])[order],
+            np.concatenate([part.covers for part in parts])[order],
+        )
+
+
+class RangeBatch(TableBatch):
+    """Results of a batch of range lookups, one row per (query, prefix) pair.
+
+    ``total`` counts rows, not queries.
+    """
+
+    FIELDNAMES = (
+        "query", "asn", "timestamp", "provider", "prefix", "prefix_length", "origins", "addresses", "covers",
+    )
+
+    def __init__(
+        self,
+        queries: List[str],
+        details: RangeDetails,
+        provider: str,
+        lookup_date: datetime,
+        timestamp: Optional[datetime] = None,
+    ) -> None:
+        """Initialize the batch.
+
+        Args:
+            queries: Normalized text of every query, indexed by ``details.query``.
+            details: The resolved rows.
+            provider: Name of the provider that answered.
+            lookup_date: RouteViews snapshot date used.
+            timestamp: Lookup timestamp shared by all rows (default: now).
+        """
+        super().__init__(provider, lookup_date, timestamp)
+        self.queries = queries
+        self.details = details
+
+    @property
+    def asns(self) -> np.ndarray:
+        """uint32 ASN of every row, 0 for unrouted rows."""
+        return self.details.details.asns
+
+    def columns(self) -> Dict[str, List[Any]]:
+        """Return the JSON-ready columns; address counts are exact Python ints."""
+        details = self.details
+        prefixes = details.prefixes
+        return {
+            "query": [self.queries[i] for i in details.query.tolist()],
+            "asn": self.asns.tolist(),
+            "prefix": prefixes,
+            "prefix_length": [
+                None if prefix is None else length
+                for prefix, length in zip(prefixes, details.details.prefix_length.tolist())
+            ],
+            "origins": details.details.origins(),
+            "addresses": details.addresses.tolist(),
+            "covers": details.covers.tolist(),
+        }
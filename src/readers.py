@@ -0,0 +1,324 @@
+"""Pluggable input readers.
+
+An input is a file, a directory (every file in it) or a glob pattern such as
+``logs/access.log*``; the files are read in natural name order, so
+``access.log.10`` comes after ``access.log.9``. gzip, bzip2 and zstd
+compression is recognised by its magic bytes and decompressed as the file is
+read, never to disk.
+
+Every file is turned into blocks of newline-terminated addresses by a reader
+chosen from its suffix (ignoring compression suffixes): plain text by default,
+and one named column of a CSV, TSV or Parquet file with ``column``. Only that
+column is decoded: CSV parsing skips the other columns and Parquet reads only
+its column chunks. Other formats can be added with ``register_reader``.
+
+With ``read_workers`` above one, several files are read and decompressed ahead
+in threads (zlib, bz2 and zstd release the GIL) while blocks are still handed
+out in file order. Line numbers, used in error reports, run on across files.
+"""
+import bz2
+import gzip
+import io
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+from .ipparse import BLOCK_BYTES, ParsedIPs, parse_ip_buffer
+
+# Blocks buffered per file ahead of the consumer when reading files concurrently.
+PREFETCH_BLOCKS = 4
+# Rows converted at a time by the Parquet reader.
+PARQUET_BATCH_ROWS = 1 << 18
+
+# A reader turns one file into blocks of newline-terminated addresses, given the
+# column to read (None for the default) and the approximate block size in bytes.
+Reader = Callable[[Path, Optional[str], int], Iterator[bytes]]
+
+_COMPRESSION_SUFFIXES = {".gz", ".gzip", ".bz2", ".zst", ".zstd"}
+_GLOB_CHARS = re.compile(r"[*?\[]")
+_DIGITS = re.compile(r"(\d+)")
+_READERS: Dict[str, Reader] = {}
+_DONE = object()
+
+
+def _open_zstd(f: IO[bytes]) -> IO[bytes]:
+    try:
+        from compression import zstd  # type: ignore[import-not-found]  # Python 3.14+
+        return zstd.ZstdFile(f)  # type: ignore[no-any-return]
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading zstd-compressed input needs the zstandard package "
+                          "(pip install 'map-ip-to-asn[zstd]')") from None
+    return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)  # type: ignore[no-any-return]
+
+
+def open_input(path: Union[str, Path]) -> IO[bytes]:
+    """Open a file for reading, decompressing gzip, bzip2 and zstd streams on the fly.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        A binary stream of the (decompressed) contents.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+    """
+    f = open(Path(path), "rb")  # noqa: SIM115 - returned to the caller, possibly wrapped
+    magic = f.read(4)
+    f.seek(0)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=f)  # type: ignore[return-value]
+    if magic[:3] == b"BZh":
+        return bz2.BZ2File(f)
+    if magic == b"\x28\xb5\x2f\xfd":
+        return _open_zstd(f)
+    return f
+
+
+def _natural_key(path: Path) -> List[Any]:
+    return [int(part) if part.isdigit() else part for part in _DIGITS.split(str(path))]
+
+
+def expand_input(spec: str) -> List[Path]:
+    """List the files of an input: a file, a directory or a glob pattern.
+
+    Args:
+        spec: Path, directory or glob pattern.
+
+    Returns:
+        The files, in natural name order; hidden files of directories are skipped.
+
+    Raises:
+        FileNotFoundError: If no file matches.
+    """
+    path = Path(spec)
+    if path.is_dir():
+        files = [p for p in path.iterdir() if p.is_file() and not p.name.startswith(".")]
+    elif _GLOB_CHARS.search(spec):
+        anchor = Path(path.anchor) if path.is_absolute() else Path()
+        pattern = str(path.relative_to(anchor)) if path.is_absolute() else spec
+        files = [p for p in anchor.glob(pattern) if p.is_file()]
+    elif path.is_file():
+        return [path]
+    else:
+        files = []
+    if not files:
+        raise FileNotFoundError(f"Input file not found: {spec}")
+    return sorted(files, key=_natural_key)
+
+
+def input_size(spec: str) -> int:
+    """Total size in bytes of the files of an input, as stored (compressed)."""
+    return sum(path.stat().st_size for path in expand_input(spec))
+
+
+def register_reader(suffix: str, reader: Reader) -> None:
+    """Read files with a suffix (e.g. ``.parquet``) with a custom reader.
+
+    Args:
+        suffix: Lower-case file suffix, including the dot.
+        reader: Function yielding blocks of newline-terminated addresses.
+    """
+    _READERS[suffix] = reader
+
+
+def _format_suffix(path: Path) -> str:
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    while suffixes and suffixes[-1] in _COMPRESSION_SUFFIXES:
+        suffixes.pop()
+    return suffixes[-1] if suffixes else ""
+
+
+def read_text(path: Path, column: Optional[str], block_bytes: int) -> Iterator[bytes]:
+    """Read a text file with one address per line, cut into blocks of whole lines."""
+    if column is not None:
+        yield from read_csv(path, column, block_bytes)
+        return
+    with open_input(path) as f:
+        tail = b""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            tail = block[cut:]
+            if cut:
+                yield block[:cut]
+        if tail:
+            yield tail + b"\n"
+
+
+def _column_block(values: Any) -> bytes:
+    """Join a string array into a block of lines; nulls become blank lines."""
+    lines = ["" if value is None else value for value in values.to_pylist()]
+    return ("\n".join(lines) + "\n").encode("utf-8", errors="replace") if lines else b""
+
+
+def read_csv(path: Path, column: Optional[str], block_bytes: int, delimiter: str = ",") -> Iterator[bytes]:
+    """Read one column of a CSV file with a header row (the first column by default)."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    convert = pacsv.ConvertOptions(
+        include_columns=[column] if column is not None else None,
+        column_types={column: pa.string()} if column is not None else None,
+    )
+    with open_input(path) as f:
+        reader = pacsv.open_csv(
+            f,
+            read_options=pacsv.ReadOptions(block_size=block_bytes),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter),
+            convert_options=convert,
+        )
+        for batch in reader:
+            values = batch.column(0)
+            yield _column_block(values if values.type == pa.string() else values.cast(pa.string()))
+
+
+def read_tsv(path: Path, column: Optional[str], block_bytes: int) -> Iterator[bytes]:
+    """Read one column of a tab-separated file with a header row."""
+    return read_csv(path, column, block_bytes, delimiter="\t")
+
+
+def read_parquet(path: Path, column: Optional[str], block_bytes: int) -> Iterator[bytes]:
+    """Read one column of a Parquet file (the first column by default)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with pq.ParquetFile(path) as f:
+        name = column if column is not None else f.schema_arrow.names[0]
+        if name not in f.schema_arrow.names:
+            raise ValueError(f"{path} has no column {name!r}")
+        for batch in f.iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=[name]):
+            yield _column_block(batch.column(0).cast(pa.string()))
+
+
+register_reader(".csv", read_csv)
+register_reader(".tsv", read_tsv)
+register_reader(".parquet", read_parquet)
+register_reader(".pq", read_parquet)
+
+
+def _file_blocks(path: Path, column: Optional[str], block_bytes: int) -> Iterator[bytes]:
+    reader = _READERS.get(_format_suffix(path), read_text)
+    return reader(path, column, block_bytes)
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    """Put an item on a bounded queue unless the consumer has gone away."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_ahead(paths: List[Path], column: Optional[str], block_bytes: int, workers: int) -> Iterator[bytes]:
+    """Read up to ``workers`` files at once in threads, yielding their blocks in file order."""
+    stop = threading.Event()
+
+    def produce(path: Path, q: "queue.Queue[Any]") -> None:
+        try:
+            for block in _file_blocks(path, column, block_bytes):
+                if not _put(q, block, stop):
+                    return
+            item: Any = _DONE
+        except BaseException as e:
+            item = e
+        _put(q, item, stop)
+
+    remaining = iter(paths)
+    pending: Deque["queue.Queue[Any]"] = deque()
+    with ThreadPoolExecutor(workers, thread_name_prefix="map-ip-to-asn-reader") as pool:
+
+        def submit() -> None:
+            path = next(remaining, None)
+            if path is not None:
+                q: "queue.Queue[Any]" = queue.Queue(PREFETCH_BLOCKS)
+                pool.submit(produce, path, q)
+                pending.append(q)
+
+        for _ in range(workers):
+            submit()
+        try:
+            while pending:
+                q = pending.popleft()
+                while True:
+                    item = q.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+                submit()
+        finally:
+            stop.set()
+
+
+def iter_input_blocks(
+    spec: str,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+    block_bytes: int = BLOCK_BYTES,
+) -> Iterator[bytes]:
+    """Read an input as blocks of newline-terminated addresses.
+
+    Args:
+        spec: File, directory or glob pattern.
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+        block_bytes: Approximate size of the blocks of text files.
+
+    Yields:
+        Blocks of whole lines, in file order.
+
+    Raises:
+        FileNotFoundError: If no file matches.
+    """
+    paths = expand_input(spec)
+    if read_workers > 1 and len(paths) > 1:
+        yield from _read_ahead(paths, column, block_bytes, min(read_workers, len(paths)))
+        return
+    for path in paths:
+        yield from _file_blocks(path, column, block_bytes)
+
+
+def iter_parsed_input(
+    spec: str,
+    column: Optional[str] = None,
+    read_workers: int = 1,
+    block_bytes: int = BLOCK_BYTES,
+) -> Iterator[ParsedIPs]:
+    """Parse an input of IP addresses block by block.
+
+    Args:
+        spec: File, directory or glob pattern.
+        column: Column to read from CSV and Parquet files (default: the first).
+        read_workers: Number of files read and decompressed concurrently.
+        block_bytes: Approximate size of the blocks of text files.
+
+    Yields:
+        The parsed rows of each block, with line numbers running across all files.
+    """
+    line = 1
+    for block in iter_input_blocks(spec, column, read_workers, block_bytes):
+        yield parse_ip_buffer(block, line)
+        line += block.count(b"\n")
+
+
+def iter_input_lines(spec: str, column: Optional[str] = None, read_workers: int = 1) -> Iterator[bytes]:
+    """Read an input line by line, each line with its newline."""
+    for block in iter_input_blocks(spec, column, read_workers):
+        yield from io.BytesIO(block)
+
@@ -0,0 +1,188 @@
+"""Reverse lookups: the prefixes and address space originated by ASNs.
+
+The origin sets of a snapshot's prefix table are inverted into an ``ASNIndex``,
+so the prefixes of any ASN are found with one binary search. The result has one
+row per (ASN, prefix) pair, and keeps the address space of every ASN: the size
+of the union of its prefixes, so that a more specific prefix announced by the
+same ASN is not counted twice.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .columnar import TableBatch
+from .ipparse import format_ipv4, format_ipv6
+from .providers.asn_index import ASNIndex
+from .providers.origins import LookupDetails
+from .providers.prefix_table import PrefixTable
+
+_ASN_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def parse_asn(text: str) -> int:
+    """Parse an ASN in plain (``64500``), ``AS64500`` or asdot (``1.10``) notation.
+
+    Raises:
+        ValueError: If the text is not a valid 32-bit ASN.
+    """
+    value = text.strip()
+    if value[:2].upper() == "AS":
+        value = value[2:]
+    try:
+        if "." in value:
+            high, low = value.split(".")
+            if not (high.isdigit() and low.isdigit() and int(high) < 1 << 16 and int(low) < 1 << 16):
+                raise ValueError
+            return (int(high) << 16) | int(low)
+        if not value.isdigit() or int(value) >= 1 << 32:
+            raise ValueError
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid ASN: {text!r}") from None
+
+
+def parse_asns(texts: Iterable[str]) -> List[int]:
+    """Parse comma or whitespace separated ASNs, dropping repeats but keeping their order.
+
+    Args:
+        texts: Strings holding one or more ASNs each.
+
+    Returns:
+        The distinct ASNs, in the order they were first given.
+
+    Raises:
+        ValueError: If an entry is not a valid ASN.
+    """
+    asns: Dict[int, None] = {}
+    for text in texts:
+        for item in _ASN_SEPARATORS.split(text):
+            if item:
+                asns.setdefault(parse_asn(item), None)
+    return list(asns)
+
+
+class ASNPrefixes:
+    """Prefixes originated by a set of ASNs, one row per (ASN, prefix) pair.
+
+    Rows follow the order of the queried ASNs and then the address order of the
+    prefixes. ``space`` maps every queried ASN to the size of the union of its
+    prefixes, 0 for ASNs that originate none.
+    """
+
+    def __init__(
+        self,
+        family: int,
+        asn: np.ndarray,
+        details: LookupDetails,
+        prefixes: List[str],
+        addresses: np.ndarray,
+        space: Dict[int, int],
+        total_space: int,
+    ) -> None:
+        """Initialize from columns.
+
+        Args:
+            family: Address family of the prefixes (4 or 6).
+            asn: uint32 queried ASN of every row.
+            details: Prefix length and origin set of every row.
+            prefixes: Network address of every row's prefix.
+            addresses: Object array with the size of every row's prefix.
+            space: Address space of every queried ASN.
+            total_space: Size of the union of all the rows' prefixes.
+        """
+        self.family = family
+        self.asn = np.asarray(asn, dtype=np.uint32)
+        self.details = details
+        self.prefixes = prefixes
+        self.addresses = addresses
+        self.space = space
+        self.total_space = total_space
+
+    def __len__(self) -> int:
+        return len(self.asn)
+
+    def prefix_counts(self) -> Dict[int, int]:
+        """Return the number of prefixes of every queried ASN."""
+        counts = dict.fromkeys(self.space, 0)
+        for asn, count in zip(*np.unique(self.asn, return_counts=True)):
+            counts[int(asn)] = int(count)
+        return counts
+
+    @classmethod
+    def from_index(cls, index: ASNIndex, asns: List[int]) -> "ASNPrefixes":
+        """Collect the prefixes of ASNs from a reverse index.
+
+        Args:
+            index: The reverse index of one address family.
+            asns: Distinct ASNs to look up.
+
+        Returns:
+            The prefixes of the ASNs, by ASN.
+        """
+        query, rows = index.lookup(np.array(asns, dtype=np.uint32))
+        table = index.table
+        lengths = table.length[rows].astype(np.int64)
+        bits = 32 if index.family == 4 else 128
+        addresses = np.empty(len(rows), dtype=object)
+        addresses[:] = [1 << (bits - length) for length in lengths.tolist()]
+        if isinstance(table, PrefixTable):
+            prefixes = format_ipv4(table.network[rows])
+        else:
+            prefixes = format_ipv6(np.stack([table.network_hi[rows], table.network_lo[rows]], axis=1))
+
+        space = dict(zip(asns, index.address_spaces(query, rows, len(asns))))
+        return cls(
+            index.family,
+            np.array(asns, dtype=np.uint32)[query],
+            LookupDetails.from_table(table, rows.astype(np.int64)),
+            prefixes,
+            addresses,
+            space,
+            index.address_space(np.unique(rows)),
+        )
+
+
+class PrefixBatch(TableBatch):
+    """Results of a reverse lookup, one row per (ASN, prefix) pair.
+
+    ``addresses`` is the size of each prefix; the per-ASN totals, which count
+    nested prefixes once, are kept in ``prefixes.space``.
+    """
+
+    FIELDNAMES = ("asn", "timestamp", "provider", "prefix", "prefix_length", "origins", "addresses")
+
+    def __init__(
+        self,
+        prefixes: ASNPrefixes,
+        provider: str,
+        lookup_date: datetime,
+        timestamp: Optional[datetime] = None,
+    ) -> None:
+        """Initialize the batch.
+
+        Args:
+            prefixes: The prefixes found.
+            provider: Name of the provider that answered.
+            lookup_date: RouteViews snapshot date used.
+            timestamp: Lookup timestamp shared by all rows (default: now).
+        """
+        super().__init__(provider, lookup_date, timestamp)
+        self.prefixes = prefixes
+
+    @property
+    def asns(self) -> np.ndarray:
+        """uint32 queried ASN of every row."""
+        return self.prefixes.asn
+
+    def columns(self) -> Dict[str, List[Any]]:
+        """Return the JSON-ready columns; prefix sizes are exact Python ints."""
+        prefixes = self.prefixes
+        return {
+            "asn": self.asns.tolist(),
+            "prefix": prefixes.prefixes,
+            "prefix_length": prefixes.details.prefix_length.tolist(),
+            "origins": prefixes.details.origins(),
+            "addresses": prefixes.addresses.tolist(),
+        }
@@ -1,6 +1,63 @@
-"""Output serializers for different formats."""
-from .csv_serializer import CSVSerializer
-from .json_serializer import JSONSerializer
-from .parquet_serializer import ParquetSerializer
+"""Output serializers for different formats.
 
-__all__ = ["JSONSerializer", "CSVSerializer", "ParquetSerializer"]
\ No newline at end of file
+The Parquet serializers import pyarrow, so they are only loaded once Parquet
+output is requested.
+"""
+from typing import Any, Callable, Dict, Optional
+
+from ..models import OutputFormat, ParquetOptions
+from .base import StreamWriter
+from .csv_serializer import CSVSerializer, CSVStreamWriter
+from .json_serializer import (
+    JSONLinesSerializer,
+    JSONLinesStreamWriter,
+    JSONSerializer,
+    JSONStreamWriter,
+)
+
+
+def open_stream_writer(
+    output_format: OutputFormat,
+    output_file: Optional[str] = None,
+    parquet_options: Optional[ParquetOptions] = None
+) -> StreamWriter:
+    """Create the streaming writer for an output format.
+    
+    Args:
+        output_format: The output format to write.
+        output_file: Optional path to write the output to (default: stdout).
+        parquet_options: Row group size and compression for Parquet output.
+        
+    Returns:
+        A streaming writer; close it (or use it as a context manager) when done.
+    """
+    if output_format == OutputFormat.PARQUET:
+        from .parquet_serializer import ParquetStreamWriter
+        return ParquetStreamWriter(output_file, parquet_options)
+    writers: Dict[OutputFormat, Callable[[Optional[str]], StreamWriter]] = {
+        OutputFormat.JSON: JSONStreamWriter,
+        OutputFormat.JSONL: JSONLinesStreamWriter,
+        OutputFormat.CSV: CSVStreamWriter,
+    }
+    return writers[output_format](output_file)
+
+
+def __getattr__(name: str) -> Any:
+    if name in ("ParquetSerializer", "ParquetStreamWriter"):
+        from . import parquet_serializer
+        return getattr(parquet_serializer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "JSONSerializer",
+    "JSONLinesSerializer",
+    "CSVSerializer",
+    "ParquetSerializer",
+    "StreamWriter",
+    "JSONStreamWriter",
+    "JSONLinesStreamWriter",
+    "CSVStreamWriter",
+    "ParquetStreamWriter",
+    "open_stream_writer",
+]
@@ -0,0 +1,86 @@
+"""Base class for incremental (streaming) result writers."""
+import sys
+from abc import ABC, abstractmethod
+from types import TracebackType
+from typing import IO, Optional, Type, Union
+
+from ..columnar import ColumnarBatch, LookupResult, TableBatch
+
+# Output files are written through a large buffer so blocks reach the disk in few writes.
+WRITE_BUFFER_BYTES = 1 << 20
+
+# Anything a writer accepts: per-address results, or the rows of range and ASN queries.
+WritableResult = Union[LookupResult, TableBatch]
+
+
+def has_snapshot_dates(result: LookupResult) -> bool:
+    """Return whether results carry per-row snapshot dates (multi-date lookups)."""
+    if isinstance(result, ColumnarBatch):
+        return result.snapshot_date is not None
+    return any(r.snapshot_date is not None for r in result.results)
+
+
+def has_details(result: LookupResult) -> bool:
+    """Return whether results carry matched prefixes and origin sets (enriched lookups)."""
+    if isinstance(result, ColumnarBatch):
+        return result.details is not None
+    return any(r.origins is not None for r in result.results)
+
+
+class StreamWriter(ABC):
+    """Write lookup results chunk by chunk without holding them all in memory.
+
+    Subclasses implement ``_write_chunk`` and optionally ``_finish``. The writer
+    keeps running ``total``/``successful`` counters across all chunks.
+    """
+
+    def __init__(self, output_file: Optional[str] = None) -> None:
+        """Initialize the writer.
+
+        Args:
+            output_file: Optional path to write the output to (default: stdout).
+        """
+        self.output_file = output_file
+        self.total = 0
+        self.successful = 0
+        self._closed = False
+
+    def _open_text(self) -> IO[str]:
+        """Open the output file for text writing, or return stdout."""
+        if self.output_file:
+            return open(self.output_file, "w", newline="", buffering=WRITE_BUFFER_BYTES)
+        return sys.stdout
+
+    def write(self, result: WritableResult) -> None:
+        """Write one chunk of results.
+
+        Args:
+            result: The chunk of results to write.
+        """
+        self._write_chunk(result)
+        self.total += result.total
+        self.successful += result.successful
+
+    @abstractmethod
+    def _write_chunk(self, result: WritableResult) -> None:
+        """Write the rows of one chunk."""
+
+    def _finish(self) -> None:  # noqa: B027
+        """Write any trailer and release resources."""
+
+    def close(self) -> None:
+        """Finish the output. Safe to call more than once."""
+        if not self._closed:
+            self._closed = True
+            self._finish()
+
+    def __enter__(self) -> "StreamWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
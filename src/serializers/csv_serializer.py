@@ -1,17 +1,77 @@
 """CSV serializer for ASN lookup results."""
 import csv
 from io import StringIO
-from typing import Optional
+from itertools import repeat
+from typing import IO, Any, Iterable, Iterator, List, Optional, Tuple
 
-from ..models import BatchResult
+from ..columnar import ColumnarBatch, LookupResult, TableBatch, iter_columns
+from .base import StreamWriter, WritableResult, has_details, has_snapshot_dates
+
+FIELDNAMES = ['ip', 'asn', 'timestamp', 'provider']
+DETAIL_FIELDNAMES = ['prefix', 'prefix_length', 'origins']
+
+
+def _detail_columns(batch: ColumnarBatch) -> List[Iterable[Any]]:
+    """Return the prefix, prefix length and origins columns; origin sets are written as ``a_b``."""
+    if batch.details is None:
+        return [repeat(''), repeat(''), repeat('')]
+    prefixes, lengths, origins = batch.detail_columns()
+    return [
+        ('' if prefix is None else prefix for prefix in prefixes),
+        ('' if length is None else length for length in lengths),
+        ('_'.join(map(str, items)) for items in origins),
+    ]
+
+
+def _rows(result: LookupResult, with_snapshot_date: bool, with_details: bool = False) -> Iterator[Tuple[Any, ...]]:
+    """Yield the CSV values of every row, column by column."""
+    for batch in iter_columns(result):
+        columns: List[Iterable[Any]] = [
+            batch.ips,
+            batch.asns.tolist(),
+            repeat(batch.timestamp.isoformat()),
+            repeat(batch.provider),
+        ]
+        if with_snapshot_date:
+            columns.append(repeat(batch.snapshot_date.isoformat() if batch.snapshot_date else ''))
+            columns.append(repeat(batch.requested_date.isoformat() if batch.requested_date else ''))
+        if with_details:
+            columns.extend(_detail_columns(batch))
+        yield from zip(*columns)
+
+
+def _csv_value(value: Any) -> Any:
+    """Format a JSON-ready value as CSV: lists as ``a_b``, booleans as ``true``/``false``."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return '_'.join(map(str, value))
+    return value
+
+
+def _table_rows(batch: TableBatch) -> Iterator[Tuple[Any, ...]]:
+    """Yield the CSV values of every row of a range or ASN query."""
+    columns = batch.columns()
+    shared = batch.shared()
+    yield from zip(*(
+        map(_csv_value, columns[name]) if name in columns else repeat(shared[name])
+        for name in batch.FIELDNAMES
+    ))
+
+
+def _fieldnames(with_snapshot_date: bool, with_details: bool = False) -> List[str]:
+    fieldnames = FIELDNAMES + ['snapshot_date', 'requested_date'] if with_snapshot_date else FIELDNAMES
+    return fieldnames + DETAIL_FIELDNAMES if with_details else fieldnames
 
 
 class CSVSerializer:
     """Serialize results to CSV format."""
     
     @staticmethod
-    def serialize(result: BatchResult, output_file: Optional[str] = None) -> str:
-        """Serialize BatchResult to CSV.
+    def serialize(result: WritableResult, output_file: Optional[str] = None) -> str:
+        """Serialize a lookup result to CSV.
         
         Args:
             result: The batch result to serialize.
@@ -21,20 +81,16 @@ class CSVSerializer:
             The CSV string representation.
         """
         output = StringIO()
-        writer = csv.DictWriter(
-            output, 
-            fieldnames=['ip', 'asn', 'timestamp', 'provider'],
-            quoting=csv.QUOTE_MINIMAL
-        )
+        writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
         
-        writer.writeheader()
-        for r in result.results:
-            writer.writerow({
-                'ip': r.ip,
-                'asn': r.asn,
-                'timestamp': r.timestamp.isoformat(),
-                'provider': r.provider
-            })
+        if isinstance(result, TableBatch):
+            writer.writerow(result.FIELDNAMES)
+            writer.writerows(_table_rows(result))
+        else:
+            with_snapshot_date = has_snapshot_dates(result)
+            with_details = has_details(result)
+            writer.writerow(_fieldnames(with_snapshot_date, with_details))
+            writer.writerows(_rows(result, with_snapshot_date, with_details))
         
         csv_str = output.getvalue()
         
@@ -42,4 +98,47 @@ class CSVSerializer:
             with open(output_file, 'w', newline='') as f:
                 f.write(csv_str)
         
-        return csv_str
\ No newline at end of file
+        return csv_str
+
+
+class CSVStreamWriter(StreamWriter):
+    """Incrementally write results as CSV."""
+    
+    def __init__(self, output_file: Optional[str] = None) -> None:
+        """Initialize the writer.
+        
+        The header row is written with the first chunk, whose columns decide it.
+        
+        Args:
+            output_file: Optional path to write the output to (default: stdout).
+        """
+        super().__init__(output_file)
+        self._stream: IO[str] = self._open_text()
+        self._writer = csv.writer(self._stream, quoting=csv.QUOTE_MINIMAL)
+        self._with_snapshot_date: Optional[bool] = None
+        self._with_details = False
+    
+    def _write_header(self, with_snapshot_date: bool, with_details: bool = False) -> None:
+        self._with_snapshot_date = with_snapshot_date
+        self._with_details = with_details
+        self._writer.writerow(_fieldnames(with_snapshot_date, with_details))
+    
+    def _write_chunk(self, result: WritableResult) -> None:
+        if isinstance(result, TableBatch):
+            if self._with_snapshot_date is None:
+                self._with_snapshot_date = False
+                self._writer.writerow(result.FIELDNAMES)
+            self._writer.writerows(_table_rows(result))
+            return
+        if self._with_snapshot_date is None:
+            self._write_header(has_snapshot_dates(result), has_details(result))
+        with_snapshot_date = bool(self._with_snapshot_date)
+        self._writer.writerows(_rows(result, with_snapshot_date, self._with_details))
+    
+    def _finish(self) -> None:
+        if self._with_snapshot_date is None:
+            self._write_header(False)
+        if self.output_file:
+            self._stream.close()
+        else:
+            self._stream.flush()
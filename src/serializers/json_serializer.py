@@ -1,16 +1,87 @@
 """JSON serializer for ASN lookup results."""
 import json
-from typing import Optional
+import re
+from typing import IO, Any, Dict, Iterator, List, Optional
 
-from ..models import BatchResult
+from ..columnar import ColumnarBatch, TableBatch, iter_columns
+from .base import StreamWriter, WritableResult
+
+# Rows encoded and written per block by the streaming JSON writers.
+BLOCK_ROWS = 65_536
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+# Characters that ``_encode`` escapes: quotes, backslashes, control and non-ASCII characters.
+_NEEDS_ESCAPE = re.compile(r'["\\\x00-\x1f\x80-\U0010ffff]')
+
+
+def _document(result: WritableResult) -> Dict[str, Any]:
+    """Return the JSON-ready document of a result."""
+    if isinstance(result, TableBatch):
+        return result.to_dict()
+    return {
+        "results": [record for batch in iter_columns(result) for record in batch.records()],
+        "total": result.total,
+        "successful": result.successful,
+        "lookup_date": result.lookup_date.isoformat(),
+    }
+
+
+def _encode_rows(batch: ColumnarBatch, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Encode rows of a columnar batch as compact JSON objects.
+    
+    The fields shared by the batch are encoded once; only the IP and ASN (and,
+    for enriched batches, the prefix and origins) are formatted per row. The
+    output is identical to ``json.dumps`` of ``records()``.
+    
+    Args:
+        batch: The batch to encode.
+        start: First row to encode.
+        stop: Row to stop before (default: the end of the batch).
+        
+    Returns:
+        One JSON object per row, without separators.
+    """
+    shared = next(batch.records(), None)
+    if shared is None:
+        return []
+    del shared["ip"], shared["asn"]
+    ips = batch.ips[start:stop]
+    # Formatted addresses never need escaping, but input text kept for a row
+    # (invalid rows, or addresses with surrounding whitespace) may.
+    if _NEEDS_ESCAPE.search("".join(ips)):
+        ips = [_encode(ip)[1:-1] for ip in ips]
+    asns = batch.asns[start:stop].tolist()
+    if batch.details is None:
+        tail = _encode(shared)[1:]
+        return [f'{{"ip":"{ip}","asn":{asn},{tail}' for ip, asn in zip(ips, asns)]
+    del shared["prefix"], shared["prefix_length"], shared["origins"]
+    middle = _encode(shared)[1:-1]
+    prefixes, lengths, origins = (column[start:stop] for column in batch.detail_columns())
+    return [
+        f'{{"ip":"{ip}","asn":{asn},{middle},"prefix":{_encode(prefix)},'
+        f'"prefix_length":{_encode(length)},"origins":{_encode(items)}}}'
+        for ip, asn, prefix, length, items in zip(ips, asns, prefixes, lengths, origins)
+    ]
+
+
+def _iter_row_blocks(result: WritableResult) -> Iterator[List[str]]:
+    """Yield the encoded rows of a result in blocks of at most ``BLOCK_ROWS``."""
+    if isinstance(result, TableBatch):
+        # Range and ASN queries give a few rows per query, so rows are encoded as they are.
+        rows = [_encode(record) for record in result.records()]
+        for start in range(0, len(rows), BLOCK_ROWS):
+            yield rows[start:start + BLOCK_ROWS]
+        return
+    for batch in iter_columns(result):
+        for start in range(0, len(batch), BLOCK_ROWS):
+            yield _encode_rows(batch, start, start + BLOCK_ROWS)
 
 
 class JSONSerializer:
     """Serialize results to JSON format."""
     
     @staticmethod
-    def serialize(result: BatchResult, output_file: Optional[str] = None) -> str:
-        """Serialize BatchResult to JSON.
+    def serialize(result: WritableResult, output_file: Optional[str] = None) -> str:
+        """Serialize a lookup result to JSON.
         
         Args:
             result: The batch result to serialize.
@@ -19,10 +90,98 @@ class JSONSerializer:
         Returns:
             The JSON string representation.
         """
-        json_str = result.model_dump_json(indent=2)
+        json_str = json.dumps(_document(result), indent=2)
         
         if output_file:
             with open(output_file, 'w') as f:
                 f.write(json_str)
         
-        return json_str
\ No newline at end of file
+        return json_str
+
+
+class JSONLinesSerializer:
+    """Serialize results to JSON Lines format (one record per line)."""
+    
+    @staticmethod
+    def serialize(result: WritableResult, output_file: Optional[str] = None) -> str:
+        """Serialize a lookup result to JSON Lines.
+        
+        Args:
+            result: The batch result to serialize.
+            output_file: Optional path to write the output to.
+            
+        Returns:
+            The JSON Lines string representation.
+        """
+        jsonl_str = "".join("\n".join(rows) + "\n" for rows in _iter_row_blocks(result))
+        
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write(jsonl_str)
+        
+        return jsonl_str
+
+
+class JSONStreamWriter(StreamWriter):
+    """Incrementally write results as a single JSON document.
+    
+    Rows are written as they arrive; the totals and snapshot date are written
+    after the results array once the stream is closed.
+    """
+    
+    def __init__(self, output_file: Optional[str] = None) -> None:
+        """Initialize the writer.
+        
+        Args:
+            output_file: Optional path to write the output to (default: stdout).
+        """
+        super().__init__(output_file)
+        self._stream: IO[str] = self._open_text()
+        self._stream.write('{\n  "results": [')
+        self._lookup_date: Optional[str] = None
+        self._separator = "\n    "
+    
+    def _write_chunk(self, result: WritableResult) -> None:
+        if self._lookup_date is None:
+            self._lookup_date = result.lookup_date.isoformat()
+        for rows in _iter_row_blocks(result):
+            self._stream.write(self._separator)
+            self._stream.write(",\n    ".join(rows))
+            self._separator = ",\n    "
+    
+    def _finish(self) -> None:
+        self._stream.write(
+            f'\n  ],\n  "total": {self.total},\n  "successful": {self.successful},\n'
+            f'  "lookup_date": {json.dumps(self._lookup_date)}\n}}\n'
+        )
+        if self.output_file:
+            self._stream.close()
+        else:
+            self._stream.flush()
+
+
+class JSONLinesStreamWriter(StreamWriter):
+    """Incrementally write results as JSON Lines (NDJSON).
+    
+    Rows are encoded by a specialised encoder and written in blocks of
+    ``BLOCK_ROWS`` lines, so output can be tailed and split while it is written.
+    """
+    
+    def __init__(self, output_file: Optional[str] = None) -> None:
+        """Initialize the writer.
+        
+        Args:
+            output_file: Optional path to write the output to (default: stdout).
+        """
+        super().__init__(output_file)
+        self._stream: IO[str] = self._open_text()
+    
+    def _write_chunk(self, result: WritableResult) -> None:
+        for rows in _iter_row_blocks(result):
+            self._stream.write("\n".join(rows) + "\n")
+    
+    def _finish(self) -> None:
+        if self.output_file:
+            self._stream.close()
+        else:
+            self._stream.flush()
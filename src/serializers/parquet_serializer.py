@@ -1,41 +1,241 @@
 """Parquet serializer for ASN lookup results."""
-from typing import Optional
+from typing import Dict, List, Optional, Type, Union
 
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from ..models import BatchResult
+from ..columnar import ColumnarBatch, LookupResult, TableBatch, iter_columns
+from ..models import ParquetCompression, ParquetOptions
+from ..ranges import RangeBatch
+from ..reverse import PrefixBatch
+from .base import StreamWriter, WritableResult, has_details, has_snapshot_dates
+
+SCHEMA = pa.schema([
+    ('ip', pa.string()),
+    ('asn', pa.uint32()),
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('provider', pa.dictionary(pa.int32(), pa.string())),
+])
+SNAPSHOT_SCHEMA = SCHEMA.append(pa.field('snapshot_date', pa.timestamp('us'))).append(
+    pa.field('requested_date', pa.timestamp('us'))
+)
+DETAIL_FIELDS = [
+    pa.field('prefix', pa.string()),
+    pa.field('prefix_length', pa.uint8()),
+    pa.field('origins', pa.list_(pa.uint32())),
+]
+
+# Address counts of IPv6 queries can exceed 64 bits, so they are stored as doubles
+# (exact up to 2**53 addresses, which covers every IPv4 query).
+RANGE_SCHEMA = pa.schema([
+    ('query', pa.string()),
+    ('asn', pa.uint32()),
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('provider', pa.dictionary(pa.int32(), pa.string())),
+    *DETAIL_FIELDS,
+    ('addresses', pa.float64()),
+    ('covers', pa.bool_()),
+])
+PREFIX_SCHEMA = pa.schema([
+    ('asn', pa.uint32()),
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('provider', pa.dictionary(pa.int32(), pa.string())),
+    *DETAIL_FIELDS,
+    ('addresses', pa.float64()),
+])
+TABLE_SCHEMAS: Dict[Type[TableBatch], pa.Schema] = {
+    RangeBatch: RANGE_SCHEMA,
+    PrefixBatch: PREFIX_SCHEMA,
+}
+
+
+def _with_details(schema: pa.Schema) -> pa.Schema:
+    for field in DETAIL_FIELDS:
+        schema = schema.append(field)
+    return schema
+
+
+def _record_batch(batch: ColumnarBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """Build the Arrow record batch of a columnar batch.
+
+    The ASN column wraps the batch's ``uint32`` array without copying; values
+    shared by the whole batch are repeated or dictionary-encoded.
+    """
+    rows = len(batch)
+    columns = [
+        pa.array(batch.ips, pa.string()),
+        pa.array(batch.asns, pa.uint32()),
+        pa.repeat(pa.scalar(batch.timestamp, schema.field('timestamp').type), rows),
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(rows, dtype=np.int32)), pa.array([batch.provider], pa.string())
+        ),
+    ]
+    if 'snapshot_date' in schema.names:
+        columns.append(pa.repeat(pa.scalar(batch.snapshot_date, schema.field('snapshot_date').type), rows))
+        columns.append(pa.repeat(pa.scalar(batch.requested_date, schema.field('requested_date').type), rows))
+    if 'origins' in schema.names:
+        columns.extend(_detail_arrays(batch))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _detail_arrays(batch: ColumnarBatch) -> List[pa.Array]:
+    """Build the prefix, prefix length and origins columns of a batch.
+
+    The origins column wraps the batch's ragged offsets and ASN pool directly.
+    """
+    rows = len(batch)
+    if batch.details is None:
+        return [pa.nulls(rows, field.type) for field in DETAIL_FIELDS]
+    prefixes = batch.prefixes()
+    found = np.array([prefix is not None for prefix in prefixes], dtype=bool)
+    details = batch.details
+    return [
+        pa.array(prefixes, pa.string()),
+        pa.array(details.prefix_length, pa.uint8(), mask=~found),
+        pa.ListArray.from_arrays(
+            pa.array(details.origin_offsets.astype(np.int32)), pa.array(details.origin_pool, pa.uint32())
+        ),
+    ]
+
+
+def _table_record_batch(batch: TableBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """Build the Arrow record batch of the rows of a range or ASN query."""
+    rows = len(batch)
+    columns = batch.columns()
+    arrays = []
+    for field in schema:
+        if field.name == 'timestamp':
+            arrays.append(pa.repeat(pa.scalar(batch.timestamp, field.type), rows))
+        elif field.name == 'provider':
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(rows, dtype=np.int32)), pa.array([batch.provider], pa.string())
+            ))
+        elif pa.types.is_floating(field.type):
+            arrays.append(pa.array([float(value) for value in columns[field.name]], field.type))
+        else:
+            arrays.append(pa.array(columns[field.name], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _schema_for(result: LookupResult) -> pa.Schema:
+    schema = SNAPSHOT_SCHEMA if has_snapshot_dates(result) else SCHEMA
+    return _with_details(schema) if has_details(result) else schema
 
 
 class ParquetSerializer:
     """Serialize results to Parquet format."""
-    
+
     @staticmethod
-    def serialize(result: BatchResult, output_file: Optional[str] = None) -> bytes:
-        """Serialize BatchResult to Parquet.
-        
+    def serialize(
+        result: WritableResult,
+        output_file: Optional[str] = None,
+        options: Optional[ParquetOptions] = None
+    ) -> Optional[bytes]:
+        """Serialize a lookup result to Parquet.
+
         Args:
             result: The batch result to serialize.
             output_file: Optional path to write the output to.
-            
+            options: Row group size and compression settings.
+
         Returns:
-            The Parquet bytes representation.
+            The Parquet bytes when no output file is given, otherwise None (the
+            file is not read back).
         """
-        # Convert results to DataFrame
-        df = pd.DataFrame([
-            {
-                'ip': r.ip,
-                'asn': r.asn,
-                'timestamp': r.timestamp,
-                'provider': r.provider
-            }
-            for r in result.results
-        ])
-        
-        if output_file:
-            df.to_parquet(output_file, index=False, engine='pyarrow')
-            # Read back to return bytes
-            with open(output_file, 'rb') as f:
-                return f.read()
-        else:
-            # Return as bytes
-            return df.to_parquet(index=False, engine='pyarrow')
\ No newline at end of file
+        sink = None if output_file else pa.BufferOutputStream()
+        with ParquetStreamWriter(output_file, options, sink=sink) as writer:
+            writer.write(result)
+        return sink.getvalue().to_pybytes() if sink is not None else None
+
+
+class ParquetStreamWriter(StreamWriter):
+    """Incrementally write results as Parquet with a ``pyarrow`` writer.
+
+    By default every chunk becomes one row group. With ``row_group_size`` set,
+    chunks are coalesced into row groups of exactly that many rows, so at most
+    one row group is buffered at a time.
+    """
+
+    def __init__(
+        self,
+        output_file: Optional[str] = None,
+        options: Optional[ParquetOptions] = None,
+        sink: Optional[pa.NativeFile] = None
+    ) -> None:
+        """Initialize the writer.
+
+        Args:
+            output_file: Path to write the output to.
+            options: Row group size and compression settings.
+            sink: Writable Arrow stream to use instead of ``output_file``.
+
+        Raises:
+            ValueError: If no output file or sink is given (Parquet is not written
+                to stdout).
+        """
+        if not output_file and sink is None:
+            raise ValueError("Streaming Parquet output requires an output file")
+        super().__init__(output_file)
+        self.options = options or ParquetOptions()
+        self._sink: Union[str, pa.NativeFile] = sink if sink is not None else output_file
+        # Opened with the first chunk, whose columns decide the schema.
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._pending: List[pa.RecordBatch] = []
+        self._pending_rows = 0
+
+    def _open(self, schema: pa.Schema) -> pq.ParquetWriter:
+        if self._writer is None:
+            compression = self.options.compression
+            self._writer = pq.ParquetWriter(
+                self._sink, schema,
+                compression=None if compression == ParquetCompression.NONE else compression.value
+            )
+        return self._writer
+
+    def _write_batches(self, batches: List[pa.RecordBatch]) -> None:
+        """Write record batches, as one row group or into fixed-size row groups."""
+        rows = sum(b.num_rows for b in batches)
+        if not rows:
+            return
+        writer = self._open(batches[0].schema)
+        row_group_size = self.options.row_group_size
+        if row_group_size is None:
+            writer.write_table(pa.Table.from_batches(batches), row_group_size=rows)
+            return
+        self._pending.extend(batches)
+        self._pending_rows += rows
+        if self._pending_rows < row_group_size:
+            return
+        table = pa.Table.from_batches(self._pending)
+        full = self._pending_rows - self._pending_rows % row_group_size
+        writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+        self._pending = table.slice(full).to_batches()
+        self._pending_rows -= full
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        """Write one Arrow record batch with the ``SCHEMA`` or ``SNAPSHOT_SCHEMA`` layout.
+
+        Args:
+            batch: The record batch to write.
+        """
+        self._write_batches([batch])
+        self.total += batch.num_rows
+        self.successful += int(np.count_nonzero(batch.column('asn').to_numpy(zero_copy_only=False)))
+
+    def _write_chunk(self, result: WritableResult) -> None:
+        if isinstance(result, TableBatch):
+            schema = TABLE_SCHEMAS[type(result)]
+            self._open(schema)
+            self._write_batches([_table_record_batch(result, schema)])
+            return
+        schema = self._writer.schema if self._writer is not None else _schema_for(result)
+        self._write_batches([_record_batch(batch, schema) for batch in iter_columns(result)])
+
+    def _finish(self) -> None:
+        if self._pending_rows:
+            assert self._writer is not None
+            self._writer.write_table(pa.Table.from_batches(self._pending))
+            self._pending = []
+            self._pending_rows = 0
+        self._open(SCHEMA).close()
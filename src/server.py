@@ -0,0 +1,440 @@
+"""Resident lookup daemon serving a small JSON-over-HTTP API.
+
+The daemon keeps initialized providers in memory, keyed by the snapshot that
+answers the requested date, and answers over TCP or a Unix socket:
+
+- ``GET /lookup?ip=8.8.8.8[&date=YYYY-MM-DD]``: single lookup
+- ``POST /lookup`` with ``{"ips": [...], "date": "YYYY-MM-DD"}``: batch lookup
+- ``GET /health``: liveness check
+- ``GET /metrics``: Prometheus-style metrics (when started with ``metrics`` enabled)
+
+Responses use the same layout as the JSON output format.
+Concurrent requests for the same snapshot are coalesced into one provider call.
+"""
+import asyncio
+import contextlib
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from . import metrics
+from .columnar import ColumnarBatch
+from .lookup import build_batch, get_lookup_cache, get_provider, get_snapshot_store, lookup_unique
+from .models import ServerConfig
+from .providers import BaseProvider
+from .providers.binary_index import load_index
+from .providers.discovery import find_routeviews_snapshot_url
+
+_MAX_BODY_BYTES = 256 * 1024 * 1024
+_PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Error that is reported to the client with an HTTP status code."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def parse_address(address: str) -> Tuple[str, str, int]:
+    """Parse a listen/connect address.
+
+    Args:
+        address: ``unix:/path/to.sock``, ``http://host:port`` or ``host:port``.
+
+    Returns:
+        Tuple of (kind, host or socket path, port); kind is ``"unix"`` or ``"tcp"``.
+
+    Raises:
+        ValueError: If the address cannot be parsed.
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):], 0
+    if address.startswith("http://"):
+        address = address[len("http://"):].rstrip("/")
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid address: {address}. Use host:port or unix:/path")
+    return "tcp", host or "127.0.0.1", int(port)
+
+
+def _parse_request_date(value: Optional[str]) -> datetime:
+    if not value:
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPError(400, f"Invalid date format: {value}. Use YYYY-MM-DD") from None
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove a Unix socket left behind by a daemon that is no longer running.
+
+    Args:
+        path: Path the daemon is about to listen on.
+
+    Raises:
+        FileExistsError: If something other than a socket exists at the path.
+        OSError: If a daemon still accepts connections on the socket.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket, refusing to replace it", path)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        # Nothing listens on it any more.
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, "Another daemon is serving on this socket", path)
+
+
+class _Batcher:
+    """Coalesce concurrent lookups for one provider into batched provider calls.
+
+    A closed batcher stops once every lookup queued on it has been answered; a
+    lookup that still reaches it afterwards restarts it until that one is.
+    """
+
+    def __init__(self, provider: BaseProvider, window: float, max_batch: int) -> None:
+        self.provider = provider
+        self._window = window
+        self._max_batch = max_batch
+        self._queue: "asyncio.Queue[Tuple[List[str], asyncio.Future[np.ndarray]]]" = asyncio.Queue()
+        self._closing = False
+        self._idle = False
+        self._start()
+
+    def _start(self) -> None:
+        # Providers are not thread-safe, so each one gets a single lookup thread.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def lookup(self, ips: List[str]) -> np.ndarray:
+        future: "asyncio.Future[np.ndarray]" = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((ips, future))
+        if self._task.done():
+            self._start()
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[str], "asyncio.Future[np.ndarray]"]]:
+        loop = asyncio.get_running_loop()
+        self._idle = True
+        try:
+            batch = [await self._queue.get()]
+        finally:
+            self._idle = False
+        size = len(batch[0][0])
+        deadline = loop.time() + self._window
+        while size < self._max_batch:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._queue.empty()):
+            batch = await self._collect()
+            all_ips = [ip for ips, _ in batch for ip in ips]
+            metrics.incr("lookups", len(all_ips))
+            metrics.incr("lookup_batches")
+            try:
+                with metrics.span("lookup"):
+                    asns = await loop.run_in_executor(self._executor, lookup_unique, self.provider, all_ips)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for ips, future in batch:
+                if not future.done():
+                    future.set_result(asns[offset:offset + len(ips)])
+                offset += len(ips)
+        self._executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Stop once the queued and running lookups have been answered."""
+        self._closing = True
+        if self._idle and self._queue.empty():
+            # Waiting for work that will not come: nothing is lost by cancelling.
+            self._task.cancel()
+            self._executor.shutdown(wait=False)
+
+
+class LookupServer:
+    """Asyncio lookup daemon keeping initialized providers resident."""
+
+    def __init__(self, config: ServerConfig) -> None:
+        """Initialize the server.
+
+        Args:
+            config: Server configuration; with ``metrics`` set, recording is
+                switched on for the whole process.
+        """
+        self.config = config
+        if config.metrics and not metrics.get_recorder().enabled:
+            metrics.enable()
+        self.store = get_snapshot_store(config)
+        self._batchers: "OrderedDict[str, asyncio.Future[_Batcher]]" = OrderedDict()
+        # Requested date -> snapshot date, for the snapshots that are loaded.
+        self._snapshots: Dict[str, datetime] = {}
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the lookup cache counters of every loaded snapshot."""
+        return {
+            key: pending.result().provider.cache.stats.as_dict()
+            for key, pending in self._batchers.items()
+            if pending.done() and not pending.cancelled() and pending.exception() is None
+        }
+
+    def metrics_text(self) -> str:
+        """Return the process metrics and per-snapshot cache counters as Prometheus text."""
+        prefix = metrics.PROMETHEUS_PREFIX
+        caches = self.cache_stats()
+        lines = [metrics.get_recorder().prometheus(prefix).rstrip("\n")]
+        lines.append(f"# TYPE {prefix}_snapshots_loaded gauge")
+        lines.append(f"{prefix}_snapshots_loaded {len(caches)}")
+        for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("hit_rate", "gauge")):
+            name = f"{prefix}_lookup_cache_{field}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# TYPE {name} {kind}")
+            for snapshot, stats in sorted(caches.items()):
+                lines.append(f'{name}{{snapshot="{snapshot}"}} {stats[field]:g}')
+        return "\n".join(lines) + "\n"
+
+    def _find_snapshot(self, date: datetime) -> datetime:
+        """Return the date of the snapshot that answers a requested date."""
+        if self.config.index_path:
+            return load_index(Path(self.config.index_path))[1]
+        try:
+            return find_routeviews_snapshot_url(date, self.store)[1]
+        except SystemExit as e:
+            raise HTTPError(404, str(e)) from e
+
+    async def _resolve(self, date: datetime) -> datetime:
+        """Resolve a requested date to its snapshot, without blocking the loop."""
+        requested = date.strftime("%Y-%m-%d")
+        snapshot = self._snapshots.get(requested)
+        if snapshot is None:
+            snapshot = await asyncio.get_running_loop().run_in_executor(None, self._find_snapshot, date)
+            self._snapshots[requested] = snapshot
+        return snapshot
+
+    def _evict(self, key: str, evicted: "asyncio.Future[_Batcher]") -> None:
+        """Close an evicted batcher, once its provider has loaded if it is still loading."""
+        self._snapshots = {
+            requested: snapshot for requested, snapshot in self._snapshots.items()
+            if snapshot.strftime("%Y-%m-%d") != key
+        }
+
+        def close(pending: "asyncio.Future[_Batcher]") -> None:
+            if not pending.cancelled() and pending.exception() is None:
+                pending.result().close()
+
+        if evicted.done():
+            close(evicted)
+        else:
+            evicted.add_done_callback(close)
+
+    async def _batcher(self, date: datetime) -> _Batcher:
+        """Return the batcher for the snapshot answering a date, loading its provider on first use.
+
+        Requested dates that resolve to the same snapshot share one provider.
+        """
+        snapshot = await self._resolve(date)
+        key = snapshot.strftime("%Y-%m-%d")
+        pending = self._batchers.get(key)
+        if pending is not None:
+            self._batchers.move_to_end(key)
+            return await pending
+
+        loop = asyncio.get_running_loop()
+        pending = loop.create_future()
+        self._batchers[key] = pending
+        while len(self._batchers) > self.config.max_providers:
+            self._evict(*self._batchers.popitem(last=False))
+
+        def forget() -> None:
+            if self._batchers.get(key) is pending:
+                del self._batchers[key]
+
+        try:
+            provider = get_provider(
+                self.config.provider, snapshot, self.store, self.config.index_path, get_lookup_cache(self.config),
+                self.config.index6_path
+            )
+            try:
+                with metrics.span("initialize"):
+                    await provider.ainitialize()
+            except LookupError as e:
+                raise HTTPError(404, str(e)) from e
+        except Exception as e:
+            forget()
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved; waiters re-raise it
+            raise
+        except BaseException:
+            forget()
+            pending.cancel()
+            raise
+        batcher = _Batcher(provider, self.config.batch_window_ms / 1000, self.config.max_batch_size)
+        pending.set_result(batcher)
+        print(f"Loaded snapshot {key} for {date.strftime('%Y-%m-%d')}", file=sys.stderr)
+        return batcher
+
+    async def lookup(self, ips: List[str], date: datetime) -> ColumnarBatch:
+        """Look up a batch of IPs against the snapshot for a date.
+
+        Args:
+            ips: IP addresses to lookup.
+            date: Requested snapshot date.
+
+        Returns:
+            The batch result.
+        """
+        batcher = await self._batcher(date)
+        asns = await batcher.lookup(ips) if ips else np.zeros(0, dtype=np.uint32)
+        return build_batch(ips, asns, batcher.provider.provider_name, batcher.provider.snapshot_date)
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Union[Dict[str, Any], str]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            return {"status": "ok", "snapshots": list(self._batchers), "caches": self.cache_stats()}
+        if url.path == "/metrics":
+            if not self.config.metrics:
+                raise HTTPError(404, "Metrics are disabled; start the daemon with --metrics")
+            return self.metrics_text()
+        if url.path != "/lookup":
+            raise HTTPError(404, f"Unknown path: {url.path}")
+
+        if method == "GET":
+            ips = query.get("ip", [])
+            date = _parse_request_date(query.get("date", [None])[0])
+        elif method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+                ips = payload["ips"]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'Expected a JSON body like {"ips": [...], "date": "YYYY-MM-DD"}') from None
+            if not isinstance(ips, list) or not all(isinstance(ip, str) for ip in ips):
+                raise HTTPError(400, '"ips" must be a list of strings')
+            date = _parse_request_date(payload.get("date"))
+        else:
+            raise HTTPError(405, f"Method not allowed: {method}")
+
+        result = await self.lookup(ips, date)
+        return result.to_dict()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until it is closed."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status = 200
+                metrics.incr("requests")
+                try:
+                    length = int(headers.get("content-length", "0"))
+                    if length > _MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    with metrics.span("request"):
+                        response = await self._dispatch(method.upper(), target, body)
+                except HTTPError as e:
+                    status, response, keep_alive = e.status, {"error": str(e)}, False
+                except Exception as e:
+                    status, response = 500, {"error": str(e)}
+                if status != 200:
+                    metrics.incr("request_errors")
+
+                if isinstance(response, str):
+                    data, content_type = response.encode(), _PROMETHEUS_CONTENT_TYPE
+                else:
+                    data, content_type = json.dumps(response).encode(), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> asyncio.AbstractServer:
+        """Start listening on the configured address.
+
+        Returns:
+            The running asyncio server.
+        """
+        kind, host, port = parse_address(self.config.address)
+        if kind == "unix":
+            _remove_stale_socket(host)
+            return await asyncio.start_unix_server(self._handle, path=host)
+        return await asyncio.start_server(self._handle, host=host, port=port)
+
+    async def serve_forever(self) -> None:
+        """Start the server and serve until cancelled."""
+        server = await self.start()
+        print(f"Serving lookups on {self.config.address}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def serve(config: ServerConfig) -> None:
+    """Run the lookup daemon until interrupted.
+
+    Args:
+        config: Server configuration.
+    """
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(LookupServer(config).serve_forever())
@@ -0,0 +1,129 @@
+"""Multi-date (time-series) lookups of one IP set across many snapshots."""
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from . import metrics
+from .columnar import ColumnarBatch, pack_ips
+from .ipparse import FAMILY_INVALID, FAMILY_IPV4, FAMILY_IPV6
+from .lookup import (
+    dedupe_ips,
+    get_lookup_cache,
+    get_provider,
+    get_snapshot_store,
+    initialize_provider,
+    record_cache_stats,
+)
+from .models import LookupConfig
+from .providers import Prefix2ASProvider, SnapshotStore
+from .providers.discovery import find_routeviews_snapshot_url
+
+
+def expand_date_range(start: datetime, end: datetime, step_days: int = 1) -> List[datetime]:
+    """List the dates from ``start`` to ``end`` inclusive.
+
+    Args:
+        start: First date.
+        end: Last date.
+        step_days: Number of days between consecutive dates.
+
+    Returns:
+        The dates in ascending order.
+
+    Raises:
+        ValueError: If the range is empty or the step is not positive.
+    """
+    if step_days < 1:
+        raise ValueError("Date step must be at least one day")
+    if end < start:
+        raise ValueError(f"Date range end {end:%Y-%m-%d} is before its start {start:%Y-%m-%d}")
+    days = (end - start).days
+    return [start + timedelta(days=d) for d in range(0, days + 1, step_days)]
+
+
+def resolve_snapshots(
+    dates: List[datetime],
+    store: Optional[SnapshotStore] = None
+) -> Dict[datetime, List[datetime]]:
+    """Resolve requested dates to the snapshots that will answer them.
+
+    Several requested dates can resolve to the same snapshot (for example when a
+    daily snapshot is missing), in which case it is loaded only once.
+
+    Args:
+        dates: Requested snapshot dates.
+        store: Optional snapshot store used for discovery.
+
+    Returns:
+        Mapping of actual snapshot date to the requested dates it answers, in
+        ascending snapshot order.
+    """
+    snapshots: Dict[datetime, List[datetime]] = {}
+    for date in sorted(set(dates)):
+        _, actual_date = find_routeviews_snapshot_url(date, store)
+        snapshots.setdefault(actual_date, []).append(date)
+    return dict(sorted(snapshots.items()))
+
+
+def lookup_ips_over_dates(ips: List[str], config: LookupConfig) -> Iterator[ColumnarBatch]:
+    """Look up the same IPs against every snapshot in ``config.snapshot_dates``.
+
+    Snapshots are resolved up front and each distinct snapshot is loaded and
+    looked up once. The input is deduplicated and packed to integers once and
+    reused for every snapshot.
+
+    Args:
+        ips: IP addresses to lookup.
+        config: Configuration whose ``snapshot_dates`` lists the requested dates.
+
+    Yields:
+        One ColumnarBatch per requested date, in ascending date order and long
+        format: every result carries its ``requested_date`` and the
+        ``snapshot_date`` it was resolved against. Requested dates answered by
+        the same snapshot share its lookup results.
+    """
+    assert config.snapshot_dates, "snapshot_dates is required for multi-date lookups"
+    store = get_snapshot_store(config)
+    snapshots = resolve_snapshots(config.snapshot_dates, store)
+    for actual_date, requested in snapshots.items():
+        if len(requested) > 1 or requested[0].date() != actual_date.date():
+            print(f"Snapshot {actual_date:%Y-%m-%d} answers {', '.join(f'{d:%Y-%m-%d}' for d in requested)}; "
+                  f"its results are written for each of them", file=sys.stderr)
+
+    unique_ips, inverse = dedupe_ips(ips)
+    unique_family, unique_addrs, unique_addrs6, _ = pack_ips(unique_ips)
+    v4_rows = np.flatnonzero(unique_family == FAMILY_IPV4)
+    v6_rows = np.flatnonzero(unique_family == FAMILY_IPV6)
+    family, addrs, addrs6 = unique_family[inverse], unique_addrs[inverse], unique_addrs6[inverse]
+    text = {row: ips[row] for row in np.flatnonzero(family == FAMILY_INVALID).tolist()}
+
+    for actual_date, requested in snapshots.items():
+        provider = get_provider(config.provider, actual_date, store, cache=get_lookup_cache(config))
+        initialize_provider(provider)
+        details = None
+        metrics.incr("lookups", len(ips))
+        with metrics.span("lookup"):
+            if config.enrich:
+                details = provider.lookup_details(unique_ips)
+                unique_asns = details.asns
+            elif isinstance(provider, Prefix2ASProvider):
+                # The addresses are packed once and looked up in every snapshot.
+                unique_asns = np.zeros(len(unique_ips), dtype=np.uint32)
+                unique_asns[v4_rows] = provider.lookup_addrs(unique_addrs[v4_rows])
+                if len(v6_rows):
+                    unique_asns[v6_rows] = provider.lookup_addrs6(unique_addrs6[v6_rows])
+            else:
+                unique_asns = np.asarray(provider.lookup_batch(unique_ips), dtype=np.uint32)
+        record_cache_stats(provider)
+
+        asns = unique_asns[inverse]
+        rows = details.take(inverse) if details is not None else None
+        timestamp = datetime.now(timezone.utc)
+        for date in requested:
+            yield ColumnarBatch(
+                addrs, asns, provider.provider_name, actual_date, timestamp=timestamp,
+                snapshot_date=actual_date, text=text, ips=ips, details=rows, requested_date=date,
+                family=family, addrs6=addrs6
+            )
@@ -0,0 +1,20 @@
+"""Shared fixtures for the unit tests."""
+from datetime import datetime
+
+import pytest
+
+from src.providers import Prefix2ASProvider
+from src.providers.prefix_table import PrefixTable
+from src.providers.prefix_table6 import PrefixTable6
+
+
+@pytest.fixture
+def prefix2as_provider():
+    """Factory building a prefix2as provider from pfx2as text, without downloading a snapshot."""
+    def build(text, snapshot_date=datetime(2023, 1, 1)):
+        provider = Prefix2ASProvider(snapshot_date)
+        provider.load_table(PrefixTable.from_lines(text.splitlines()))
+        provider.load_table6(PrefixTable6.from_lines(text.splitlines()))
+        return provider
+
+    return build
@@ -0,0 +1,162 @@
+"""Unit tests for the asyncio facade."""
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from src import lookup
+from src.aio import AsyncLookup, achunked, lookup_ips_async
+from src.models import LookupConfig, Provider
+from src.providers import BaseProvider
+
+PFX2AS = """\
+8.8.8.0\t24\t15169
+1.1.1.0\t24\t13335
+192.0.2.0\t24\t64496_64497
+"""
+
+
+class SlowProvider(BaseProvider):
+    """Provider whose initialization blocks its thread."""
+
+    def __init__(self, snapshot_date, delay=0.2, fail=False):
+        super().__init__(snapshot_date)
+        self.delay = delay
+        self.fail = fail
+        self.threads = []
+
+    def initialize(self) -> None:
+        self.threads.append(threading.current_thread())
+        threading.Event().wait(self.delay)
+        if self.fail:
+            raise SystemExit("No snapshot found")
+
+    def _lookup_uncached(self, ip: str) -> int:
+        return 1
+
+
+async def _source(ips, pulled):
+    for ip in ips:
+        pulled.append(ip)
+        await asyncio.sleep(0)
+        yield ip
+
+
+class TestAsyncInitialize:
+    """Test non-blocking provider initialization."""
+
+    def test_loop_keeps_running(self):
+        """Test that other tasks run while a provider initializes."""
+        async def main():
+            provider = SlowProvider(datetime(2023, 1, 1))
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.ensure_future(ticker())
+            await provider.ainitialize()
+            task.cancel()
+            return provider, ticks
+
+        provider, ticks = asyncio.run(main())
+        assert ticks > 5
+        assert provider.threads[0] is not threading.main_thread()
+
+    def test_missing_snapshot_raises_lookup_error(self):
+        """Test that a provider exiting for a missing snapshot raises instead of exiting."""
+        with pytest.raises(LookupError):
+            asyncio.run(SlowProvider(datetime(2023, 1, 1), delay=0, fail=True).ainitialize())
+
+    def test_session_initializes_once(self):
+        """Test that concurrent callers share one initialization."""
+        async def main():
+            session = AsyncLookup(SlowProvider(datetime(2023, 1, 1), delay=0.05))
+            await asyncio.gather(session.ainitialize(), session.ainitialize(), session.lookup(["8.8.8.8"]))
+            session.close()
+            return session.provider.threads
+
+        assert len(asyncio.run(main())) == 1
+
+
+class TestAsyncLookup:
+    """Test chunked lookups on the session executor."""
+
+    def test_lookup_merges_chunks(self, prefix2as_provider):
+        """Test that a list is looked up in chunks and returned in order."""
+        async def main():
+            async with AsyncLookup(prefix2as_provider(PFX2AS), chunk_size=2) as session:
+                return await session.lookup(["8.8.8.8", "9.9.9.9", "1.1.1.1", "8.8.4.4", "192.0.2.1"])
+
+        assert asyncio.run(main()).asns.tolist() == [15169, 0, 13335, 0, 64497]
+
+    def test_stream_applies_backpressure(self, prefix2as_provider):
+        """Test that reading from the source pauses while the consumer is behind."""
+        async def main():
+            pulled = []
+            ips = [f"8.8.8.{i}" for i in range(100)]
+            async with AsyncLookup(prefix2as_provider(PFX2AS), chunk_size=10, max_pending=2) as session:
+                batches = session.stream(_source(ips, pulled))
+                first = await batches.__anext__()
+                await asyncio.sleep(0.05)
+                pulled_early = len(pulled)
+                rest = [batch async for batch in batches]
+            return first, rest, pulled_early
+
+        first, rest, pulled_early = asyncio.run(main())
+        assert first.ips == [f"8.8.8.{i}" for i in range(10)]
+        assert pulled_early <= 30
+        assert sum(len(b) for b in rest) == 90
+        assert all(b.asns.tolist() == [15169] * 10 for b in rest)
+
+    def test_partial_chunk_after_max_delay(self, prefix2as_provider):
+        """Test that an idle source does not hold back a partial chunk."""
+        async def main():
+            stop = asyncio.Event()
+
+            async def idle_source():
+                yield "8.8.8.8"
+                await stop.wait()
+
+            async with AsyncLookup(prefix2as_provider(PFX2AS), chunk_size=100) as session:
+                batches = session.stream(idle_source(), max_delay=0.02)
+                batch = await asyncio.wait_for(batches.__anext__(), 1)
+                stop.set()
+                await batches.aclose()
+            return batch
+
+        assert asyncio.run(main()).asns.tolist() == [15169]
+
+    def test_achunked_sync_source(self):
+        """Test that plain iterables are chunked like ``chunked``, off the event loop thread."""
+        threads = set()
+
+        def source():
+            for item in "abcde":
+                threads.add(threading.current_thread())
+                yield item
+
+        async def main():
+            return [chunk async for chunk in achunked(source(), 2)]
+
+        assert asyncio.run(main()) == [["a", "b"], ["c", "d"], ["e"]]
+        assert threading.main_thread() not in threads
+
+    def test_lookup_ips_async(self, prefix2as_provider, monkeypatch):
+        """Test the configuration-driven stream with enriched results."""
+        monkeypatch.setattr(lookup, "get_provider", lambda *args: prefix2as_provider(PFX2AS))
+        config = LookupConfig(
+            provider=Provider.PREFIX2AS, single_ip="8.8.8.8", snapshot_date=datetime(2023, 1, 1),
+            chunk_size=2, enrich=True
+        )
+
+        async def main():
+            return [batch async for batch in lookup_ips_async(_source(["192.0.2.1", "8.8.8.8", "1.1.1.1"], []), config)]
+
+        batches = asyncio.run(main())
+        assert [len(b) for b in batches] == [2, 1]
+        assert batches[0].details.origins() == [[64496, 64497], [15169]]
@@ -0,0 +1,138 @@
+"""Unit tests for ASN to prefix queries."""
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from src.cli import create_parser
+from src.models import LookupConfig, Provider
+from src.providers.asn_index import ASNIndex
+from src.providers.prefix_table import PrefixTable
+from src.providers.prefix_table6 import PrefixTable6
+from src.reverse import PrefixBatch, parse_asns
+from src.serializers import CSVSerializer, JSONSerializer, ParquetSerializer
+
+PFX2AS = """\
+10.0.0.0\t8\t100
+10.1.0.0\t16\t100
+10.2.0.0\t16\t200
+192.0.2.0\t24\t100_300
+198.51.100.0\t24\t300,300
+2001:db8::\t32\t100
+2001:db8:1::\t48\t100
+2001:db9::\t32\t100
+"""
+
+
+class TestParseASNs:
+    """Test reading ASNs in their usual notations."""
+
+    def test_notations(self):
+        """Test plain, AS-prefixed and asdot ASNs, with repeats dropped."""
+        assert parse_asns(["AS64500, 64501 as64500", "1.10"]) == [64500, 64501, 65546]
+
+    @pytest.mark.parametrize("text", ["ASX", "-1", "4294967296", "1.65536", "1.2.3"])
+    def test_invalid(self, text):
+        """Test that malformed and out-of-range ASNs are rejected."""
+        with pytest.raises(ValueError, match="Invalid ASN"):
+            parse_asns([text])
+
+
+class TestASNIndex:
+    """Test building and querying the reverse index."""
+
+    def test_build(self):
+        """Test that every origin of multi-origin and AS-set prefixes lists the prefix once."""
+        index = ASNIndex.build(PrefixTable.from_lines(PFX2AS.splitlines()))
+        assert index.asns.tolist() == [100, 200, 300]
+        assert index.offsets.tolist() == [0, 3, 4, 6]
+        assert index.table.network[index.rows_of(300)].tolist() == [0xC0000200, 0xC6336400]
+        assert len(index.rows_of(64500)) == 0
+
+    def test_lookup(self):
+        """Test batch lookups, including ASNs that originate nothing."""
+        index = ASNIndex.build(PrefixTable.from_lines(PFX2AS.splitlines()))
+        query, rows = index.lookup(np.array([300, 7, 200], dtype=np.uint32))
+        assert query.tolist() == [0, 0, 2]
+        assert rows.tolist() == index.rows_of(300).tolist() + index.rows_of(200).tolist()
+
+    def test_address_space_counts_nested_prefixes_once(self):
+        """Test that a more specific prefix inside another of the same ASN adds nothing."""
+        index = ASNIndex.build(PrefixTable.from_lines(PFX2AS.splitlines()))
+        assert index.address_space(index.rows_of(100)) == 2 ** 24 + 256
+        index6 = ASNIndex.build(PrefixTable6.from_lines(PFX2AS.splitlines()))
+        assert index6.address_space(index6.rows_of(100)) == 2 * 2 ** 96
+
+    def test_empty_table(self):
+        """Test that an empty table answers with no rows."""
+        index = ASNIndex.build(PrefixTable.from_lines([]))
+        query, rows = index.lookup(np.array([100], dtype=np.uint32))
+        assert len(query) == len(rows) == 0
+        assert index.address_space(rows) == 0
+
+
+class TestLookupASNs:
+    """Test provider queries and their output."""
+
+    def test_rows_and_space(self, prefix2as_provider):
+        """Test the rows, per-ASN space and total space of a query."""
+        prefixes = prefix2as_provider(PFX2AS).lookup_asns([300, 100, 64500])
+        assert prefixes.asn.tolist() == [300, 300, 100, 100, 100]
+        assert prefixes.prefixes == ["192.0.2.0", "198.51.100.0", "10.0.0.0", "10.1.0.0", "192.0.2.0"]
+        assert prefixes.space == {300: 512, 100: 2 ** 24 + 256, 64500: 0}
+        assert prefixes.total_space == 2 ** 24 + 512
+        assert prefixes.prefix_counts() == {300: 2, 100: 3, 64500: 0}
+
+    def test_ipv6(self, prefix2as_provider):
+        """Test that IPv6 prefix sizes are exact."""
+        prefixes = prefix2as_provider(PFX2AS).lookup_asns([100], family=6)
+        assert prefixes.prefixes == ["2001:db8::", "2001:db8:1::", "2001:db9::"]
+        assert prefixes.addresses.tolist() == [2 ** 96, 2 ** 80, 2 ** 96]
+
+    def test_index_follows_reloaded_table(self, prefix2as_provider):
+        """Test that loading another table drops the reverse index of the old one."""
+        provider = prefix2as_provider(PFX2AS)
+        assert len(provider.lookup_asns([200])) == 1
+        provider.load_table(PrefixTable.from_lines(["10.0.0.0\t8\t100"]))
+        assert len(provider.lookup_asns([200])) == 0
+
+    @pytest.fixture
+    def batch(self, prefix2as_provider):
+        """Prefix rows of AS300."""
+        return PrefixBatch(prefix2as_provider(PFX2AS).lookup_asns([300]), "prefix2as", datetime(2023, 1, 1))
+
+    def test_csv(self, batch):
+        """Test the CSV layout of prefix rows."""
+        rows = list(csv.DictReader(StringIO(CSVSerializer.serialize(batch))))
+        assert [(r["asn"], r["prefix"], r["origins"], r["addresses"]) for r in rows] == [
+            ("300", "192.0.2.0", "100_300", "256"),
+            ("300", "198.51.100.0", "300_300", "256"),
+        ]
+
+    def test_json(self, batch):
+        """Test the JSON document of prefix rows."""
+        document = json.loads(JSONSerializer.serialize(batch))
+        assert document["total"] == 2 and document["successful"] == 2
+        assert document["results"][0]["prefix_length"] == 24
+
+    def test_parquet(self, batch, tmp_path):
+        """Test the Parquet layout of prefix rows."""
+        path = tmp_path / "prefixes.parquet"
+        ParquetSerializer.serialize(batch, str(path))
+        table = pq.read_table(path)
+        assert table.column_names[:3] == ["asn", "timestamp", "provider"]
+        assert table.column("addresses").to_pylist() == [256.0, 256.0]
+
+    def test_config(self):
+        """Test the --asn option and its validation."""
+        args = create_parser().parse_args(["--asn", "AS300,1.10", "--ipv6"])
+        assert args.asns == [300, 65546] and args.ipv6
+        with pytest.raises(ValueError, match="prefix2as"):
+            LookupConfig(asns=[300])
+        with pytest.raises(ValueError, match="single snapshot"):
+            LookupConfig(asns=[300], provider=Provider.PREFIX2AS, workers=2)
+        LookupConfig(asns=[300], provider=Provider.PREFIX2AS)
@@ -0,0 +1,132 @@
+"""Unit tests for the offline benchmark suite."""
+from datetime import datetime
+
+import numpy as np
+
+from src import benchmark
+from src.models import Provider
+from src.providers import Prefix2ASProvider, SnapshotStore
+from src.providers.discovery import ROUTEVIEWS6_DATASET, find_routeviews_snapshot_url
+from src.providers.prefix_table import PrefixTable
+from src.providers.prefix_table6 import PrefixTable6
+
+
+class TestSyntheticData:
+    """Test synthetic snapshots and IP sets."""
+
+    def test_snapshots_parse(self):
+        """Test that generated lines are valid pfx2as prefixes with some MOAS origins."""
+        lines4 = benchmark.synthetic_pfx2as(2000, 4, seed=1, moas_fraction=0.1)
+        lines6 = benchmark.synthetic_pfx2as(200, 6, seed=1)
+        assert len(PrefixTable.from_lines(lines4)) == len(lines4)
+        assert len(PrefixTable6.from_lines(lines6)) == len(lines6)
+        assert any("_" in line for line in lines4)
+
+    def test_ip_set_mix(self):
+        """Test size, repetition, family mix and that most addresses are found."""
+        lines4 = benchmark.synthetic_pfx2as(2000, 4)
+        lines6 = benchmark.synthetic_pfx2as(200, 6)
+        ips = benchmark.synthetic_ips(lines4, lines6, 1000, duplication=0.5, ipv6_fraction=0.2)
+        assert len(ips) == 1000
+        assert len(set(ips)) <= 500
+        assert 0.1 < sum(":" in ip for ip in ips) / len(ips) < 0.3
+
+        provider = Prefix2ASProvider(datetime(2023, 1, 1))
+        provider.load_table(PrefixTable.from_lines(lines4))
+        provider.load_table6(PrefixTable6.from_lines(lines6))
+        assert np.count_nonzero(provider.lookup_batch(ips)) / len(ips) > 0.9
+
+
+class TestMirror:
+    """Test the loopback mirror of the routing datasets."""
+
+    def test_discovery_uses_mirror(self, tmp_path, monkeypatch):
+        """Test that discovery and downloads go to the mirror when it is configured."""
+        root = tmp_path / "mirror"
+        benchmark.write_mirror(root, ["10.0.0.0\t8\t100"], ["2001:db8::\t32\t200"])
+        with benchmark.serve_mirror(root) as url:
+            monkeypatch.setenv("MAP_IP_TO_ASN_ROUTING_URL", url)
+            store = SnapshotStore(tmp_path / "store")
+            found, date = find_routeviews_snapshot_url(benchmark.SNAPSHOT_DATE, store, ROUTEVIEWS6_DATASET)
+            assert found.startswith(url)
+            assert date == benchmark.SNAPSHOT_DATE
+
+            provider = Prefix2ASProvider(benchmark.SNAPSHOT_DATE, store)
+            assert provider.lookup_batch(["10.1.1.1", "2001:db8::1"]) == [100, 200]
+
+
+class TestRunBenchmark:
+    """Test running and comparing benchmarks."""
+
+    def test_small_run(self):
+        """Test that a tiny run reports every stage of every case."""
+        document = benchmark.run_benchmark(
+            sizes=[300], duplications=[0.5], ipv6_fractions=[0.0, 0.2], providers=[Provider.PREFIX2AS],
+            formats=["jsonl", "parquet"], n_prefixes=500, startup=False, end_to_end=False, imports=False,
+        )
+        assert document["version"] == benchmark.RESULTS_VERSION
+        assert len(document["results"]) == 2
+        result = document["results"][1]
+        assert result["dataset"]["ipv6_fraction"] == 0.2
+        assert set(result["stages"]) == {"discovery_s", "load_cold_s", "load_warm_s", "lookup_s"}
+        assert set(result["serialize"]) == {"jsonl", "parquet"}
+        assert result["lookups_per_sec"] > 0
+        assert result["successful"] > 200
+        assert document["delta"]["changes"] > 0
+
+    def test_compare_results(self):
+        """Test that only slowdowns beyond the threshold are reported."""
+        def document(lookups_per_sec, lookup_s):
+            return {"results": [{
+                "provider": "prefix2as",
+                "dataset": {"ips": 10, "duplication": 0.0, "ipv6_fraction": 0.0},
+                "stages": {"lookup_s": lookup_s},
+                "lookups_per_sec": lookups_per_sec,
+            }]}
+
+        baseline = document(1000.0, 1.0)
+        assert benchmark.compare_results(document(1000.0, 0.001), document(1000.0, 0.005)) == []
+        assert benchmark.compare_results(baseline, document(950.0, 1.05)) == []
+        regressions = benchmark.compare_results(baseline, document(500.0, 2.0))
+        assert len(regressions) == 2
+        assert any("lookups_per_sec" in line for line in regressions)
+
+    def test_compare_imports(self):
+        """Test that slower imports and newly loaded heavy modules are reported."""
+        def document(import_s, heavy_modules):
+            return {"results": [], "imports": {"src.cli": {"import_s": import_s, "heavy_modules": heavy_modules}}}
+
+        baseline = document(0.2, [])
+        assert benchmark.compare_results(baseline, document(0.205, [])) == []
+        regressions = benchmark.compare_results(baseline, document(0.4, ["pyarrow"]))
+        assert len(regressions) == 2
+        assert any("now loads pyarrow" in line for line in regressions)
+
+    def test_compare_delta(self):
+        """Test that a slower delta update on the same snapshot size is reported."""
+        def document(prefixes, apply_delta_s):
+            return {"results": [], "delta": {"prefixes": prefixes, "apply_delta_s": apply_delta_s}}
+
+        assert benchmark.compare_results(document(1000, 0.1), document(1000, 0.105)) == []
+        assert benchmark.compare_results(document(1000, 0.1), document(2000, 0.5)) == []
+        assert len(benchmark.compare_results(document(1000, 0.1), document(1000, 0.5))) == 1
+
+
+class TestDeltaUpdate:
+    """Test the snapshot delta update measurements."""
+
+    def test_delta_beats_build(self):
+        """Test that applying a small delta is faster than building the index again."""
+        delta = benchmark.measure_delta_update(100_000)
+        assert delta["changes"] > 0
+        assert delta["apply_delta_s"] < delta["build_s"]
+
+
+class TestImports:
+    """Test the import time measurements."""
+
+    def test_cli_does_not_load_heavy_modules(self):
+        """Test that importing the CLI leaves pyarrow, requests and the daemon stack unloaded."""
+        imports = benchmark.measure_imports(["src.cli"], repeat=1)
+        assert imports["src.cli"]["import_s"] > 0
+        assert imports["src.cli"]["heavy_modules"] == []
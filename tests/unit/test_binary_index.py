@@ -0,0 +1,105 @@
+"""Unit tests for the binary snapshot index."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.providers import Prefix2ASProvider, SnapshotStore
+from src.providers.binary_index import cached_index, load_index, write_index
+from src.providers.origins import LookupDetails
+from src.providers.prefix_table import PrefixTable, RangeIndex
+from src.providers.prefix_table6 import PrefixTable6, RangeIndex6
+
+LINES = ["10.0.0.0\t8\t100", "10.1.0.0\t16\t200", "192.0.2.0\t24\t64496_64497"]
+LINES6 = ["2001:db8::\t32\t100", "2001:db8:0:0:1::\t80\t200"]
+URL = "http://data.caida.org/datasets/routing/routeviews-prefix2as/2023/01/routeviews-rv2-20230101-1200.pfx2as"
+
+
+class TestBinaryIndex:
+    """Test writing and memory-mapping indexes."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a loaded index answers like the in-memory one."""
+        index = RangeIndex.build(PrefixTable.from_lines(LINES))
+        path = tmp_path / "snap.idx"
+        write_index(index, datetime(2023, 1, 1), path)
+
+        loaded, snapshot_date = load_index(path)
+
+        assert snapshot_date == datetime(2023, 1, 1)
+        addrs = np.array([0x0A000001, 0x0A010001, 0xC0000201, 0x01010101], dtype=np.uint32)
+        assert loaded.lookup(addrs).tolist() == [100, 200, 64497, 0]
+        assert loaded.table.length.tolist() == index.table.length.tolist()
+        rows = loaded.lookup_rows_unique(addrs)
+        assert LookupDetails.from_table(loaded.table, rows).origins() == [[100], [200], [64496, 64497], []]
+
+    def test_views_are_read_only(self, tmp_path):
+        """Test that loaded arrays are zero-copy read-only views."""
+        path = tmp_path / "snap.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(LINES)), datetime(2023, 1, 1), path)
+        loaded, _ = load_index(path)
+        assert not loaded.starts.flags.writeable
+        assert not loaded.starts.flags.owndata
+
+    def test_empty_index(self, tmp_path):
+        """Test an index without prefixes."""
+        path = tmp_path / "empty.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines([])), datetime(2023, 1, 1), path)
+        loaded, _ = load_index(path)
+        assert loaded.lookup(np.array([1], dtype=np.uint32)).tolist() == [0]
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that non-index files are rejected."""
+        path = tmp_path / "bogus.idx"
+        path.write_bytes(b"x" * 128)
+        with pytest.raises(ValueError):
+            load_index(path)
+
+    def test_cached_index_compiles_once(self, tmp_path):
+        """Test that the store keeps compiled indexes keyed by snapshot digest."""
+        store = SnapshotStore(tmp_path / "store")
+        source = tmp_path / "snap"
+        source.write_text("\n".join(LINES))
+        store.add_file(URL, source)
+
+        path = cached_index(store, URL, datetime(2023, 1, 1))
+        mtime = path.stat().st_mtime_ns
+        assert cached_index(store, URL, datetime(2023, 1, 1)) == path
+        assert path.stat().st_mtime_ns >= mtime
+
+    def test_provider_loads_index(self, tmp_path):
+        """Test the provider uses a precompiled index and its snapshot date."""
+        path = tmp_path / "snap.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(LINES)), datetime(2023, 1, 1), path)
+        provider = Prefix2ASProvider(datetime(2024, 5, 5), index_path=path)
+        provider.initialize()
+        assert provider.snapshot_date == datetime(2023, 1, 1)
+        assert provider.lookup_batch(["10.1.2.3", "10.2.0.0"]) == [200, 100]
+
+    def test_ipv6_round_trip(self, tmp_path):
+        """Test that IPv6 indexes round-trip and are told apart from IPv4 ones."""
+        index = RangeIndex6.build(PrefixTable6.from_lines(LINES6))
+        path = tmp_path / "snap6.idx"
+        write_index(index, datetime(2023, 1, 1), path)
+
+        loaded, _ = load_index(path)
+
+        assert isinstance(loaded, RangeIndex6)
+        addrs = np.array([[0x20010DB800000000, 1], [0x20010DB800000000, 1 << 48], [0, 1]], dtype=np.uint64)
+        assert loaded.lookup_unique(addrs).tolist() == [100, 200, 0]
+
+    def test_provider_rejects_swapped_indexes(self, tmp_path):
+        """Test that an IPv6 index passed as the IPv4 one is refused."""
+        path = tmp_path / "snap6.idx"
+        write_index(RangeIndex6.build(PrefixTable6.from_lines(LINES6)), datetime(2023, 1, 1), path)
+        with pytest.raises(ValueError, match="IPv6 index"):
+            Prefix2ASProvider(datetime(2023, 1, 1), index_path=path).initialize()
+
+    def test_provider_loads_ipv6_index(self, tmp_path):
+        """Test that both precompiled indexes are used together."""
+        path, path6 = tmp_path / "snap.idx", tmp_path / "snap6.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(LINES)), datetime(2023, 1, 1), path)
+        write_index(RangeIndex6.build(PrefixTable6.from_lines(LINES6)), datetime(2023, 1, 2), path6)
+        provider = Prefix2ASProvider(datetime(2024, 5, 5), index_path=path, index6_path=path6)
+        assert provider.lookup_batch(["2001:db8::1:0:0:1", "10.1.2.3"]) == [200, 200]
+        assert provider.snapshot_date6 == datetime(2023, 1, 2)
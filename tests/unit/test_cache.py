@@ -0,0 +1,147 @@
+"""Unit tests for provider lookup caches."""
+from datetime import datetime
+
+import pytest
+
+from src.providers import Prefix2ASProvider
+from src.providers.base import BaseProvider
+from src.providers.cache import (
+    IPV6_KEY_OFFSET,
+    LRUCache,
+    NullCache,
+    PrefixCache,
+    TieredCache,
+    address_key,
+    make_cache,
+)
+from src.providers.prefix_table import PrefixTable
+
+
+class CountingProvider(BaseProvider):
+    """Provider answering from the last octet and counting uncached lookups."""
+
+    def __init__(self, cache=None):
+        super().__init__(datetime(2024, 1, 1), cache)
+        self.calls = 0
+
+    def initialize(self):
+        pass
+
+    def _lookup_uncached(self, ip):
+        self.calls += 1
+        return int(ip.rsplit(".", 1)[-1])
+
+
+class TestAddressKey:
+    """Test integer cache keys."""
+
+    def test_families_do_not_collide(self):
+        """Test that IPv4 and IPv6 keys live in separate ranges."""
+        assert address_key("0.0.0.1") == 1
+        assert address_key("::1") == IPV6_KEY_OFFSET + 1
+        assert address_key("not an ip") is None
+
+
+class TestLRUCache:
+    """Test the address LRU."""
+
+    def test_bounded_with_counters(self):
+        """Test that the least recently used entry is evicted and counted."""
+        cache = LRUCache(max_entries=2)
+        cache.put(1, 10)
+        cache.put(2, 20)
+        assert cache.get(1) == 10
+        cache.put(3, 30)
+        assert len(cache) == 2
+        assert cache.get(2) is None
+        assert cache.get(3) == 30
+        assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions) == (2, 1, 1)
+
+    def test_rejects_empty_size(self):
+        """Test that a zero-sized LRU is refused."""
+        with pytest.raises(ValueError):
+            LRUCache(0)
+
+
+class TestPrefixCache:
+    """Test the prefix-level cache."""
+
+    def test_unseen_address_in_block_hits(self):
+        """Test that every address of a cached block hits."""
+        cache = PrefixCache()
+        cache.put(address_key("10.1.2.3"), 64500, (address_key("10.1.0.0"), address_key("10.1.255.255")))
+        assert cache.get(address_key("10.1.200.7")) == 64500
+        assert cache.get(address_key("10.2.0.1")) is None
+
+    def test_unaligned_span_uses_largest_block(self):
+        """Test that only the aligned block around the address inside the span is cached."""
+        cache = PrefixCache()
+        # Span 10.0.0.0 - 10.0.2.255 is not a CIDR block; 10.0.0.0/23 is the largest around .1.5.
+        cache.put(address_key("10.0.1.5"), 1, (address_key("10.0.0.0"), address_key("10.0.2.255")))
+        assert cache.get(address_key("10.0.0.9")) == 1
+        assert cache.get(address_key("10.0.2.9")) is None
+
+    def test_ipv6_blocks(self):
+        """Test that IPv6 blocks are cached apart from IPv4 blocks of the same length."""
+        cache = PrefixCache()
+        first, last = address_key("2001:db8::"), address_key("2001:db8:ffff:ffff:ffff:ffff:ffff:ffff")
+        cache.put(address_key("2001:db8::1"), 64502, (first, last))
+        assert cache.get(address_key("2001:db8:abcd::9")) == 64502
+        assert cache.get(address_key("2001:db9::")) is None
+        assert cache.get(address_key("32.1.13.184")) is None
+
+    def test_eviction(self):
+        """Test that blocks are bounded like addresses."""
+        cache = PrefixCache(max_entries=1)
+        cache.put(1, 1, (0, 1))
+        cache.put(5, 2, (4, 7))
+        assert cache.get(0) is None
+        assert cache.get(6) == 2
+        assert cache.stats.evictions == 1
+
+
+class TestProviderCache:
+    """Test caching in providers."""
+
+    def test_repeated_lookups_use_cache(self):
+        """Test that only the first lookup of an address reaches the provider."""
+        provider = CountingProvider()
+        assert provider.lookup("10.0.0.7") == 7
+        assert provider.lookup("10.0.0.7") == 7
+        assert provider.calls == 1
+        assert provider.cache.stats.hits == 1
+
+    def test_null_cache(self):
+        """Test that a disabled cache always reaches the provider."""
+        provider = CountingProvider(make_cache(0))
+        assert isinstance(provider.cache, NullCache)
+        provider.lookup("10.0.0.7")
+        provider.lookup("10.0.0.7")
+        assert provider.calls == 2
+
+    def test_prefix_cache_matches_index(self):
+        """Test that prefix-cached answers agree with uncached lookups, gaps included."""
+        table = PrefixTable.from_lines([
+            "10.0.0.0\t8\t100",
+            "10.1.0.0\t16\t200",
+            "10.1.2.0\t24\t300",
+        ])
+        cache = make_cache(max_entries=0, prefix_entries=16)
+        provider = Prefix2ASProvider(datetime(2024, 1, 1), cache=cache)
+        provider.load_table(table)
+        reference = Prefix2ASProvider(datetime(2024, 1, 1))
+        reference.load_table(table)
+
+        ips = ["10.1.2.9", "10.1.2.200", "10.1.3.1", "10.1.9.9", "10.200.0.1", "10.1.1.1", "11.0.0.1", "11.9.9.9"]
+        assert [provider.lookup(ip) for ip in ips] == reference.lookup_batch(ips)
+        assert cache.stats.hits > 0
+
+    def test_tiered_cache(self):
+        """Test that tiers are consulted in order and all filled on a miss."""
+        cache = make_cache(max_entries=4, prefix_entries=4)
+        assert isinstance(cache, TieredCache)
+        cache.put(address_key("10.0.0.1"), 5, (address_key("10.0.0.0"), address_key("10.0.0.255")))
+        assert cache.get(address_key("10.0.0.1")) == 5
+        assert cache.get(address_key("10.0.0.2")) == 5
+        assert cache.tiers[0].stats.hits == 1
+        assert cache.tiers[1].stats.hits == 1
@@ -0,0 +1,160 @@
+"""Unit tests for resumable, checkpointed batch jobs."""
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+import src.checkpoint as checkpoint
+from src.checkpoint import iter_line_chunks, run_checkpointed_job
+from src.cli import create_parser
+from src.models import LookupConfig, OutputFormat, Provider
+from src.providers.binary_index import write_index
+from src.providers.prefix_table import PrefixTable, RangeIndex
+
+LINES = ["10.0.0.0\t8\t100", "192.0.2.0\t24\t200"]
+
+
+@pytest.fixture
+def job(tmp_path):
+    """Configuration of a 10-line job in chunks of 3 lines, against a compiled index."""
+    index_path = tmp_path / "rv.idx"
+    write_index(RangeIndex.build(PrefixTable.from_lines(LINES)), datetime(2023, 1, 1), index_path)
+    input_file = tmp_path / "ips.txt"
+    input_file.write_text("\n".join(["10.0.0.1", "192.0.2.1", "bad", "8.8.8.8", "10.1.1.1"] * 2) + "\n")
+
+    def config(**kwargs):
+        options = dict(
+            provider=Provider.PREFIX2AS, snapshot_date=datetime(2023, 1, 1), input_file=str(input_file),
+            index_path=str(index_path), output_format=OutputFormat.PARQUET, chunk_size=3,
+            checkpoint_dir=str(tmp_path / "job"),
+        )
+        options.update(kwargs)
+        # An option passed as None is left unset, as the CLI does for --date.
+        return LookupConfig(**{key: value for key, value in options.items() if value is not None})
+
+    return config
+
+
+def _parts(config):
+    return sorted(p.name for p in Path(config.checkpoint_dir).glob("part-*"))
+
+
+class TestLineChunks:
+    """Test splitting input into numbered chunks."""
+
+    def test_numbering(self, tmp_path):
+        """Test chunk numbers, first line numbers and a last line without a newline, which gets one."""
+        path = tmp_path / "ips.txt"
+        path.write_bytes(b"a\nb\nc\nd\ne")
+        chunks = list(iter_line_chunks(str(path), 2))
+        assert [(chunk, first) for chunk, first, _ in chunks] == [(0, 1), (1, 3), (2, 5)]
+        assert chunks[2][2] == [b"e\n"]
+
+
+class TestCheckpointedJob:
+    """Test committing, resuming and sharding jobs."""
+
+    def test_run(self, job):
+        """Test that every chunk becomes a part and the parts form one dataset."""
+        config = job()
+        result, progress = run_checkpointed_job(config)
+        assert _parts(config) == [f"part-00000{i}.parquet" for i in range(4)]
+        assert (progress.committed, progress.skipped, progress.rows, progress.successful) == (4, 0, 10, 6)
+        table = pq.read_table(config.checkpoint_dir)
+        assert sorted(table.column("asn").to_pylist()).count(0) == 4
+        assert result.rows == 10
+
+    def test_resume_after_failure(self, job, monkeypatch):
+        """Test that a run that dies mid-chunk leaves no partial part and resumes where it stopped."""
+        config = job()
+        real_lookup = checkpoint.lookup_chunk
+        calls = []
+
+        def failing_lookup(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("killed")
+            return real_lookup(*args, **kwargs)
+
+        monkeypatch.setattr(checkpoint, "lookup_chunk", failing_lookup)
+        with pytest.raises(RuntimeError):
+            run_checkpointed_job(config)
+        assert _parts(config) == ["part-000000.parquet", "part-000001.parquet"]
+        assert not list(Path(config.checkpoint_dir).glob(".tmp-*"))
+
+        monkeypatch.setattr(checkpoint, "lookup_chunk", real_lookup)
+        result, progress = run_checkpointed_job(config)
+        assert (progress.committed, progress.skipped) == (2, 2)
+        assert result.rows == 10
+
+    def test_missing_part_is_redone(self, job):
+        """Test that a committed chunk whose part was removed is processed again."""
+        config = job()
+        run_checkpointed_job(config)
+        (Path(config.checkpoint_dir) / "part-000002.parquet").unlink()
+        _, progress = run_checkpointed_job(config)
+        assert (progress.committed, progress.skipped) == (1, 3)
+
+    def test_shards(self, job, tmp_path):
+        """Test that shards split the chunks and an unsharded run then finds nothing left to do."""
+        first, _ = run_checkpointed_job(job(shard_index=0, shard_count=2))
+        assert sorted(first.chunks) == [0, 2]
+        second, _ = run_checkpointed_job(job(shard_index=1, shard_count=2))
+        assert sorted(second.chunks) == [0, 1, 2, 3]
+
+        # The snapshot is not loaded when no chunk is left, so a missing index does not matter.
+        (tmp_path / "rv.idx").unlink()
+        _, progress = run_checkpointed_job(job())
+        assert (progress.committed, progress.skipped) == (0, 4)
+        assert pq.read_table(job().checkpoint_dir).num_rows == 10
+
+    def test_resume_keeps_start_date(self, job, monkeypatch):
+        """Test that a job resumed without a date, e.g. after midnight, keeps the date it was started with."""
+        config = job()
+        run_checkpointed_job(config)
+        (Path(config.checkpoint_dir) / "part-000001.parquet").unlink()
+
+        real_lookup = checkpoint.lookup_chunk
+        dates = []
+
+        def recording_lookup(provider, ips, snapshot_date, enrich=False):
+            dates.append(snapshot_date)
+            return real_lookup(provider, ips, snapshot_date, enrich)
+
+        monkeypatch.setattr(checkpoint, "lookup_chunk", recording_lookup)
+        resumed = job(snapshot_date=None)
+        assert resumed.snapshot_date.date() != datetime(2023, 1, 1).date()
+        _, progress = run_checkpointed_job(resumed)
+        assert (progress.committed, progress.skipped) == (1, 3)
+        assert dates == [datetime(2023, 1, 1)]
+
+        # An explicit date must still match.
+        with pytest.raises(ValueError, match="snapshot_date='2023-01-01'"):
+            run_checkpointed_job(job(snapshot_date=datetime(2023, 1, 2)))
+
+    def test_options_must_match(self, job):
+        """Test that a job directory cannot be resumed with other options."""
+        run_checkpointed_job(job())
+        with pytest.raises(ValueError, match="chunk_size=3"):
+            run_checkpointed_job(job(chunk_size=4))
+
+
+class TestCheckpointConfig:
+    """Test checkpoint options."""
+
+    def test_args(self):
+        """Test the --checkpoint-dir and --shard options."""
+        args = create_parser().parse_args(["--file", "ips.txt", "--checkpoint-dir", "job", "--shard", "1/4"])
+        assert args.checkpoint_dir == "job" and args.shard == (1, 4)
+        with pytest.raises(SystemExit):
+            create_parser().parse_args(["--file", "ips.txt", "--shard", "4/4"])
+
+    def test_validation(self, job):
+        """Test the combinations checkpointed jobs refuse."""
+        with pytest.raises(ValueError, match="output file"):
+            job(output_file="out.parquet")
+        with pytest.raises(ValueError, match="single snapshot date"):
+            job(workers=2)
+        with pytest.raises(ValueError, match="checkpoint directory"):
+            job(checkpoint_dir=None, shard_count=2)
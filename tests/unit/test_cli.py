@@ -77,4 +77,46 @@ class TestCLI:
         """Test that either --ip or --file is required."""
         parser = create_parser()
         with pytest.raises(SystemExit):
-            parser.parse_args(["--format", "json"])
\ No newline at end of file
+            parser.parse_args(["--format", "json"])
+    
+    def test_compile_index_args(self):
+        """Test parsing the compile-index mode."""
+        parser = create_parser()
+        args = parser.parse_args(["--compile-index", "--date", "2023-01-01", "--output", "rv.idx"])
+        assert args.compile_index is True
+        assert args.single_ip is None
+        assert args.output_file == "rv.idx"
+        
+        with pytest.raises(SystemExit):
+            parser.parse_args(["--compile-index", "--ip", "8.8.8.8"])
+    
+    def test_parquet_args(self):
+        """Test parsing Parquet writer options."""
+        parser = create_parser()
+        args = parser.parse_args(["--file", "ips.txt", "--format", "parquet", "--output", "out.parquet",
+                                  "--row-group-size", "50000", "--compression", "zstd"])
+        assert args.row_group_size == 50000
+        assert args.compression == "zstd"
+        
+        with pytest.raises(SystemExit):
+            parser.parse_args(["--ip", "8.8.8.8", "--compression", "bogus"])
+    
+    def test_errors_arg(self):
+        """Test parsing the invalid input report destination."""
+        parser = create_parser()
+        assert parser.parse_args(["--file", "ips.txt"]).errors_file is None
+        assert parser.parse_args(["--file", "ips.txt", "--errors", "bad.txt"]).errors_file == "bad.txt"
+    
+    def test_enrich_arg(self):
+        """Test parsing the enriched output flag."""
+        parser = create_parser()
+        assert parser.parse_args(["--file", "ips.txt"]).enrich is False
+        assert parser.parse_args(["--file", "ips.txt", "--enrich"]).enrich is True
+    
+    def test_stats_arg(self):
+        """Test parsing the instrumentation report destination."""
+        parser = create_parser()
+        assert parser.parse_args(["--file", "ips.txt"]).stats is None
+        assert parser.parse_args(["--file", "ips.txt", "--stats"]).stats == "-"
+        assert parser.parse_args(["--file", "ips.txt", "--stats", "stats.json"]).stats == "stats.json"
+        assert parser.parse_args(["--serve", "--metrics"]).metrics is True
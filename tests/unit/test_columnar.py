@@ -0,0 +1,163 @@
+"""Unit tests for columnar lookup results."""
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from src.columnar import ColumnarBatch, TableBatch, format_ipv4, iter_columns
+from src.models import ASNResult, BatchResult
+from src.providers.origins import NO_PREFIX, LookupDetails
+from src.serializers import CSVSerializer, JSONLinesSerializer, JSONSerializer
+
+DATE = datetime(2024, 1, 1)
+TIMESTAMP = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def _enriched():
+    """An enriched batch with a MOAS prefix, an IPv6 row and an unmatched row."""
+    details = LookupDetails.from_origin_lists([[64496, 64497], [64502], [], [15169]])
+    details.prefix_length = np.array([24, 32, NO_PREFIX, 0], dtype=np.uint8)
+    return ColumnarBatch.from_ips(
+        ["192.0.2.77", "2001:db8:1::1", "11.0.0.0", "8.8.8.8"], details.asns, "prefix2as", DATE, details=details
+    )
+
+
+class TestColumnarBatch:
+    """Test the columnar batch."""
+
+    def test_packs_ips_and_keeps_invalid_text(self):
+        """Test that IPv4 addresses are packed and other rows keep their text."""
+        batch = ColumnarBatch.from_ips(["8.8.8.8", "bogus", "1.1.1.1"], [15169, 0, 13335], "prefix2as", DATE)
+        assert batch.addrs.dtype == np.uint32
+        assert batch.asns.dtype == np.uint32
+        assert batch.addrs.tolist() == [0x08080808, 0, 0x01010101]
+        assert batch.text == {1: "bogus"}
+        assert batch.total == 3
+        assert batch.successful == 2
+
+    def test_ips_formatted_from_packed_column(self):
+        """Test that IP strings are rebuilt from packed addresses."""
+        batch = ColumnarBatch(np.array([0x08080808, 0], dtype=np.uint32), [15169, 0], "p", DATE, text={1: "bogus"})
+        assert batch.ips == ["8.8.8.8", "bogus"]
+        assert format_ipv4(np.array([0xFFFFFFFF], dtype=np.uint32)) == ["255.255.255.255"]
+
+    def test_packs_ipv6(self):
+        """Test that IPv6 rows are packed into their own column and formatted back in canonical form."""
+        batch = ColumnarBatch.from_ips(
+            ["2001:DB8::1", "8.8.8.8", "::ffff:1.1.1.1", "", "::1"], [64500, 15169, 13335, 0, 0], "p", DATE
+        )
+        assert batch.family.tolist() == [6, 4, 4, 0, 6]
+        assert batch.addrs6.shape == (5, 2)
+        assert batch.addrs6[0].tolist() == [0x20010DB800000000, 1]
+        assert batch.addrs.tolist() == [0, 0x08080808, 0x01010101, 0, 0]
+        assert batch.text == {3: ""}
+
+        merged = ColumnarBatch.concat([batch, batch], DATE)
+        assert merged.ips == ["2001:db8::1", "8.8.8.8", "1.1.1.1", "", "::1"] * 2
+
+    def test_results_are_lazy_models(self):
+        """Test that ASNResult rows share the batch timestamp and provider."""
+        batch = ColumnarBatch.from_ips(["8.8.8.8"], [15169], "prefix2as", DATE)
+        batch.timestamp = TIMESTAMP
+        assert batch._results is None
+        assert batch.results == [ASNResult(ip="8.8.8.8", asn=15169, timestamp=TIMESTAMP, provider="prefix2as")]
+
+    def test_concat_shifts_text_rows(self):
+        """Test that concatenation keeps non-IPv4 rows in place."""
+        first = ColumnarBatch.from_ips(["8.8.8.8", "x"], [1, 0], "p", DATE)
+        second = ColumnarBatch.from_ips(["y", "1.1.1.1"], [0, 2], "p", DATE)
+        merged = ColumnarBatch.concat([first, second], DATE)
+        assert merged.ips == ["8.8.8.8", "x", "y", "1.1.1.1"]
+        assert merged.asns.tolist() == [1, 0, 0, 2]
+
+    def test_dict_round_trip(self):
+        """Test that to_dict matches the BatchResult JSON layout and can be read back."""
+        batch = ColumnarBatch.from_ips(["8.8.8.8", "10.0.0.1"], [15169, 0], "prefix2as", DATE)
+        data = json.loads(json.dumps(batch.to_dict()))
+        assert data == json.loads(batch.to_batch_result().model_dump_json(exclude_none=True))
+
+        restored = ColumnarBatch.from_dict(data)
+        assert restored.ips == batch.ips
+        assert restored.asns.tolist() == [15169, 0]
+        assert restored.timestamp == batch.timestamp
+
+    def test_enriched_prefixes(self):
+        """Test that matched networks are derived from the addresses and prefix lengths."""
+        batch = _enriched()
+        assert batch.prefixes() == ["192.0.2.0", "2001:db8::", None, "0.0.0.0"]
+        rows = list(batch.records())
+        assert rows[0]["origins"] == [64496, 64497]
+        assert rows[0]["prefix_length"] == 24
+        assert rows[2]["prefix"] is None and rows[2]["prefix_length"] is None and rows[2]["origins"] == []
+        assert batch.results[1].prefix == "2001:db8::"
+
+    def test_ipv6_prefixes(self):
+        """Test that IPv6 networks are masked across both halves of the address."""
+        ip = "2001:db8:aaaa:bbbb:cccc:dddd:eeee:ffff"
+        details = LookupDetails.from_asns([1] * 5)
+        details.prefix_length = np.array([0, 48, 64, 100, 128], dtype=np.uint8)
+        batch = ColumnarBatch.from_ips([ip] * 5, details.asns, "prefix2as", DATE, details=details)
+        assert batch.prefixes() == [
+            "::", "2001:db8:aaaa::", "2001:db8:aaaa:bbbb::", "2001:db8:aaaa:bbbb:cccc:dddd:e000:0", ip,
+        ]
+
+    def test_enriched_concat(self):
+        """Test that concatenation keeps the details of enriched batches."""
+        merged = ColumnarBatch.concat([_enriched(), _enriched()], DATE)
+        assert merged.details is not None
+        assert len(merged.details) == 8
+        assert merged.prefixes()[4:] == _enriched().prefixes()
+
+    def test_iter_columns_groups_rows(self):
+        """Test that row-based results are grouped into runs of shared values."""
+        rows = [
+            ASNResult(ip="8.8.8.8", asn=1, timestamp=TIMESTAMP, provider="p"),
+            ASNResult(ip="1.1.1.1", asn=2, timestamp=TIMESTAMP, provider="p"),
+            ASNResult(ip="9.9.9.9", asn=3, timestamp=TIMESTAMP, provider="q"),
+        ]
+        batches = list(iter_columns(BatchResult(results=rows, total=3, successful=3, lookup_date=DATE)))
+        assert [b.ips for b in batches] == [["8.8.8.8", "1.1.1.1"], ["9.9.9.9"]]
+
+
+class TestColumnarSerialization:
+    """Test that serializers consume columnar batches directly."""
+
+    def test_same_output_as_row_results(self):
+        """Test that JSON and CSV output match the equivalent BatchResult."""
+        batch = ColumnarBatch.from_ips(["8.8.8.8", "bogus"], [15169, 0], "prefix2as", DATE)
+        rows = batch.to_batch_result()
+        assert JSONSerializer.serialize(batch) == JSONSerializer.serialize(rows)
+        assert CSVSerializer.serialize(batch) == CSVSerializer.serialize(rows)
+
+    def test_json_escapes_input_text(self):
+        """Test that kept input text is escaped, also for addresses with surrounding whitespace."""
+        batch = ColumnarBatch.from_ips(["\t8.8.8.8", 'bad"ip', "1.1.1.1"], [15169, 0, 13335], "prefix2as", DATE)
+        rows = [json.loads(line) for line in JSONLinesSerializer.serialize(batch).splitlines()]
+        assert [row["ip"] for row in rows] == ["\t8.8.8.8", 'bad"ip', "1.1.1.1"]
+        assert batch.family.tolist() == [4, 0, 4]
+
+    def test_enriched_output_matches_row_results(self):
+        """Test that enriched columns survive the round trip through ASNResult rows."""
+        batch = _enriched()
+        batch.timestamp = TIMESTAMP
+        rows = batch.to_batch_result()
+        assert JSONSerializer.serialize(batch) == JSONSerializer.serialize(rows)
+        assert CSVSerializer.serialize(batch) == CSVSerializer.serialize(rows)
+        header, first = CSVSerializer.serialize(batch).splitlines()[:2]
+        assert header.endswith("prefix,prefix_length,origins")
+        assert first.endswith("192.0.2.0,24,64496_64497")
+
+
+class TestTableBatch:
+    """Test the base class of range and ASN query results."""
+
+    def test_abstract(self):
+        """Test that a subclass without columns cannot be instantiated."""
+        class NoColumns(TableBatch):
+            @property
+            def asns(self):
+                return np.zeros(0, dtype=np.uint32)
+
+        with pytest.raises(TypeError, match="columns"):
+            NoColumns("prefix2as", DATE)
@@ -0,0 +1,161 @@
+"""Unit tests for RouteViews snapshot discovery."""
+import threading
+from datetime import datetime
+
+import pytest
+import requests
+
+from src.providers import discovery
+from src.providers.snapshot_store import SnapshotStore
+
+BASE = "http://data.caida.org/datasets/routing/routeviews-prefix2as"
+
+
+def _listing(*names):
+    rows = "".join(f'<tr><td><a href="{name}">{name}</a></td></tr>' for name in names)
+    return f'<html><body><a href="../">Parent Directory</a><a href="?C=N;O=D">Name</a>{rows}</body></html>'
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, text, status=200):
+        self.text = text
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status != 200:
+            raise requests.HTTPError(f"{self.status}")
+
+
+class FakeSession:
+    """Serve month listings from a dict and count requests."""
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.requests.append(url)
+        if url in self.listings:
+            return FakeResponse(self.listings[url])
+        return FakeResponse("", status=404)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Install a fake HTTP session with a few months of listings."""
+    fake = FakeSession({
+        f"{BASE}/2023/03/": _listing("routeviews-rv2-20230301-1200.pfx2as.gz", "routeviews-rv2-20230305-1200.pfx2as.gz"),
+        f"{BASE}/2023/01/": _listing("routeviews-rv2-20230130-1200.pfx2as.gz"),
+    })
+    monkeypatch.setattr(discovery, "get_session", lambda: fake)
+    monkeypatch.setattr(discovery, "_memory_catalogs", {})
+    return fake
+
+
+class TestParseListing:
+    """Test directory listing parsing."""
+
+    def test_extracts_snapshot_links(self):
+        """Test that only dated files are returned, once each."""
+        html = _listing("routeviews-rv2-20230301-1200.pfx2as.gz", "routeviews-rv2-20230301-1200.pfx2as.gz", "README.txt")
+        assert discovery.parse_listing("http://x/", html) == [
+            ("http://x/routeviews-rv2-20230301-1200.pfx2as.gz", datetime(2023, 3, 1)),
+        ]
+
+    def test_skips_invalid_dates(self):
+        """Test that eight-digit runs that are not dates are ignored."""
+        assert discovery.parse_listing("http://x/", _listing("file-20231345.gz")) == []
+
+
+class TestFindSnapshot:
+    """Test snapshot resolution."""
+
+    def test_exact_date_fetches_one_listing(self, session):
+        """Test that an exact match needs a single request."""
+        url, date = discovery.find_routeviews_snapshot_url(datetime(2023, 3, 5))
+        assert url == f"{BASE}/2023/03/routeviews-rv2-20230305-1200.pfx2as.gz"
+        assert date == datetime(2023, 3, 5)
+        assert session.requests == [f"{BASE}/2023/03/"]
+
+    def test_closest_in_same_month(self, session):
+        """Test that the closest earlier snapshot of the month is used without scanning back."""
+        _, date = discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4))
+        assert date == datetime(2023, 3, 1)
+        assert session.requests == [f"{BASE}/2023/03/"]
+
+    def test_falls_back_to_earlier_months(self, session):
+        """Test that earlier months are searched when the month has nothing before the date."""
+        _, date = discovery.find_routeviews_snapshot_url(datetime(2023, 2, 10))
+        assert date == datetime(2023, 1, 30)
+        assert sorted(session.requests)[:2] == [f"{BASE}/2022/09/", f"{BASE}/2022/10/"]
+        assert len(session.requests) == 6
+
+    def test_not_found(self, session):
+        """Test that SystemExit is raised when no snapshot exists within 6 months."""
+        with pytest.raises(SystemExit):
+            discovery.find_routeviews_snapshot_url(datetime(2020, 1, 1))
+
+    def test_ipv6_dataset(self, session):
+        """Test that the IPv6 dataset is listed from its own directory."""
+        base6 = BASE.replace("routeviews-prefix2as", discovery.ROUTEVIEWS6_DATASET)
+        session.listings[f"{base6}/2023/03/"] = _listing("routeviews-rv6-20230302-1200.pfx2as.gz")
+        url, date = discovery.find_routeviews_snapshot_url(datetime(2023, 3, 5), dataset=discovery.ROUTEVIEWS6_DATASET)
+        assert url == f"{base6}/2023/03/routeviews-rv6-20230302-1200.pfx2as.gz"
+        assert date == datetime(2023, 3, 2)
+
+    def test_warnings_name_the_dataset(self, session, capsys):
+        """Test that fallback messages of the IPv4 and IPv6 lookups can be told apart."""
+        base6 = BASE.replace("routeviews-prefix2as", discovery.ROUTEVIEWS6_DATASET)
+        session.listings[f"{base6}/2023/03/"] = _listing("routeviews-rv6-20230302-1200.pfx2as.gz")
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4))
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4), dataset=discovery.ROUTEVIEWS6_DATASET)
+        lines = capsys.readouterr().err.splitlines()
+        assert [line.startswith("Exact date 2023-03-04 not found in ") for line in lines] == [True, False, True, False]
+        assert "routeviews-prefix2as" in lines[0] and discovery.ROUTEVIEWS6_DATASET in lines[2]
+        assert discovery.ROUTEVIEWS6_DATASET in lines[3]
+
+    def test_listing_reused_across_dates(self, session):
+        """Test that a month listing is downloaded once per process."""
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 5))
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 2))
+        assert session.requests == [f"{BASE}/2023/03/"]
+
+
+class TestPersistedCatalog:
+    """Test the catalog persisted in the snapshot store."""
+
+    def test_catalog_survives_process(self, tmp_path, session):
+        """Test that a new catalog instance reuses listings saved by a previous run."""
+        store = SnapshotStore(tmp_path / "store")
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4), store)
+        assert (store.root / "discovery.json").exists()
+
+        session.requests.clear()
+        # A different date in the same month is not in the store's date map.
+        _, date = discovery.find_routeviews_snapshot_url(datetime(2023, 3, 6), store)
+        assert date == datetime(2023, 3, 5)
+        assert session.requests == []
+
+    def test_unchanged_catalog_is_not_saved(self, tmp_path, session, monkeypatch):
+        """Test that answering from saved listings does not rewrite the catalog file."""
+        store = SnapshotStore(tmp_path / "store")
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4), store)
+        writes = []
+        monkeypatch.setattr(discovery, "atomic_write_bytes", lambda path, data: writes.append(path))
+
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 6), store)
+        assert writes == []
+
+    def test_stale_listing_is_refetched(self, tmp_path, session, monkeypatch):
+        """Test that listings older than their TTL are downloaded again."""
+        store = SnapshotStore(tmp_path / "store")
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 4), store)
+        monkeypatch.setattr(discovery, "PAST_MONTH_TTL_SECONDS", -1)
+
+        session.requests.clear()
+        discovery.find_routeviews_snapshot_url(datetime(2023, 3, 6), store)
+        assert session.requests == [f"{BASE}/2023/03/"]
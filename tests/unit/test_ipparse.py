@@ -0,0 +1,114 @@
+"""Unit tests for the bulk IP parser."""
+import io
+
+import numpy as np
+import pytest
+
+from src.ipparse import (
+    FAMILY_INVALID,
+    FAMILY_IPV4,
+    FAMILY_IPV6,
+    ErrorStream,
+    InvalidLine,
+    format_ipv4,
+    format_ipv6,
+    iter_parsed_file,
+    parse_ip_buffer,
+    parse_ips,
+)
+
+
+class TestParseBuffer:
+    """Test parsing of text buffers."""
+
+    def test_families_and_rows(self):
+        """Test that each family gets its own column, with blank lines skipped."""
+        parsed = parse_ip_buffer(b"8.8.8.8\n\n2001:db8::1\nnot an ip\n1.1.1.1\n")
+        assert parsed.line.tolist() == [1, 3, 4, 5]
+        assert parsed.family.tolist() == [FAMILY_IPV4, FAMILY_IPV6, FAMILY_INVALID, FAMILY_IPV4]
+        assert parsed.invalid.tolist() == [False, False, True, False]
+        assert parsed.v4_rows.tolist() == [0, 3]
+        assert parsed.v4.tolist() == [0x08080808, 0x01010101]
+        assert parsed.v6_rows.tolist() == [1]
+        assert parsed.v6.tolist() == [[0x20010DB800000000, 1]]
+        assert parsed.errors == [InvalidLine(4, "not an ip")]
+
+    def test_normalization(self):
+        """Test that equivalent spellings parse to the same address."""
+        parsed = parse_ip_buffer(b"10.0.0.1\n010.000.0.01\n  10.0.0.1 \r\n::ffff:10.0.0.1\n2001:DB8:0:0::1\n")
+        assert parsed.v4.tolist() == [0x0A000001] * 4
+        assert parsed.addresses() == ["10.0.0.1"] * 4 + ["2001:db8::1"]
+
+    @pytest.mark.parametrize("text", [
+        "1.2.3.256", "1.2.3", "1.2.3.4.5", "1..2.3", ".1.2.3", "1.2.3.", "0001.2.3.4", "1.2.3.-4", "1.2.3.4/24",
+    ])
+    def test_malformed_ipv4(self, text):
+        """Test that near-misses of dotted quads are reported, not guessed."""
+        parsed = parse_ip_buffer(f"1.1.1.1\n{text}\n".encode())
+        assert parsed.errors == [InvalidLine(2, text)]
+        assert parsed.addresses() == ["1.1.1.1"]
+
+    def test_matches_inet_pton(self):
+        """Test the vectorized decoder against the standard library on random addresses."""
+        addrs = np.random.default_rng(0).integers(0, 2 ** 32, 1000, dtype=np.uint64).astype(np.uint32)
+        text = format_ipv4(addrs)
+        parsed = parse_ips(text)
+        assert np.array_equal(parsed.v4, addrs)
+        assert parsed.addresses() == text
+
+    def test_keep_invalid(self):
+        """Test that invalid rows can be kept as their stripped text."""
+        parsed = parse_ips(["8.8.8.8", " junk ", "::1"])
+        assert parsed.addresses(keep_invalid=True) == ["8.8.8.8", "junk", "::1"]
+
+    def test_empty(self):
+        """Test that empty input gives empty columns."""
+        parsed = parse_ip_buffer(b"")
+        assert len(parsed) == 0
+        assert parsed.addresses() == []
+
+
+class TestFormat:
+    """Test address formatting."""
+
+    def test_format_ipv4(self):
+        """Test dotted-quad formatting of edge values."""
+        assert format_ipv4(np.array([0, 0x0A00FF01, 0xFFFFFFFF], dtype=np.uint32)) == [
+            "0.0.0.0", "10.0.255.1", "255.255.255.255"
+        ]
+        assert format_ipv4(np.zeros(0, dtype=np.uint32)) == []
+
+    def test_format_ipv6(self):
+        """Test canonical IPv6 formatting."""
+        assert format_ipv6(np.array([[0x20010DB800000000, 1]], dtype=np.uint64)) == ["2001:db8::1"]
+
+
+class TestParseFile:
+    """Test block-wise file parsing."""
+
+    def test_blocks_keep_line_numbers(self, tmp_path):
+        """Test that lines split over block boundaries and line numbers survive."""
+        path = tmp_path / "ips.txt"
+        path.write_bytes(b"1.1.1.1\nbad\n\n2.2.2.2\nworse\n3.3.3.3")
+        blocks = list(iter_parsed_file(str(path), block_bytes=5))
+        assert [ip for block in blocks for ip in block.addresses()] == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+        assert [error for block in blocks for error in block.errors] == [
+            InvalidLine(2, "bad"), InvalidLine(5, "worse")
+        ]
+
+    def test_missing_file(self, tmp_path):
+        """Test a missing file raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            list(iter_parsed_file(str(tmp_path / "missing.txt")))
+
+
+class TestErrorStream:
+    """Test invalid line reporting."""
+
+    def test_report(self):
+        """Test that invalid lines are written one per line and counted."""
+        stream = io.StringIO()
+        errors = ErrorStream(stream)
+        errors.report([InvalidLine(3, "x"), InvalidLine(9, "y")])
+        assert errors.count == 2
+        assert stream.getvalue() == "line 3: invalid IP address: 'x'\nline 9: invalid IP address: 'y'\n"
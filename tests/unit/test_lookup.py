@@ -0,0 +1,105 @@
+"""Unit tests for the lookup module."""
+import io
+from datetime import datetime
+
+import pytest
+
+from src import lookup
+from src.ipparse import ErrorStream
+from src.models import LookupConfig
+from src.providers import BaseProvider
+
+
+class FakeProvider(BaseProvider):
+    """Provider answering from a fixed mapping."""
+    
+    ASNS = {"8.8.8.8": 15169, "1.1.1.1": 13335}
+    
+    def initialize(self) -> None:
+        self.initialized = True
+    
+    def lookup_batch(self, ips):
+        self.batches = getattr(self, "batches", []) + [list(ips)]
+        return super().lookup_batch(ips)
+    
+    def _lookup_uncached(self, ip: str) -> int:
+        return self.ASNS.get(ip, 0)
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    """Make lookup functions use FakeProvider."""
+    monkeypatch.setattr(lookup, "get_provider", lambda *args: FakeProvider(datetime(2023, 1, 1)))
+
+
+class TestReadIPs:
+    """Test input readers."""
+    
+    def test_iter_skips_blank_lines(self, tmp_path):
+        """Test the generator reader strips and skips blank lines."""
+        path = tmp_path / "ips.txt"
+        path.write_text("8.8.8.8\n\n  1.1.1.1  \n")
+        assert list(lookup.iter_ips_from_file(str(path))) == ["8.8.8.8", "1.1.1.1"]
+    
+    def test_normalized_with_errors(self, tmp_path):
+        """Test addresses are normalized and invalid lines reported and dropped."""
+        path = tmp_path / "ips.txt"
+        path.write_text("008.8.8.8\nbogus\n2001:DB8::1\n")
+        stream = io.StringIO()
+        errors = ErrorStream(stream)
+        assert list(lookup.iter_ips_from_file(str(path), errors)) == ["8.8.8.8", "2001:db8::1"]
+        assert errors.count == 1
+        assert "line 2" in stream.getvalue()
+        # Without an error stream invalid lines pass through.
+        assert list(lookup.iter_ips_from_file(str(path))) == ["8.8.8.8", "bogus", "2001:db8::1"]
+    
+    def test_missing_file(self, tmp_path):
+        """Test a missing file raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            list(lookup.iter_ips_from_file(str(tmp_path / "missing.txt")))
+    
+    def test_empty_file(self, tmp_path):
+        """Test an empty file is rejected by the list reader."""
+        path = tmp_path / "ips.txt"
+        path.write_text("\n")
+        with pytest.raises(ValueError):
+            lookup.read_ips_from_file(str(path))
+
+
+class TestLookupIPs:
+    """Test batch and streaming lookups."""
+    
+    def test_lookup_ips(self, fake_provider):
+        """Test counters on a full batch."""
+        config = LookupConfig(single_ip="8.8.8.8", snapshot_date=datetime(2023, 1, 1))
+        result = lookup.lookup_ips(["8.8.8.8", "1.1.1.1", "9.9.9.9"], config)
+        assert [r.asn for r in result.results] == [15169, 13335, 0]
+        assert (result.total, result.successful) == (3, 2)
+    
+    def test_streaming_chunks(self, fake_provider):
+        """Test streaming splits input into chunks of chunk_size."""
+        config = LookupConfig(single_ip="8.8.8.8", snapshot_date=datetime(2023, 1, 1), chunk_size=2)
+        chunks = list(lookup.lookup_ips_streaming(iter(["8.8.8.8", "1.1.1.1", "9.9.9.9"]), config))
+        assert [c.total for c in chunks] == [2, 1]
+        assert [c.successful for c in chunks] == [2, 0]
+    
+    def test_repeated_ips_resolved_once(self):
+        """Test that duplicates are looked up once and answers scattered back in order."""
+        provider = FakeProvider(datetime(2023, 1, 1))
+        ips = ["1.1.1.1", "8.8.8.8", "1.1.1.1", "9.9.9.9", "8.8.8.8"]
+        assert lookup.lookup_unique(provider, ips).tolist() == [13335, 15169, 13335, 0, 15169]
+        assert provider.batches == [["1.1.1.1", "8.8.8.8", "9.9.9.9"]]
+    
+    def test_enriched_lookup(self, fake_provider):
+        """Test that enriched lookups carry origin sets in input order."""
+        config = LookupConfig(single_ip="8.8.8.8", snapshot_date=datetime(2023, 1, 1), enrich=True)
+        result = lookup.lookup_ips(["8.8.8.8", "9.9.9.9", "8.8.8.8"], config)
+        assert result.details is not None
+        assert result.details.origins() == [[15169], [], [15169]]
+        assert [r.origins for r in result.results] == [[15169], [], [15169]]
+    
+    def test_dedupe_ips(self):
+        """Test first-seen order and inverse positions."""
+        unique, inverse = lookup.dedupe_ips(["b", "a", "b"])
+        assert unique == ["b", "a"]
+        assert inverse.tolist() == [0, 1, 0]
@@ -0,0 +1,72 @@
+"""Unit tests for run instrumentation."""
+import pytest
+
+from src import metrics
+
+
+@pytest.fixture
+def recorder():
+    """A recording recorder, switched off again after the test."""
+    yield metrics.enable()
+    metrics.disable()
+
+
+class TestNullRecorder:
+    """Test that instrumentation is a no-op while off."""
+
+    def test_disabled_by_default(self):
+        """Test that nothing is recorded before instrumentation is enabled."""
+        active = metrics.get_recorder()
+        assert not active.enabled
+        with metrics.span("lookup"):
+            metrics.incr("lookups", 10)
+        assert active.spans == {} and active.counters == {}
+
+
+class TestRecorder:
+    """Test recording spans and counters."""
+
+    def test_spans_and_counters(self, recorder):
+        """Test that spans accumulate time and counters add up, even when the block raises."""
+        for _ in range(2):
+            with metrics.span("lookup"):
+                metrics.incr("lookups", 5)
+        with pytest.raises(ValueError), metrics.span("serialize"):
+            raise ValueError("boom")
+
+        report = recorder.report()
+        assert report["spans"]["lookup"]["count"] == 2
+        assert report["spans"]["serialize"]["count"] == 1
+        assert report["counters"]["lookups"] == 10
+        assert report["rates"]["lookups_per_second"] > 0
+        assert report["wall_seconds"] >= report["spans"]["lookup"]["seconds"]
+
+    def test_timed_decorator(self, recorder):
+        """Test that decorated functions are timed and keep their result."""
+        @metrics.timed("discovery")
+        def discover(x):
+            return x * 2
+
+        assert discover(21) == 42
+        assert recorder.spans["discovery"].count == 1
+
+    def test_hit_rates(self, recorder):
+        """Test that hit rates are derived from hit/miss counter pairs."""
+        metrics.incr("snapshot_store_hits", 3)
+        metrics.incr("snapshot_store_misses")
+        rates = recorder.report()["rates"]
+        assert rates["snapshot_store_hit_rate"] == 0.75
+        assert "lookup_cache_hit_rate" not in rates
+
+    def test_prometheus(self, recorder):
+        """Test the Prometheus text exposition."""
+        with metrics.span("lookup"):
+            metrics.incr("lookups", 7)
+        recorder.set_gauge("snapshots-loaded", 2)
+
+        text = recorder.prometheus()
+        assert "# TYPE map_ip_to_asn_lookup_seconds summary" in text
+        assert "map_ip_to_asn_lookup_seconds_count 1" in text
+        assert "# TYPE map_ip_to_asn_lookups_total counter\nmap_ip_to_asn_lookups_total 7\n" in text
+        assert "map_ip_to_asn_snapshots_loaded 2" in text
+        assert text.endswith("\n")
@@ -120,4 +120,10 @@ class TestLookupConfig:
         future_date = datetime.now() + timedelta(days=1)
         with pytest.raises(ValidationError) as exc_info:
             LookupConfig(input_file="test.txt", snapshot_date=future_date)
-        assert "cannot be in the future" in str(exc_info.value)
\ No newline at end of file
+        assert "cannot be in the future" in str(exc_info.value)
+    
+    def test_enrich_with_server_error(self):
+        """Test that enriched lookups are not sent to the daemon."""
+        with pytest.raises(ValidationError) as exc_info:
+            LookupConfig(input_file="test.txt", enrich=True, server="127.0.0.1:8765")
+        assert "not supported by the lookup daemon" in str(exc_info.value)
@@ -0,0 +1,52 @@
+"""Unit tests for multi-process lookups."""
+from datetime import datetime
+
+import pytest
+
+from src.models import LookupConfig, Provider
+from src.parallel import lookup_ips_parallel
+from src.providers.binary_index import write_index
+from src.providers.prefix_table import PrefixTable, RangeIndex
+
+
+@pytest.fixture
+def index_config(tmp_path):
+    """Configuration that loads a small precompiled index in every worker."""
+    path = tmp_path / "snap.idx"
+    table = PrefixTable.from_lines([f"10.{i}.0.0\t16\t{1000 + i}" for i in range(256)])
+    write_index(RangeIndex.build(table), datetime(2023, 1, 1), path)
+
+    def make(**kwargs):
+        return LookupConfig(
+            provider=Provider.PREFIX2AS,
+            single_ip="10.0.0.1",
+            index_path=str(path),
+            use_cache=False,
+            snapshot_date=datetime(2023, 1, 1),
+            **kwargs
+        )
+    return make
+
+
+IPS = [f"10.{i % 256}.1.1" for i in range(1000)] + ["192.0.2.1"]
+
+
+class TestLookupIPsParallel:
+    """Test lookup_ips_parallel."""
+
+    def test_ordered(self, index_config):
+        """Test results come back in input order."""
+        config = index_config(workers=2, chunk_size=64)
+        results = [r for chunk in lookup_ips_parallel(IPS, config) for r in chunk.results]
+        assert [r.ip for r in results] == IPS
+        assert [r.asn for r in results[:3]] == [1000, 1001, 1002]
+        assert results[-1].asn == 0
+        assert results[0].provider == "prefix2as"
+
+    def test_unordered(self, index_config):
+        """Test unordered mode returns every result exactly once."""
+        config = index_config(workers=2, chunk_size=64, ordered=False)
+        chunks = list(lookup_ips_parallel(iter(IPS), config))
+        assert sum(c.total for c in chunks) == len(IPS)
+        assert sum(c.successful for c in chunks) == len(IPS) - 1
+        assert sorted(r.ip for c in chunks for r in c.results) == sorted(IPS)
@@ -0,0 +1,192 @@
+"""Unit tests for the NumPy prefix2as provider."""
+import gzip
+import ipaddress
+import random
+from datetime import datetime
+
+import numpy as np
+
+from src.providers import Prefix2ASProvider
+from src.providers.binary_index import write_index
+from src.providers.cache import PrefixCache, address_key
+from src.providers.origins import NO_PREFIX, LookupDetails
+from src.providers.prefix_table import PrefixTable, RangeIndex, ipv4_to_ints
+from src.providers.prefix_table6 import PrefixTable6, RangeIndex6
+
+PFX2AS = """\
+10.0.0.0\t8\t100
+10.1.0.0\t16\t200
+10.1.2.0\t24\t300
+10.1.2.128\t25\t400
+192.0.2.0\t24\t64496_64497
+198.51.100.0\t24\t64500,64501
+not-a-prefix\t24\t1
+2001:db8::\t32\t64502
+"""
+
+
+def _pairs(addrs):
+    return np.array([[a >> 64, a & (2 ** 64 - 1)] for a in addrs], dtype=np.uint64).reshape(-1, 2)
+
+
+class TestPrefixTable:
+    """Test pfx2as parsing."""
+
+    def test_parse(self):
+        """Test that valid IPv4 lines are parsed and others skipped."""
+        table = PrefixTable.from_lines(PFX2AS.splitlines())
+        assert len(table) == 6
+        assert table.length.tolist() == [8, 16, 24, 25, 24, 24]
+
+    def test_multi_origin_keeps_last_asn(self):
+        """Test MOAS and AS-set origins resolve to their last ASN."""
+        table = PrefixTable.from_lines(PFX2AS.splitlines())
+        assert table.asn[-2:].tolist() == [64497, 64501]
+
+    def test_origin_sets(self):
+        """Test that every origin of MOAS and AS-set prefixes is kept."""
+        table = PrefixTable.from_lines(PFX2AS.splitlines())
+        details = LookupDetails.from_table(table, np.arange(len(table)))
+        assert details.origins() == [[100], [200], [300], [400], [64496, 64497], [64500, 64501]]
+
+    def test_duplicate_prefix_last_wins(self):
+        """Test that a repeated prefix keeps its last origin."""
+        table = PrefixTable.from_lines(["1.0.0.0\t24\t1", "1.0.0.0\t24\t2"])
+        assert table.asn.tolist() == [2]
+
+    def test_from_gzip_file(self, tmp_path):
+        """Test reading a gzip-compressed snapshot."""
+        path = tmp_path / "snap.pfx2as.gz"
+        with gzip.open(path, "wt") as f:
+            f.write(PFX2AS)
+        assert len(PrefixTable.from_file(path)) == 6
+
+
+class TestRangeIndex:
+    """Test flattened range lookups."""
+
+    def test_longest_prefix_match(self, prefix2as_provider):
+        """Test nested prefixes resolve to the most specific one."""
+        provider = prefix2as_provider(PFX2AS)
+        ips = ["10.9.9.9", "10.1.9.9", "10.1.2.1", "10.1.2.200", "10.1.3.0", "11.0.0.0"]
+        assert provider.lookup_batch(ips) == [100, 200, 300, 400, 200, 0]
+
+    def test_invalid_and_ipv6_addresses(self, prefix2as_provider):
+        """Test that unparseable addresses return 0 and IPv6 ones use the IPv6 index."""
+        provider = prefix2as_provider(PFX2AS)
+        assert provider.lookup_batch(["garbage", "2001:db8::1", "192.0.2.1", "2001:db9::1"]) == [0, 64502, 64497, 0]
+        assert provider.lookup("198.51.100.7") == 64501
+        assert provider.lookup("2001:db8:ffff::1") == 64502
+
+    def test_mixed_batch_routing(self, prefix2as_provider):
+        """Test that mixed batches keep input order across both families."""
+        provider = prefix2as_provider(PFX2AS)
+        ips = ["2001:db8::1", "10.1.2.1", "", "::ffff:10.1.2.200", "2001:db8::1", "10.9.9.9"]
+        assert provider.lookup_batch(ips) == [64502, 300, 0, 400, 64502, 100]
+
+    def test_lookup_details(self, prefix2as_provider):
+        """Test enriched lookups of a mixed batch in input order."""
+        provider = prefix2as_provider(PFX2AS)
+        ips = ["192.0.2.1", "garbage", "2001:db8::1", "10.1.2.200", "11.0.0.0", "192.0.2.1"]
+        details = provider.lookup_details(ips)
+        assert details.asns.tolist() == [64497, 0, 64502, 400, 0, 64497]
+        assert details.prefix_length.tolist() == [24, NO_PREFIX, 32, 25, NO_PREFIX, 24]
+        assert details.origins() == [[64496, 64497], [], [64502], [400], [], [64496, 64497]]
+
+    def test_ipv4_only_index_skips_ipv6_discovery(self, tmp_path):
+        """Test that a precompiled IPv4 index alone answers IPv6 addresses with 0."""
+        path = tmp_path / "v4.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(PFX2AS.splitlines())), datetime(2023, 1, 1), path)
+        provider = Prefix2ASProvider(datetime(2023, 1, 1), index_path=path)
+        assert provider.lookup_batch(["2001:db8::1", "10.1.2.1"]) == [0, 300]
+
+    def test_ipv6_prefix_cache(self, prefix2as_provider):
+        """Test that IPv6 spans fill the prefix cache in their own key space."""
+        provider = prefix2as_provider(PFX2AS)
+        provider.cache = PrefixCache()
+        assert provider.lookup("2001:db8::1") == 64502
+        assert provider.cache.get(address_key("2001:db8:1234::7")) == 64502
+        assert provider.cache.get(address_key("2001:db9::1")) is None
+
+    def test_matches_brute_force(self):
+        """Test the flattened index against a naive longest-prefix match."""
+        rng = random.Random(7)
+        lines = []
+        for _ in range(300):
+            length = rng.randint(8, 28)
+            net = ipaddress.ip_network((rng.getrandbits(32) >> (32 - length) << (32 - length), length))
+            lines.append(f"{net.network_address}\t{length}\t{rng.randint(1, 65000)}")
+        table = PrefixTable.from_lines(lines)
+        index = RangeIndex.build(table)
+        networks = [ipaddress.ip_network(f"{ipaddress.IPv4Address(int(n))}/{int(length)}")
+                    for n, length in zip(table.network, table.length)]
+
+        addrs = np.array([rng.getrandbits(32) for _ in range(500)]
+                         + [int(n.network_address) for n in networks], dtype=np.uint32)
+        expected = []
+        for addr in addrs.tolist():
+            ip = ipaddress.IPv4Address(addr)
+            best = max((i for i, n in enumerate(networks) if ip in n),
+                       key=lambda i: networks[i].prefixlen, default=None)
+            expected.append(0 if best is None else int(table.asn[best]))
+
+        assert index.lookup(addrs).tolist() == expected
+        repeated = np.concatenate([addrs[::-1], addrs])
+        assert index.lookup_unique(repeated).tolist() == expected[::-1] + expected
+
+    def test_ipv4_to_ints(self):
+        """Test string to integer conversion."""
+        addrs, valid = ipv4_to_ints(["0.0.0.1", "255.255.255.255", "bad"])
+        assert addrs.tolist() == [1, 2 ** 32 - 1, 0]
+        assert valid.tolist() == [True, True, False]
+
+
+class TestRangeIndex6:
+    """Test IPv6 range lookups over paired uint64 words."""
+
+    def test_parse_skips_ipv4(self):
+        """Test that only IPv6 lines are kept."""
+        table = PrefixTable6.from_lines(PFX2AS.splitlines())
+        assert len(table) == 1
+        assert table.length.tolist() == [32]
+
+    def test_matches_brute_force(self):
+        """Test the flattened index against a naive longest-prefix match."""
+        rng = random.Random(11)
+        lines = ["::\t0\t1"]
+        for _ in range(300):
+            # Lengths on both sides of /64 exercise the high-word fast path and the pair search.
+            length = rng.choice([rng.randint(16, 64), rng.randint(65, 128)])
+            net = ipaddress.IPv6Network((rng.getrandbits(128) >> (128 - length) << (128 - length), length))
+            lines.append(f"{net.network_address}\t{length}\t{rng.randint(2, 65000)}")
+        table = PrefixTable6.from_lines(lines)
+        index = RangeIndex6.build(table)
+        networks = [ipaddress.IPv6Network((int(h) << 64 | int(lo), int(length)))
+                    for h, lo, length in zip(table.network_hi, table.network_lo, table.length)]
+
+        addrs = ([rng.getrandbits(128) for _ in range(300)]
+                 + [int(n.network_address) for n in networks]
+                 + [int(n.broadcast_address) for n in networks])
+        expected = []
+        for addr in addrs:
+            ip = ipaddress.IPv6Address(addr)
+            best = max((i for i, n in enumerate(networks) if ip in n), key=lambda i: networks[i].prefixlen)
+            expected.append(int(table.asn[best]))
+
+        assert index.lookup(_pairs(addrs)).tolist() == expected
+        assert index.lookup_unique(_pairs(addrs[::-1] + addrs)).tolist() == expected[::-1] + expected
+        for addr, asn in zip(addrs[:50], expected):
+            found, first, last = index.span(addr)
+            assert found == asn and first <= addr <= last
+
+    def test_gap_span(self):
+        """Test that unmatched addresses report the gap between ranges."""
+        index = RangeIndex6.build(PrefixTable6.from_lines(["2001:db8::\t32\t1"]))
+        start = int(ipaddress.IPv6Address("2001:db8::"))
+        assert index.span(0) == (0, 0, start - 1)
+        assert index.span(2 ** 128 - 1) == (0, start + 2 ** 96, 2 ** 128 - 1)
+
+    def test_empty(self):
+        """Test an index without prefixes."""
+        index = RangeIndex6.build(PrefixTable6.from_lines([]))
+        assert index.lookup_unique(_pairs([1, 2])).tolist() == [0, 0]
@@ -0,0 +1,167 @@
+"""Unit tests for prefix and range lookups."""
+import csv
+import ipaddress
+import json
+import random
+from datetime import datetime
+from io import StringIO
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from src.cli import create_parser
+from src.lookup import lookup_ranges_chunk
+from src.models import LookupConfig, Provider
+from src.ranges import InvalidRange, RangeBatch, parse_ranges
+from src.serializers import CSVSerializer, JSONSerializer, ParquetSerializer
+
+PFX2AS = """\
+10.0.0.0\t8\t100
+10.1.0.0\t16\t200
+10.1.2.0\t24\t300
+10.1.2.128\t25\t400
+192.0.2.0\t24\t64496_64497
+2001:db8::\t32\t64502
+2001:db8:1::\t48\t64503
+"""
+
+
+def _rows(provider, queries):
+    batch = lookup_ranges_chunk(provider, parse_ranges(queries), datetime(2023, 1, 1))
+    columns = batch.columns()
+    names = ("query", "prefix", "prefix_length", "addresses", "covers")
+    return list(zip(*(columns[name] for name in names)))
+
+
+class TestParseRanges:
+    """Test parsing addresses, prefixes and ranges."""
+
+    def test_forms(self):
+        """Test that each form becomes an interval with a normalized query."""
+        parsed = parse_ranges(["10.1.2.7/24", " 10.0.0.5 - 10.0.0.9 ", "", "8.8.8.8", "2001:DB8::/32"])
+        assert parsed.text == ["10.1.2.0/24", "10.0.0.5-10.0.0.9", "8.8.8.8", "2001:db8::/32"]
+        assert parsed.line.tolist() == [1, 2, 4, 5]
+        assert parsed.family.tolist() == [4, 4, 4, 6]
+        assert parsed.first[:3, 1].tolist() == [0x0A010200, 0x0A000005, 0x08080808]
+        assert parsed.last[:3, 1].tolist() == [0x0A0102FF, 0x0A000009, 0x08080808]
+        assert parsed.last[3].tolist() == [0x20010DB8FFFFFFFF, 2 ** 64 - 1]
+
+    def test_ipv4_mapped_prefix(self):
+        """Test that IPv4-mapped prefixes are read as IPv4 with their length rebased."""
+        parsed = parse_ranges(["::ffff:10.1.2.0/120"])
+        assert parsed.text == ["10.1.2.0/24"]
+
+    def test_invalid(self):
+        """Test that bad lines are reported with their line numbers."""
+        parsed = parse_ranges(
+            ["10.0.0.0/33", "10.0.0.9-10.0.0.1", "10.0.0.1-2001:db8::", "x/8", "1.2.3.4-", "1.2.3.4"]
+        )
+        assert [error.line for error in parsed.errors] == [1, 2, 3, 4, 5]
+        assert isinstance(parsed.errors[0], InvalidRange)
+        assert "invalid address, prefix or range" in str(parsed.errors[0])
+        assert parsed.text == ["1.2.3.4"]
+
+    def test_empty(self):
+        """Test that no input parses to no rows."""
+        assert len(parse_ranges([])) == 0
+
+
+class TestRangeLookups:
+    """Test resolving intervals against the prefix table."""
+
+    def test_nested_prefixes(self, prefix2as_provider):
+        """Test that a /24 split by a more specific /25 reports both, with counts."""
+        assert _rows(prefix2as_provider(PFX2AS), ["10.1.2.0/24"]) == [
+            ("10.1.2.0/24", "10.1.2.0", 24, 128, True),
+            ("10.1.2.0/24", "10.1.2.128", 25, 128, False),
+        ]
+
+    def test_partial_and_unrouted(self, prefix2as_provider):
+        """Test overlapping prefixes and the unrouted remainder of a range."""
+        assert _rows(prefix2as_provider(PFX2AS), ["10.1.2.200-10.1.3.0", "192.0.2.255-192.0.3.4"]) == [
+            ("10.1.2.200-10.1.3.0", "10.1.2.128", 25, 56, False),
+            ("10.1.2.200-10.1.3.0", "10.1.0.0", 16, 1, True),
+            ("192.0.2.255-192.0.3.4", "192.0.2.0", 24, 1, False),
+            ("192.0.2.255-192.0.3.4", None, None, 5, False),
+        ]
+
+    def test_ipv6_counts(self, prefix2as_provider):
+        """Test that IPv6 counts are exact beyond 64 bits and families keep input order."""
+        rows = _rows(prefix2as_provider(PFX2AS), ["2001:db8::/31", "10.1.2.130"])
+        assert rows == [
+            ("2001:db8::/31", "2001:db8::", 32, 2 ** 96 - 2 ** 80, False),
+            ("2001:db8::/31", "2001:db8:1::", 48, 2 ** 80, False),
+            ("2001:db8::/31", None, None, 2 ** 96, False),
+            ("10.1.2.130", "10.1.2.128", 25, 1, True),
+        ]
+
+    def test_matches_per_address_lookups(self, prefix2as_provider):
+        """Test that counts agree with looking up every address of random ranges."""
+        provider = prefix2as_provider(PFX2AS)
+        rng = random.Random(7)
+        for _ in range(50):
+            first = rng.randrange(0x0A00FF00, 0x0A010400)
+            last = first + rng.randrange(0, 700)
+            query = f"{ipaddress.IPv4Address(first)}-{ipaddress.IPv4Address(last)}"
+            addrs = np.arange(first, last + 1, dtype=np.uint32)
+            rows = provider.index.lookup_rows_unique(addrs)
+            table = provider.index.table
+            expected = {
+                None if row < 0 else str(ipaddress.IPv4Address(int(table.network[row]))): int(count)
+                for row, count in zip(*np.unique(rows, return_counts=True))
+            }
+            details = provider.lookup_ranges(parse_ranges([query]))
+            assert dict(zip(details.prefixes, details.addresses.tolist())) == expected
+
+    def test_provider_without_prefixes(self):
+        """Test that providers without a prefix table refuse range lookups."""
+        config = dict(single_ip="10.0.0.0/8", ranges=True)
+        with pytest.raises(ValueError, match="prefix2as"):
+            LookupConfig(**config)
+        LookupConfig(provider=Provider.PREFIX2AS, **config)
+
+
+class TestRangeOutput:
+    """Test writing range lookups."""
+
+    @pytest.fixture
+    def batch(self, prefix2as_provider):
+        """Range rows of a nested prefix and an unrouted one."""
+        parsed = parse_ranges(["10.1.2.0/24", "8.8.8.0/24"])
+        return lookup_ranges_chunk(prefix2as_provider(PFX2AS), parsed, datetime(2023, 1, 1))
+
+    def test_csv(self, batch):
+        """Test the CSV layout of range rows."""
+        rows = list(csv.DictReader(StringIO(CSVSerializer.serialize(batch))))
+        assert [(r["query"], r["prefix"], r["addresses"], r["covers"]) for r in rows] == [
+            ("10.1.2.0/24", "10.1.2.0", "128", "true"),
+            ("10.1.2.0/24", "10.1.2.128", "128", "false"),
+            ("8.8.8.0/24", "", "256", "false"),
+        ]
+
+    def test_json(self, batch):
+        """Test the JSON document of range rows."""
+        document = json.loads(JSONSerializer.serialize(batch))
+        assert document["total"] == 3 and document["successful"] == 2
+        assert document["results"][1]["origins"] == [400]
+        assert document["results"][2]["prefix_length"] is None
+
+    def test_parquet(self, batch, tmp_path):
+        """Test the Parquet layout of range rows."""
+        path = tmp_path / "ranges.parquet"
+        ParquetSerializer.serialize(batch, str(path))
+        table = pq.read_table(path)
+        assert table.column("addresses").to_pylist() == [128.0, 128.0, 256.0]
+        assert table.column("prefix_length").to_pylist() == [24, 25, None]
+
+    def test_empty_batch(self, prefix2as_provider):
+        """Test that an empty batch still writes the range header."""
+        details = prefix2as_provider(PFX2AS).lookup_ranges(parse_ranges([]))
+        batch = RangeBatch([], details, "prefix2as", datetime(2023, 1, 1))
+        assert CSVSerializer.serialize(batch).startswith("query,asn,")
+
+    def test_ranges_arg(self):
+        """Test the --ranges flag."""
+        args = create_parser().parse_args(["--file", "subnets.txt", "--ranges"])
+        assert args.ranges
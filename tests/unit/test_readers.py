@@ -0,0 +1,170 @@
+"""Unit tests for compressed, multi-file and columnar input readers."""
+import bz2
+import gzip
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import src.readers as readers
+from src.cli import create_parser
+from src.lookup import read_ips_from_file
+from src.models import LookupConfig
+from src.ranges import iter_parsed_ranges
+from src.readers import (
+    expand_input,
+    iter_input_blocks,
+    iter_parsed_input,
+    open_input,
+    register_reader,
+)
+
+
+def _lines(spec, **kwargs):
+    return b"".join(iter_input_blocks(spec, **kwargs)).decode().splitlines()
+
+
+class TestOpenInput:
+    """Test decompression by magic bytes."""
+
+    def test_gzip_and_bz2(self, tmp_path):
+        """Test that compressed files read back whatever their name."""
+        (tmp_path / "a.log").write_bytes(gzip.compress(b"10.0.0.1\n"))
+        (tmp_path / "b.txt").write_bytes(bz2.compress(b"10.0.0.2\n"))
+        with open_input(tmp_path / "a.log") as f:
+            assert f.read() == b"10.0.0.1\n"
+        with open_input(tmp_path / "b.txt") as f:
+            assert f.read() == b"10.0.0.2\n"
+
+    def test_zstd(self, tmp_path):
+        """Test zstd files, including several concatenated frames."""
+        zstandard = pytest.importorskip("zstandard")
+        compressor = zstandard.ZstdCompressor()
+        path = tmp_path / "ips.txt.zst"
+        path.write_bytes(compressor.compress(b"10.0.0.1\n") + compressor.compress(b"10.0.0.2\n"))
+        assert _lines(str(path)) == ["10.0.0.1", "10.0.0.2"]
+
+    def test_plain(self, tmp_path):
+        """Test that short and uncompressed files are read as they are."""
+        (tmp_path / "ips.txt").write_bytes(b"1")
+        with open_input(tmp_path / "ips.txt") as f:
+            assert f.read() == b"1"
+
+
+class TestExpandInput:
+    """Test resolving files, directories and globs."""
+
+    def test_glob_natural_order(self, tmp_path):
+        """Test that rotated files sort by number, not by text."""
+        for name in ["access.log.10", "access.log.9", "access.log.1", "other.log"]:
+            (tmp_path / name).write_text("")
+        assert [p.name for p in expand_input(str(tmp_path / "access.log.*"))] == [
+            "access.log.1", "access.log.9", "access.log.10",
+        ]
+
+    def test_directory(self, tmp_path):
+        """Test that a directory yields its files but not hidden files or subdirectories."""
+        (tmp_path / "b.txt").write_text("")
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / ".hidden").write_text("")
+        (tmp_path / "sub").mkdir()
+        assert [p.name for p in expand_input(str(tmp_path))] == ["a.txt", "b.txt"]
+
+    def test_missing(self, tmp_path):
+        """Test that nothing matching is reported like a missing file."""
+        with pytest.raises(FileNotFoundError, match="Input file not found"):
+            expand_input(str(tmp_path / "nothing*.txt"))
+        with pytest.raises(FileNotFoundError, match="Input file not found"):
+            read_ips_from_file(str(tmp_path / "missing.txt"))
+
+
+class TestReaders:
+    """Test reading text, CSV and Parquet inputs."""
+
+    def test_text_blocks(self, tmp_path):
+        """Test that small blocks hold whole lines and a last line gets its newline."""
+        path = tmp_path / "ips.txt.gz"
+        path.write_bytes(gzip.compress(b"10.0.0.1\n10.0.0.22\n10.0.0.3"))
+        blocks = list(iter_input_blocks(str(path), block_bytes=4))
+        assert all(block.endswith(b"\n") for block in blocks)
+        assert b"".join(blocks) == b"10.0.0.1\n10.0.0.22\n10.0.0.3\n"
+
+    def test_csv_column(self, tmp_path):
+        """Test reading one column of a compressed CSV file."""
+        path = tmp_path / "flows.csv.gz"
+        path.write_bytes(gzip.compress(b"port,src_ip\n80,10.0.0.1\n443,\n22,2001:db8::1\n"))
+        assert _lines(str(path), column="src_ip") == ["10.0.0.1", "", "2001:db8::1"]
+        assert _lines(str(path)) == ["80", "443", "22"]
+
+    def test_parquet_column(self, tmp_path):
+        """Test reading one column of a Parquet file."""
+        path = tmp_path / "flows.parquet"
+        pq.write_table(pa.table({"port": [80, 443], "dst_ip": ["10.0.0.1", None]}), path)
+        assert _lines(str(path), column="dst_ip") == ["10.0.0.1", ""]
+        with pytest.raises(ValueError, match="no column 'src_ip'"):
+            _lines(str(path), column="src_ip")
+
+    def test_register_reader(self, tmp_path, monkeypatch):
+        """Test that custom readers are chosen by suffix."""
+        monkeypatch.setattr(readers, "_READERS", dict(readers._READERS))
+        register_reader(".upper", lambda path, column, block_bytes: iter([path.read_bytes().lower()]))
+        (tmp_path / "ips.upper").write_bytes(b"FE80::1\n")
+        assert _lines(str(tmp_path / "ips.upper")) == ["fe80::1"]
+
+
+class TestMultiFileInput:
+    """Test reading several files, sequentially and concurrently."""
+
+    @pytest.fixture
+    def rotated(self, tmp_path):
+        """Twelve rotated logs of 100 addresses, half of them gzipped, one with a bad line."""
+        for i in range(12):
+            lines = [f"10.{i}.0.{j}" for j in range(100)]
+            if i == 7:
+                lines[5] = "bad"
+            data = ("\n".join(lines) + "\n").encode()
+            if i % 2:
+                (tmp_path / f"access.log.{i}.gz").write_bytes(gzip.compress(data))
+            else:
+                (tmp_path / f"access.log.{i}").write_bytes(data)
+        return str(tmp_path / "access.log.*")
+
+    def test_concurrent_order(self, rotated):
+        """Test that read workers keep file order and small blocks keep line order."""
+        expected = _lines(rotated)
+        assert expected[:2] == ["10.0.0.0", "10.0.0.1"] and expected[-1] == "10.11.0.99"
+        assert _lines(rotated, read_workers=4, block_bytes=64) == expected
+
+    def test_line_numbers_across_files(self, rotated):
+        """Test that error line numbers run on across files."""
+        for workers in (1, 3):
+            errors = [e for parsed in iter_parsed_input(rotated, read_workers=workers) for e in parsed.errors]
+            assert [(e.line, e.text) for e in errors] == [(706, "bad")]
+
+    def test_reader_error_is_raised(self, rotated, tmp_path):
+        """Test that a reader failing in a thread fails the consumer."""
+        (tmp_path / "access.log.3.gz").write_bytes(b"\x1f\x8b garbage")
+        with pytest.raises(OSError):
+            _lines(rotated, read_workers=4)
+
+    def test_ranges(self, rotated):
+        """Test that range inputs are read through the readers too."""
+        chunks = list(iter_parsed_ranges(rotated, 500, read_workers=2))
+        assert [len(chunk.text) for chunk in chunks] == [500, 499, 200]
+        assert chunks[1].errors[0].line == 706
+
+
+class TestReaderConfig:
+    """Test input reading options."""
+
+    def test_args(self):
+        """Test the --column and --read-workers options."""
+        args = create_parser().parse_args(["--file", "logs/*.gz", "--column", "ip", "--read-workers", "4"])
+        assert (args.input_file, args.input_column, args.read_workers) == ("logs/*.gz", "ip", 4)
+
+    def test_validation(self):
+        """Test that reading options need an input file."""
+        with pytest.raises(ValueError, match="input files"):
+            LookupConfig(single_ip="10.0.0.1", input_column="ip")
+        with pytest.raises(ValueError):
+            LookupConfig(input_file="ips.txt", read_workers=0)
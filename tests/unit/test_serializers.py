@@ -7,8 +7,37 @@ from pathlib import Path
 import pandas as pd
 import pytest
 
-from src.models import ASNResult, BatchResult
-from src.serializers import CSVSerializer, JSONSerializer, ParquetSerializer
+from src.columnar import ColumnarBatch
+from src.models import ASNResult, BatchResult, OutputFormat, ParquetCompression, ParquetOptions
+from src.providers.origins import LookupDetails
+from src.serializers import (
+    CSVSerializer,
+    JSONLinesSerializer,
+    JSONSerializer,
+    ParquetSerializer,
+    open_stream_writer,
+)
+
+
+def _chunks():
+    """Two chunks of results as produced by streaming lookups."""
+    return [
+        BatchResult(
+            results=[
+                ASNResult(ip="8.8.8.8", asn=15169, provider="pyipmeta"),
+                ASNResult(ip="1.1.1.1", asn=13335, provider="pyipmeta"),
+            ],
+            total=2,
+            successful=2,
+            lookup_date=datetime(2023, 1, 1)
+        ),
+        BatchResult(
+            results=[ASNResult(ip="0.0.0.0", asn=0, provider="pyipmeta")],
+            total=1,
+            successful=0,
+            lookup_date=datetime(2023, 1, 1)
+        ),
+    ]
 
 
 class TestJSONSerializer:
@@ -64,6 +93,20 @@ class TestJSONSerializer:
 class TestCSVSerializer:
     """Test CSV serializer."""
     
+    def test_snapshot_date_column(self):
+        """Test that multi-date results get snapshot_date and requested_date columns."""
+        batch = BatchResult(
+            results=[ASNResult(ip="8.8.8.8", asn=15169, provider="prefix2as",
+                               snapshot_date=datetime(2023, 1, 1), requested_date=datetime(2023, 1, 2))],
+            total=1,
+            successful=1,
+            lookup_date=datetime(2023, 1, 1)
+        )
+        lines = CSVSerializer.serialize(batch).strip().split('\n')
+        assert lines[0].strip() == "ip,asn,timestamp,provider,snapshot_date,requested_date"
+        assert lines[1].strip().endswith("2023-01-01T00:00:00,2023-01-02T00:00:00")
+        assert "snapshot_date" not in JSONSerializer.serialize(_chunks()[0])
+    
     def test_serialize_to_string(self):
         """Test serializing to CSV string."""
         results = [
@@ -152,4 +195,169 @@ class TestParquetSerializer:
         
         parquet_bytes = ParquetSerializer.serialize(batch)
         assert isinstance(parquet_bytes, bytes)
-        assert len(parquet_bytes) > 0
\ No newline at end of file
+        assert len(parquet_bytes) > 0
+    
+    def test_arrow_types(self, tmp_path):
+        """Test the ASN column is uint32 and the provider column dictionary-encoded."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        path = tmp_path / "out.parquet"
+        batch = ColumnarBatch.from_ips(["8.8.8.8", "1.1.1.1"], [15169, 13335], "prefix2as", datetime(2023, 1, 1))
+        assert ParquetSerializer.serialize(batch, str(path)) is None
+        
+        table = pq.read_table(path)
+        assert table.schema.field("asn").type == pa.uint32()
+        assert pa.types.is_dictionary(table.schema.field("provider").type)
+        assert table.column("provider").to_pylist() == ["prefix2as", "prefix2as"]
+        assert pq.ParquetFile(path).metadata.row_group(0).column(0).compression == "SNAPPY"
+    
+    def test_enriched_columns(self, tmp_path):
+        """Test the prefix, prefix length and origins columns of enriched results."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        details = LookupDetails.from_origin_lists([[64496, 64497], []])
+        details.prefix_length[0] = 24
+        batch = ColumnarBatch.from_ips(
+            ["192.0.2.1", "11.0.0.0"], details.asns, "prefix2as", datetime(2023, 1, 1), details=details
+        )
+        path = tmp_path / "out.parquet"
+        ParquetSerializer.serialize(batch, str(path))
+        
+        table = pq.read_table(path)
+        assert table.schema.field("origins").type == pa.list_(pa.uint32())
+        assert table.column("prefix").to_pylist() == ["192.0.2.0", None]
+        assert table.column("prefix_length").to_pylist() == [24, None]
+        assert table.column("origins").to_pylist() == [[64496, 64497], []]
+
+
+class TestJSONLinesSerializer:
+    """Test JSON Lines serializer."""
+    
+    def test_serialize_to_string(self):
+        """Test one JSON object per line."""
+        lines = JSONLinesSerializer.serialize(_chunks()[0]).splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[1])["asn"] == 13335
+    
+    def test_matches_standard_encoder(self):
+        """Test the hand-rolled encoder produces the same lines as json.dumps."""
+        batch = ColumnarBatch.from_ips(
+            ["8.8.8.8", 'we"ird\\ip', "1.1.1.1"], [15169, 0, 13335], "prefix2as", datetime(2023, 1, 1),
+            snapshot_date=datetime(2023, 1, 1), requested_date=datetime(2023, 1, 2)
+        )
+        expected = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch.records())
+        assert JSONLinesSerializer.serialize(batch) == expected
+    
+    def test_enriched_matches_standard_encoder(self):
+        """Test the encoder output for enriched rows, including unmatched ones."""
+        details = LookupDetails.from_origin_lists([[64496, 64497], [], [1]])
+        details.prefix_length[[0, 2]] = [24, 8]
+        batch = ColumnarBatch.from_ips(
+            ["192.0.2.1", "bad", "10.0.0.1"], details.asns, "prefix2as", datetime(2023, 1, 1), details=details
+        )
+        expected = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch.records())
+        assert JSONLinesSerializer.serialize(batch) == expected
+    
+    def test_written_in_blocks(self, tmp_path, monkeypatch):
+        """Test rows are split into blocks without losing or reordering lines."""
+        from src.serializers import json_serializer
+        
+        monkeypatch.setattr(json_serializer, "BLOCK_ROWS", 2)
+        ips = [f"10.0.0.{i}" for i in range(5)] + ["bad"]
+        batch = ColumnarBatch.from_ips(ips, [1, 2, 3, 4, 5, 0], "p", datetime(2023, 1, 1))
+        path = tmp_path / "out.jsonl"
+        with open_stream_writer(OutputFormat.JSONL, str(path)) as writer:
+            writer.write(batch)
+        assert [json.loads(line)["ip"] for line in path.read_text().splitlines()] == ips
+
+
+class TestStreamWriters:
+    """Test incremental writers."""
+    
+    @pytest.mark.parametrize("output_format", list(OutputFormat))
+    def test_running_counters(self, tmp_path, output_format):
+        """Test that counters accumulate across chunks for every format."""
+        path = tmp_path / f"out.{output_format.value}"
+        with open_stream_writer(output_format, str(path)) as writer:
+            for chunk in _chunks():
+                writer.write(chunk)
+        assert writer.total == 3
+        assert writer.successful == 2
+    
+    def test_json_document(self, tmp_path):
+        """Test the streamed JSON document matches the batch layout."""
+        path = tmp_path / "out.json"
+        with open_stream_writer(OutputFormat.JSON, str(path)) as writer:
+            for chunk in _chunks():
+                writer.write(chunk)
+        data = json.loads(path.read_text())
+        assert [r["ip"] for r in data["results"]] == ["8.8.8.8", "1.1.1.1", "0.0.0.0"]
+        assert data["total"] == 3
+        assert data["successful"] == 2
+    
+    def test_csv(self, tmp_path):
+        """Test the header is written once."""
+        path = tmp_path / "out.csv"
+        with open_stream_writer(OutputFormat.CSV, str(path)) as writer:
+            for chunk in _chunks():
+                writer.write(chunk)
+        df = pd.read_csv(path)
+        assert df["ip"].tolist() == ["8.8.8.8", "1.1.1.1", "0.0.0.0"]
+    
+    def test_parquet_row_groups(self, tmp_path):
+        """Test each chunk becomes a Parquet row group."""
+        import pyarrow.parquet as pq
+        
+        path = tmp_path / "out.parquet"
+        with open_stream_writer(OutputFormat.PARQUET, str(path)) as writer:
+            for chunk in _chunks():
+                writer.write(chunk)
+        parquet_file = pq.ParquetFile(path)
+        assert parquet_file.num_row_groups == 2
+        assert parquet_file.read().column("asn").to_pylist() == [15169, 13335, 0]
+    
+    def test_parquet_fixed_row_groups(self, tmp_path):
+        """Test chunks are coalesced into row groups of the configured size."""
+        import pyarrow.parquet as pq
+        
+        path = tmp_path / "out.parquet"
+        options = ParquetOptions(row_group_size=2, compression=ParquetCompression.ZSTD)
+        ips = [f"10.0.0.{i}" for i in range(5)]
+        with open_stream_writer(OutputFormat.PARQUET, str(path), options) as writer:
+            for i in range(0, 5, 3):
+                writer.write(ColumnarBatch.from_ips(ips[i:i + 3], [1] * len(ips[i:i + 3]), "p", datetime(2023, 1, 1)))
+        metadata = pq.ParquetFile(path).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2, 1]
+        assert metadata.row_group(0).column(0).compression == "ZSTD"
+        assert pq.read_table(path).column("ip").to_pylist() == ips
+    
+    def test_parquet_record_batches(self, tmp_path):
+        """Test Arrow record batches can be written one at a time."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        from src.serializers.parquet_serializer import SCHEMA, ParquetStreamWriter
+        
+        path = tmp_path / "out.parquet"
+        batch = pa.RecordBatch.from_pydict(
+            {
+                "ip": ["8.8.8.8"],
+                "asn": [15169],
+                "timestamp": [datetime(2023, 1, 1)],
+                "provider": ["p"],
+            },
+            schema=SCHEMA,
+        )
+        with ParquetStreamWriter(str(path)) as writer:
+            writer.write_batch(batch)
+            writer.write_batch(batch)
+        assert writer.total == 2
+        assert writer.successful == 2
+        assert pq.read_table(path).num_rows == 2
+    
+    def test_parquet_requires_file(self):
+        """Test Parquet streaming refuses stdout."""
+        with pytest.raises(ValueError):
+            open_stream_writer(OutputFormat.PARQUET)
@@ -0,0 +1,207 @@
+"""Unit tests for the lookup daemon and its client."""
+import asyncio
+import socket
+import time
+from datetime import datetime
+
+import pytest
+
+import src.server as server_module
+from src import metrics
+from src.client import LookupClient
+from src.models import Provider, ServerConfig
+from src.providers.binary_index import write_index
+from src.providers.prefix_table import PrefixTable, RangeIndex
+from src.server import LookupServer, parse_address
+
+
+@pytest.fixture
+def server_config(tmp_path):
+    """Server configuration backed by a small precompiled index."""
+    path = tmp_path / "snap.idx"
+    table = PrefixTable.from_lines(["8.8.8.0\t24\t15169", "1.1.1.0\t24\t13335"])
+    write_index(RangeIndex.build(table), datetime(2023, 1, 1), path)
+    return ServerConfig(
+        provider=Provider.PREFIX2AS,
+        address=f"unix:{tmp_path / 'lookup.sock'}",
+        index_path=str(path),
+        use_cache=False,
+    )
+
+
+def _run_with_server(config, client_fn):
+    """Start the server, run a blocking client function against it and stop."""
+    async def main():
+        server = await LookupServer(config).start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, client_fn)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+
+class TestParseAddress:
+    """Test address parsing."""
+
+    def test_addresses(self):
+        """Test TCP and Unix socket addresses."""
+        assert parse_address("unix:/tmp/x.sock") == ("unix", "/tmp/x.sock", 0)
+        assert parse_address("http://localhost:9000/") == ("tcp", "localhost", 9000)
+        assert parse_address(":9000") == ("tcp", "127.0.0.1", 9000)
+        with pytest.raises(ValueError):
+            parse_address("localhost")
+
+
+class TestSocketPath:
+    """Test taking over the Unix socket path."""
+
+    def _start_and_stop(self, config):
+        async def main():
+            server = await LookupServer(config).start()
+            server.close()
+            await server.wait_closed()
+        asyncio.run(main())
+
+    def test_stale_socket_is_replaced(self, server_config, tmp_path):
+        """Test that a socket nothing listens on any more is removed."""
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(tmp_path / "lookup.sock"))
+        stale.close()
+        self._start_and_stop(server_config)
+
+    def test_other_files_are_kept(self, server_config, tmp_path):
+        """Test that a regular file at the path is neither replaced nor removed."""
+        path = tmp_path / "lookup.sock"
+        path.write_text("data")
+        with pytest.raises(FileExistsError):
+            self._start_and_stop(server_config)
+        assert path.read_text() == "data"
+
+    def test_live_socket_is_kept(self, server_config):
+        """Test that a second daemon does not take over a socket that is still served."""
+        async def main():
+            server = await LookupServer(server_config).start()
+            try:
+                with pytest.raises(OSError, match="Another daemon"):
+                    await LookupServer(server_config).start()
+            finally:
+                server.close()
+                await server.wait_closed()
+        asyncio.run(main())
+
+
+class TestLookupServer:
+    """Test the daemon over a Unix socket."""
+
+    def test_batch_lookup(self, server_config):
+        """Test batch lookups through the client, reusing the connection."""
+        def client_fn():
+            client = LookupClient(server_config.address)
+            try:
+                first = client.lookup(["8.8.8.8", "1.1.1.1", "9.9.9.9"], datetime(2023, 1, 1))
+                second = client.lookup(["1.1.1.2"], datetime(2023, 1, 1))
+            finally:
+                client.close()
+            return first, second
+
+        first, second = _run_with_server(server_config, client_fn)
+        assert [r.asn for r in first.results] == [15169, 13335, 0]
+        assert (first.total, first.successful) == (3, 2)
+        assert first.lookup_date == datetime(2023, 1, 1)
+        assert second.results[0].asn == 13335
+
+    def test_concurrent_requests_are_batched(self, server_config):
+        """Test that concurrent requests are coalesced into shared provider calls."""
+        async def main():
+            server = LookupServer(server_config)
+            results = await asyncio.gather(*(
+                server.lookup([f"8.8.8.{i}"], datetime(2023, 1, 1)) for i in range(20)
+            ))
+            return server, results
+
+        server, results = asyncio.run(main())
+        assert all(r.results[0].asn == 15169 for r in results)
+        assert len(server._batchers) == 1
+
+    def test_dates_share_snapshot(self, server_config):
+        """Test that requested dates answered by the same snapshot share one provider."""
+        async def main():
+            server = LookupServer(server_config)
+            await server.lookup(["8.8.8.8"], datetime(2023, 1, 1))
+            await server.lookup(["8.8.8.8"], datetime(2023, 2, 1))
+            return server
+
+        assert list(asyncio.run(main())._batchers) == ["2023-01-01"]
+
+    def test_eviction_answers_pending_lookups(self, server_config, monkeypatch):
+        """Test that evicted snapshots, loaded or still loading, answer their lookups and stop."""
+        slow_lookup = server_module.lookup_unique
+
+        def lookup_unique(provider, ips):
+            time.sleep(0.05)
+            return slow_lookup(provider, ips)
+
+        monkeypatch.setattr(server_module, "lookup_unique", lookup_unique)
+        monkeypatch.setattr(LookupServer, "_find_snapshot", lambda self, date: date)
+        config = server_config.model_copy(update={"max_providers": 1})
+
+        async def main():
+            server = LookupServer(config)
+            # The second date evicts the first while it is still loading, the third
+            # evicts the second while its lookup runs.
+            first = asyncio.ensure_future(server.lookup(["8.8.8.8"], datetime(2023, 1, 1)))
+            second = asyncio.ensure_future(server.lookup(["1.1.1.1"], datetime(2023, 1, 2)))
+            await asyncio.sleep(0.02)
+            third = server.lookup(["8.8.8.8"], datetime(2023, 1, 3))
+            results = await asyncio.wait_for(asyncio.gather(first, second, third), 5)
+            await asyncio.sleep(0)
+            return server, results
+
+        server, results = asyncio.run(main())
+        assert [r.results[0].asn for r in results] == [15169, 13335, 15169]
+        assert list(server._batchers) == ["2023-01-03"]
+
+    def test_bad_request(self, server_config):
+        """Test that invalid requests produce an error instead of stopping the server."""
+        def client_fn():
+            client = LookupClient(server_config.address)
+            try:
+                client._conn.request("POST", "/lookup", body="not json")
+                response = client._conn.getresponse()
+                response.read()
+                client._conn.close()
+                return response.status, client.lookup(["8.8.8.8"], datetime(2023, 1, 1))
+            finally:
+                client.close()
+
+        status, result = _run_with_server(server_config, client_fn)
+        assert status == 400
+        assert result.results[0].asn == 15169
+
+    def test_metrics_endpoint(self, server_config):
+        """Test that /metrics serves Prometheus text only when enabled."""
+        def fetch(config):
+            def client_fn():
+                client = LookupClient(config.address)
+                try:
+                    client.lookup(["8.8.8.8", "9.9.9.9"], datetime(2023, 1, 1))
+                    client._conn.request("GET", "/metrics")
+                    response = client._conn.getresponse()
+                    return response.status, response.getheader("Content-Type"), response.read().decode()
+                finally:
+                    client.close()
+            return _run_with_server(config, client_fn)
+
+        status, _, _ = fetch(server_config)
+        assert status == 404
+
+        try:
+            status, content_type, text = fetch(server_config.model_copy(update={"metrics": True}))
+        finally:
+            metrics.disable()
+        assert status == 200
+        assert content_type.startswith("text/plain")
+        assert "map_ip_to_asn_lookup_batches_total 1" in text
+        assert "map_ip_to_asn_snapshots_loaded 1" in text
+        assert 'map_ip_to_asn_lookup_cache_misses_total{snapshot="2023-01-01"}' in text
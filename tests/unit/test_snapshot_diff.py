@@ -0,0 +1,130 @@
+"""Unit tests for snapshot diffs."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.providers.binary_index import load_index, write_index
+from src.providers.prefix_table import PrefixTable, RangeIndex
+from src.providers.snapshot_diff import (
+    SnapshotDelta,
+    apply_delta,
+    apply_delta_to_file,
+    apply_delta_to_index,
+    diff_tables,
+)
+
+OLD = ["10.0.0.0\t8\t100", "10.1.0.0\t16\t200", "192.0.2.0\t24\t300", "198.51.100.0\t24\t400"]
+NEW = ["10.0.0.0\t8\t100", "10.1.0.0\t16\t201", "192.0.2.0\t24\t300", "203.0.113.0\t24\t500"]
+
+
+def _random_table(rng, n, shortest=8):
+    length = rng.integers(shortest, 25, n).astype(np.uint8)
+    shift = (32 - length).astype(np.uint64)
+    network = (rng.integers(0, 2 ** 32, n, dtype=np.uint64) >> shift << shift).astype(np.uint32)
+    return PrefixTable(network, length, rng.integers(1, 1000, n))
+
+
+class TestDiff:
+    """Test computing and applying deltas."""
+
+    def test_diff_contents(self):
+        """Test removed, added and re-originated prefixes."""
+        delta = diff_tables(PrefixTable.from_lines(OLD), PrefixTable.from_lines(NEW))
+        assert len(delta.removed) == 1
+        assert delta.upserted.asn.tolist() == [201, 500]
+
+    def test_apply_reproduces_target(self):
+        """Test that applying a diff to the old table yields the new table."""
+        rng = np.random.default_rng(3)
+        old = _random_table(rng, 2000)
+        keep = rng.random(len(old)) > 0.05
+        asn = old.asn.copy()
+        asn[rng.random(len(old)) < 0.05] += 1
+        extra = _random_table(rng, 100)
+        new = PrefixTable(
+            np.concatenate([old.network[keep], extra.network]),
+            np.concatenate([old.length[keep], extra.length]),
+            np.concatenate([asn[keep], extra.asn]),
+        )
+
+        result = apply_delta(old, diff_tables(old, new))
+
+        assert result.keys.tolist() == new.keys.tolist()
+        assert result.asn.tolist() == new.asn.tolist()
+
+    def test_origin_set_change(self):
+        """Test that a prefix whose origin set changed is upserted even if its ASN did not."""
+        old = PrefixTable.from_lines(["192.0.2.0\t24\t64497", "10.0.0.0\t8\t100"])
+        new = PrefixTable.from_lines(["192.0.2.0\t24\t64496_64497", "10.0.0.0\t8\t100"])
+        delta = diff_tables(old, new)
+        assert delta.upserted.asn.tolist() == [64497]
+
+        result = apply_delta(old, delta)
+        assert result.origin_pool.tolist() == new.origin_pool.tolist()
+        assert result.origin_offsets.tolist() == new.origin_offsets.tolist()
+
+    def test_identical_snapshots(self):
+        """Test an empty diff."""
+        table = PrefixTable.from_lines(OLD)
+        assert len(diff_tables(table, table)) == 0
+
+    def test_apply_to_index_matches_build(self):
+        """Test that updating an index in place gives the index built from the target table."""
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            # Prefixes down to /0 cover many blocks and are cut at their boundaries.
+            old = _random_table(rng, 500, shortest=0 if seed % 2 else 12)
+            keep = rng.random(len(old)) > 0.1
+            asn = old.asn.copy()
+            asn[rng.random(len(old)) < 0.05] += 1
+            extra = _random_table(rng, 50)
+            new = PrefixTable(
+                np.concatenate([old.network[keep], extra.network]),
+                np.concatenate([old.length[keep], extra.length]),
+                np.concatenate([asn[keep], extra.asn]),
+            )
+
+            result = apply_delta_to_index(RangeIndex.build(old), diff_tables(old, new))
+
+            expected = RangeIndex.build(new)
+            assert result.table.keys.tolist() == new.keys.tolist()
+            for column in ("starts", "ends", "prefix", "range_asn"):
+                assert getattr(result, column).tolist() == getattr(expected, column).tolist()
+
+    def test_apply_to_index_edge_cases(self):
+        """Test empty deltas and deltas that empty or fill the table."""
+        table = PrefixTable.from_lines(OLD)
+        empty = PrefixTable.from_lines([])
+        for old, new in ((table, table), (table, empty), (empty, table)):
+            result = apply_delta_to_index(RangeIndex.build(old), diff_tables(old, new))
+            assert result.starts.tolist() == RangeIndex.build(new).starts.tolist()
+            assert result.prefix.tolist() == RangeIndex.build(new).prefix.tolist()
+
+
+class TestDeltaFiles:
+    """Test delta persistence and on-disk index updates."""
+
+    def test_apply_to_index_file(self, tmp_path):
+        """Test producing the next day's index file from the previous one."""
+        base = tmp_path / "day1.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(OLD)), datetime(2023, 1, 1), base)
+        delta = diff_tables(PrefixTable.from_lines(OLD), PrefixTable.from_lines(NEW),
+                            datetime(2023, 1, 1), datetime(2023, 1, 2))
+        delta.save(tmp_path / "delta.npz")
+
+        apply_delta_to_file(base, SnapshotDelta.load(tmp_path / "delta.npz"), tmp_path / "day2.idx")
+
+        index, date = load_index(tmp_path / "day2.idx")
+        assert date == datetime(2023, 1, 2)
+        addrs = np.array([0x0A010101, 0xC6336401, 0xCB007101], dtype=np.uint32)
+        assert index.lookup(addrs).tolist() == [201, 0, 500]
+
+    def test_wrong_base_rejected(self, tmp_path):
+        """Test that a delta is not applied to another snapshot's index."""
+        base = tmp_path / "day5.idx"
+        write_index(RangeIndex.build(PrefixTable.from_lines(OLD)), datetime(2023, 1, 5), base)
+        delta = diff_tables(PrefixTable.from_lines(OLD), PrefixTable.from_lines(NEW),
+                            datetime(2023, 1, 1), datetime(2023, 1, 2))
+        with pytest.raises(ValueError):
+            apply_delta_to_file(base, delta, tmp_path / "out.idx")
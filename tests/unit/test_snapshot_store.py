@@ -0,0 +1,108 @@
+"""Unit tests for the local snapshot store."""
+import os
+from datetime import datetime
+
+from src.providers import discovery, snapshot_store
+from src.providers.snapshot_store import SnapshotStore, sha256_file
+
+URL = "http://data.caida.org/datasets/routing/routeviews-prefix2as/2023/01/routeviews-rv2-20230101-1200.pfx2as.gz"
+
+
+def _make_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return path
+
+
+class TestSnapshotStore:
+    """Test SnapshotStore."""
+
+    def test_add_and_get(self, tmp_path):
+        """Test that added files are content addressed and retrievable."""
+        store = SnapshotStore(tmp_path / "store")
+        source = _make_file(tmp_path, "snap", b"1.0.0.0\t24\t13335\n")
+        digest = sha256_file(source)
+
+        stored = store.add_file(URL, source)
+
+        assert stored.name == digest
+        assert not source.exists()
+        assert store.get(URL) == stored
+        assert store.get("http://example.invalid/other") is None
+
+    def test_corrupt_object_is_discarded(self, tmp_path):
+        """Test checksum verification on read."""
+        store = SnapshotStore(tmp_path / "store")
+        stored = store.add_file(URL, _make_file(tmp_path, "snap", b"original"))
+        stored.write_bytes(b"tampered")
+
+        assert store.get(URL) is None
+        assert not stored.exists()
+
+    def test_unchanged_object_is_not_rehashed(self, tmp_path, monkeypatch):
+        """Test that reads only hash files whose size or modification time changed."""
+        store = SnapshotStore(tmp_path / "store")
+        stored = store.add_file(URL, _make_file(tmp_path, "snap", b"original"))
+        hashed = []
+        monkeypatch.setattr(snapshot_store, "sha256_file", lambda path: hashed.append(path) or sha256_file(path))
+
+        assert store.get(URL) == stored
+        assert store.get(URL) == stored
+        assert hashed == []
+
+        os.utime(stored, (1, 1))
+        assert store.get(URL) == stored
+        assert store.get(URL) == stored
+        assert hashed == [stored]
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used object is evicted first."""
+        store = SnapshotStore(tmp_path / "store", max_bytes=20)
+        first = store.add_file("http://x/1", _make_file(tmp_path, "a", b"a" * 10))
+        second = store.add_file("http://x/2", _make_file(tmp_path, "b", b"b" * 10))
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        store.get("http://x/1")  # touch: now most recently used
+
+        third = store.add_file("http://x/3", _make_file(tmp_path, "c", b"c" * 10))
+
+        assert first.exists()
+        assert not second.exists()
+        assert third.exists()
+
+    def test_resolve_requires_stored_object(self, tmp_path):
+        """Test that date resolutions are only returned when the snapshot is stored."""
+        store = SnapshotStore(tmp_path / "store")
+        date = datetime(2023, 1, 1)
+        store.remember(date, URL, date)
+        assert store.resolve(date) is None
+
+        store.add_file(URL, _make_file(tmp_path, "snap", b"data"))
+        assert store.resolve(date) == (URL, date)
+
+
+    def test_resolutions_are_kept_per_dataset(self, tmp_path):
+        """Test that IPv6 date resolutions do not shadow IPv4 ones."""
+        store = SnapshotStore(tmp_path / "store")
+        date = datetime(2023, 1, 1)
+        store.add_file(URL, _make_file(tmp_path, "snap", b"data"))
+        store.remember(date, URL, date, dataset="routeviews6-prefix2as")
+        assert store.resolve(date) is None
+        assert store.resolve(date, "routeviews6-prefix2as") == (URL, date)
+
+class TestSnapshotDiscoveryCache:
+    """Test snapshot discovery against the store."""
+
+    def test_warm_store_makes_no_requests(self, tmp_path, monkeypatch):
+        """Test that a resolved date is answered without touching the network."""
+        store = SnapshotStore(tmp_path / "store")
+        date = datetime(2023, 1, 1)
+        store.add_file(URL, _make_file(tmp_path, "snap", b"data"))
+        store.remember(date, URL, date)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("network access attempted")
+
+        monkeypatch.setattr(discovery, "get_session", fail)
+
+        assert discovery.find_routeviews_snapshot_url(date, store) == (URL, date)
@@ -0,0 +1,118 @@
+"""Unit tests for multi-date lookups."""
+from datetime import datetime
+
+import pytest
+
+from src import timeseries
+from src.models import LookupConfig, Provider
+from src.providers import Prefix2ASProvider
+from src.providers.cache import NullCache, PrefixCache
+from src.providers.prefix_table import PrefixTable
+from src.providers.prefix_table6 import PrefixTable6
+
+# Snapshot published on the 1st and 3rd only; the 2nd falls back to the 1st.
+SNAPSHOTS = {
+    datetime(2023, 1, 1): ["8.8.8.0\t24\t15169"],
+    datetime(2023, 1, 3): ["8.8.8.0\t24\t64500", "2001:db8::\t32\t64500_64501"],
+}
+
+
+@pytest.fixture
+def fake_snapshots(monkeypatch):
+    """Serve SNAPSHOTS instead of discovering and downloading real ones."""
+    loads = []
+
+    def find(date, store=None):
+        actual = max(d for d in SNAPSHOTS if d <= date)
+        return f"http://example.invalid/{actual:%Y%m%d}", actual
+
+    def get_provider(provider_type, snapshot_date, store=None, index_path=None, cache=None):
+        loads.append(snapshot_date)
+        provider = Prefix2ASProvider(snapshot_date, cache=cache)
+        provider.load_table(PrefixTable.from_lines(SNAPSHOTS[snapshot_date]))
+        provider.load_table6(PrefixTable6.from_lines(SNAPSHOTS[snapshot_date]))
+        return provider
+
+    monkeypatch.setattr(timeseries, "find_routeviews_snapshot_url", find)
+    monkeypatch.setattr(timeseries, "get_provider", get_provider)
+    return loads
+
+
+class TestDateRange:
+    """Test date range expansion."""
+
+    def test_expand(self):
+        """Test inclusive ranges with a step."""
+        dates = timeseries.expand_date_range(datetime(2023, 1, 1), datetime(2023, 1, 5), step_days=2)
+        assert dates == [datetime(2023, 1, 1), datetime(2023, 1, 3), datetime(2023, 1, 5)]
+
+    def test_reversed_range(self):
+        """Test that an end before the start is rejected."""
+        with pytest.raises(ValueError):
+            timeseries.expand_date_range(datetime(2023, 1, 5), datetime(2023, 1, 1))
+
+
+class TestLookupOverDates:
+    """Test lookup_ips_over_dates."""
+
+    def test_each_snapshot_loaded_once(self, fake_snapshots):
+        """Test dates resolving to the same snapshot share one load but each get their rows."""
+        config = LookupConfig(
+            provider=Provider.PREFIX2AS,
+            single_ip="8.8.8.8",
+            snapshot_dates=timeseries.expand_date_range(datetime(2023, 1, 1), datetime(2023, 1, 3)),
+        )
+        batches = list(timeseries.lookup_ips_over_dates(["8.8.8.8", "1.1.1.1"], config))
+
+        assert fake_snapshots == [datetime(2023, 1, 1), datetime(2023, 1, 3)]
+        rows = [(r.ip, r.requested_date.day, r.snapshot_date.day, r.asn) for b in batches for r in b.results]
+        assert rows == [
+            ("8.8.8.8", 1, 1, 15169),
+            ("1.1.1.1", 1, 1, 0),
+            ("8.8.8.8", 2, 1, 15169),
+            ("1.1.1.1", 2, 1, 0),
+            ("8.8.8.8", 3, 3, 64500),
+            ("1.1.1.1", 3, 3, 0),
+        ]
+        assert [b.successful for b in batches] == [1, 1, 1]
+        assert batches[0].asns is batches[1].asns
+
+    def test_ipv6_rows(self, fake_snapshots):
+        """Test that IPv6 rows are resolved on every snapshot, with origin sets when enriched."""
+        dates = [datetime(2023, 1, 1), datetime(2023, 1, 3)]
+        config = LookupConfig(provider=Provider.PREFIX2AS, single_ip="8.8.8.8", snapshot_dates=dates)
+        batches = list(timeseries.lookup_ips_over_dates(["2001:db8::1", "8.8.8.8"], config))
+        assert [b.asns.tolist() for b in batches] == [[0, 15169], [64501, 64500]]
+
+        config = LookupConfig(provider=Provider.PREFIX2AS, single_ip="8.8.8.8", snapshot_dates=dates, enrich=True)
+        batches = list(timeseries.lookup_ips_over_dates(["2001:db8::1", "8.8.8.8"], config))
+        assert batches[1].details.origins() == [[64500, 64501], [64500]]
+        assert batches[1].prefixes() == ["2001:db8::", "8.8.8.0"]
+
+    def test_configured_lookup_cache(self, fake_snapshots, monkeypatch):
+        """Test that each snapshot's provider gets a lookup cache sized by the configuration."""
+        providers = []
+        get_provider = timeseries.get_provider
+
+        def recording_get_provider(*args, **kwargs):
+            providers.append(get_provider(*args, **kwargs))
+            return providers[-1]
+
+        monkeypatch.setattr(timeseries, "get_provider", recording_get_provider)
+        config = LookupConfig(
+            provider=Provider.PREFIX2AS,
+            single_ip="8.8.8.8",
+            snapshot_dates=[datetime(2023, 1, 1), datetime(2023, 1, 3)],
+            lookup_cache_entries=0,
+            prefix_cache_entries=16,
+        )
+        list(timeseries.lookup_ips_over_dates(["8.8.8.8"], config))
+
+        assert len(providers) == 2
+        assert all(isinstance(p.cache, PrefixCache) for p in providers)
+        assert providers[0].cache is not providers[1].cache
+
+        config = config.model_copy(update={"prefix_cache_entries": 0})
+        providers.clear()
+        list(timeseries.lookup_ips_over_dates(["8.8.8.8"], config))
+        assert all(isinstance(p.cache, NullCache) for p in providers)